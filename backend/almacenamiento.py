@@ -0,0 +1,240 @@
+"""
+Almacén de contenidos de los libros Excel, direccionado por SHA-256.
+
+ArchivosExcel guarda solo metadatos y HashContenido; los bytes viven en el
+almacén (por defecto, el sistema de archivos local en BLOBS_DIR). Contenidos
+idénticos comparten un único blob. Con varios contenedores, BLOBS_DIR debe ser
+un volumen compartido.
+
+Herramienta de migración (desde backend/):
+    python almacenamiento.py --migrar    # mueve ArchivosExcel.Datos al almacén
+    python almacenamiento.py --purgar    # borra blobs que ya nadie referencia
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# ======================= CARGA .ENV (carpeta "archivos") =======================
+BASE_DIR = Path(__file__).resolve().parent
+ENV_PATH = BASE_DIR / "archivos" / ".env"
+load_dotenv(dotenv_path=ENV_PATH, override=True)
+
+# ======================= CONFIG ===========================
+ALMACEN_BLOBS = os.getenv("ALMACEN_BLOBS", "local")
+BLOBS_DIR = Path(os.getenv("BLOBS_DIR", str(BASE_DIR / "archivos" / "blobs")))
+BLOQUE_LECTURA = 1024 * 1024
+# Un blob sin referencias se borra solo si es más antiguo que esto (evita carreras con subidas en curso)
+BLOBS_GRACIA_SEGUNDOS = int(os.getenv("BLOBS_GRACIA_SEGUNDOS", "3600"))
+
+
+class AlmacenBlobs(ABC):
+    """Interfaz de un almacén de blobs direccionado por contenido"""
+
+    @abstractmethod
+    def guardar(self, origen):
+        """
+        Guarda bytes o un archivo abierto (se lee por bloques).
+
+        Returns:
+            tuple: (hash_hex, tamano)
+        """
+
+    @abstractmethod
+    def abrir(self, hash_hex):
+        """Devuelve un archivo binario abierto con el contenido"""
+
+    def ruta_local(self, hash_hex):
+        """Ruta en disco si el backend la tiene (permite sendfile), o None"""
+        return None
+
+    @abstractmethod
+    def existe(self, hash_hex):
+        """True si el blob está guardado"""
+
+    @abstractmethod
+    def eliminar(self, hash_hex):
+        """Borra el blob (sin error si no existe)"""
+
+    @abstractmethod
+    def listar(self):
+        """Itera (hash_hex, segundos_desde_modificacion)"""
+
+
+class AlmacenLocal(AlmacenBlobs):
+    """Blobs en BLOBS_DIR/ab/cd/<sha256>; escritura atómica vía archivo temporal + rename"""
+
+    def __init__(self, raiz=BLOBS_DIR):
+        self.raiz = Path(raiz)
+        self.temporales = self.raiz / "tmp"
+        self.temporales.mkdir(parents=True, exist_ok=True)
+
+    def _ruta(self, hash_hex):
+        return self.raiz / hash_hex[:2] / hash_hex[2:4] / hash_hex
+
+    def guardar(self, origen):
+        sha = hashlib.sha256()
+        tamano = 0
+        fd, temporal = tempfile.mkstemp(dir=self.temporales)
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                if isinstance(origen, (bytes, bytearray, memoryview)):
+                    sha.update(origen)
+                    destino.write(origen)
+                    tamano = len(origen)
+                else:
+                    while True:
+                        bloque = origen.read(BLOQUE_LECTURA)
+                        if not bloque:
+                            break
+                        sha.update(bloque)
+                        destino.write(bloque)
+                        tamano += len(bloque)
+                destino.flush()
+                os.fsync(destino.fileno())
+
+            hash_hex = sha.hexdigest()
+            ruta = self._ruta(hash_hex)
+            if ruta.exists():
+                # Mismo contenido ya almacenado: renovar la fecha para la purga
+                os.utime(ruta)
+                os.unlink(temporal)
+            else:
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                os.chmod(temporal, 0o644)
+                os.replace(temporal, ruta)
+            return hash_hex, tamano
+        except BaseException:
+            if os.path.exists(temporal):
+                os.unlink(temporal)
+            raise
+
+    def abrir(self, hash_hex):
+        return open(self._ruta(hash_hex), "rb")
+
+    def ruta_local(self, hash_hex):
+        return self._ruta(hash_hex)
+
+    def existe(self, hash_hex):
+        return self._ruta(hash_hex).exists()
+
+    def eliminar(self, hash_hex):
+        try:
+            os.unlink(self._ruta(hash_hex))
+        except FileNotFoundError:
+            pass
+
+    def listar(self):
+        ahora = time.time()
+        for ruta in self.raiz.glob("??/??/*"):
+            if len(ruta.name) == 64:
+                yield ruta.name, ahora - ruta.stat().st_mtime
+
+
+# Backends disponibles (ALMACEN_BLOBS)
+BACKENDS = {
+    "local": AlmacenLocal,
+}
+
+_almacen = None
+
+
+def obtener_almacen():
+    global _almacen
+    if _almacen is None:
+        if ALMACEN_BLOBS not in BACKENDS:
+            raise ValueError(f"ALMACEN_BLOBS desconocido: {ALMACEN_BLOBS}")
+        _almacen = BACKENDS[ALMACEN_BLOBS]()
+    return _almacen
+
+
+# ======================= MIGRACIÓN DESDE VARBINARY ===========================
+def migrar_blobs_de_bd():
+    """
+    Mueve ArchivosExcel.Datos al almacén, una fila por transacción, en todas las particiones.
+
+    Returns:
+        tuple: (filas migradas, bytes movidos)
+    """
+    from database import PARTICIONES, conectar, registrar_version_archivo
+
+    almacen = obtener_almacen()
+    migradas = 0
+    total_bytes = 0
+    for particion in PARTICIONES:
+        conn = conectar(particion)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT Id FROM ArchivosExcel WHERE HashContenido IS NULL AND Datos IS NOT NULL ORDER BY Id")
+            ids = [row[0] for row in cur.fetchall()]
+            print(f"🔧 {len(ids)} archivos de la partición '{particion}' por migrar al almacén '{ALMACEN_BLOBS}'")
+
+            for archivo_id in ids:
+                cur.execute("""
+                    SELECT Datos, VersionActual, TipoMime FROM ArchivosExcel WHERE Id = ? AND HashContenido IS NULL
+                """, (archivo_id,))
+                row = cur.fetchone()
+                if not row or row[0] is None:
+                    continue
+                hash_hex, tamano = almacen.guardar(row[0])
+                cur.execute("""
+                    UPDATE ArchivosExcel SET HashContenido = ?, Tamano = ?, Datos = NULL
+                    WHERE Id = ? AND HashContenido IS NULL
+                """, (hash_hex, tamano, archivo_id))
+                registrar_version_archivo(cur, archivo_id, row[1], hash_hex, tamano, row[2], None,
+                                          conservar_fecha=True)
+                conn.commit()
+                migradas += 1
+                total_bytes += tamano
+                print(f"✅ Archivo {archivo_id} ({particion}) -> {hash_hex[:12]}… ({tamano / 1024:.0f} KB)")
+        finally:
+            conn.close()
+
+    print(f"✅ Migración completa: {migradas} archivos, {total_bytes / 1024 / 1024:.1f} MB fuera de la BD")
+    if migradas:
+        print("ℹ️ SQL Server no devuelve el espacio al sistema hasta un DBCC SHRINKFILE (opcional)")
+    return migradas, total_bytes
+
+
+def purgar_blobs_huerfanos(gracia_segundos=BLOBS_GRACIA_SEGUNDOS):
+    """Borra blobs que ninguna fila referencia y que superan el período de gracia"""
+    from database import PARTICIONES, conectar
+
+    almacen = obtener_almacen()
+    # El almacén es compartido: un blob se conserva si lo referencia cualquier partición
+    referenciados = set()
+    for particion in PARTICIONES:
+        conn = conectar(particion)
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT HashContenido FROM ArchivosExcel WHERE HashContenido IS NOT NULL
+                UNION
+                SELECT HashContenido FROM VersionesArchivoExcel
+            """)
+            referenciados.update(row[0].strip() for row in cur.fetchall())
+        finally:
+            conn.close()
+
+    borrados = 0
+    for hash_hex, edad in list(almacen.listar()):
+        if hash_hex not in referenciados and edad > gracia_segundos:
+            almacen.eliminar(hash_hex)
+            borrados += 1
+    if borrados:
+        print(f"🧹 {borrados} blobs huérfanos eliminados")
+    return borrados
+
+
+if __name__ == '__main__':
+    if "--migrar" in sys.argv:
+        migrar_blobs_de_bd()
+    elif "--purgar" in sys.argv:
+        purgar_blobs_huerfanos()
+    else:
+        print(__doc__)
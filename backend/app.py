@@ -1,29 +1,80 @@
 import os
+import time
 from io import BytesIO
 from pathlib import Path
 
-import msal
 import requests
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from database import (
     guardar_archivo_excel,
+    guardar_archivos_excel,
     listar_archivos_por_facultad,
+    leer_contenido_archivo,
     guardar_plantillas_por_tipo,
     obtener_plantillas_por_tipo,
     conectar,
+    conectar_archivo,
+    conectar_facultad,
+    invalidar_particiones,
+    PARTICION_PRINCIPAL,
+    PARTICIONES,
+    FacultadEnMovimiento,
     crear_usuario,
     obtener_usuario_por_usuario,
-    inicializar_base_datos,
+    obtener_usuario_por_id,
     listar_usuarios_con_filtros,
     obtener_roles,
     obtener_facultades,
     obtener_carreras_por_facultad,
     obtener_correo_autoridad,
-    actualizar_correo_autoridad
+    actualizar_correo_autoridad,
+    invalidar_catalogos,
+    invalidar_totales_usuarios,
+    reindexar_trigramas_usuario,
+    importar_usuarios
 )
+from almacenamiento import obtener_almacen
+from arranque import asegurar_inicializacion
+from limites import PROXIES_CONFIABLES, cuenta_enviada, limitar, token_enviado
+from metricas import instrumentar_flask, exportar as exportar_metricas
+import perfil_sql
+import replicas
+from replicas import CABECERA_ESCRITURA, exigir_lectura_desde, marcas_escritura
+from salud import crear_monitor
+from vuelos import marcar_cambio, version_contenido, vuelos
+from versiones import listar_versiones, obtener_version, compactador as compactador_versiones
+from ingesta import (
+    INGESTA_AUTOMATICA,
+    ReporteNoSoportado,
+    VersionNoVigente,
+    ingerir_version,
+    ingestor,
+    listar_cambios,
+    listar_ingestas,
+    obtener_agregados,
+    planificador as planificador_ingesta,
+    precalcular_tras_ingesta
+)
+from correo import enviar_correo_graph
+from sesion import emitir_token, verificar_token, versiones_sesion
+from importacion_usuarios import leer_filas_archivo, validar_filas
+from lector_xlsx import LectorXlsx, XlsxInvalido
+from subida_lote import TIPOS_ZIP, LoteInvalido, almacenar_lote
+from escritor_xlsx import MIME_XLSX, generar_csv, generar_xlsx
+from exportacion import (
+    FORMATOS_EXPORTACION,
+    encabezados_reporte,
+    exportar_control_final,
+    exportar_reporte,
+    exportar_usuarios
+)
+from precalculo import ModuloDesconocido, listar_resultados, obtener_resultado, precalculador
+from tablero_admin import resumen_universidad
+from particiones import MovimientoEnCurso, estado_particiones, movedor
 
 # ======================= CARGA .ENV ===========================
 BASE_DIR = Path(__file__).resolve().parent
@@ -32,37 +83,63 @@ load_dotenv(dotenv_path=ENV_PATH, override=True)
 
 # ======================= FLASK APP ===========================
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
+# X-Forwarded-For solo cuenta si lo agregó un proxy propio (los saltos de PROXIES_CONFIABLES)
+if PROXIES_CONFIABLES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXIES_CONFIABLES)
+# Cabeceras que el frontend (otro origen) necesita leer; asgi.py usa la misma lista
+CABECERAS_EXPUESTAS = [CABECERA_ESCRITURA, "Retry-After"]
+CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=CABECERAS_EXPUESTAS)
+instrumentar_flask(app)
+perfil_sql.instrumentar_flask(app)
+replicas.instrumentar_flask(app)
 
 # ======================= CONFIG ===========================
 UG_AUTH_URL = os.getenv("UG_AUTH_URL",
                         "https://servicioenlinea.ug.edu.ec/SeguridadTestAPI/api/CampusVirtual/ValidarCuentaInstitucionalv3")
-USUARIO_OUTLOOK = os.getenv("OUTLOOK_USER")
-CLIENT_ID = os.getenv("MS_CLIENT_ID")
-CLIENT_SECRET = os.getenv("MS_CLIENT_SECRET")
-TENANT_ID = os.getenv("MS_TENANT_ID", "250f76e7-6105-42e3-82d0-be7c460aea59")
-SCOPES = ["https://graph.microsoft.com/.default"]
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "10"))
+# Compatibilidad temporal con clientes que aún envían X-User-Email en lugar del token
+PERMITIR_CABECERA_EMAIL = os.getenv("AUTH_PERMITIR_CABECERA_EMAIL", "0") == "1"
+# Si se define, /metrics exige "Authorization: Bearer <METRICAS_TOKEN>"
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")
+
+# Chequeos de salud en segundo plano (las sondas leen el último resultado)
+monitor_salud = crear_monitor(UG_AUTH_URL)
+# Compactación periódica del historial de versiones de archivos
+compactador_versiones.iniciar()
 
 # ======================= INICIALIZACIÓN BD ===========================
-print("🚀 Iniciando aplicación FACAF...")
-if inicializar_base_datos():
-    print("✅ Sistema listo - Base de datos inicializada correctamente")
-else:
-    print("❌ ADVERTENCIA: Problemas en inicialización de BD")
+# Con gunicorn ya la hizo el proceso maestro (on_starting); aquí no hay consultas
+asegurar_inicializacion()
 
 
 # ======================= AUTENTICACIÓN  ===========================
+def _token_de_request():
+    auth = request.headers.get('Authorization', '')
+    if auth.lower().startswith('bearer '):
+        return auth[7:].strip()
+    return None
+
+
 def get_current_user():
-    """Obtiene el usuario actual desde los headers con logging detallado"""
+    """Obtiene el usuario actual desde el token de sesión firmado (sin consultar la BD)"""
+    token = _token_de_request()
+    if token:
+        user = verificar_token(token)
+        if not user:
+            print("❌ get_current_user: token inválido, vencido o revocado")
+        return user
+
+    if not PERMITIR_CABECERA_EMAIL:
+        print("❌ get_current_user: No Authorization header found")
+        return None
+
     user_email = request.headers.get('X-User-Email')
 
     if not user_email:
-        print("❌ get_current_user: No X-User-Email header found")
-        print(f"📋 Available headers: {dict(request.headers)}")
+        print("❌ get_current_user: No Authorization/X-User-Email header found")
         return None
 
-    print(f"🔍 get_current_user: Looking for user '{user_email}'")
+    print(f"🔍 get_current_user: Looking for user '{user_email}' (cabecera legacy)")
 
     try:
         user = obtener_usuario_por_usuario(user_email)
@@ -90,6 +167,8 @@ def require_login(f):
 
         # Agregar usuario al request para usarlo en los endpoints
         request.current_user = user
+        # Sus escrituras recientes en este worker: no leer de réplicas que aún no las tengan
+        exigir_lectura_desde(marcas_escritura.de(user['id']))
         return f(*args, **kwargs)
 
     return decorated_function
@@ -107,22 +186,9 @@ def require_role(*roles):
                 print("❌ require_role: No current_user found - missing @require_login?")
                 return jsonify({'error': 'No autenticado - falta contexto de usuario'}), 401
 
-            # Normalizar rol (minúsculas, sin espacios)
-            user_role = (user.get('rolNombre') or '').strip().lower()
-            required_roles = [role.strip().lower() for role in roles]
-
-            print(f"🔍 Role check: user={user.get('usuario')}, role='{user_role}', required={required_roles}")
-
-            if user_role not in required_roles:
-                print(f"❌ Access DENIED: '{user_role}' not in {required_roles}")
-                return jsonify({
-                    'error': 'Permisos insuficientes',
-                    'userRole': user_role,
-                    'requiredRoles': list(roles),
-                    'message': f'Se requiere uno de estos roles: {", ".join(roles)}'
-                }), 403
-
-            print(f"✅ Access GRANTED for {user.get('usuario')} with role '{user_role}'")
+            denegado = _error_de_rol(user, roles)
+            if denegado:
+                return jsonify(denegado), 403
             return f(*args, **kwargs)
 
         return decorated_function
@@ -130,6 +196,27 @@ def require_role(*roles):
     return decorator
 
 
+def _error_de_rol(user, roles):
+    """Devuelve el cuerpo del 403 si el rol del usuario no está en `roles`, o None si tiene acceso"""
+    # Normalizar rol (minúsculas, sin espacios)
+    user_role = (user.get('rolNombre') or '').strip().lower()
+    required_roles = [role.strip().lower() for role in roles]
+
+    print(f"🔍 Role check: user={user.get('usuario')}, role='{user_role}', required={required_roles}")
+
+    if user_role not in required_roles:
+        print(f"❌ Access DENIED: '{user_role}' not in {required_roles}")
+        return {
+            'error': 'Permisos insuficientes',
+            'userRole': user_role,
+            'requiredRoles': list(roles),
+            'message': f'Se requiere uno de estos roles: {", ".join(roles)}'
+        }
+
+    print(f"✅ Access GRANTED for {user.get('usuario')} with role '{user_role}'")
+    return None
+
+
 # ======================= PERFIL DE USUARIO ===========================
 @app.get('/user/profile')
 @require_login
@@ -241,20 +328,18 @@ def api_get_carreras(facultad_cod):
 
 
 # ======================= ARCHIVOS ===========================
-@app.post('/upload')
-@require_login
-def subir_archivo():
-    """Subir archivo - TODOS los usuarios solo pueden subir a su facultad asignada"""
-    user = request.current_user
+def _facultad_destino_subida(user):
+    """
+    Facultad a la que el usuario puede subir archivos.
+
+    Returns:
+        tuple: (facultad_cod, None) o (None, respuesta de error)
+    """
     user_role = user.get('rolNombre', '').lower()
 
     # Solo ciertos roles pueden subir archivos
     if user_role not in ['admin', 'decano', 'coordinador']:
-        return jsonify({'error': 'No tienes permisos para subir archivos'}), 403
-
-    archivo = request.files.get('file')
-    if not archivo or archivo.filename.strip() == '':
-        return jsonify({'error': 'No se envió archivo'}), 400
+        return None, (jsonify({'error': 'No tienes permisos para subir archivos'}), 403)
 
     # CAMBIO CRÍTICO: Incluso admin está limitado a su facultad asignada
     facultad_cod = request.form.get('facultadCod') or request.args.get('facultadCod')
@@ -265,27 +350,108 @@ def subir_archivo():
     if user_role == 'admin' and override_facultad == 'true':
         # Admin con override puede subir a cualquier facultad
         if not facultad_cod:
-            return jsonify({'error': 'FacultadCod es requerido'}), 400
+            return None, (jsonify({'error': 'FacultadCod es requerido'}), 400)
         print(f"🔧 Admin override upload to faculty: {facultad_cod}")
     else:
         # TODOS los usuarios (incluso admin normal) solo pueden subir a su facultad
         if facultad_cod and facultad_cod != user['facultadCod']:
-            return jsonify({
-                               'error': f'Solo puedes subir archivos a tu facultad asignada ({user["facultadCod"]}). Facultad solicitada: {facultad_cod}'}), 403
+            return None, (jsonify({
+                               'error': f'Solo puedes subir archivos a tu facultad asignada ({user["facultadCod"]}). Facultad solicitada: {facultad_cod}'}), 403)
 
         facultad_cod = user['facultadCod']  # Forzar uso de facultad del usuario
         print(f"🔒 Standard upload to user's faculty: {facultad_cod}")
+    return facultad_cod, None
+
+
+@app.post('/upload')
+@require_login
+@limitar('blob')
+def subir_archivo():
+    """Subir archivo - TODOS los usuarios solo pueden subir a su facultad asignada"""
+    user = request.current_user
+    facultad_cod, error = _facultad_destino_subida(user)
+    if error:
+        return error
+
+    archivo = request.files.get('file')
+    if not archivo or archivo.filename.strip() == '':
+        return jsonify({'error': 'No se envió archivo'}), 400
+
+    if archivo.filename.lower().endswith(('.xlsx', '.xlsm')):
+        # Solo se abre el índice del zip y la lista de hojas; el contenido no se carga
+        try:
+            LectorXlsx(archivo.stream).cerrar()
+        except XlsxInvalido as e:
+            return jsonify({'error': str(e)}), 400
+        archivo.stream.seek(0)
 
     try:
-        guardar_archivo_excel(archivo, facultad_cod)
+        resultado = guardar_archivo_excel(archivo, facultad_cod, subido_por=user.get('usuario'))
+        if resultado['sinCambios']:
+            mensaje = f'Archivo "{archivo.filename}" sin cambios en facultad {facultad_cod} (contenido idéntico)'
+        else:
+            mensaje = f'Archivo "{archivo.filename}" guardado correctamente en facultad {facultad_cod}'
+            if INGESTA_AUTOMATICA:
+                # El delta por filas se calcula en segundo plano; ver /files/<id>/ingestas
+                ingestor.encolar(resultado['id'])
         return jsonify({
-            'message': f'Archivo "{archivo.filename}" guardado correctamente en facultad {facultad_cod}',
-            'facultadCod': facultad_cod
+            'message': mensaje,
+            'facultadCod': facultad_cod,
+            'id': resultado['id'],
+            'hash': resultado['hash'],
+            'version': resultado['version'],
+            'sinCambios': resultado['sinCambios']
         }), 200
+    except FacultadEnMovimiento as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         return jsonify({'error': f'Error al guardar: {e}'}), 500
 
 
+@app.post('/upload/lote')
+@require_login
+@limitar('blob')
+def subir_lote():
+    """
+    Subida en lote: varios archivos (campo 'files') o un .zip, en multipart o como cuerpo
+    application/zip. Todos se registran en una transacción y se ingieren en una sola pasada.
+    """
+    user = request.current_user
+    facultad_cod, error = _facultad_destino_subida(user)
+    if error:
+        return error
+
+    try:
+        if request.mimetype in TIPOS_ZIP:
+            contenidos = almacenar_lote([], request.stream, request.mimetype)
+        else:
+            archivos = request.files.getlist('files') + request.files.getlist('file')
+            contenidos = almacenar_lote(archivos)
+    except LoteInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        resultados = guardar_archivos_excel(contenidos, facultad_cod, subido_por=user.get('usuario'))
+    except FacultadEnMovimiento as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': f'Error al guardar el lote (no se guardó ningún archivo): {e}'}), 500
+
+    cambiados = [r['id'] for r in resultados if not r['sinCambios']]
+    if cambiados and INGESTA_AUTOMATICA:
+        # Una sola pasada de ingesta para todo el lote
+        ingestor.encolar(*cambiados)
+    print(f"📦 Lote de {len(resultados)} archivos en facultad {facultad_cod}: {len(cambiados)} con cambios")
+    return jsonify({
+        'message': f'{len(resultados)} archivo(s) procesados en facultad {facultad_cod}: '
+                   f'{len(cambiados)} con cambios',
+        'facultadCod': facultad_cod,
+        'archivos': resultados,
+        'total': len(resultados),
+        'cambiados': len(cambiados)
+    }), 200
+
+
 @app.get('/files')
 @require_login
 def listar_archivos():
@@ -310,7 +476,11 @@ def listar_archivos():
         print(f"🔒 Standard mode: usando facultad del usuario = {facultad_filter}")
 
     try:
-        archivos = listar_archivos_por_facultad(facultad_filter)
+        # Los listados idénticos en curso (misma facultad y versión) comparten una sola consulta
+        archivos, _ = vuelos.ejecutar(
+            'archivos', (facultad_filter, version_contenido(facultad_filter)),
+            lambda: listar_archivos_por_facultad(facultad_filter)
+        )
 
         print(f"✅ Found {len(archivos)} files for facultad {facultad_filter}")
 
@@ -343,8 +513,37 @@ def listar_archivos():
         return jsonify({'error': f'Error al listar archivos: {e}'}), 500
 
 
+def _consultar_descarga(archivo_id, facultad_cod=None):
+    """
+    Returns:
+        tuple: (nombre, tipo, contenido de filas sin migrar, facultad, hash) o None
+    """
+    conn = conectar_archivo(archivo_id, lectura=True)
+    try:
+        cur = conn.cursor()
+        if facultad_cod is None:
+            cur.execute("""
+                SELECT NombreArchivo, TipoMime, CASE WHEN HashContenido IS NULL THEN Datos END,
+                       FacultadCod, HashContenido
+                FROM ArchivosExcel 
+                WHERE Id = ?
+            """, (archivo_id,))
+        else:
+            cur.execute("""
+                SELECT NombreArchivo, TipoMime, CASE WHEN HashContenido IS NULL THEN Datos END,
+                       FacultadCod, HashContenido
+                FROM ArchivosExcel 
+                WHERE Id = ? AND FacultadCod = ?
+            """, (archivo_id, facultad_cod))
+        row = cur.fetchone()
+        return tuple(row) if row else None
+    finally:
+        conn.close()
+
+
 @app.get('/download/<int:archivo_id>')
 @require_login
+@limitar('blob')
 def descargar_archivo(archivo_id):
     """Descargar archivo - TODOS los usuarios solo pueden descargar archivos de su facultad"""
     user = request.current_user
@@ -355,47 +554,51 @@ def descargar_archivo(archivo_id):
         f"📥 Download request: user={user['usuario']}, role={user_role}, facultad={user_facultad}, archivo_id={archivo_id}")
 
     try:
-        conn = conectar()
-        cur = conn.cursor()
-
         # CAMBIO CRÍTICO: Incluso admin está restringido a su facultad
         # Solo permitir override con parámetro especial
         override_facultad = request.args.get('override_facultad')
 
         if user_role == 'admin' and override_facultad == 'true':
             # Admin con override puede descargar cualquier archivo
-            cur.execute("""
-                SELECT NombreArchivo, TipoMime, Datos, FacultadCod 
-                FROM ArchivosExcel 
-                WHERE Id = ?
-            """, (archivo_id,))
+            facultad_restringida = None
             print("🔧 Admin override: no faculty restriction")
         else:
             # TODOS los usuarios (incluso admin normal) solo archivos de su facultad
-            cur.execute("""
-                SELECT NombreArchivo, TipoMime, Datos, FacultadCod 
-                FROM ArchivosExcel 
-                WHERE Id = ? AND FacultadCod = ?
-            """, (archivo_id, user_facultad))
+            facultad_restringida = user_facultad
             print(f"🔒 Faculty restricted download: archivo {archivo_id} para facultad {user_facultad}")
 
-        archivo_info = cur.fetchone()
-        cur.close()
-        conn.close()
+        # Descargas idénticas en curso comparten la consulta (y los bytes de filas sin migrar)
+        archivo_info, _ = vuelos.ejecutar(
+            'descarga', (archivo_id, facultad_restringida, version_contenido(facultad_restringida)),
+            lambda: _consultar_descarga(archivo_id, facultad_restringida)
+        )
 
         if not archivo_info:
             print(f"❌ File {archivo_id} not found or access denied for faculty {user_facultad}")
             return jsonify({'error': 'Archivo no encontrado o sin permisos para descargarlo'}), 404
 
-        nombre, tipo, contenido, archivo_facultad = archivo_info
+        nombre, tipo, contenido, archivo_facultad, hash_contenido = archivo_info
         print(f"✅ Download authorized: {nombre} (faculty: {archivo_facultad}) for user {user['usuario']}")
 
-        bio = BytesIO(contenido)
+        mimetype = tipo or 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        ruta_blob = obtener_almacen().ruta_local(hash_contenido.strip()) if hash_contenido else None
+        if ruta_blob:
+            # Desde disco: el servidor usa sendfile y el navegador puede revalidar con el ETag (hash)
+            return send_file(
+                ruta_blob,
+                as_attachment=True,
+                download_name=nombre,
+                mimetype=mimetype,
+                etag=hash_contenido.strip(),
+                conditional=True
+            )
+
+        bio = BytesIO(leer_contenido_archivo(hash_contenido, contenido))
         return send_file(
             bio,
             as_attachment=True,
             download_name=nombre,
-            mimetype=tipo or 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            mimetype=mimetype
         )
 
     except Exception as e:
@@ -403,6 +606,318 @@ def descargar_archivo(archivo_id):
         return jsonify({'error': f'Error al descargar archivo: {str(e)}'}), 500
 
 
+def _facultad_de_archivo_permitida(user, archivo_id):
+    """Misma regla que /download: solo la facultad del usuario, salvo admin con override_facultad=true"""
+    if (user.get('rolNombre') or '').lower() == 'admin' and request.args.get('override_facultad') == 'true':
+        return True
+    conn = conectar_archivo(archivo_id, lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT FacultadCod FROM ArchivosExcel WHERE Id = ?", (archivo_id,))
+        row = cur.fetchone()
+        return bool(row) and row[0] == user['facultadCod']
+    finally:
+        conn.close()
+
+
+@app.get('/files/<int:archivo_id>/versiones')
+@require_login
+def listar_versiones_archivo(archivo_id):
+    """Historial de versiones de un archivo"""
+    user = request.current_user
+    if not _facultad_de_archivo_permitida(user, archivo_id):
+        return jsonify({'error': 'Archivo no encontrado o sin permisos'}), 404
+    try:
+        versiones = listar_versiones(archivo_id)
+        return jsonify({'archivoId': archivo_id, 'versiones': versiones, 'total': len(versiones)}), 200
+    except Exception as e:
+        print(f"❌ Error listing versions: {e}")
+        return jsonify({'error': f'Error al listar versiones: {e}'}), 500
+
+
+@app.get('/download/<int:archivo_id>/version/<int:version>')
+@require_login
+@limitar('blob')
+def descargar_version_archivo(archivo_id, version):
+    """Descargar una versión anterior de un archivo"""
+    user = request.current_user
+    if not _facultad_de_archivo_permitida(user, archivo_id):
+        return jsonify({'error': 'Archivo no encontrado o sin permisos para descargarlo'}), 404
+
+    try:
+        encontrada = obtener_version(archivo_id, version)
+        if not encontrada:
+            return jsonify({'error': f'La versión {version} no existe o ya fue compactada'}), 404
+        nombre, tipo, hash_contenido = encontrada
+        base, punto, extension = nombre.rpartition('.')
+        nombre_version = f"{base}_v{version}.{extension}" if punto else f"{nombre}_v{version}"
+
+        ruta_blob = obtener_almacen().ruta_local(hash_contenido)
+        origen = ruta_blob if ruta_blob else BytesIO(leer_contenido_archivo(hash_contenido, None))
+        return send_file(
+            origen,
+            as_attachment=True,
+            download_name=nombre_version,
+            mimetype=tipo or 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            etag=hash_contenido,
+            conditional=True
+        )
+    except Exception as e:
+        print(f"❌ Version download error: {e}")
+        return jsonify({'error': f'Error al descargar versión: {str(e)}'}), 500
+
+
+@app.post('/files/<int:archivo_id>/ingestar')
+@require_login
+def ingestar_archivo(archivo_id):
+    """Ingiere la versión vigente aplicando solo el delta por filas (?version=N: 409 si ya no es la vigente)"""
+    user = request.current_user
+    if (user.get('rolNombre') or '').lower() not in ['admin', 'decano', 'coordinador']:
+        return jsonify({'error': 'No tienes permisos para ingerir archivos'}), 403
+    if not _facultad_de_archivo_permitida(user, archivo_id):
+        return jsonify({'error': 'Archivo no encontrado o sin permisos'}), 404
+    try:
+        resumen = ingerir_version(archivo_id, request.args.get('version', type=int))
+        return jsonify(resumen), 200
+    except ReporteNoSoportado as e:
+        return jsonify({'error': str(e)}), 422
+    except VersionNoVigente as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        print(f"❌ Error ingesting file: {e}")
+        return jsonify({'error': f'Error al ingerir archivo: {e}'}), 500
+
+
+def _archivos_ingestables(user, facultad_cod=None):
+    """Ids de archivos que el usuario puede ingerir (misma regla de facultad que /files)"""
+    if (user.get('rolNombre') or '').lower() == 'admin' and request.args.get('override_facultad') == 'true':
+        return {a['id'] for a in listar_archivos_por_facultad(facultad_cod)}
+    return {a['id'] for a in listar_archivos_por_facultad(user['facultadCod'])}
+
+
+@app.post('/ingestas')
+@require_login
+def ingestar_archivos():
+    """
+    Ingesta en paralelo de varios archivos: {"archivoIds": [...]} o, sin ids, todos los
+    de la facultad (sincronización completa). Devuelve estado y tiempos por archivo.
+    """
+    user = request.current_user
+    if (user.get('rolNombre') or '').lower() not in ['admin', 'decano', 'coordinador']:
+        return jsonify({'error': 'No tienes permisos para ingerir archivos'}), 403
+
+    datos = request.get_json(silent=True) or {}
+    try:
+        permitidos = _archivos_ingestables(user, datos.get('facultadCod'))
+        pedidos = datos.get('archivoIds')
+        if pedidos:
+            if not isinstance(pedidos, list) or not all(isinstance(i, int) for i in pedidos):
+                return jsonify({'error': 'archivoIds debe ser una lista de enteros'}), 400
+            ajenos = sorted(set(pedidos) - permitidos)
+            if ajenos:
+                return jsonify({'error': f'Archivos no encontrados o sin permisos: {ajenos}'}), 404
+        archivo_ids = sorted(pedidos or permitidos)
+
+        resultados = precalcular_tras_ingesta(planificador_ingesta.ejecutar(archivo_ids))
+        return jsonify({
+            'archivos': resultados,
+            'total': len(resultados),
+            'procesos': planificador_ingesta.procesos
+        }), 200
+    except Exception as e:
+        print(f"❌ Error ingesting files: {e}")
+        return jsonify({'error': f'Error al ingerir archivos: {e}'}), 500
+
+
+@app.get('/ingestas/progreso')
+@require_login
+def progreso_ingestas():
+    """Estado y tiempos (análisis, aplicación, total) de las ingestas de este worker"""
+    user = request.current_user
+    try:
+        permitidos = _archivos_ingestables(user, request.args.get('facultadCod'))
+        progreso = [p for p in planificador_ingesta.progreso() if p['archivoId'] in permitidos]
+        return jsonify({'archivos': progreso, 'total': len(progreso)}), 200
+    except Exception as e:
+        print(f"❌ Error reading ingestion progress: {e}")
+        return jsonify({'error': f'Error al consultar el progreso: {e}'}), 500
+
+
+@app.get('/files/<int:archivo_id>/ingestas')
+@require_login
+def listar_ingestas_archivo(archivo_id):
+    """Resumen de cada ingesta (insertadas/actualizadas/eliminadas por versión) y agregados vigentes"""
+    user = request.current_user
+    if not _facultad_de_archivo_permitida(user, archivo_id):
+        return jsonify({'error': 'Archivo no encontrado o sin permisos'}), 404
+    try:
+        return jsonify({
+            'archivoId': archivo_id,
+            'ingestas': listar_ingestas(archivo_id),
+            'agregados': obtener_agregados(archivo_id)
+        }), 200
+    except Exception as e:
+        print(f"❌ Error listing ingestions: {e}")
+        return jsonify({'error': f'Error al listar ingestas: {e}'}), 500
+
+
+@app.get('/files/<int:archivo_id>/cambios')
+@require_login
+def listar_cambios_archivo(archivo_id):
+    """Filas insertadas/actualizadas/eliminadas de una versión (?version=&tipo=I|U|D&cursor=&limit=)"""
+    user = request.current_user
+    if not _facultad_de_archivo_permitida(user, archivo_id):
+        return jsonify({'error': 'Archivo no encontrado o sin permisos'}), 404
+
+    tipo = (request.args.get('tipo') or '').upper() or None
+    if tipo and tipo not in ('I', 'U', 'D'):
+        return jsonify({'error': 'tipo debe ser I, U o D'}), 400
+    limit = min(max(request.args.get('limit', 200, type=int), 1), 1000)
+    try:
+        resultado = listar_cambios(
+            archivo_id,
+            version=request.args.get('version', type=int),
+            tipo=tipo,
+            cursor=request.args.get('cursor', 0, type=int),
+            limit=limit
+        )
+        return jsonify({'archivoId': archivo_id, **resultado}), 200
+    except Exception as e:
+        print(f"❌ Error listing changes: {e}")
+        return jsonify({'error': f'Error al listar cambios: {e}'}), 500
+
+
+# ======================= MÓDULOS DE ANÁLISIS ===========================
+def _facultad_consulta(user):
+    """Facultad del usuario; un admin puede consultar otra con ?facultadCod= y override_facultad=true"""
+    if ((user.get('rolNombre') or '').lower() == 'admin' and request.args.get('override_facultad') == 'true'
+            and request.args.get('facultadCod')):
+        return request.args.get('facultadCod')
+    return user['facultadCod']
+
+
+@app.get('/api/modulos/<string:modulo>')
+@require_login
+@limitar('analitica')
+def obtener_modulo(modulo):
+    """
+    Resultado de un módulo (top-promedios, control-parcial, control-final, tercera-matricula,
+    nee-control, reportes) desde los reportes ingeridos. ?periodo=&carrera= para otras vistas;
+    la vista por defecto sale precalculada y la de otro periodo se guarda en la primera visita
+    (X-Cache: HIT). Las vistas por carrera se calculan en cada request.
+    """
+    facultad_cod = _facultad_consulta(request.current_user)
+    if not facultad_cod:
+        return jsonify({'error': 'El usuario no tiene facultad asignada'}), 400
+    carrera = (request.args.get('carrera') or '').strip()
+    carrera = None if carrera in ('', 'Todas') else carrera
+    periodo = (request.args.get('periodo') or '').strip() or None
+    try:
+        (texto, desde_cache), _ = vuelos.ejecutar(
+            'modulo', (facultad_cod, modulo, periodo, carrera, version_contenido(facultad_cod)),
+            lambda: obtener_resultado(facultad_cod, modulo, periodo=periodo, carrera=carrera)
+        )
+        return Response(texto, mimetype='application/json', headers={'X-Cache': 'HIT' if desde_cache else 'MISS'})
+    except ModuloDesconocido as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        print(f"❌ Error computing module {modulo}: {e}")
+        return jsonify({'error': f'Error al calcular el módulo: {e}'}), 500
+
+
+@app.get('/api/precalculos')
+@require_login
+def estado_precalculos():
+    """Vistas precalculadas de la facultad (vigencia, filas, duración) y progreso en este worker"""
+    facultad_cod = _facultad_consulta(request.current_user)
+    try:
+        return jsonify({
+            'facultadCod': facultad_cod,
+            'resultados': listar_resultados(facultad_cod),
+            'progreso': precalculador.progreso(facultad_cod)
+        }), 200
+    except Exception as e:
+        print(f"❌ Error listing precomputed modules: {e}")
+        return jsonify({'error': f'Error al consultar los precálculos: {e}'}), 500
+
+
+@app.post('/api/precalculos')
+@require_login
+@require_role('admin', 'decano', 'coordinador')
+def lanzar_precalculo():
+    """Encola el precálculo de los módulos de la facultad (p. ej. tras cambiar la lógica de un módulo)"""
+    facultad_cod = _facultad_consulta(request.current_user)
+    if not facultad_cod:
+        return jsonify({'error': 'El usuario no tiene facultad asignada'}), 400
+    precalculador.encolar(facultad_cod)
+    return jsonify({'facultadCod': facultad_cod, 'progreso': precalculador.progreso(facultad_cod)}), 202
+
+
+# ======================= EXPORTACIONES ===========================
+def _respuesta_exportacion(nombre, formato, encabezados, filas):
+    """
+    Respuesta chunked (sin Content-Length) que genera el xlsx/CSV mientras se envía.
+    ?separador=; para CSV en Excel con configuración regional de coma decimal.
+    """
+    if formato == 'xlsx':
+        cuerpo, mimetype = generar_xlsx(encabezados, filas, hoja=nombre), MIME_XLSX
+    else:
+        separador = ';' if request.args.get('separador') == ';' else ','
+        cuerpo, mimetype = generar_csv(encabezados, filas, separador), 'text/csv; charset=utf-8'
+    return Response(cuerpo, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{nombre}.{formato}"',
+        # Que nginx no acumule la respuesta completa antes de reenviarla
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.get('/api/export/control-final.<formato>')
+@require_login
+@limitar('blob')
+def exportar_control_final_endpoint(formato):
+    """Lista de control final (?periodo=&carrera=) desde los reportes ingeridos de la facultad"""
+    if formato not in FORMATOS_EXPORTACION:
+        return jsonify({'error': 'Formato no soportado (xlsx o csv)'}), 404
+    facultad_cod = _facultad_consulta(request.current_user)
+    if not facultad_cod:
+        return jsonify({'error': 'El usuario no tiene facultad asignada'}), 400
+
+    carrera = (request.args.get('carrera') or '').strip()
+    encabezados, filas = exportar_control_final(
+        facultad_cod,
+        periodo=(request.args.get('periodo') or '').strip() or None,
+        carrera=None if carrera in ('', 'Todas') else carrera
+    )
+    print(f"📤 Exporting control final: facultad={facultad_cod}, formato={formato}")
+    return _respuesta_exportacion('control_final', formato, encabezados, filas)
+
+
+@app.get('/api/export/reporte/<int:archivo_id>.<formato>')
+@require_login
+@limitar('blob')
+def exportar_reporte_endpoint(archivo_id, formato):
+    """Filas ingeridas de un archivo; cada parámetro COLUMNA=valor filtra por igualdad"""
+    if formato not in FORMATOS_EXPORTACION:
+        return jsonify({'error': 'Formato no soportado (xlsx o csv)'}), 404
+    user = request.current_user
+    if not _facultad_de_archivo_permitida(user, archivo_id):
+        return jsonify({'error': 'Archivo no encontrado o sin permisos'}), 404
+    try:
+        encontrado = encabezados_reporte(archivo_id)
+    except Exception as e:
+        print(f"❌ Error reading report headers: {e}")
+        return jsonify({'error': f'Error al leer el reporte: {e}'}), 500
+    if not encontrado:
+        return jsonify({'error': 'Archivo no encontrado'}), 404
+
+    nombre, encabezados = encontrado
+    filtros = {k.upper(): v for k, v in request.args.items() if k not in ('override_facultad', 'separador')}
+    encabezados, filas = exportar_reporte(archivo_id, encabezados, filtros)
+    return _respuesta_exportacion(nombre.rsplit('.', 1)[0], formato, encabezados, filas)
+
+
 @app.delete('/delete/by-name/<string:filename>')
 @require_role('admin', 'decano', 'coordinador')
 def eliminar_archivo(filename):
@@ -419,23 +934,31 @@ def eliminar_archivo(filename):
         facultad_cod = user['facultadCod']
 
     try:
-        conn = conectar()
-        cursor = conn.cursor()
-
+        rows_affected = 0
         if user_role == 'admin' and not facultad_cod:
-            cursor.execute("DELETE FROM ArchivosExcel WHERE NombreArchivo = ?", (filename,))
+            # Sin facultad el nombre se borra en todas las particiones
+            for particion in PARTICIONES:
+                conn = conectar(particion)
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM ArchivosExcel WHERE NombreArchivo = ?", (filename,))
+                rows_affected += cursor.rowcount
+                conn.commit()
+                cursor.close()
+                conn.close()
         else:
+            conn = conectar_facultad(facultad_cod)
+            cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM ArchivosExcel 
                 WHERE NombreArchivo = ? AND FacultadCod = ?
             """, (filename, facultad_cod))
-
-        rows_affected = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
+            rows_affected = cursor.rowcount
+            conn.commit()
+            cursor.close()
+            conn.close()
 
         if rows_affected > 0:
+            marcar_cambio(facultad_cod)
             return jsonify({'message': f'Archivo "{filename}" eliminado correctamente'}), 200
         else:
             return jsonify({'error': 'Archivo no encontrado'}), 404
@@ -532,6 +1055,8 @@ def api_listar_usuarios():
         page = max(0, int(request.args.get("page", 0)))
         limit = max(1, min(200, int(request.args.get("limit", 20))))
         activo_param = request.args.get("activo")  # '1', '0', o None
+        cursor = request.args.get("cursor", type=int)  # Id del último usuario de la página anterior
+        incluir_total = request.args.get("total", "1") != "0"
 
         # Convertir activo a boolean si es necesario
         activo_filter = None
@@ -540,7 +1065,7 @@ def api_listar_usuarios():
         elif activo_param == '0':
             activo_filter = False
 
-        print(f"📋 Listing users: q='{q}', rol_id={rol_id}, page={page}, limit={limit}, activo={activo_filter}")
+        print(f"📋 Listing users: q='{q}', rol_id={rol_id}, page={page}, cursor={cursor}, limit={limit}, activo={activo_filter}")
 
         # Filtro de facultad según permisos
         facultad_filter = None
@@ -555,7 +1080,9 @@ def api_listar_usuarios():
             q=q,
             page=page,
             limit=limit,
-            activo=activo_filter  # Pasar el filtro boolean
+            activo=activo_filter,  # Pasar el filtro boolean
+            cursor=cursor,
+            incluir_total=incluir_total
         )
 
         print(f"📋 Found {len(resultado.get('data', []))} users (total: {resultado.get('total', 0)})")
@@ -566,6 +1093,26 @@ def api_listar_usuarios():
         return jsonify({"error": f"Error al listar usuarios: {e}"}), 500
 
 
+@app.get("/usuarios/export.<formato>")
+@require_login
+@require_role('admin', 'decano')
+@limitar('blob')
+def api_exportar_usuarios(formato):
+    """Exporta todos los usuarios que cumplen los filtros de /usuarios (sin paginar)"""
+    if formato not in FORMATOS_EXPORTACION:
+        return jsonify({'error': 'Formato no soportado (xlsx o csv)'}), 404
+    user = request.current_user
+    user_role = (user.get('rolNombre') or '').strip().lower()
+    activo_param = request.args.get("activo")
+    encabezados, filas = exportar_usuarios(
+        facultad_cod=request.args.get("facultadCod") if user_role == 'admin' else user['facultadCod'],
+        rol_id=request.args.get("rolId", type=int),
+        q=(request.args.get("q") or "").strip(),
+        activo={'1': True, '0': False}.get(activo_param)
+    )
+    return _respuesta_exportacion('usuarios', formato, encabezados, filas)
+
+
 @app.post("/usuarios")
 @require_login
 @require_role('admin')
@@ -599,6 +1146,43 @@ def api_crear_usuario():
         return jsonify({"error": str(e)}), 500
 
 
+@app.post("/usuarios/importar")
+@require_login
+@require_role('admin')
+def api_importar_usuarios():
+    """Importación masiva de usuarios desde CSV/xlsx - Solo admin"""
+    inicio = time.perf_counter()
+
+    archivo = request.files.get('file')
+    if not archivo or archivo.filename.strip() == '':
+        return jsonify({'error': 'No se envió archivo'}), 400
+
+    try:
+        registros = leer_filas_archivo(archivo)
+    except Exception as e:
+        print(f"❌ Error reading import file: {e}")
+        return jsonify({'error': f'No se pudo leer el archivo: {e}'}), 400
+
+    try:
+        validas, errores = validar_filas(registros, request.form.get('facultadCod'))
+        creados, errores_insercion = importar_usuarios(validas)
+        errores = sorted(errores + errores_insercion, key=lambda e: e['fila'])
+
+        print(f"👥 Import finished: {len(creados)} created, {len(errores)} errors of {len(registros)} rows")
+        return jsonify({
+            'message': f'Importación finalizada: {len(creados)} usuario(s) creado(s)',
+            'total': len(registros),
+            'creados': len(creados),
+            'fallidos': len(errores),
+            'usuariosCreados': creados,
+            'errores': errores,
+            'duracionMs': round((time.perf_counter() - inicio) * 1000)
+        }), 200
+    except Exception as e:
+        print(f"❌ Error importing users: {e}")
+        return jsonify({'error': f'Error al importar usuarios: {e}'}), 500
+
+
 @app.put("/usuarios/<int:user_id>")
 @require_login
 @require_role('admin')
@@ -627,9 +1211,11 @@ def api_actualizar_usuario(user_id):
         updates = []
         params = []
 
+        nuevo_usuario = None
         if 'usuario' in data and data['usuario'].strip():
+            nuevo_usuario = data['usuario'].strip()
             updates.append("Usuario = ?")
-            params.append(data['usuario'].strip())
+            params.append(nuevo_usuario)
 
         if 'rolId' in data:
             updates.append("RolId = ?")
@@ -652,17 +1238,23 @@ def api_actualizar_usuario(user_id):
             conn.close()
             return jsonify({"error": "No hay campos para actualizar"}), 400
 
+        # Invalida los tokens de sesión emitidos antes de este cambio
+        updates.append("VersionSesion = VersionSesion + 1")
+
         # Ejecutar actualización
         params.append(user_id)
         sql = f"UPDATE Usuarios SET {', '.join(updates)} WHERE Id = ?"
         cur.execute(sql, params)
+        if nuevo_usuario:
+            reindexar_trigramas_usuario(cur, user_id, nuevo_usuario)
         conn.commit()
+        invalidar_totales_usuarios()
 
         # Obtener usuario actualizado
         cur.execute("""
             SELECT u.Id, u.Usuario, u.Estado, u.RolId, r.Nombre as RolNombre,
                    u.FacultadCod, f.Nombre as FacultadNombre, 
-                   u.CarreraCod, c.Nombre as CarreraNombre
+                   u.CarreraCod, c.Nombre as CarreraNombre, u.VersionSesion
             FROM Usuarios u
             LEFT JOIN Rol r ON u.RolId = r.RolId
             LEFT JOIN Facultad f ON u.FacultadCod = f.FacultadCod
@@ -674,6 +1266,8 @@ def api_actualizar_usuario(user_id):
         cur.close()
         conn.close()
 
+        versiones_sesion.registrar(user_id, int(updated_user[9]))
+
         print(f"✅ User {user_id} updated successfully")
 
         return jsonify({
@@ -698,66 +1292,56 @@ def api_actualizar_usuario(user_id):
 
 
 # ======================= ENVÍO DE CORREOS ===========================
-msal_app = msal.ConfidentialClientApplication(
-    CLIENT_ID,
-    authority=f"https://login.microsoftonline.com/{TENANT_ID}",
-    client_credential=CLIENT_SECRET
-)
+ROLES_CORREO = ('admin', 'decano', 'coordinador')
 
 
-def obtener_token_graph():
-    result = msal_app.acquire_token_for_client(scopes=SCOPES)
-    if "access_token" in result:
-        return result["access_token"]
-    else:
-        raise Exception(f"Error obteniendo token: {result.get('error_description', result)}")
-
-
-def enviar_correo_graph(destinatarios, asunto, cuerpo):
-    access_token = obtener_token_graph()
-    graph_endpoint = f"https://graph.microsoft.com/v1.0/users/{USUARIO_OUTLOOK}/sendMail"
-    to_recipients = [{"emailAddress": {"address": email}} for email in destinatarios]
-    payload = {
-        "message": {
-            "subject": asunto,
-            "body": {"contentType": "HTML", "content": cuerpo},
-            "toRecipients": to_recipients
-        },
-        "saveToSentItems": "true"
-    }
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    resp = requests.post(graph_endpoint, headers=headers, json=payload)
-    if resp.status_code != 202:
-        raise Exception(f"Error enviando correo: {resp.status_code} - {resp.text}")
+def _leer_solicitud_correo(data):
+    """
+    Valida el cuerpo de /send-email.
 
-
-@app.post('/send-email')
-@require_role('admin', 'decano', 'coordinador')
-def send_email():
-    """Envío de correos para roles autorizados"""
-    data = request.get_json(silent=True) or {}
+    Returns:
+        tuple: ((to_emails, subject, body), None) o (None, mensaje de error 400)
+    """
     to_list = data.get("to")
     subject = data.get("subject", "FACAF Notificación Académica")
     body = data.get("body", "")
 
     if not to_list or not body:
-        return jsonify({"error": "Faltan destinatarios o contenido"}), 400
+        return None, "Faltan destinatarios o contenido"
 
     if isinstance(to_list, str):
         to_emails = [email.strip() for email in to_list.split(';') if email.strip()]
     elif isinstance(to_list, list):
         to_emails = [str(x).strip() for x in to_list if str(x).strip()]
     else:
-        return jsonify({"error": "Formato incorrecto en campo 'to'"}), 400
+        return None, "Formato incorrecto en campo 'to'"
+
+    return (to_emails, subject, body), None
+
+
+@app.post('/send-email')
+@require_login
+@require_role(*ROLES_CORREO)
+@limitar('correo')
+def send_email():
+    """Envío de correos para roles autorizados"""
+    solicitud, error = _leer_solicitud_correo(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({"error": error}), 400
+    to_emails, subject, body = solicitud
 
     try:
-        enviar_correo_graph(to_emails, subject, body)
-        return jsonify({"message": "Correo enviado correctamente"}), 200
+        reintentos = enviar_correo_graph(to_emails, subject, body)
+        return jsonify({"message": "Correo enviado correctamente", "reintentos": reintentos}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # ======================= AUTENTICACIÓN UG ===========================
+# Sesión compartida: reutiliza la conexión TLS con UG entre logins
+http_ug = requests.Session()
+
+
 def _parse_ug_result(obj: dict):
     if not isinstance(obj, dict):
         return None, None
@@ -773,18 +1357,69 @@ def _parse_ug_result(obj: dict):
     return id_int, mensaje
 
 
+def _leer_credenciales_ug(form, data_json):
+    usuario_in = (form.get('usuario') or data_json.get("usuario") or "").strip()
+    clave = (form.get('clave') or data_json.get("clave") or "").strip()
+    return usuario_in, clave
+
+
+def _respuesta_auth_ug(usuario_in, ug_payload, user_row):
+    """
+    Arma la respuesta de /auth/ug a partir de la respuesta de UG.
+
+    `user_row` es el usuario local (solo se consulta cuando UG valida las credenciales).
+
+    Returns:
+        tuple: (cuerpo, status)
+    """
+    ug_id, ug_msg = _parse_ug_result(ug_payload)
+
+    # Credenciales incorrectas
+    if ug_id == 0:
+        return {
+            "ok": False,
+            "ug": {"id": 0, "mensaje": ug_msg or "CREDENCIALES ERRADAS"}
+        }, 401
+
+    # Credenciales válidas
+    if ug_id == 1:
+        if user_row:
+            respuesta = {
+                "ok": True,
+                "registrado": True,
+                "usuario": user_row
+            }
+            if user_row.get('estado'):
+                respuesta["token"], respuesta["expiraEn"] = emitir_token(user_row)
+            return respuesta, 200
+
+        # Usuario válido en UG pero no registrado localmente
+        return {
+            "ok": True,
+            "registrado": False,
+            "usuario": usuario_in,
+            "mensaje": "Usuario válido en UG pero no registrado localmente"
+        }, 200
+
+    # Caso inesperado
+    return {
+        "ok": False,
+        "ug": ug_payload,
+        "mensaje": "Respuesta de UG sin 'id' válido"
+    }, 502
+
+
 @app.post("/auth/ug")
+@limitar('auth', clave=cuenta_enviada)
 def proxy_auth():
     """Autenticación con UG"""
-    data_json = request.get_json(silent=True) or {}
-    usuario_in = (request.form.get('usuario') or data_json.get("usuario") or "").strip()
-    clave = (request.form.get('clave') or data_json.get("clave") or "").strip()
+    usuario_in, clave = _leer_credenciales_ug(request.form, request.get_json(silent=True) or {})
 
     if not usuario_in or not clave:
         return jsonify({"id": 0, "mensaje": "Usuario/clave vacíos"}), 400
 
     try:
-        resp = requests.post(
+        resp = http_ug.post(
             UG_AUTH_URL,
             data={"usuario": usuario_in, "clave": clave},
             headers={"User-Agent": "Mozilla/5.0"},
@@ -796,39 +1431,10 @@ def proxy_auth():
         except:
             ug_payload = {"status": resp.status_code, "text": resp.text}
 
-        ug_id, ug_msg = _parse_ug_result(ug_payload)
-
-        # Credenciales incorrectas
-        if ug_id == 0:
-            return jsonify({
-                "ok": False,
-                "ug": {"id": 0, "mensaje": ug_msg or "CREDENCIALES ERRADAS"}
-            }), 401
-
-        # Credenciales válidas
-        if ug_id == 1:
-            user_row = obtener_usuario_por_usuario(usuario_in)
-            if user_row:
-                return jsonify({
-                    "ok": True,
-                    "registrado": True,
-                    "usuario": user_row
-                }), 200
-
-            # Usuario válido en UG pero no registrado localmente
-            return jsonify({
-                "ok": True,
-                "registrado": False,
-                "usuario": usuario_in,
-                "mensaje": "Usuario válido en UG pero no registrado localmente"
-            }), 200
-
-        # Caso inesperado
-        return jsonify({
-            "ok": False,
-            "ug": ug_payload,
-            "mensaje": "Respuesta de UG sin 'id' válido"
-        }), 502
+        ug_id, _ = _parse_ug_result(ug_payload)
+        user_row = obtener_usuario_por_usuario(usuario_in) if ug_id == 1 else None
+        cuerpo, status = _respuesta_auth_ug(usuario_in, ug_payload, user_row)
+        return jsonify(cuerpo), status
 
     except requests.RequestException as e:
         return jsonify({
@@ -837,30 +1443,66 @@ def proxy_auth():
         }), 502
 
 
-# ======================= ENDPOINTS ADICIONALES ===========================
-@app.get('/api/health')
-def health_check():
-    """Estado de la API con información detallada"""
-    try:
-        # Verificar conexión a BD
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM Usuarios")
-        user_count = cur.fetchone()[0]
-        cur.close()
-        conn.close()
-        db_status = "OK"
+@app.post("/auth/refresh")
+@limitar('sesion', clave=token_enviado)
+def refrescar_sesion():
+    """Renueva el token de sesión releyendo rol, facultad y estado desde la BD"""
+    token = _token_de_request()
+    previo = verificar_token(token, gracia=True, comprobar_version=False) if token else None
+    if not previo:
+        return jsonify({'error': 'Sesión inválida o vencida'}), 401
 
+    try:
+        user = obtener_usuario_por_id(previo['id'])
     except Exception as e:
-        print(f"❌ Database health check failed: {e}")
-        db_status = f"ERROR: {e}"
-        user_count = 0
+        print(f"❌ refrescar_sesion: Database error: {e}")
+        return jsonify({'error': 'Error al renovar sesión'}), 500
+
+    if not user:
+        return jsonify({'error': 'No autenticado'}), 401
+    if not user.get('estado'):
+        return jsonify({'error': 'Usuario inactivo'}), 403
+
+    versiones_sesion.registrar(user['id'], user['versionSesion'])
+    nuevo_token, expira_en = emitir_token(user)
+    return jsonify({'token': nuevo_token, 'expiraEn': expira_en, 'usuario': user}), 200
+
+
+# ======================= ENDPOINTS ADICIONALES ===========================
+@app.get('/metrics')
+def metricas():
+    """Métricas Prometheus agregadas de todos los workers"""
+    if METRICAS_TOKEN and _token_de_request() != METRICAS_TOKEN:
+        return jsonify({'error': 'No autenticado'}), 401
+    cuerpo, content_type = exportar_metricas()
+    return cuerpo, 200, {'Content-Type': content_type}
 
+
+@app.get('/api/health/live')
+def health_live():
+    """Liveness: el proceso atiende requests (sin E/S)"""
+    return jsonify({'status': 'OK', 'pid': os.getpid()}), 200
+
+
+@app.get('/api/health/ready')
+def health_ready():
+    """Readiness: último resultado de los chequeos de fondo (BD, Graph, UG)"""
+    cuerpo, listo = monitor_salud.estado()
+    return jsonify(cuerpo), 200 if listo else 503
+
+
+@app.get('/api/health')
+def health_check():
+    """Estado de la API con información detallada (desde la caché de chequeos)"""
+    cuerpo, _ = monitor_salud.estado()
+    bd = cuerpo['componentes'].get('database', {})
     return jsonify({
         'status': 'OK',
-        'database': db_status,
-        'user_count': user_count,
+        'database': bd.get('status', cuerpo['status']) if 'error' not in bd else f"ERROR: {bd['error']}",
+        'user_count': bd.get('usuarios', 0),
         'version': '1.0.0',
+        'verificadoEn': cuerpo.get('verificadoEn'),
+        'componentes': cuerpo['componentes']
     })
 
 
@@ -886,6 +1528,60 @@ def debug_auth_info():
         "url": request.url
     })
 
+@app.get("/admin/consultas-sql")
+@require_login
+@require_role('admin')
+def admin_consultas_sql():
+    """Sentencias SQL por tiempo total, las más lentas y consultas por ruta (de este worker)"""
+    limite = max(1, min(request.args.get('limite', 20, type=int) or 20, 100))
+    reporte = perfil_sql.registro.reporte(limite)
+    if request.args.get('reiniciar') == '1':
+        perfil_sql.registro.reiniciar()
+    return jsonify(reporte), 200
+
+
+@app.get("/admin/resumen")
+@require_login
+@require_role('admin')
+@limitar('analitica')
+def admin_resumen():
+    """
+    Resumen de todas las facultades (archivos, usuarios, ingesta y estudiantes en riesgo).
+    Solo se reagregan, en paralelo, las facultades que cambiaron; ?forzar=1 reagrega todas.
+    """
+    try:
+        return jsonify(resumen_universidad(forzar=request.args.get('forzar') == '1')), 200
+    except Exception as e:
+        print(f"❌ Error building admin summary: {e}")
+        return jsonify({'error': f'Error al generar el resumen: {e}'}), 500
+
+
+@app.get("/admin/particiones")
+@require_login
+@require_role('admin')
+def admin_particiones():
+    """Particiones configuradas, facultades y archivos en cada una, y movimientos lanzados en este worker"""
+    try:
+        return jsonify({'particiones': estado_particiones(), 'movimientos': movedor.progreso()}), 200
+    except Exception as e:
+        print(f"❌ Error listing partitions: {e}")
+        return jsonify({'error': f'Error al consultar las particiones: {e}'}), 500
+
+
+@app.post("/admin/particiones/<string:facultad_cod>/mover")
+@require_login
+@require_role('admin')
+def admin_mover_facultad(facultad_cod):
+    """Mueve los datos de la facultad a otra partición en segundo plano ({destino}); ver GET /admin/particiones"""
+    destino = ((request.get_json(silent=True) or {}).get('destino') or '').strip()
+    try:
+        return jsonify(movedor.iniciar(facultad_cod.strip().upper(), destino)), 202
+    except MovimientoEnCurso as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
 @app.post("/admin/panel")
 @require_login  # CRÍTICO: Agregar esta línea
 @require_role('admin')
@@ -937,6 +1633,7 @@ def create_facultad():
         conn.commit()
         cur.close()
         conn.close()
+        invalidar_catalogos()
 
         print(f"✅ Facultad creada: {codigo} - {nombre}")
         return jsonify({
@@ -993,15 +1690,55 @@ def update_facultad(facultad_cod):
         """, (nuevo_codigo, nuevo_nombre, facultad_cod))
 
         # Si cambió el código, actualizar referencias en otras tablas
-        if nuevo_codigo != facultad_cod:
-            print(f"🔄 Updating references: {facultad_cod} -> {nuevo_codigo}")
-            cur.execute("UPDATE Usuarios SET FacultadCod = ? WHERE FacultadCod = ?", (nuevo_codigo, facultad_cod))
-            cur.execute("UPDATE Carrera SET FacultadCod = ? WHERE FacultadCod = ?", (nuevo_codigo, facultad_cod))
-            cur.execute("UPDATE ArchivosExcel SET FacultadCod = ? WHERE FacultadCod = ?", (nuevo_codigo, facultad_cod))
-
-        conn.commit()
+        versiones = []
+        datos_conn = None
+        try:
+            if nuevo_codigo != facultad_cod:
+                print(f"🔄 Updating references: {facultad_cod} -> {nuevo_codigo}")
+                # Los tokens emitidos con el código anterior dejan de valer (como en api_actualizar_usuario)
+                cur.execute("""
+                    UPDATE Usuarios SET FacultadCod = ?, VersionSesion = VersionSesion + 1
+                    OUTPUT INSERTED.Id, INSERTED.VersionSesion
+                    WHERE FacultadCod = ?
+                """, (nuevo_codigo, facultad_cod))
+                versiones = cur.fetchall()
+                cur.execute("UPDATE Carrera SET FacultadCod = ? WHERE FacultadCod = ?", (nuevo_codigo, facultad_cod))
+                cur.execute("UPDATE ParticionFacultad SET FacultadCod = ? WHERE FacultadCod = ?", (nuevo_codigo, facultad_cod))
+
+                # Los archivos viven en la partición de la facultad: en la principal, misma transacción
+                cur.execute("SELECT Particion FROM ParticionFacultad WHERE FacultadCod = ?", (nuevo_codigo,))
+                row = cur.fetchone()
+                if not row or row[0] == PARTICION_PRINCIPAL:
+                    cur_datos = cur
+                else:
+                    # Otra base: se confirma justo después de la principal y se deshace si esta falla
+                    datos_conn = conectar(row[0])
+                    cur_datos = datos_conn.cursor()
+                cur_datos.execute("UPDATE ArchivosExcel SET FacultadCod = ? WHERE FacultadCod = ?", (nuevo_codigo, facultad_cod))
+                # Las vistas precalculadas se rehacen con el código nuevo en la próxima consulta
+                cur_datos.execute("DELETE FROM ResultadosModulo WHERE FacultadCod = ?", (facultad_cod,))
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            if datos_conn is not None:
+                datos_conn.rollback()
+                datos_conn.close()
+            conn.close()
+            raise
+        if datos_conn is not None:
+            datos_conn.commit()
+            datos_conn.close()
         cur.close()
         conn.close()
+        for user_id, version in versiones:
+            versiones_sesion.registrar(user_id, int(version))
+        invalidar_catalogos()
+        invalidar_totales_usuarios()
+
+        if nuevo_codigo != facultad_cod:
+            invalidar_particiones()
+            marcar_cambio(facultad_cod, nuevo_codigo)
 
         print(f"✅ Facultad actualizada: {facultad_cod} -> {nuevo_codigo} - {nuevo_nombre}")
         return jsonify({
@@ -1039,9 +1776,13 @@ def delete_facultad(facultad_cod):
         cur.execute("SELECT COUNT(*) FROM Carrera WHERE FacultadCod = ?", (facultad_cod,))
         carreras_count = cur.fetchone()[0]
 
-        # Verificar si hay archivos asociados
-        cur.execute("SELECT COUNT(*) FROM ArchivosExcel WHERE FacultadCod = ?", (facultad_cod,))
-        archivos_count = cur.fetchone()[0]
+        # Verificar si hay archivos asociados (en la partición de la facultad)
+        conn_datos = conectar_facultad(facultad_cod)
+        cur_datos = conn_datos.cursor()
+        cur_datos.execute("SELECT COUNT(*) FROM ArchivosExcel WHERE FacultadCod = ?", (facultad_cod,))
+        archivos_count = cur_datos.fetchone()[0]
+        cur_datos.close()
+        conn_datos.close()
 
         if usuarios_count > 0 or carreras_count > 0 or archivos_count > 0:
             cur.close()
@@ -1056,10 +1797,12 @@ def delete_facultad(facultad_cod):
             }), 409
 
         # Eliminar facultad
+        cur.execute("DELETE FROM ParticionFacultad WHERE FacultadCod = ?", (facultad_cod,))
         cur.execute("DELETE FROM Facultad WHERE FacultadCod = ?", (facultad_cod,))
         conn.commit()
         cur.close()
         conn.close()
+        invalidar_catalogos()
 
         print(f"✅ Facultad eliminada: {facultad_cod} - {facultad[0]}")
         return jsonify({"message": f"Facultad '{facultad[0]}' eliminada exitosamente"}), 200
@@ -1110,6 +1853,7 @@ def create_carrera():
         conn.commit()
         cur.close()
         conn.close()
+        invalidar_catalogos()
 
         print(f"✅ Carrera creada: {codigo} - {nombre} (Facultad: {facultad_cod})")
         return jsonify({
@@ -1169,13 +1913,22 @@ def update_carrera(carrera_cod):
             WHERE CarreraCod = ?
         """, (nuevo_codigo, nuevo_nombre, nueva_facultad_cod, carrera_cod))
 
-        # Si cambió el código, actualizar referencias en usuarios
+        # Si cambió el código, actualizar referencias en usuarios e invalidar sus tokens de sesión
+        versiones = []
         if nuevo_codigo != carrera_cod:
-            cur.execute("UPDATE Usuarios SET CarreraCod = ? WHERE CarreraCod = ?", (nuevo_codigo, carrera_cod))
+            cur.execute("""
+                UPDATE Usuarios SET CarreraCod = ?, VersionSesion = VersionSesion + 1
+                OUTPUT INSERTED.Id, INSERTED.VersionSesion
+                WHERE CarreraCod = ?
+            """, (nuevo_codigo, carrera_cod))
+            versiones = cur.fetchall()
 
         conn.commit()
         cur.close()
         conn.close()
+        for user_id, version in versiones:
+            versiones_sesion.registrar(user_id, int(version))
+        invalidar_catalogos()
 
         print(f"✅ Carrera actualizada: {carrera_cod} -> {nuevo_codigo} - {nuevo_nombre}")
         return jsonify({
@@ -1221,6 +1974,7 @@ def delete_carrera(carrera_cod):
         conn.commit()
         cur.close()
         conn.close()
+        invalidar_catalogos()
 
         print(f"✅ Carrera eliminada: {carrera_cod} - {carrera[0]}")
         return jsonify({"message": f"Carrera '{carrera[0]}' eliminada exitosamente"}), 200
@@ -0,0 +1,149 @@
+"""
+Inicialización de la aplicación una sola vez por despliegue.
+
+La creación/migración de la BD se ejecuta en el proceso maestro de gunicorn
+(hook on_starting de gunicorn.conf.py) antes de hacer fork de los workers; los
+workers heredan FACAF_BD_INICIALIZADA y no vuelven a conectarse a master.
+
+Fuera de gunicorn (python app.py, uvicorn con varios workers) cada proceso llama
+a asegurar_inicializacion(): la primera ejecuta la inicialización bajo un lock de
+archivo y las demás esperan el lock y la omiten al encontrar la marca del padre.
+
+Los tiempos de cada fase quedan en `fases` y se imprimen al terminar.
+"""
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+LOCK_PATH = BASE_DIR / "archivos" / ".arranque.lock"
+VARIABLE_INICIALIZADA = "FACAF_BD_INICIALIZADA"
+
+
+class FasesArranque:
+    """Duración (ms) de cada fase de arranque del proceso"""
+
+    def __init__(self):
+        self._inicio = time.perf_counter()
+        self._fases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def medir(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, (time.perf_counter() - t0) * 1000)
+
+    def registrar(self, nombre, ms):
+        with self._lock:
+            self._fases.append((nombre, round(ms, 1)))
+
+    def resumen(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "fases": [{"fase": nombre, "ms": ms} for nombre, ms in self._fases],
+                "desdeInicioMs": round((time.perf_counter() - self._inicio) * 1000, 1)
+            }
+
+    def imprimir(self, titulo):
+        detalle = ", ".join(f"{f['fase']}={f['ms']}ms" for f in self.resumen()["fases"])
+        print(f"⏱️ {titulo} (pid {os.getpid()}): {detalle or 'sin fases'}")
+
+
+fases = FasesArranque()
+
+
+@contextmanager
+def _lock_arranque():
+    LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_PATH, "a+") as f:
+        with fases.medir("arranque.espera_lock"):
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _huella_padre():
+    """Identifica al proceso padre (pid + instante de inicio, para no confundir pids reciclados)"""
+    ppid = os.getppid()
+    try:
+        with open(f"/proc/{ppid}/stat") as f:
+            inicio = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        inicio = "?"
+    return f"padre={ppid}:{inicio}"
+
+
+def inicializar_despliegue():
+    """
+    Crea la BD si no existe y aplica las migraciones pendientes (también en las particiones).
+    Lo llama el maestro de gunicorn una vez, antes de crear los workers.
+
+    Returns:
+        bool: True si la BD quedó lista
+    """
+    with _lock_arranque():
+        return _inicializar()
+
+
+def _inicializar():
+    from database import PARTICION_PRINCIPAL, PARTICIONES, crear_base_datos
+    from migraciones import aplicar_migraciones
+
+    print("🚀 Iniciando aplicación FACAF...")
+    try:
+        with fases.medir("bd.crear"):
+            ok = crear_base_datos()
+        if ok:
+            with fases.medir("bd.migraciones"):
+                ok = aplicar_migraciones()
+                # Las particiones de datos siguen las mismas migraciones que la principal
+                for particion in PARTICIONES:
+                    if particion != PARTICION_PRINCIPAL:
+                        ok = aplicar_migraciones(particion) and ok
+    except Exception as e:
+        print(f"💥 Error crítico en inicialización: {e}")
+        ok = False
+
+    if ok:
+        print("✅ Sistema listo - Base de datos inicializada correctamente")
+    else:
+        print("❌ ADVERTENCIA: Problemas en inicialización de BD")
+    # Los procesos hijos no la repiten aunque haya fallado (se reintenta al reiniciar el servicio)
+    os.environ[VARIABLE_INICIALIZADA] = str(os.getpid())
+    fases.imprimir("Arranque")
+    return ok
+
+
+def asegurar_inicializacion():
+    """
+    Inicializa la BD salvo que el proceso padre o un hermano ya lo hayan hecho.
+
+    Returns:
+        bool: True si ya estaba inicializada o terminó bien
+    """
+    if os.getenv(VARIABLE_INICIALIZADA):
+        return True
+
+    with _lock_arranque() as f:
+        # Hermanos del mismo padre (p. ej. workers de uvicorn): el primero deja la marca
+        marca = _huella_padre()
+        f.seek(0)
+        if f.read().strip() == marca:
+            os.environ[VARIABLE_INICIALIZADA] = marca
+            return True
+        ok = _inicializar()
+        if ok:
+            f.seek(0)
+            f.truncate()
+            f.write(marca)
+            f.flush()
+        return ok
@@ -0,0 +1,192 @@
+"""
+Modo de servicio ASGI.
+
+/auth/ug y /send-email se atienden de forma asíncrona: la espera a UG y a Graph
+no ocupa un hilo, así un worker sostiene cientos de logins en vuelo. Las
+consultas pyodbc (bloqueantes) van a un pool de hilos acotado (DB_HILOS_ASYNC).
+El resto de rutas se delega a la app Flask a través de un puente WSGI.
+
+Levantar con:
+    MODO_ASGI=1 gunicorn -c gunicorn.conf.py
+    uvicorn asgi:app --port 5000
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qsl
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+
+from app import (
+    app as flask_app,
+    UG_AUTH_URL,
+    REQUEST_TIMEOUT,
+    CABECERAS_EXPUESTAS,
+    ROLES_CORREO,
+    _parse_ug_result,
+    _leer_credenciales_ug,
+    _respuesta_auth_ug,
+    _leer_solicitud_correo,
+    _error_de_rol
+)
+from correo import obtener_token_graph, enviar_correo_graph_async
+from database import obtener_usuario_por_usuario
+from limites import LIMITES_ACTIVOS, LimiteExcedido, clave_cuenta, limitador, respuesta_limite
+from metricas import medir_solicitud
+from sesion import verificar_token
+
+# ======================= CONFIG ===========================
+DB_HILOS_ASYNC = int(os.getenv("DB_HILOS_ASYNC", "16"))
+WSGI_HILOS = int(os.getenv("WSGI_HILOS", "16"))
+HTTP_MAX_CONEXIONES = int(os.getenv("HTTP_MAX_CONEXIONES", "200"))
+
+# Pool acotado para trabajo bloqueante (pyodbc, MSAL)
+pool_bd = ThreadPoolExecutor(max_workers=DB_HILOS_ASYNC, thread_name_prefix="bd")
+
+
+async def en_hilo_bd(fn, *args):
+    """Ejecuta una función bloqueante en el pool de BD sin bloquear el event loop"""
+    return await asyncio.get_running_loop().run_in_executor(pool_bd, fn, *args)
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    limites = httpx.Limits(max_connections=HTTP_MAX_CONEXIONES, max_keepalive_connections=HTTP_MAX_CONEXIONES)
+    async with httpx.AsyncClient(limits=limites, timeout=REQUEST_TIMEOUT) as cliente:
+        app.state.http = cliente
+        yield
+    pool_bd.shutdown(wait=False)
+
+
+async def con_limite(clase, usuario, facultad, atender):
+    """Atiende `atender()` dentro de un cupo del limitador (429 con Retry-After si no hay)"""
+    if not LIMITES_ACTIVOS:
+        return await atender()
+    try:
+        token = await en_hilo_bd(limitador.adquirir, clase, usuario, facultad)
+    except LimiteExcedido as e:
+        cuerpo, cabeceras = respuesta_limite(e)
+        return JSONResponse(cuerpo, status_code=429, headers=cabeceras)
+    try:
+        return await atender()
+    finally:
+        await en_hilo_bd(limitador.liberar, clase, token)
+
+
+# ======================= AUTENTICACIÓN UG ===========================
+async def proxy_auth(request):
+    """Autenticación con UG (asíncrona)"""
+    tipo = request.headers.get("content-type", "")
+    cuerpo = await request.body()
+    form, data_json = {}, {}
+    if "application/x-www-form-urlencoded" in tipo:
+        form = dict(parse_qsl(cuerpo.decode("utf-8", "replace")))
+    elif "json" in tipo:
+        try:
+            data_json = json.loads(cuerpo or b"{}")
+        except ValueError:
+            pass
+    usuario_in, clave = _leer_credenciales_ug(form, data_json if isinstance(data_json, dict) else {})
+
+    if not usuario_in or not clave:
+        return JSONResponse({"id": 0, "mensaje": "Usuario/clave vacíos"}, status_code=400)
+    # Cupo por cuenta: no por IP, varios usuarios comparten la NAT del campus
+    return await con_limite("auth", clave_cuenta(usuario_in), None,
+                            lambda: _autenticar_ug(request, usuario_in, clave))
+
+
+async def _autenticar_ug(request, usuario_in, clave):
+    try:
+        resp = await request.app.state.http.post(
+            UG_AUTH_URL,
+            data={"usuario": usuario_in, "clave": clave},
+            headers={"User-Agent": "Mozilla/5.0"}
+        )
+    except httpx.HTTPError as e:
+        return JSONResponse({
+            "error": "No se pudo contactar con la API de la UG",
+            "detalle": str(e)
+        }, status_code=502)
+
+    try:
+        ug_payload = resp.json()
+    except ValueError:
+        ug_payload = {"status": resp.status_code, "text": resp.text}
+
+    ug_id, _ = _parse_ug_result(ug_payload)
+    user_row = await en_hilo_bd(obtener_usuario_por_usuario, usuario_in) if ug_id == 1 else None
+    cuerpo, status = _respuesta_auth_ug(usuario_in, ug_payload, user_row)
+    return JSONResponse(cuerpo, status_code=status)
+
+
+# ======================= ENVÍO DE CORREOS ===========================
+async def send_email(request):
+    """Envío de correos para roles autorizados (asíncrono)"""
+    auth = request.headers.get("authorization", "")
+    token = auth[7:].strip() if auth.lower().startswith("bearer ") else None
+    # verificar_token puede recargar las versiones de sesión desde la BD
+    user = await en_hilo_bd(verificar_token, token) if token else None
+    if not user:
+        return JSONResponse({'error': 'No autenticado'}, status_code=401)
+    if not user.get('estado'):
+        return JSONResponse({'error': 'Usuario inactivo'}, status_code=403)
+    denegado = _error_de_rol(user, ROLES_CORREO)
+    if denegado:
+        return JSONResponse(denegado, status_code=403)
+    return await con_limite("correo", str(user["id"]), (user.get("facultadCod") or "").strip() or None,
+                            lambda: _enviar_correo(request))
+
+
+async def _enviar_correo(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    solicitud, error = _leer_solicitud_correo(data if isinstance(data, dict) else {})
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+    to_emails, subject, body = solicitud
+
+    try:
+        access_token = await en_hilo_bd(obtener_token_graph)
+        reintentos = await enviar_correo_graph_async(request.app.state.http, access_token,
+                                                     to_emails, subject, body)
+        return JSONResponse({"message": "Correo enviado correctamente", "reintentos": reintentos})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+def _medida(ruta, handler):
+    """Mide las rutas nativas; las de Flask las mide instrumentar_flask"""
+    async def envoltura(request):
+        with medir_solicitud(request.method, ruta) as medicion:
+            response = await handler(request)
+            medicion["estado"] = response.status_code
+            return response
+
+    return envoltura
+
+
+# ======================= APP ASGI ===========================
+app = Starlette(
+    routes=[
+        Route("/auth/ug", _medida("/auth/ug", proxy_auth), methods=["POST"]),
+        Route("/send-email", _medida("/send-email", send_email), methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(flask_app, workers=WSGI_HILOS)),
+    ],
+    middleware=[
+        # CORS de las rutas nativas; también reescribe el de las rutas Flask, por eso expone
+        # las mismas cabeceras (X-Sisa-Escritura incluida)
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+                   expose_headers=CABECERAS_EXPUESTAS)
+    ],
+    lifespan=ciclo_de_vida
+)
@@ -0,0 +1,18 @@
+"""
+Backend con correo.py apuntando al Graph falso, para el modo http de bench_correo.
+Solo para benchmarks: la redirección no existe en los módulos de producción.
+
+Uso (desde backend/, con el Graph falso ya levantado):
+    MS_GRAPH_FALSO=http://127.0.0.1:8765 gunicorn -c gunicorn.conf.py benchmarks.app_graph_falso:app
+    (con MODO_ASGI=1 sirve la aplicación de asgi.py)
+"""
+import os
+
+from benchmarks.graph_falso import redirigir_hosts_microsoft
+
+redirigir_hosts_microsoft(os.environ["MS_GRAPH_FALSO"])
+
+if os.getenv("MODO_ASGI", "0") == "1":
+    from asgi import app  # noqa: E402
+else:
+    from app import app  # noqa: E402
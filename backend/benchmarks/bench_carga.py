@@ -0,0 +1,248 @@
+"""
+Prueba de carga de extremo a extremo del backend.
+
+Genera tráfico mixto contra /auth/ug, /files, /download, /upload y /usuarios
+con usuarios sembrados por sembrar_datos.py, usando un servicio UG falso
+(ug_falso.py). Reporta por ruta solicitudes/seg, errores y latencias
+p50/p95/p99, y puede compararse contra una corrida guardada.
+
+Preparación (desde backend/):
+    docker compose -f benchmarks/docker-compose.yml up -d
+    export DB_SERVER=localhost DB_PORT=14333 DB_USER=sa DB_PASSWORD='Bench_Sisa_2024!' DB_NAME=FACAFDB
+    python -m benchmarks.sembrar_datos --usuarios 5000
+
+Uso:
+    python -m benchmarks.bench_carga --lanzar --duracion 60 --concurrencia 16 --json base.json
+    python -m benchmarks.bench_carga --lanzar --comparar base.json
+    python -m benchmarks.bench_carga --url http://localhost:5000 --puerto-ug 8766   # backend ya levantado
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from benchmarks.estadisticas import (
+    resumir_latencias,
+    guardar_resultados,
+    comparar_con_base,
+    imprimir_comparacion
+)
+from benchmarks.sembrar_datos import (
+    FACULTADES,
+    MIME_XLSX,
+    libros_disponibles,
+    usuario_admin,
+    usuario_coordinador,
+    usuario_generico
+)
+from benchmarks.ug_falso import UGFalso, CLAVE_VALIDA
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MEZCLA_POR_DEFECTO = "auth=10,files=35,download=20,upload=5,usuarios=30"
+
+
+class _Resultados:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = {}
+        self.errores = {}
+
+    def anotar(self, ruta, ms, ok):
+        with self.lock:
+            if ok:
+                self.latencias.setdefault(ruta, []).append(ms)
+            else:
+                self.errores[ruta] = self.errores.get(ruta, 0) + 1
+
+    def resumen(self, duracion):
+        filas = []
+        for ruta in sorted(set(self.latencias) | set(self.errores)):
+            latencias = self.latencias.get(ruta, [])
+            fila = {
+                "ruta": ruta,
+                "solicitudes": len(latencias),
+                "errores": self.errores.get(ruta, 0),
+                "rps": round(len(latencias) / duracion, 2) if duracion else 0.0
+            }
+            fila.update(resumir_latencias(latencias))
+            filas.append(fila)
+        return filas
+
+
+class UsuarioVirtual:
+    """Sesión de un admin de facultad que recorre la mezcla de rutas"""
+
+    def __init__(self, url, facultad, semilla, usuarios_sembrados):
+        self.url = url.rstrip("/")
+        self.facultad = facultad
+        self.http = requests.Session()
+        self.aleatorio = random.Random(semilla)
+        self.usuarios_sembrados = usuarios_sembrados
+        self.token = None
+        self.archivos = []
+        self.libros = libros_disponibles()
+
+    def _login(self, usuario):
+        resp = self.http.post(f"{self.url}/auth/ug", data={"usuario": usuario, "clave": CLAVE_VALIDA}, timeout=30)
+        return resp, (resp.json().get("token") if resp.status_code == 200 else None)
+
+    def preparar(self):
+        _, self.token = self._login(usuario_admin(self.facultad))
+        if not self.token:
+            raise RuntimeError(f"No se pudo iniciar sesión como {usuario_admin(self.facultad)} (¿se sembró la BD?)")
+        self.http.headers["Authorization"] = f"Bearer {self.token}"
+        resp = self.http.get(f"{self.url}/files", timeout=30)
+        self.archivos = [a["id"] for a in resp.json().get("archivos", [])]
+
+    def auth(self):
+        # Login de un usuario cualquiera (la sesión del admin no se toca)
+        usuario = self.aleatorio.choice([usuario_coordinador(self.facultad),
+                                         usuario_generico(self.aleatorio.randrange(self.usuarios_sembrados))])
+        resp = requests.post(f"{self.url}/auth/ug", data={"usuario": usuario, "clave": CLAVE_VALIDA}, timeout=30)
+        # 403: el usuario genérico puede estar inactivo; UG lo validó igual
+        return resp.status_code in (200, 403)
+
+    def files(self):
+        return self.http.get(f"{self.url}/files", timeout=30).status_code == 200
+
+    def download(self):
+        if not self.archivos:
+            return False
+        resp = self.http.get(f"{self.url}/download/{self.aleatorio.choice(self.archivos)}", timeout=60)
+        return resp.status_code == 200 and len(resp.content) > 0
+
+    def upload(self):
+        libro = self.aleatorio.choice(self.libros)
+        with open(libro, "rb") as f:
+            resp = self.http.post(f"{self.url}/upload", files={"file": (f"BENCH_{libro.name}", f, MIME_XLSX)},
+                                  data={"facultadCod": self.facultad}, timeout=120)
+        return resp.status_code == 200
+
+    def usuarios(self):
+        params = {"limit": 50, "total": self.aleatorio.choice(["0", "1"])}
+        if self.aleatorio.random() < 0.3:
+            params["q"] = f"usuario{self.aleatorio.randrange(1000):03d}"
+        return self.http.get(f"{self.url}/usuarios", params=params, timeout=30).status_code == 200
+
+
+def _leer_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        ruta, _, peso = parte.partition("=")
+        if ruta.strip():
+            mezcla[ruta.strip()] = float(peso or 1)
+    invalidas = set(mezcla) - {"auth", "files", "download", "upload", "usuarios"}
+    if invalidas:
+        raise argparse.ArgumentTypeError(f"Rutas desconocidas en la mezcla: {', '.join(sorted(invalidas))}")
+    return mezcla
+
+
+def ejecutar_carga(url, mezcla, duracion, concurrencia, usuarios_sembrados, semilla=7):
+    resultados = _Resultados()
+    rutas, pesos = list(mezcla), list(mezcla.values())
+
+    virtuales = [UsuarioVirtual(url, FACULTADES[i % len(FACULTADES)], semilla + i, usuarios_sembrados)
+                 for i in range(concurrencia)]
+    for vu in virtuales:
+        vu.preparar()
+
+    fin = time.perf_counter() + duracion
+
+    def bucle(vu):
+        while time.perf_counter() < fin:
+            ruta = vu.aleatorio.choices(rutas, weights=pesos)[0]
+            t0 = time.perf_counter()
+            try:
+                ok = getattr(vu, ruta)()
+            except requests.RequestException:
+                ok = False
+            resultados.anotar(ruta, (time.perf_counter() - t0) * 1000.0, ok)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=bucle, args=(vu,), daemon=True) for vu in virtuales]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return resultados.resumen(time.perf_counter() - inicio)
+
+
+def _lanzar_backend(puerto, ug_url, workers):
+    """Levanta gunicorn con la configuración del repo apuntando al UG falso"""
+    entorno = dict(os.environ, PORT=str(puerto), UG_AUTH_URL=ug_url, GUNICORN_WORKERS=str(workers))
+    proceso = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+                               cwd=BASE_DIR, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{puerto}"
+    for _ in range(120):
+        if proceso.poll() is not None:
+            raise RuntimeError("El backend terminó al arrancar")
+        try:
+            if requests.get(f"{url}/api/health", timeout=2).status_code < 500:
+                return proceso, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    proceso.terminate()
+    raise RuntimeError("El backend no respondió a tiempo")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de extremo a extremo")
+    parser.add_argument("--url", default="http://localhost:5000", help="Backend ya levantado")
+    parser.add_argument("--lanzar", action="store_true", help="Levantar gunicorn apuntando al UG falso")
+    parser.add_argument("--puerto", type=int, default=5055, help="Puerto del backend con --lanzar")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--puerto-ug", type=int, default=0)
+    parser.add_argument("--ug-latencia-ms", type=float, default=80.0)
+    parser.add_argument("--duracion", type=float, default=30.0, help="Segundos de carga")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--mezcla", type=_leer_mezcla, default=_leer_mezcla(MEZCLA_POR_DEFECTO))
+    parser.add_argument("--usuarios-sembrados", type=int, default=5000)
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    parser.add_argument("--comparar", help="Comparar contra resultados guardados")
+    args = parser.parse_args(argv)
+
+    with UGFalso(args.ug_latencia_ms, puerto=args.puerto_ug) as ug:
+        print(f"🚀 UG falso en {ug.url} (latencia={args.ug_latencia_ms}ms)")
+        proceso = None
+        url = args.url
+        if args.lanzar:
+            proceso, url = _lanzar_backend(args.puerto, ug.url, args.workers)
+            print(f"🚀 Backend en {url} ({args.workers} workers)")
+        try:
+            resultados = ejecutar_carga(url, args.mezcla, args.duracion, args.concurrencia,
+                                        args.usuarios_sembrados)
+        finally:
+            if proceso:
+                proceso.terminate()
+                proceso.wait(timeout=30)
+        print(f"📊 UG falso: {ug.contadores.resumen()}")
+
+    print(f"{'ruta':<10} {'solic':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in resultados:
+        print(f"{r['ruta']:<10} {r['solicitudes']:>7} {r['errores']:>5} {r['rps']:>8} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+    if args.json:
+        guardar_resultados(args.json, resultados)
+        print(f"💾 Resultados guardados en {args.json}")
+
+    if args.comparar:
+        filas = comparar_con_base(
+            args.comparar, resultados,
+            clave=lambda r: r["ruta"],
+            metricas={"rps": 1, "p50_ms": -1, "p95_ms": -1, "p99_ms": -1}
+        )
+        if imprimir_comparacion(filas):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Benchmark de throughput del envío de correos.
+
+Levanta un Graph/MSAL falso (graph_falso.py) y ejecuta el envío con distintas
+cantidades de mensajes y niveles de concurrencia, reportando mensajes/seg,
+latencias p50/p99, reintentos y fallos.
+
+Modos:
+    directo  llama a correo.enviar_correo_graph() en este proceso
+    http     hace POST /send-email contra un backend ya levantado con
+             benchmarks.app_graph_falso (correo.py apuntando al Graph falso)
+
+Uso (desde backend/):
+    python -m benchmarks.bench_correo --mensajes 100,500 --concurrencia 1,8,32
+    python -m benchmarks.bench_correo --limite-rps 50 --tasa-error 0.02 --json base.json
+    python -m benchmarks.bench_correo --comparar base.json
+    python -m benchmarks.bench_correo --modo http --url http://localhost:5000 \\
+        --token <token de /auth/ug> --puerto-graph 8765
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.estadisticas import (
+    resumir_latencias,
+    guardar_resultados,
+    comparar_con_base,
+    imprimir_comparacion
+)
+from benchmarks.graph_falso import GraphFalso, ConfigGraphFalso, redirigir_hosts_microsoft
+
+DESTINATARIOS = ["estudiante.prueba@ug.edu.ec"]
+ASUNTO = "FACAF Notificación Académica"
+CUERPO = "<p>Estimado estudiante, este es un mensaje de prueba de rendimiento.</p>" * 20
+
+
+def _enviador_directo(graph_url):
+    os.environ.setdefault("MS_CLIENT_ID", "00000000-0000-0000-0000-000000000000")
+    os.environ.setdefault("MS_CLIENT_SECRET", "secreto-falso")
+    os.environ.setdefault("OUTLOOK_USER", "notificaciones@ug.edu.ec")
+    import correo
+
+    redirigir_hosts_microsoft(graph_url)
+
+    def enviar():
+        return correo.enviar_correo_graph(DESTINATARIOS, ASUNTO, CUERPO)
+
+    return enviar
+
+
+def _enviador_http(url, cabeceras):
+    sesion = requests.Session()
+
+    def enviar():
+        resp = sesion.post(f"{url.rstrip('/')}/send-email", headers=cabeceras,
+                           json={"to": DESTINATARIOS, "subject": ASUNTO, "body": CUERPO}, timeout=120)
+        if resp.status_code != 200:
+            raise Exception(f"{resp.status_code} - {resp.text[:200]}")
+        return resp.json().get("reintentos", 0)
+
+    return enviar
+
+
+def ejecutar_escenario(enviar, mensajes, concurrencia):
+    latencias = []
+    reintentos = 0
+    fallos = 0
+
+    def uno(_):
+        t0 = time.perf_counter()
+        try:
+            r = enviar()
+            return (time.perf_counter() - t0) * 1000.0, r, None
+        except Exception as e:
+            return (time.perf_counter() - t0) * 1000.0, 0, e
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        for ms, r, error in pool.map(uno, range(mensajes)):
+            if error is None:
+                latencias.append(ms)
+                reintentos += r
+            else:
+                fallos += 1
+    duracion = time.perf_counter() - inicio
+
+    resultado = {
+        "mensajes": mensajes,
+        "concurrencia": concurrencia,
+        "duracion_s": round(duracion, 3),
+        "mensajes_por_s": round(len(latencias) / duracion, 2) if duracion else 0.0,
+        "reintentos": reintentos,
+        "fallos": fallos
+    }
+    resultado.update(resumir_latencias(latencias))
+    return resultado
+
+
+def _lista_enteros(texto):
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del envío de correos vía Graph")
+    parser.add_argument("--modo", choices=["directo", "http"], default="directo")
+    parser.add_argument("--mensajes", type=_lista_enteros, default=[100, 500])
+    parser.add_argument("--concurrencia", type=_lista_enteros, default=[1, 4, 16, 32])
+    parser.add_argument("--latencia-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    parser.add_argument("--limite-rps", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--puerto-graph", type=int, default=0)
+    parser.add_argument("--url", default="http://localhost:5000", help="Backend (modo http)")
+    parser.add_argument("--token", help="Token de sesión de un usuario autorizado (modo http)")
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    parser.add_argument("--comparar", help="Comparar contra resultados guardados")
+    args = parser.parse_args(argv)
+
+    config = ConfigGraphFalso(args.latencia_ms, args.jitter_ms, args.tasa_error,
+                              args.limite_rps, args.retry_after)
+
+    with GraphFalso(config, puerto=args.puerto_graph) as graph:
+        print(f"🚀 Graph falso en {graph.url} (latencia={args.latencia_ms}ms, "
+              f"error={args.tasa_error:.0%}, limite={args.limite_rps or '∞'} rps)")
+
+        if args.modo == "directo":
+            enviar = _enviador_directo(graph.url)
+        else:
+            if not args.token:
+                parser.error("--token es requerido en modo http")
+            enviar = _enviador_http(args.url, {"Authorization": f"Bearer {args.token}"})
+
+        resultados = []
+        print(f"{'mensajes':>8} {'conc':>5} {'msg/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'reint':>6} {'fallos':>6}")
+        for mensajes in args.mensajes:
+            for concurrencia in args.concurrencia:
+                r = ejecutar_escenario(enviar, mensajes, concurrencia)
+                resultados.append(r)
+                print(f"{r['mensajes']:>8} {r['concurrencia']:>5} {r['mensajes_por_s']:>9} "
+                      f"{r['p50_ms']:>9} {r['p99_ms']:>9} {r['reintentos']:>6} {r['fallos']:>6}")
+
+        print(f"📊 Servidor Graph falso: {graph.contadores.resumen()}")
+
+    if args.json:
+        guardar_resultados(args.json, resultados)
+        print(f"💾 Resultados guardados en {args.json}")
+
+    if args.comparar:
+        filas = comparar_con_base(
+            args.comparar, resultados,
+            clave=lambda r: f"{r['mensajes']}x{r['concurrencia']}",
+            metricas={"mensajes_por_s": 1, "p50_ms": -1, "p99_ms": -1}
+        )
+        if imprimir_comparacion(filas):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Benchmark de lectura de los reportes xlsx.
+
+Compara lector_xlsx (streaming, por lotes) con openpyxl en modo read_only y
+con la carga completa del libro (DOM) sobre los libros de backend/uploads/. Cada medición corre en un proceso nuevo
+para que una corrida no deje memoria ni cachés a la siguiente. El tiempo se
+mide sin instrumentar; el pico de memoria se mide aparte con tracemalloc.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_xlsx
+    python -m benchmarks.bench_xlsx --lotes 100,1000,10000 --repeticiones 3 --json base.json
+    python -m benchmarks.bench_xlsx --comparar base.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.estadisticas import guardar_resultados, comparar_con_base, imprimir_comparacion
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+UPLOADS_DIR = BASE_DIR / "uploads"
+
+
+def _medir_lector(ruta, lote):
+    from lector_xlsx import LectorXlsx
+
+    filas = 0
+    with LectorXlsx(ruta) as lector:
+        for bloque in lector.lotes(lote):
+            filas += len(bloque)
+    return filas
+
+
+def _medir_openpyxl(ruta, _lote, read_only=True):
+    from openpyxl import load_workbook
+
+    filas = 0
+    libro = load_workbook(ruta, read_only=read_only, data_only=True)
+    try:
+        for _ in libro.worksheets[0].iter_rows(values_only=True):
+            filas += 1
+    finally:
+        libro.close()
+    return filas
+
+
+LECTORES = {
+    "lector_xlsx": _medir_lector,
+    "openpyxl": _medir_openpyxl,
+    "openpyxl_dom": lambda ruta, lote: _medir_openpyxl(ruta, lote, read_only=False),
+}
+
+
+def medir_en_proceso(lector, ruta, lote):
+    """Punto de entrada del proceso hijo: imprime la medición como JSON"""
+    if lector.startswith("openpyxl"):
+        import openpyxl  # noqa: F401  (la importación no cuenta en el tiempo ni en el pico)
+    else:
+        import lector_xlsx  # noqa: F401
+    inicio = time.perf_counter()
+    filas = LECTORES[lector](ruta, lote)
+    segundos = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    LECTORES[lector](ruta, lote)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({"filas": filas, "segundos": segundos, "pico_mb": pico / 1024 / 1024}))
+
+
+def medir(lector, ruta, lote, repeticiones):
+    corridas = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_xlsx", "--hijo", lector, str(ruta), str(lote)],
+            cwd=BASE_DIR, capture_output=True, text=True
+        )
+        if salida.returncode != 0:
+            raise RuntimeError(f"{lector} falló con {ruta.name}: {salida.stderr.strip()[-300:]}")
+        corridas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+    mejor = min(corridas, key=lambda c: c["segundos"])
+    return {
+        "archivo": ruta.name,
+        "lector": lector,
+        "lote": lote if lector == "lector_xlsx" else None,
+        "filas": mejor["filas"],
+        "segundos": round(mejor["segundos"], 3),
+        "filas_por_s": round(mejor["filas"] / mejor["segundos"], 1) if mejor["segundos"] else 0.0,
+        "pico_mb": round(max(c["pico_mb"] for c in corridas), 1)
+    }
+
+
+def _lista_enteros(texto):
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["--hijo"]:
+        medir_en_proceso(argv[1], argv[2], int(argv[3]))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark de lectura de xlsx")
+    parser.add_argument("--archivos", nargs="*", help="Libros a leer (por defecto backend/uploads/*.xlsx)")
+    parser.add_argument("--lotes", type=_lista_enteros, default=[100, 1000, 10000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-openpyxl", action="store_true", help="No medir openpyxl")
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    parser.add_argument("--comparar", help="Comparar contra resultados guardados")
+    args = parser.parse_args(argv)
+
+    archivos = [Path(a) for a in args.archivos] if args.archivos else sorted(UPLOADS_DIR.glob("*.xlsx"))
+    if not archivos:
+        parser.error(f"No hay libros en {UPLOADS_DIR}")
+
+    escenarios = [("lector_xlsx", lote) for lote in args.lotes]
+    if not args.sin_openpyxl:
+        try:
+            import openpyxl  # noqa: F401
+            escenarios += [("openpyxl", 0), ("openpyxl_dom", 0)]
+        except ImportError:
+            print("ℹ️ openpyxl no está instalado; solo se mide lector_xlsx")
+
+    resultados = []
+    print(f"{'archivo':<58} {'lector':<13} {'lote':>6} {'filas':>7} {'seg':>7} {'filas/s':>9} {'pico MB':>8}")
+    for ruta in archivos:
+        for lector, lote in escenarios:
+            r = medir(lector, ruta, lote, args.repeticiones)
+            resultados.append(r)
+            print(f"{r['archivo']:<58} {r['lector']:<13} {r['lote'] or '-':>6} {r['filas']:>7} "
+                  f"{r['segundos']:>7} {r['filas_por_s']:>9} {r['pico_mb']:>8}")
+
+    if args.json:
+        guardar_resultados(args.json, resultados)
+        print(f"💾 Resultados guardados en {args.json}")
+
+    if args.comparar:
+        filas = comparar_con_base(
+            args.comparar, resultados,
+            clave=lambda r: f"{r['archivo']}:{r['lector']}:{r['lote']}",
+            metricas={"filas_por_s": 1, "pico_mb": -1}
+        )
+        if imprimir_comparacion(filas):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
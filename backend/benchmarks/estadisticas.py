@@ -0,0 +1,66 @@
+"""Utilidades comunes de los benchmarks: percentiles y comparación contra una línea base."""
+import json
+import math
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (p en 0..100) sobre una lista de números"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    rango = max(1, math.ceil(p / 100.0 * len(ordenados)))
+    return ordenados[rango - 1]
+
+
+def resumir_latencias(latencias_ms):
+    return {
+        "p50_ms": round(percentil(latencias_ms, 50), 2),
+        "p95_ms": round(percentil(latencias_ms, 95), 2),
+        "p99_ms": round(percentil(latencias_ms, 99), 2),
+        "max_ms": round(max(latencias_ms), 2) if latencias_ms else 0.0
+    }
+
+
+def guardar_resultados(ruta, resultados):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+
+def comparar_con_base(ruta_base, resultados, clave, metricas, tolerancia=0.10):
+    """
+    Compara `resultados` con una corrida guardada.
+
+    Args:
+        ruta_base: JSON previo generado con guardar_resultados
+        resultados: lista de dicts de la corrida actual
+        clave: función que devuelve la clave de emparejamiento de cada dict
+        metricas: dict nombre -> +1 si mayor es mejor, -1 si menor es mejor
+        tolerancia: variación relativa tolerada antes de marcar regresión
+
+    Returns:
+        list: filas (clave, métrica, base, actual, cambio relativo, regresión)
+    """
+    with open(ruta_base, encoding="utf-8") as f:
+        base = {clave(r): r for r in json.load(f)}
+
+    filas = []
+    for r in resultados:
+        previo = base.get(clave(r))
+        if not previo:
+            continue
+        for nombre, sentido in metricas.items():
+            antes, ahora = previo.get(nombre), r.get(nombre)
+            if not antes or ahora is None:
+                continue
+            cambio = (ahora - antes) / antes
+            filas.append((clave(r), nombre, antes, ahora, cambio, cambio * sentido < -tolerancia))
+    return filas
+
+
+def imprimir_comparacion(filas):
+    regresiones = 0
+    for k, nombre, antes, ahora, cambio, regresion in filas:
+        marca = "❌" if regresion else "✅"
+        regresiones += regresion
+        print(f"{marca} {k} {nombre}: {antes} -> {ahora} ({cambio:+.1%})")
+    return regresiones
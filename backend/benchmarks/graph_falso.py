@@ -0,0 +1,210 @@
+"""
+Servidor local que imita los endpoints de Microsoft usados por correo.py:
+
+- Descubrimiento OIDC y emisión de tokens MSAL (login.microsoftonline.com)
+- POST /v1.0/users/<usuario>/sendMail (graph.microsoft.com)
+
+Permite simular latencia, tasa de errores y throttling (429 + Retry-After)
+para medir el subsistema de correo sin tocar Microsoft 365.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit
+
+from requests.adapters import HTTPAdapter
+
+HOST_LOGIN = "https://login.microsoftonline.com"
+
+
+class ConfigGraphFalso:
+    def __init__(self, latencia_ms=50.0, jitter_ms=10.0, tasa_error=0.0, limite_rps=0.0, retry_after=1.0):
+        self.latencia_ms = latencia_ms      # Latencia media de sendMail
+        self.jitter_ms = jitter_ms          # Variación uniforme +/- sobre la latencia
+        self.tasa_error = tasa_error        # Probabilidad de responder 503
+        self.limite_rps = limite_rps        # Mensajes/seg antes de responder 429 (0 = sin límite)
+        self.retry_after = retry_after      # Valor de la cabecera Retry-After en los 429
+
+
+class _Contadores:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = 0
+        self.envios = 0
+        self.aceptados = 0
+        self.throttled = 0
+        self.errores = 0
+        self._ventana_inicio = time.monotonic()
+        self._ventana_envios = 0
+
+    def permitir(self, limite_rps):
+        """Ventana fija de 1 segundo para simular el throttling de Graph"""
+        with self.lock:
+            self.envios += 1
+            if limite_rps <= 0:
+                return True
+            ahora = time.monotonic()
+            if ahora - self._ventana_inicio >= 1.0:
+                self._ventana_inicio = ahora
+                self._ventana_envios = 0
+            self._ventana_envios += 1
+            return self._ventana_envios <= limite_rps
+
+    def sumar(self, campo):
+        with self.lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def resumen(self):
+        with self.lock:
+            return {
+                "tokens": self.tokens,
+                "envios": self.envios,
+                "aceptados": self.aceptados,
+                "throttled": self.throttled,
+                "errores": self.errores
+            }
+
+
+def _crear_handler(config, contadores):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status, cuerpo=None, headers=None):
+            data = json.dumps(cuerpo).encode() if cuerpo is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _leer_cuerpo(self):
+            largo = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(largo) if largo else b""
+
+        def do_GET(self):
+            partes = self.path.split("?")[0].strip("/").split("/")
+            if self.path.endswith("/.well-known/openid-configuration"):
+                tenant = partes[0]
+                return self._responder(200, {
+                    "issuer": f"{HOST_LOGIN}/{tenant}/v2.0",
+                    "authorization_endpoint": f"{HOST_LOGIN}/{tenant}/oauth2/v2.0/authorize",
+                    "token_endpoint": f"{HOST_LOGIN}/{tenant}/oauth2/v2.0/token",
+                    "device_authorization_endpoint": f"{HOST_LOGIN}/{tenant}/oauth2/v2.0/devicecode"
+                })
+            if self.path.startswith("/common/discovery/instance"):
+                return self._responder(200, {
+                    "tenant_discovery_endpoint": f"{HOST_LOGIN}/common/v2.0/.well-known/openid-configuration",
+                    "metadata": []
+                })
+            self._responder(404, {"error": "not_found"})
+
+        def do_POST(self):
+            self._leer_cuerpo()
+            if self.path.endswith("/oauth2/v2.0/token"):
+                contadores.sumar("tokens")
+                return self._responder(200, {
+                    "token_type": "Bearer",
+                    "expires_in": 3600,
+                    "ext_expires_in": 3600,
+                    "access_token": f"token-falso-{contadores.tokens}"
+                })
+            if self.path.endswith("/sendMail"):
+                if not contadores.permitir(config.limite_rps):
+                    contadores.sumar("throttled")
+                    return self._responder(429, {"error": {"code": "TooManyRequests"}},
+                                           {"Retry-After": str(config.retry_after)})
+                espera = config.latencia_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+                time.sleep(max(0.0, espera) / 1000.0)
+                if random.random() < config.tasa_error:
+                    contadores.sumar("errores")
+                    return self._responder(503, {"error": {"code": "ServiceUnavailable"}})
+                contadores.sumar("aceptados")
+                return self._responder(202)
+            self._responder(404, {"error": "not_found"})
+
+    return Handler
+
+
+class GraphFalso:
+    """Servidor Graph/MSAL falso en un hilo de fondo. Usar como context manager."""
+
+    def __init__(self, config=None, host="127.0.0.1", puerto=0):
+        self.config = config or ConfigGraphFalso()
+        self.contadores = _Contadores()
+        self.servidor = ThreadingHTTPServer((host, puerto), _crear_handler(self.config, self.contadores))
+        self.servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+# ======================= REDIRECCIÓN DE correo.py ===========================
+class _AdaptadorRedireccion(HTTPAdapter):
+    """Reescribe las URLs de Microsoft hacia el Graph falso"""
+
+    def __init__(self, destino, **kwargs):
+        super().__init__(**kwargs)
+        self.destino = urlsplit(destino.rstrip('/'))
+
+    def send(self, request, **kwargs):
+        partes = urlsplit(request.url)
+        request.url = urlunsplit((self.destino.scheme, self.destino.netloc,
+                                  self.destino.path + partes.path, partes.query, partes.fragment))
+        return super().send(request, **kwargs)
+
+
+def redirigir_hosts_microsoft(destino):
+    """
+    Envía las llamadas de correo.py a login.microsoftonline.com (MSAL) y a
+    graph.microsoft.com (sendMail, también el cliente httpx del modo ASGI) hacia `destino`
+    """
+    import correo
+
+    adaptador = _AdaptadorRedireccion(destino)
+    correo.http_graph.mount(correo.AUTHORITY_HOST, adaptador)
+    correo.http_graph.mount(correo.GRAPH_HOST, adaptador)
+    correo.GRAPH_HOST = destino.rstrip('/')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor Graph/MSAL falso")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=float, default=50.0)
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    parser.add_argument("--limite-rps", type=float, default=0.0)
+    args = parser.parse_args()
+
+    graph = GraphFalso(ConfigGraphFalso(args.latencia_ms, tasa_error=args.tasa_error,
+                                        limite_rps=args.limite_rps), puerto=args.puerto)
+    print(f"🚀 Graph falso escuchando en {graph.url} (backend: MS_GRAPH_FALSO={graph.url} con benchmarks.app_graph_falso)")
+    try:
+        graph.servidor.serve_forever()
+    except KeyboardInterrupt:
+        graph.detener()
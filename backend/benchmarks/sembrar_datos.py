@@ -0,0 +1,103 @@
+"""
+Carga una BD de pruebas con volúmenes realistas para los benchmarks de carga.
+
+- Crea/migra FACAFDB (misma inicialización que el arranque del backend)
+- Importa N usuarios repartidos entre facultades, carreras y roles
+- Crea un admin y un coordinador "bench" por facultad (los usa bench_carga)
+- Sube los libros de backend/uploads/ a cada facultad
+
+Usar solo contra la BD de docker-compose.yml, nunca contra producción:
+    docker compose -f benchmarks/docker-compose.yml up -d
+    DB_SERVER=localhost DB_PORT=14333 ... python -m benchmarks.sembrar_datos --usuarios 5000
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+from werkzeug.datastructures import FileStorage
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DIR_LIBROS = BASE_DIR / "uploads"
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+FACULTADES = ["ADM", "ING", "MED", "EDU", "JUR"]
+ROL_ADMIN, ROL_DECANO, ROL_COORDINADOR, ROL_USUARIO = 1, 2, 3, 4
+
+
+def usuario_admin(facultad):
+    return f"bench.admin.{facultad.lower()}@ug.edu.ec"
+
+
+def usuario_coordinador(facultad):
+    return f"bench.coord.{facultad.lower()}@ug.edu.ec"
+
+
+def usuario_generico(n):
+    return f"bench.usuario{n:06d}@ug.edu.ec"
+
+
+def libros_disponibles():
+    return sorted(DIR_LIBROS.glob("*.xlsx"))
+
+
+def _usuarios(total, semilla):
+    from database import obtener_carreras_por_facultad
+
+    aleatorio = random.Random(semilla)
+    carreras = {f: [c['codigo'] for c in obtener_carreras_por_facultad(f)] for f in FACULTADES}
+
+    fijos = []
+    for f in FACULTADES:
+        fijos.append({'usuario': usuario_admin(f), 'rolId': ROL_ADMIN, 'facultadCod': f})
+        fijos.append({'usuario': usuario_coordinador(f), 'rolId': ROL_COORDINADOR, 'facultadCod': f})
+
+    genericos = []
+    for n in range(total):
+        facultad = aleatorio.choice(FACULTADES)
+        rol = aleatorio.choices([ROL_USUARIO, ROL_COORDINADOR, ROL_DECANO], weights=[90, 8, 2])[0]
+        genericos.append({
+            'usuario': usuario_generico(n),
+            'rolId': rol,
+            'facultadCod': facultad,
+            'carreraCod': aleatorio.choice(carreras[facultad]) if carreras[facultad] and aleatorio.random() < 0.7 else None,
+            'activo': aleatorio.random() > 0.05
+        })
+
+    filas = []
+    for i, u in enumerate(fijos + genericos, start=1):
+        filas.append({'fila': i, 'carreraCod': None, 'activo': True, **u})
+    return filas
+
+
+def sembrar(total_usuarios, semilla=42):
+    from arranque import inicializar_despliegue
+    from database import importar_usuarios, guardar_archivo_excel
+
+    if not inicializar_despliegue():
+        raise RuntimeError("No se pudo inicializar la BD de pruebas")
+
+    usuarios = _usuarios(total_usuarios, semilla)
+    creados, errores = importar_usuarios(usuarios)
+    print(f"👥 Usuarios: {len(creados)} creados, {len(errores)} omitidos (ya existían o inválidos)")
+
+    libros = libros_disponibles()
+    for facultad in FACULTADES:
+        for ruta in libros:
+            with open(ruta, "rb") as f:
+                guardar_archivo_excel(FileStorage(f, filename=ruta.name, content_type=MIME_XLSX), facultad)
+    total_mb = sum(r.stat().st_size for r in libros) / 1024 / 1024
+    print(f"📚 {len(libros)} libros ({total_mb:.1f} MB) subidos a {len(FACULTADES)} facultades")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga datos de prueba para los benchmarks")
+    parser.add_argument("--usuarios", type=int, default=5000)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args(argv)
+    sembrar(args.usuarios, args.semilla)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
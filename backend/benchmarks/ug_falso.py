@@ -0,0 +1,105 @@
+"""
+Servidor local que imita el servicio de autenticación de la UG (UG_AUTH_URL).
+
+Acepta cualquier usuario cuya clave sea CLAVE_VALIDA y responde con el mismo
+formato que ValidarCuentaInstitucionalv3 ({"id": 1|0, "mensaje": ...}), con
+latencia configurable. El backend debe arrancar con UG_AUTH_URL=<url>/validar.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+CLAVE_VALIDA = "clave-bench"
+
+
+class _Contadores:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.validas = 0
+        self.invalidas = 0
+
+    def sumar(self, campo):
+        with self.lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def resumen(self):
+        with self.lock:
+            return {"validas": self.validas, "invalidas": self.invalidas}
+
+
+def _crear_handler(latencia_ms, jitter_ms, contadores):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            largo = int(self.headers.get("Content-Length") or 0)
+            datos = dict(parse_qsl(self.rfile.read(largo).decode("utf-8", "replace"))) if largo else {}
+            time.sleep(max(0.0, latencia_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000.0)
+
+            if datos.get("usuario") and datos.get("clave") == CLAVE_VALIDA:
+                contadores.sumar("validas")
+                cuerpo = {"id": 1, "mensaje": "OK", "usuario": datos["usuario"]}
+            else:
+                contadores.sumar("invalidas")
+                cuerpo = {"id": 0, "mensaje": "CREDENCIALES ERRADAS"}
+
+            data = json.dumps(cuerpo).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+class UGFalso:
+    """Servicio UG falso en un hilo de fondo. Usar como context manager."""
+
+    def __init__(self, latencia_ms=80.0, jitter_ms=20.0, host="127.0.0.1", puerto=0):
+        self.contadores = _Contadores()
+        self.servidor = ThreadingHTTPServer((host, puerto), _crear_handler(latencia_ms, jitter_ms, self.contadores))
+        self.servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}/validar"
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servicio de autenticación UG falso")
+    parser.add_argument("--puerto", type=int, default=8766)
+    parser.add_argument("--latencia-ms", type=float, default=80.0)
+    args = parser.parse_args()
+
+    ug = UGFalso(args.latencia_ms, puerto=args.puerto)
+    print(f"🚀 UG falso escuchando (exportar UG_AUTH_URL={ug.url}, clave '{CLAVE_VALIDA}')")
+    try:
+        ug.servidor.serve_forever()
+    except KeyboardInterrupt:
+        ug.detener()
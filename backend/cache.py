@@ -0,0 +1,65 @@
+import threading
+import time
+
+from metricas import consultas_cache
+
+
+class CacheTTL:
+    """
+    Caché en memoria (por worker) con expiración por entrada.
+
+    Thread-safe; expone contadores de aciertos/fallos para monitoreo.
+    """
+
+    def __init__(self, nombre, ttl_segundos, max_entradas=1024):
+        self.nombre = nombre
+        self.ttl = ttl_segundos
+        self.max_entradas = max_entradas
+        self._datos = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """Devuelve el valor vigente o None"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada and entrada[0] > time.monotonic():
+                self.aciertos += 1
+                consultas_cache.labels(self.nombre, "acierto").inc()
+                return entrada[1]
+            if entrada:
+                del self._datos[clave]
+            self.fallos += 1
+            consultas_cache.labels(self.nombre, "fallo").inc()
+            return None
+
+    def guardar(self, clave, valor, ttl_segundos=None):
+        with self._lock:
+            if len(self._datos) >= self.max_entradas:
+                self._purgar_vencidas()
+                if len(self._datos) >= self.max_entradas:
+                    # Descarta la entrada más próxima a vencer
+                    del self._datos[min(self._datos, key=lambda k: self._datos[k][0])]
+            self._datos[clave] = (time.monotonic() + (ttl_segundos or self.ttl), valor)
+        return valor
+
+    def obtener_o_calcular(self, clave, calcular, ttl_segundos=None):
+        valor = self.obtener(clave)
+        if valor is None:
+            valor = self.guardar(clave, calcular(), ttl_segundos)
+        return valor
+
+    def invalidar(self, prefijo=None):
+        """Borra todo, o solo las claves (tuplas) cuyo primer elemento es `prefijo`"""
+        with self._lock:
+            if prefijo is None:
+                self._datos.clear()
+                return
+            for clave in [k for k in self._datos if isinstance(k, tuple) and k and k[0] == prefijo]:
+                del self._datos[clave]
+
+    def _purgar_vencidas(self):
+        ahora = time.monotonic()
+        for clave in [k for k, (expira, _) in self._datos.items() if expira <= ahora]:
+            del self._datos[clave]
@@ -0,0 +1,2 @@
+# test_smtp.py es una prueba manual contra smtp.office365.com (conecta al importarse)
+collect_ignore = ["test_smtp.py"]
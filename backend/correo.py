@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+import time
+from pathlib import Path
+
+import msal
+import requests
+from dotenv import load_dotenv
+
+from metricas import medir_envio_correo
+
+# ======================= CARGA .ENV (carpeta "archivos") =======================
+BASE_DIR = Path(__file__).resolve().parent
+ENV_PATH = BASE_DIR / "archivos" / ".env"
+load_dotenv(dotenv_path=ENV_PATH, override=True)
+
+# ======================= CONFIG ===========================
+USUARIO_OUTLOOK = os.getenv("OUTLOOK_USER")
+CLIENT_ID = os.getenv("MS_CLIENT_ID")
+CLIENT_SECRET = os.getenv("MS_CLIENT_SECRET")
+TENANT_ID = os.getenv("MS_TENANT_ID", "250f76e7-6105-42e3-82d0-be7c460aea59")
+SCOPES = ["https://graph.microsoft.com/.default"]
+GRAPH_HOST = "https://graph.microsoft.com"
+AUTHORITY_HOST = "https://login.microsoftonline.com"
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "10"))
+# En modo sync el worker de gunicorn queda ocupado mientras espera: pocos reintentos y cortos
+GRAPH_MAX_REINTENTOS = int(os.getenv("GRAPH_MAX_REINTENTOS", "2"))
+GRAPH_ESPERA_MAXIMA = float(os.getenv("GRAPH_ESPERA_MAXIMA", "2"))
+
+# Sesión HTTP compartida por MSAL y Graph (reutiliza conexiones TLS)
+http_graph = requests.Session()
+
+# MSAL descubre el tenant por HTTP al construirse: se crea en el primer envío, no al importar
+_msal_app = None
+_msal_lock = threading.Lock()
+
+
+def obtener_msal_app():
+    global _msal_app
+    if _msal_app is None:
+        with _msal_lock:
+            if _msal_app is None:
+                _msal_app = msal.ConfidentialClientApplication(
+                    CLIENT_ID,
+                    authority=f"{AUTHORITY_HOST}/{TENANT_ID}",
+                    client_credential=CLIENT_SECRET,
+                    http_client=http_graph
+                )
+    return _msal_app
+
+
+# ======================= ENVÍO DE CORREOS ===========================
+def obtener_token_graph():
+    result = obtener_msal_app().acquire_token_for_client(scopes=SCOPES)
+    if "access_token" in result:
+        return result["access_token"]
+    else:
+        raise Exception(f"Error obteniendo token: {result.get('error_description', result)}")
+
+
+def _espera_reintento(resp, intento):
+    """Segundos a esperar antes de reintentar: Retry-After si Graph lo indica, si no backoff exponencial"""
+    retry_after = resp.headers.get("Retry-After")
+    try:
+        espera = float(retry_after) if retry_after else 0.5 * (2 ** intento)
+    except ValueError:
+        espera = 0.5 * (2 ** intento)
+    return min(espera, GRAPH_ESPERA_MAXIMA)
+
+
+def _solicitud_send_mail(access_token, destinatarios, asunto, cuerpo):
+    """Devuelve (endpoint, headers, payload) de la llamada sendMail"""
+    graph_endpoint = f"{GRAPH_HOST}/v1.0/users/{USUARIO_OUTLOOK}/sendMail"
+    to_recipients = [{"emailAddress": {"address": email}} for email in destinatarios]
+    payload = {
+        "message": {
+            "subject": asunto,
+            "body": {"contentType": "HTML", "content": cuerpo},
+            "toRecipients": to_recipients
+        },
+        "saveToSentItems": "true"
+    }
+    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+    return graph_endpoint, headers, payload
+
+
+def enviar_correo_graph(destinatarios, asunto, cuerpo):
+    """
+    Envía un correo vía Microsoft Graph.
+
+    Reintenta ante throttling (429) o indisponibilidad (503/504) hasta GRAPH_MAX_REINTENTOS veces,
+    esperando como mucho GRAPH_ESPERA_MAXIMA segundos entre intentos.
+
+    Returns:
+        int: número de reintentos realizados
+    """
+    with medir_envio_correo() as medicion:
+        access_token = obtener_token_graph()
+        graph_endpoint, headers, payload = _solicitud_send_mail(access_token, destinatarios, asunto, cuerpo)
+
+        intento = 0
+        while True:
+            resp = http_graph.post(graph_endpoint, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
+            medicion["reintentos"] = intento
+            if resp.status_code == 202:
+                return intento
+            if resp.status_code in (429, 503, 504) and intento < GRAPH_MAX_REINTENTOS:
+                time.sleep(_espera_reintento(resp, intento))
+                intento += 1
+                continue
+            raise Exception(f"Error enviando correo: {resp.status_code} - {resp.text}")
+
+
+async def enviar_correo_graph_async(cliente, access_token, destinatarios, asunto, cuerpo):
+    """
+    Variante asíncrona de enviar_correo_graph para el modo ASGI.
+
+    Args:
+        cliente: httpx.AsyncClient compartido
+        access_token: token de Graph (obtener_token_graph es bloqueante; resolverlo en un hilo)
+
+    Returns:
+        int: número de reintentos realizados
+    """
+    graph_endpoint, headers, payload = _solicitud_send_mail(access_token, destinatarios, asunto, cuerpo)
+
+    with medir_envio_correo() as medicion:
+        intento = 0
+        while True:
+            resp = await cliente.post(graph_endpoint, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
+            medicion["reintentos"] = intento
+            if resp.status_code == 202:
+                return intento
+            if resp.status_code in (429, 503, 504) and intento < GRAPH_MAX_REINTENTOS:
+                await asyncio.sleep(_espera_reintento(resp, intento))
+                intento += 1
+                continue
+            raise Exception(f"Error enviando correo: {resp.status_code} - {resp.text}")
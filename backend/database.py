@@ -1,30 +1,173 @@
+import json
 import os
+import time
 import pyodbc
+from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
 
+from almacenamiento import obtener_almacen
+from cache import CacheTTL
+from metricas import conexiones_bd, duracion_conexion_bd, lecturas_bd
+from perfil_sql import ConexionInstrumentada
+from replicas import ahora_ms, monitor_replicas
+from vuelos import marcar_cambio
+
 # ======================= CARGA .ENV (carpeta "archivos") =======================
 BASE_DIR = Path(__file__).resolve().parent
 ENV_PATH = BASE_DIR / "archivos" / ".env"
 load_dotenv(dotenv_path=ENV_PATH, override=True)
 
+CATALOGO_TTL = int(os.getenv("CATALOGO_TTL", "300"))
+USUARIOS_TOTAL_TTL = int(os.getenv("USUARIOS_TOTAL_TTL", "60"))
+IMPORTACION_LOTE = int(os.getenv("IMPORTACION_LOTE", "500"))
+
+# Datos por facultad repartidos en varias bases: {"nombre": {"servidor", "puerto", "base",
+# "usuario", "clave", "driver", "idBase", "replicas"}}; lo que falte se toma de DB_*. Vacío = una sola base.
+# DB_REPLICAS: réplicas de lectura de la base principal (ver replicas.py)
+PARTICION_PRINCIPAL = "principal"
+PARTICIONES = {
+    PARTICION_PRINCIPAL: {"idBase": 0, "replicas": json.loads(os.getenv("DB_REPLICAS") or "[]")},
+    **json.loads(os.getenv("DB_PARTICIONES") or "{}")
+}
+PARTICION_TTL = int(os.getenv("PARTICION_TTL", "30"))
+
+# Catálogos (roles, facultades, carreras) y totales de /usuarios por combinación de filtros
+cache_catalogos = CacheTTL("catalogos", CATALOGO_TTL)
+cache_totales_usuarios = CacheTTL("totales_usuarios", USUARIOS_TOTAL_TTL)
+# FacultadCod -> partición
+cache_particiones = CacheTTL("particiones", PARTICION_TTL)
+# Último cambio de catálogos/usuarios hecho en este worker (ms): sus cachés se rellenan desde réplicas al día
+_cambio_catalogos_ms = 0
+_cambio_usuarios_ms = 0
+
+
+def conectar(particion=None, lectura=False, desde_ms=0):
+    """
+    Conexión a la base principal o a una partición de datos por facultad (ver particion_de_facultad).
+    Los catálogos, usuarios y configuración viven siempre en la principal.
 
-def conectar():
-    server = os.getenv("DB_SERVER")
-    port = os.getenv("DB_PORT")
+    Args:
+        lectura: solo consultas; se usa una réplica que ya tenga las escrituras del usuario
+                 (y las posteriores a `desde_ms`) o, si ninguna está al día, la primaria
+    """
+    nombre = particion or PARTICION_PRINCIPAL
+    config = PARTICIONES.get(nombre)
+    if config is None:
+        raise ValueError(f"Partición desconocida: {particion}")
+    if lectura and config.get("replicas"):
+        indice = monitor_replicas.elegir(nombre, desde_ms)
+        if indice is not None:
+            try:
+                conn = conectar_replica(nombre, indice)
+                lecturas_bd.labels("replica").inc()
+                return conn
+            except Exception as e:
+                monitor_replicas.descartar(nombre, indice, e)
+        lecturas_bd.labels("primaria").inc()
+    return _conectar_config(config)
+
+
+def conectar_replica(particion, indice):
+    config = PARTICIONES[particion]
+    return _conectar_config({**config, **config["replicas"][indice]}, solo_lectura=True)
+
+
+def _conectar_config(config, solo_lectura=False):
+    inicio = time.perf_counter()
+    try:
+        conn = _abrir_conexion(config, solo_lectura)
+    except Exception:
+        conexiones_bd.labels("error").inc()
+        raise
+    duracion_conexion_bd.observe(time.perf_counter() - inicio)
+    conexiones_bd.labels("ok").inc()
+    return ConexionInstrumentada(conn)
+
+
+def _abrir_conexion(config=None, solo_lectura=False):
+    config = config or {}
+    server = config.get("servidor") or os.getenv("DB_SERVER")
+    port = config.get("puerto", os.getenv("DB_PORT"))
     if port:
         server = f"{server},{port}"
 
     return pyodbc.connect(
-        'DRIVER={' + os.getenv("DB_DRIVER") + '};'
-                                              'SERVER=' + server + ';'
-                                                                   'DATABASE=' + os.getenv("DB_NAME") + ';'
-                                                                                                        'UID=' + os.getenv(
-            "DB_USER") + ';'
-                         'PWD=' + os.getenv("DB_PASSWORD") + ';'
+        'DRIVER={' + (config.get("driver") or os.getenv("DB_DRIVER")) + '};'
+        'SERVER=' + server + ';'
+        'DATABASE=' + (config.get("base") or os.getenv("DB_NAME")) + ';'
+        'UID=' + (config.get("usuario") or os.getenv("DB_USER")) + ';'
+        'PWD=' + (config.get("clave") or os.getenv("DB_PASSWORD")) + ';'
+        # Secundarias legibles de un Availability Group solo aceptan conexiones de lectura
+        + ('ApplicationIntent=ReadOnly;' if solo_lectura else '')
     )
 
 
+# ======================= PARTICIONES POR FACULTAD =======================
+class FacultadEnMovimiento(Exception):
+    """La facultad se está moviendo de partición; sus archivos no admiten escrituras"""
+
+
+def particionado():
+    return len(PARTICIONES) > 1
+
+
+def _consultar_particion(facultad_cod):
+    """
+    Returns:
+        tuple: (partición, estado) según ParticionFacultad; sin fila, la principal
+    """
+    conn = conectar()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT Particion, Estado FROM ParticionFacultad WHERE FacultadCod = ?", (facultad_cod,))
+        row = cur.fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return PARTICION_PRINCIPAL, 'activa'
+    if row[0] not in PARTICIONES:
+        raise ValueError(f"La facultad {facultad_cod} está asignada a la partición '{row[0]}', que no está configurada")
+    return row[0], row[1]
+
+
+def particion_de_facultad(facultad_cod):
+    """Partición donde viven los archivos, versiones y filas ingeridas de la facultad"""
+    if not particionado() or not facultad_cod:
+        return PARTICION_PRINCIPAL
+    return cache_particiones.obtener_o_calcular((facultad_cod,), lambda: _consultar_particion(facultad_cod)[0])
+
+
+def particion_de_archivo(archivo_id):
+    """
+    Partición de un archivo por su Id: cada partición numera sus archivos desde su
+    idBase (ver particiones.preparar_particion), así no hace falta consultar un directorio.
+    """
+    if not particionado():
+        return PARTICION_PRINCIPAL
+    return max((c.get("idBase", 0), nombre) for nombre, c in PARTICIONES.items()
+               if c.get("idBase", 0) < archivo_id)[1]
+
+
+def conectar_facultad(facultad_cod, lectura=False):
+    return conectar(particion_de_facultad(facultad_cod), lectura)
+
+
+def conectar_archivo(archivo_id, lectura=False):
+    return conectar(particion_de_archivo(archivo_id), lectura)
+
+
+def invalidar_particiones():
+    """Descarta la asignación facultad -> partición en caché (los demás workers esperan PARTICION_TTL)"""
+    cache_particiones.invalidar()
+
+
+def verificar_escritura_facultad(facultad_cod):
+    """Sin caché: un movimiento en curso debe bloquear las subidas de inmediato en todos los workers"""
+    if particionado() and _consultar_particion(facultad_cod)[1] == 'moviendo':
+        raise FacultadEnMovimiento(f"La facultad {facultad_cod} se está moviendo de partición; intenta en unos minutos")
+
+
 def conectar_master():
     """Conecta a la base de datos master para operaciones administrativas"""
     server = os.getenv("DB_SERVER")
@@ -239,7 +382,8 @@ def inicializar_base_datos():
     Función principal de inicialización
     """
     try:
-        return crear_base_datos()
+        from migraciones import aplicar_migraciones
+        return crear_base_datos() and aplicar_migraciones()
     except Exception as e:
         print(f"💥 Error crítico en inicialización: {e}")
         return False
@@ -257,70 +401,184 @@ def _row_to_user_dict(row):
         "facultadCod": row[5],
         "facultadNombre": row[6] if row[6] else None,
         "carreraCod": row[7] if row[7] else None,
-        "carreraNombre": row[8] if row[8] else None
+        "carreraNombre": row[8] if row[8] else None,
+        "versionSesion": int(row[9]) if len(row) > 9 else 0
     }
 
 
 # ======================= ARCHIVOS CON FILTRO POR FACULTAD =======================
-def guardar_archivo_excel(archivo, facultad_cod):
-    """Guarda archivo Excel asociado a una facultad específica"""
-    nombre = archivo.filename
-    tipo = archivo.mimetype
-    contenido = archivo.read()
+def guardar_archivo_excel(archivo, facultad_cod, subido_por=None):
+    """
+    Guarda archivo Excel asociado a una facultad específica (contenido en el almacén de blobs).
 
-    conn = conectar()
+    Si el contenido es idéntico al ya guardado con ese nombre no se modifica la fila
+    (FechaSubida no cambia, así los clientes no vuelven a descargarlo). Cada cambio
+    de contenido agrega una versión en VersionesArchivoExcel.
+
+    Returns:
+        dict: {id, version, hash, tamano, sinCambios}
+    """
+    verificar_escritura_facultad(facultad_cod)
+    # Se copia por bloques al almacén calculando el SHA-256; el mismo contenido
+    # (aunque sea de otra facultad) reutiliza el blob existente
+    hash_hex, tamano = obtener_almacen().guardar(archivo.stream)
+
+    conn = conectar_facultad(facultad_cod)
     try:
         cur = conn.cursor()
-        # Verificar si ya existe el archivo por nombre Y facultad
-        cur.execute("""
-            SELECT Id FROM ArchivosExcel 
-            WHERE NombreArchivo = ? AND FacultadCod = ?
-        """, (nombre, facultad_cod))
-        existe = cur.fetchone()
+        resultado = _registrar_archivo_excel(cur, archivo.filename, archivo.mimetype, hash_hex, tamano,
+                                             facultad_cod, subido_por)
+        conn.commit()
+        if not resultado['sinCambios']:
+            marcar_cambio(facultad_cod)
+        return resultado
+    finally:
+        cur.close()
+        conn.close()
 
-        if existe:
-            cur.execute("""
-                UPDATE ArchivosExcel
-                SET TipoMime = ?, Datos = ?, FechaSubida = GETDATE()
-                WHERE NombreArchivo = ? AND FacultadCod = ?
-            """, (tipo, contenido, nombre, facultad_cod))
-        else:
-            cur.execute("""
-                INSERT INTO ArchivosExcel (NombreArchivo, TipoMime, Datos, FacultadCod)
-                VALUES (?, ?, ?, ?)
-            """, (nombre, tipo, contenido, facultad_cod))
 
+def guardar_archivos_excel(archivos, facultad_cod, subido_por=None):
+    """
+    Guarda varios archivos de una facultad en una sola transacción: o quedan todos o ninguno.
+
+    Args:
+        archivos: lista de (nombre, tipo_mime, hash_hex, tamano) ya guardados en el almacén
+                  (si la transacción falla, sus blobs los elimina purgar_blobs_huerfanos)
+
+    Returns:
+        list: un dict por archivo como el de guardar_archivo_excel, más 'nombre'
+    """
+    verificar_escritura_facultad(facultad_cod)
+    conn = conectar_facultad(facultad_cod)
+    try:
+        cur = conn.cursor()
+        resultados = []
+        # Orden fijo por nombre: dos lotes concurrentes toman los locks de fila en el mismo orden
+        for nombre, tipo, hash_hex, tamano in sorted(archivos):
+            resultado = _registrar_archivo_excel(cur, nombre, tipo, hash_hex, tamano, facultad_cod, subido_por)
+            resultados.append({'nombre': nombre, **resultado})
         conn.commit()
+        marcar_cambio(facultad_cod)
+        return resultados
+    except Exception:
+        conn.rollback()
+        raise
     finally:
-        cur.close()
         conn.close()
 
 
+def _registrar_archivo_excel(cur, nombre, tipo, hash_hex, tamano, facultad_cod, subido_por):
+    """Crea o actualiza la fila de un contenido ya guardado en el almacén (sin commit)"""
+    # Verificar si ya existe el archivo por nombre Y facultad; las filas sin migrar se comparan con HASHBYTES
+    cur.execute("""
+        SELECT Id, HashContenido, TipoMime,
+               CASE WHEN HashContenido IS NULL
+                    THEN LOWER(CONVERT(CHAR(64), HASHBYTES('SHA2_256', Datos), 2)) END,
+               VersionActual
+        FROM ArchivosExcel 
+        WHERE NombreArchivo = ? AND FacultadCod = ?
+    """, (nombre, facultad_cod))
+    existe = cur.fetchone()
+
+    if existe and (existe[1] or existe[3] or '').strip() == hash_hex:
+        archivo_id = existe[0]
+        if existe[1] is None:
+            # Fila sin migrar con el mismo contenido: pasa al almacén sin tocar FechaSubida
+            cur.execute("UPDATE ArchivosExcel SET Datos = NULL, HashContenido = ?, Tamano = ? WHERE Id = ?",
+                        (hash_hex, tamano, archivo_id))
+            registrar_version_archivo(cur, archivo_id, existe[4], hash_hex, tamano, tipo, subido_por,
+                                      conservar_fecha=True)
+        if existe[2] != tipo:
+            cur.execute("UPDATE ArchivosExcel SET TipoMime = ? WHERE Id = ?", (tipo, archivo_id))
+        print(f"ℹ️ {nombre} ({facultad_cod}) sin cambios: se omite la escritura")
+        return {'id': archivo_id, 'version': existe[4], 'hash': hash_hex, 'tamano': tamano, 'sinCambios': True}
+
+    if existe:
+        archivo_id = existe[0]
+        if existe[1] is None:
+            # Fila sin migrar: su contenido pasa al almacén como versión previa antes de reemplazarlo
+            cur.execute("SELECT Datos, TipoMime FROM ArchivosExcel WHERE Id = ?", (archivo_id,))
+            datos, tipo_previo = cur.fetchone()
+            if datos is not None:
+                hash_previo, tamano_previo = obtener_almacen().guardar(datos)
+                registrar_version_archivo(cur, archivo_id, existe[4], hash_previo, tamano_previo,
+                                          tipo_previo, None, conservar_fecha=True)
+        cur.execute("""
+            UPDATE ArchivosExcel
+            SET TipoMime = ?, Datos = NULL, HashContenido = ?, Tamano = ?, FechaSubida = GETDATE(),
+                VersionActual = VersionActual + 1
+            OUTPUT INSERTED.VersionActual
+            WHERE Id = ?
+        """, (tipo, hash_hex, tamano, archivo_id))
+        version = cur.fetchone()[0]
+    else:
+        cur.execute("""
+            INSERT INTO ArchivosExcel (NombreArchivo, TipoMime, HashContenido, Tamano, FacultadCod)
+            OUTPUT INSERTED.Id
+            VALUES (?, ?, ?, ?, ?)
+        """, (nombre, tipo, hash_hex, tamano, facultad_cod))
+        archivo_id = cur.fetchone()[0]
+        version = 1
+    registrar_version_archivo(cur, archivo_id, version, hash_hex, tamano, tipo, subido_por)
+
+    return {'id': archivo_id, 'version': version, 'hash': hash_hex, 'tamano': tamano, 'sinCambios': False}
+
+
+def registrar_version_archivo(cur, archivo_id, version, hash_hex, tamano, tipo, subido_por, conservar_fecha=False):
+    """Agrega la versión al historial; conservar_fecha usa la FechaSubida actual de la fila"""
+    cur.execute("""
+        INSERT INTO VersionesArchivoExcel (ArchivoId, Version, HashContenido, Tamano, TipoMime, FechaSubida, SubidoPor)
+        SELECT ?, ?, ?, ?, ?, CASE WHEN ? = 1 THEN COALESCE(a.FechaSubida, GETDATE()) ELSE GETDATE() END, ?
+        FROM ArchivosExcel a
+        WHERE a.Id = ?
+          AND NOT EXISTS (SELECT 1 FROM VersionesArchivoExcel v WHERE v.ArchivoId = ? AND v.Version = ?)
+    """, (archivo_id, version, hash_hex, tamano, tipo, 1 if conservar_fecha else 0, subido_por,
+          archivo_id, archivo_id, version))
+
+
+def leer_contenido_archivo(hash_contenido, datos):
+    """Bytes de un archivo: del almacén si tiene hash, si no de la columna Datos (filas sin migrar)"""
+    if hash_contenido:
+        with obtener_almacen().abrir(hash_contenido.strip()) as f:
+            return f.read()
+    return datos
+
+
 def listar_archivos_por_facultad(facultad_cod=None):
     """Lista archivos filtrados por código de facultad con logging detallado"""
     try:
-        conn = conectar()
-        cursor = conn.cursor()
-
+        rows = []
         if facultad_cod:
             print(f"🔍 Listando archivos para facultad: {facultad_cod}")
-            cursor.execute("""
-                SELECT Id, NombreArchivo, FechaSubida, FacultadCod, TipoMime
-                FROM ArchivosExcel 
-                WHERE FacultadCod = ?
-                ORDER BY FechaSubida DESC
-            """, (facultad_cod,))
+            conn = conectar_facultad(facultad_cod, lectura=True)
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT Id, NombreArchivo, FechaSubida, FacultadCod, TipoMime
+                    FROM ArchivosExcel 
+                    WHERE FacultadCod = ?
+                    ORDER BY FechaSubida DESC
+                """, (facultad_cod,))
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
         else:
             print("🔍 Listando TODOS los archivos (sin filtro de facultad)")
-            cursor.execute("""
-                SELECT Id, NombreArchivo, FechaSubida, FacultadCod, TipoMime
-                FROM ArchivosExcel 
-                ORDER BY FechaSubida DESC
-            """)
-
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
+            # Sin facultad se recorren todas las particiones y se une el resultado
+            for particion in PARTICIONES:
+                conn = conectar(particion, lectura=True)
+                try:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT Id, NombreArchivo, FechaSubida, FacultadCod, TipoMime
+                        FROM ArchivosExcel 
+                    """)
+                    # Durante un movimiento la facultad está en dos particiones: vale la asignada
+                    rows.extend(row for row in cursor.fetchall()
+                                if particion_de_facultad(row[3].strip()) == particion)
+                finally:
+                    conn.close()
+            rows.sort(key=lambda row: row[2] or datetime.min, reverse=True)
 
         archivos = []
         for row in rows:
@@ -353,7 +611,7 @@ def verificar_permisos_archivo(archivo_id, usuario_facultad_cod, es_admin=False)
     if es_admin:
         return True
 
-    conn = conectar()
+    conn = conectar_archivo(archivo_id, lectura=True)
     try:
         cur = conn.cursor()
         cur.execute("SELECT FacultadCod FROM ArchivosExcel WHERE Id = ?", (archivo_id,))
@@ -372,16 +630,18 @@ def verificar_permisos_archivo(archivo_id, usuario_facultad_cod, es_admin=False)
 
 def obtener_archivo_por_facultad(archivo_id, facultad_cod):
     """Obtiene un archivo específico validando que pertenezca a la facultad"""
-    conn = conectar()
+    conn = conectar_archivo(archivo_id, lectura=True)
     try:
         cur = conn.cursor()
         cur.execute("""
-            SELECT NombreArchivo, TipoMime, Datos 
+            SELECT NombreArchivo, TipoMime, Datos, HashContenido
             FROM ArchivosExcel 
             WHERE Id = ? AND FacultadCod = ?
         """, (archivo_id, facultad_cod))
         row = cur.fetchone()
-        return row if row else None
+        if not row:
+            return None
+        return row[0], row[1], leer_contenido_archivo(row[3], row[2])
     finally:
         cur.close()
         conn.close()
@@ -390,7 +650,7 @@ def obtener_archivo_por_facultad(archivo_id, facultad_cod):
 # ======================= PLANTILLAS CON TIPO =======================
 def obtener_plantillas_por_tipo(tipo='seguimiento'):
     """Obtiene plantillas de correo por tipo"""
-    conn = conectar()
+    conn = conectar(lectura=True)
     try:
         cur = conn.cursor()
         cur.execute("""
@@ -437,6 +697,29 @@ def guardar_plantillas_por_tipo(data, tipo='seguimiento'):
         conn.close()
 
 
+# ======================= BÚSQUEDA POR TRIGRAMAS =======================
+def _trigramas(texto):
+    texto = (texto or "").lower()
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def reindexar_trigramas_usuario(cur, user_id, usuario):
+    """Regenera los trigramas de búsqueda de un usuario (dentro de la transacción del llamador)"""
+    cur.execute("DELETE FROM UsuariosTrigrama WHERE UsuarioId = ?", (user_id,))
+    trigramas = _trigramas(usuario)
+    if trigramas:
+        cur.fast_executemany = True
+        cur.executemany("INSERT INTO UsuariosTrigrama (Trigrama, UsuarioId) VALUES (?, ?)",
+                        [(t, user_id) for t in trigramas])
+
+
+def invalidar_totales_usuarios():
+    global _cambio_usuarios_ms
+    cache_totales_usuarios.invalidar()
+    # El total se vuelve a contar en una réplica que ya tenga el cambio
+    _cambio_usuarios_ms = ahora_ms()
+
+
 # ======================= USUARIOS CON NUEVO MODELO =======================
 def obtener_usuario_por_usuario(usuario: str):
     """Obtiene usuario completo con información de rol, facultad y carrera"""
@@ -446,7 +729,7 @@ def obtener_usuario_por_usuario(usuario: str):
         cur.execute("""
             SELECT u.Id, u.Usuario, u.Estado, u.RolId, r.Nombre as RolNombre,
                    u.FacultadCod, f.Nombre as FacultadNombre,
-                   u.CarreraCod, c.Nombre as CarreraNombre
+                   u.CarreraCod, c.Nombre as CarreraNombre, u.VersionSesion
             FROM Usuarios u
             INNER JOIN Rol r ON u.RolId = r.RolId
             INNER JOIN Facultad f ON u.FacultadCod = f.FacultadCod
@@ -460,6 +743,40 @@ def obtener_usuario_por_usuario(usuario: str):
         conn.close()
 
 
+def obtener_usuario_por_id(user_id: int):
+    """Obtiene usuario completo por Id (usado al renovar sesiones)"""
+    conn = conectar()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT u.Id, u.Usuario, u.Estado, u.RolId, r.Nombre as RolNombre,
+                   u.FacultadCod, f.Nombre as FacultadNombre,
+                   u.CarreraCod, c.Nombre as CarreraNombre, u.VersionSesion
+            FROM Usuarios u
+            INNER JOIN Rol r ON u.RolId = r.RolId
+            INNER JOIN Facultad f ON u.FacultadCod = f.FacultadCod
+            LEFT JOIN Carrera c ON u.CarreraCod = c.CarreraCod
+            WHERE u.Id = ?
+        """, (user_id,))
+        row = cur.fetchone()
+        return _row_to_user_dict(row) if row else None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def obtener_versiones_sesion():
+    """Devuelve {Id: VersionSesion} de los usuarios cuyas sesiones fueron revocadas alguna vez"""
+    conn = conectar()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT Id, VersionSesion FROM Usuarios WHERE VersionSesion > 0")
+        return {int(row[0]): int(row[1]) for row in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+
 def crear_usuario(usuario: str, rol_id: int, facultad_cod: str, carrera_cod: str = None, activo: bool = True):
     """Crea un nuevo usuario con el modelo actualizado"""
     conn = conectar()
@@ -467,9 +784,13 @@ def crear_usuario(usuario: str, rol_id: int, facultad_cod: str, carrera_cod: str
         cur = conn.cursor()
         cur.execute("""
             INSERT INTO Usuarios (Usuario, Estado, RolId, FacultadCod, CarreraCod)
+            OUTPUT INSERTED.Id
             VALUES (?, ?, ?, ?, ?)
         """, (usuario, 1 if activo else 0, rol_id, facultad_cod, carrera_cod))
+        user_id = cur.fetchone()[0]
+        reindexar_trigramas_usuario(cur, user_id, usuario)
         conn.commit()
+        invalidar_totales_usuarios()
 
         # Devolver el usuario creado
         return obtener_usuario_por_usuario(usuario)
@@ -478,7 +799,191 @@ def crear_usuario(usuario: str, rol_id: int, facultad_cod: str, carrera_cod: str
         conn.close()
 
 
-def listar_usuarios_con_filtros(facultad_cod=None, rol_id=None, q=None, page=0, limit=20, activo=None):
+def _condicion_busqueda(q):
+    """
+    Condición SQL para la búsqueda de texto de /usuarios sin LIKE '%q%' sobre la tabla.
+
+    - Usuario: trigramas indexados (q de 3+ caracteres). Con 1-2 caracteres no hay trigramas y se
+      mantiene LIKE '%q%' (mismos resultados que antes; recorre el índice UNIQUE de Usuario)
+    - Rol / Facultad: se resuelven contra los catálogos en caché y se filtra por Id/código
+
+    Returns:
+        tuple: (sql, params)
+    """
+    texto = q.strip().lower()
+    partes = []
+    params = []
+
+    trigramas = sorted(_trigramas(texto))
+    if trigramas:
+        partes.append(f"""(u.Id IN (
+                SELECT UsuarioId FROM UsuariosTrigrama
+                WHERE Trigrama IN ({", ".join("?" * len(trigramas))})
+                GROUP BY UsuarioId HAVING COUNT(*) = ?
+            ) AND u.Usuario LIKE ?)""")
+        params.extend(trigramas)
+        params.append(len(trigramas))
+        params.append(f"%{texto}%")
+    else:
+        partes.append("u.Usuario LIKE ?")
+        params.append(f"%{texto}%")
+
+    roles = [r["id"] for r in obtener_roles() if texto in (r["nombre"] or "").lower()]
+    if roles:
+        partes.append(f"u.RolId IN ({', '.join('?' * len(roles))})")
+        params.extend(roles)
+
+    facultades = [f["codigo"] for f in obtener_facultades() if texto in (f["nombre"] or "").lower()]
+    if facultades:
+        partes.append(f"u.FacultadCod IN ({', '.join('?' * len(facultades))})")
+        params.extend(facultades)
+
+    return "(" + " OR ".join(partes) + ")", params
+
+
+def _insertar_lote_usuarios(cur, lote):
+    """INSERT masivo de un lote + sus trigramas. Devuelve {usuario_minúsculas: Id}"""
+    cur.fast_executemany = True
+    cur.executemany("""
+        INSERT INTO Usuarios (Usuario, Estado, RolId, FacultadCod, CarreraCod)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(u['usuario'], 1 if u['activo'] else 0, u['rolId'], u['facultadCod'], u['carreraCod']) for u in lote])
+
+    marcadores = ", ".join("?" * len(lote))
+    cur.execute(f"SELECT Id, Usuario FROM Usuarios WHERE Usuario IN ({marcadores})",
+                [u['usuario'] for u in lote])
+    ids = {row[1].lower(): int(row[0]) for row in cur.fetchall()}
+
+    trigramas = [(t, ids[u['usuario'].lower()]) for u in lote for t in _trigramas(u['usuario'])]
+    if trigramas:
+        cur.executemany("INSERT INTO UsuariosTrigrama (Trigrama, UsuarioId) VALUES (?, ?)", trigramas)
+    return ids
+
+
+def importar_usuarios(usuarios):
+    """
+    Crea usuarios en lotes de IMPORTACION_LOTE con fast_executemany, una transacción por lote.
+
+    Si un lote falla se reintenta fila a fila para reportar el error exacto de cada una.
+
+    Args:
+        usuarios: dicts validados {fila, usuario, rolId, facultadCod, carreraCod, activo}
+
+    Returns:
+        tuple: (creados [{fila, usuario, id}], errores [{fila, usuario, error}])
+    """
+    creados = []
+    errores = []
+
+    conn = conectar()
+    try:
+        cur = conn.cursor()
+        for inicio in range(0, len(usuarios), IMPORTACION_LOTE):
+            lote = usuarios[inicio:inicio + IMPORTACION_LOTE]
+
+            # Descartar los que ya existen (una consulta por lote)
+            marcadores = ", ".join("?" * len(lote))
+            cur.execute(f"SELECT Usuario FROM Usuarios WHERE Usuario IN ({marcadores})",
+                        [u['usuario'] for u in lote])
+            existentes = {row[0].lower() for row in cur.fetchall()}
+            for u in lote:
+                if u['usuario'].lower() in existentes:
+                    errores.append({'fila': u['fila'], 'usuario': u['usuario'], 'error': 'El usuario ya existe'})
+            lote = [u for u in lote if u['usuario'].lower() not in existentes]
+            if not lote:
+                continue
+
+            try:
+                ids = _insertar_lote_usuarios(cur, lote)
+                conn.commit()
+                creados.extend({'fila': u['fila'], 'usuario': u['usuario'], 'id': ids[u['usuario'].lower()]}
+                               for u in lote)
+            except Exception as e:
+                conn.rollback()
+                print(f"⚠️ Lote de importación falló ({e}); reintentando fila a fila")
+                for u in lote:
+                    try:
+                        ids = _insertar_lote_usuarios(cur, [u])
+                        conn.commit()
+                        creados.append({'fila': u['fila'], 'usuario': u['usuario'], 'id': ids[u['usuario'].lower()]})
+                    except Exception as e_fila:
+                        conn.rollback()
+                        errores.append({'fila': u['fila'], 'usuario': u['usuario'], 'error': str(e_fila)})
+    finally:
+        conn.close()
+
+    if creados:
+        invalidar_totales_usuarios()
+    return creados, errores
+
+
+def _filtros_usuarios(facultad_cod=None, rol_id=None, q=None, activo=None):
+    """
+    WHERE de los listados de usuarios (alias u).
+
+    Returns:
+        tuple: (sql, params)
+    """
+    conditions = []
+    params = []
+
+    # Filtro por facultad
+    if facultad_cod:
+        conditions.append("u.FacultadCod = ?")
+        params.append(facultad_cod)
+
+    # Filtro por rol
+    if rol_id:
+        conditions.append("u.RolId = ?")
+        params.append(rol_id)
+
+    # Filtro por texto de búsqueda
+    if q and q.strip():
+        sql_busqueda, params_busqueda = _condicion_busqueda(q)
+        conditions.append(sql_busqueda)
+        params.extend(params_busqueda)
+
+    # Filtro por estado activo/inactivo
+    if activo is not None:
+        conditions.append("u.Estado = ?")
+        params.append(1 if activo else 0)
+
+    return (" AND ".join(conditions) if conditions else "1=1"), params
+
+
+def iterar_usuarios_con_filtros(facultad_cod=None, rol_id=None, q=None, activo=None, lote=1000):
+    """
+    Recorre todos los usuarios que cumplen los filtros de /usuarios, de a `lote` filas
+    (para exportaciones: la conexión queda abierta mientras se consume el generador).
+
+    Yields:
+        tuple: (Id, Usuario, Estado, RolNombre, FacultadCod, FacultadNombre, CarreraCod, CarreraNombre)
+    """
+    where, params = _filtros_usuarios(facultad_cod, rol_id, q, activo)
+    conn = conectar(lectura=True, desde_ms=_cambio_usuarios_ms)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT u.Id, u.Usuario, u.Estado, r.Nombre, u.FacultadCod, f.Nombre, u.CarreraCod, c.Nombre
+            FROM Usuarios u
+            LEFT JOIN Rol r ON u.RolId = r.RolId
+            LEFT JOIN Facultad f ON u.FacultadCod = f.FacultadCod
+            LEFT JOIN Carrera c ON u.CarreraCod = c.CarreraCod
+            WHERE {where}
+            ORDER BY u.Id DESC
+        """, params)
+        while True:
+            filas = cur.fetchmany(lote)
+            if not filas:
+                break
+            for row in filas:
+                yield tuple(row)
+    finally:
+        conn.close()
+
+
+def listar_usuarios_con_filtros(facultad_cod=None, rol_id=None, q=None, page=0, limit=20, activo=None,
+                                cursor=None, incluir_total=True):
     """
     Lista usuarios con filtros opcionales
 
@@ -486,20 +991,42 @@ def listar_usuarios_con_filtros(facultad_cod=None, rol_id=None, q=None, page=0,
         facultad_cod: Código de facultad (opcional)
         rol_id: ID del rol (opcional)
         q: Texto de búsqueda (opcional)
-        page: Página (default: 0)
+        page: Página (default: 0). Solo se usa si no hay cursor (paginación por OFFSET, compatibilidad)
         limit: Límite por página (default: 20)
         activo: Filtro de estado activo/inactivo (opcional: True, False, None)
+        cursor: Id del último usuario recibido; devuelve los siguientes (keyset sobre u.Id DESC)
+        incluir_total: Calcular el total (se guarda en caché USUARIOS_TOTAL_TTL segundos)
 
     Returns:
-        dict: {'data': [...], 'total': int, 'page': int, 'limit': int}
+        dict: {'data': [...], 'total': int|None, 'page': int, 'limit': int, 'has_more': bool, 'next_cursor': int|None}
     """
     try:
-        conn = conectar()
-        cursor = conn.cursor()
+        where, params = _filtros_usuarios(facultad_cod, rol_id, q, activo)
+
+        conn = conectar(lectura=True, desde_ms=_cambio_usuarios_ms)
+        cursor_bd = conn.cursor()
+
+        # Total: solo sobre Usuarios (los JOIN a catálogos no cambian el conteo)
+        total = None
+        if incluir_total:
+            clave_total = (facultad_cod, rol_id, (q or "").strip().lower(), activo)
 
-        # Construir consulta base
-        base_query = """
-            SELECT u.Id, u.Usuario, u.Estado, u.FacultadCod, u.CarreraCod,
+            def contar():
+                cursor_bd.execute(f"SELECT COUNT(*) FROM Usuarios u WHERE {where}", params)
+                return cursor_bd.fetchone()[0]
+
+            total = cache_totales_usuarios.obtener_o_calcular(clave_total, contar)
+
+        # Página: keyset sobre el índice clustered de Id; se pide una fila extra para has_more
+        params_pagina = list(params)
+        where_pagina = where
+        if cursor is not None:
+            where_pagina += " AND u.Id < ?"
+            params_pagina.append(int(cursor))
+
+        query = f"""
+            SELECT {f"TOP ({limit + 1})" if limit > 0 and cursor is not None else ""}
+                   u.Id, u.Usuario, u.Estado, u.FacultadCod, u.CarreraCod,
                    r.RolId, r.Nombre as RolNombre,
                    f.Nombre as FacultadNombre,
                    c.Nombre as CarreraNombre
@@ -507,51 +1034,21 @@ def listar_usuarios_con_filtros(facultad_cod=None, rol_id=None, q=None, page=0,
             LEFT JOIN Rol r ON u.RolId = r.RolId
             LEFT JOIN Facultad f ON u.FacultadCod = f.FacultadCod
             LEFT JOIN Carrera c ON u.CarreraCod = c.CarreraCod
-            WHERE 1=1
+            WHERE {where_pagina}
+            ORDER BY u.Id DESC
         """
-
-        conditions = []
-        params = []
-
-        # Filtro por facultad
-        if facultad_cod:
-            conditions.append("u.FacultadCod = ?")
-            params.append(facultad_cod)
-
-        # Filtro por rol
-        if rol_id:
-            conditions.append("u.RolId = ?")
-            params.append(rol_id)
-
-        # Filtro por texto de búsqueda
-        if q and q.strip():
-            conditions.append("(u.Usuario LIKE ? OR r.Nombre LIKE ? OR f.Nombre LIKE ?)")
-            search_term = f"%{q.strip()}%"
-            params.extend([search_term, search_term, search_term])
-
-        # Filtro por estado activo/inactivo
-        if activo is not None:
-            conditions.append("u.Estado = ?")
-            params.append(1 if activo else 0)
-
-        # Agregar condiciones a la consulta
-        if conditions:
-            base_query += " AND " + " AND ".join(conditions)
-
-        # Consulta para el total
-        count_query = f"SELECT COUNT(*) FROM ({base_query}) as filtered"
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()[0]
-
-        # Agregar ordenamiento y paginación
-        base_query += " ORDER BY u.Id DESC"
-        if limit > 0:
+        if limit > 0 and cursor is None:
             offset = page * limit
-            base_query += f" OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY"
+            query += f" OFFSET {offset} ROWS FETCH NEXT {limit + 1} ROWS ONLY"
 
-        # Ejecutar consulta principal
-        cursor.execute(base_query, params)
-        rows = cursor.fetchall()
+        cursor_bd.execute(query, params_pagina)
+        rows = cursor_bd.fetchall()
+        cursor_bd.close()
+        conn.close()
+
+        has_more = limit > 0 and len(rows) > limit
+        if has_more:
+            rows = rows[:limit]
 
         # Mapear resultados
         users = []
@@ -570,15 +1067,13 @@ def listar_usuarios_con_filtros(facultad_cod=None, rol_id=None, q=None, page=0,
             }
             users.append(user)
 
-        cursor.close()
-        conn.close()
-
         result = {
             'data': users,
             'total': total,
             'page': page,
             'limit': limit,
-            'has_more': (page + 1) * limit < total
+            'has_more': has_more,
+            'next_cursor': users[-1]['id'] if has_more else None
         }
 
         print(f"✅ listar_usuarios_con_filtros: Returned {len(users)} users (total: {total})")
@@ -590,9 +1085,32 @@ def listar_usuarios_con_filtros(facultad_cod=None, rol_id=None, q=None, page=0,
 
 
 # ======================= CATÁLOGOS =======================
+def invalidar_catalogos():
+    """Descarta roles, facultades y carreras en caché (llamar tras modificarlos)"""
+    global _cambio_catalogos_ms
+    cache_catalogos.invalidar()
+    # Lo que se vuelva a cachear debe venir de una réplica que ya tenga el cambio
+    _cambio_catalogos_ms = ahora_ms()
+
+
 def obtener_roles():
     """Obtiene lista de roles disponibles"""
-    conn = conectar()
+    return cache_catalogos.obtener_o_calcular(("roles",), _consultar_roles)
+
+
+def obtener_facultades():
+    """Obtiene lista de facultades disponibles"""
+    return cache_catalogos.obtener_o_calcular(("facultades",), _consultar_facultades)
+
+
+def obtener_carreras_por_facultad(facultad_cod):
+    """Obtiene carreras de una facultad específica"""
+    return cache_catalogos.obtener_o_calcular(("carreras", facultad_cod),
+                                              lambda: _consultar_carreras_por_facultad(facultad_cod))
+
+
+def _consultar_roles():
+    conn = conectar(lectura=True, desde_ms=_cambio_catalogos_ms)
     try:
         cur = conn.cursor()
         cur.execute("SELECT RolId, Nombre FROM Rol ORDER BY Nombre")
@@ -603,9 +1121,8 @@ def obtener_roles():
         conn.close()
 
 
-def obtener_facultades():
-    """Obtiene lista de facultades disponibles"""
-    conn = conectar()
+def _consultar_facultades():
+    conn = conectar(lectura=True, desde_ms=_cambio_catalogos_ms)
     try:
         cur = conn.cursor()
         cur.execute("SELECT FacultadCod, Nombre FROM Facultad ORDER BY Nombre")
@@ -616,9 +1133,8 @@ def obtener_facultades():
         conn.close()
 
 
-def obtener_carreras_por_facultad(facultad_cod):
-    """Obtiene carreras de una facultad específica"""
-    conn = conectar()
+def _consultar_carreras_por_facultad(facultad_cod):
+    conn = conectar(lectura=True, desde_ms=_cambio_catalogos_ms)
     try:
         cur = conn.cursor()
         cur.execute("""
@@ -637,7 +1153,7 @@ def obtener_carreras_por_facultad(facultad_cod):
 # ======================= AUTORIDAD CORREO =======================
 def obtener_correo_autoridad():
     """Obtiene el correo de autoridad configurado"""
-    conn = conectar()
+    conn = conectar(lectura=True)
     try:
         cur = conn.cursor()
         cur.execute("SELECT TOP 1 DecanoCorreo FROM AutoridadCorreo ORDER BY Id DESC")
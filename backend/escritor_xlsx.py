@@ -0,0 +1,180 @@
+"""
+Generadores de exportación por streaming: xlsx de solo escritura y CSV.
+
+Ambos reciben un iterable de filas y devuelven un generador de bloques de
+bytes que se envían tal cual en una respuesta chunked; en memoria solo vive
+el bloque en curso. El xlsx usa cadenas en línea (sin tabla de cadenas
+compartidas, que obligaría a retener todos los textos) y se comprime con un
+zip sin seek (descriptores de datos), así no hace falta un archivo temporal.
+"""
+import csv
+import io
+import math
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+# ======================= CONFIG ===========================
+FILAS_POR_BLOQUE = 500
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MAX_TEXTO_CELDA = 32767
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+# Caracteres de control que XML 1.0 no admite
+_CONTROL_INVALIDO = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# Inicio de celda que Excel/LibreOffice interpretan como fórmula al abrir un CSV
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# Estilos: 0 normal, 1 encabezado en negrita, 2 fecha y hora
+_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="3">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+</styleSheet>"""
+
+_INICIO_HOJA = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>
+<sheetData>"""
+
+_FIN_HOJA = "</sheetData></worksheet>"
+
+
+class _Salida:
+    """Destino del zip sin seek: acumula lo escrito hasta que el generador lo entrega"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _celda(valor, estilo=0):
+    if valor is None or valor == "":
+        return "<c/>"
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float)):
+        return f"<c><v>{valor}</v></c>"
+    if isinstance(valor, date):
+        if not isinstance(valor, datetime):
+            valor = datetime(valor.year, valor.month, valor.day)
+        serial = (valor.replace(tzinfo=None) - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c s="2"><v>{serial}</v></c>'
+    texto = _CONTROL_INVALIDO.sub("", str(valor))[:MAX_TEXTO_CELDA]
+    estilo_attr = f' s="{estilo}"' if estilo else ""
+    return f'<c t="inlineStr"{estilo_attr}><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _fila(numero, valores, estilo=0):
+    return f'<row r="{numero}">' + "".join(_celda(v, estilo) for v in valores) + "</row>"
+
+
+def generar_xlsx(encabezados, filas, hoja="Datos"):
+    """
+    Genera un xlsx por bloques.
+
+    Args:
+        encabezados: nombres de columna (primera fila, en negrita y fija)
+        filas: iterable de secuencias de valores (str, int, float, bool, date/datetime o None)
+    """
+    salida = _Salida()
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(hoja=escape(hoja[:31], {'"': "&quot;"})))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _STYLES)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as hoja_xml:
+            hoja_xml.write((_INICIO_HOJA + _fila(1, encabezados, estilo=1)).encode("utf-8"))
+            bloque = []
+            for numero, valores in enumerate(filas, start=2):
+                bloque.append(_fila(numero, valores))
+                if len(bloque) >= FILAS_POR_BLOQUE:
+                    hoja_xml.write("".join(bloque).encode("utf-8"))
+                    bloque = []
+                    datos = salida.vaciar()
+                    if datos:
+                        yield datos
+            hoja_xml.write(("".join(bloque) + _FIN_HOJA).encode("utf-8"))
+    yield salida.vaciar()
+
+
+def _celda_csv(valor):
+    """
+    Los textos que empiezan como fórmula se anteponen con ' (inyección de fórmulas en CSV);
+    los números escritos como texto ("-3.5", "+1", "-2,5") se dejan como están.
+    """
+    if valor is None:
+        return ""
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        try:
+            numero = math.isfinite(float(valor.replace(",", ".", 1)))
+        except ValueError:
+            numero = False
+        if not numero:
+            return "'" + valor
+    return valor
+
+
+def generar_csv(encabezados, filas, separador=","):
+    """Genera un CSV UTF-8 (con BOM, para que Excel respete los acentos) por bloques"""
+    texto = io.StringIO()
+    escritor = csv.writer(texto, delimiter=separador)
+    texto.write("\ufeff")
+    escritor.writerow([_celda_csv(v) for v in encabezados])
+    for numero, valores in enumerate(filas, start=1):
+        escritor.writerow([_celda_csv(v) for v in valores])
+        if numero % FILAS_POR_BLOQUE == 0:
+            yield texto.getvalue().encode("utf-8")
+            texto.seek(0)
+            texto.truncate()
+    yield texto.getvalue().encode("utf-8")
@@ -0,0 +1,247 @@
+"""
+Exportaciones del lado del servidor (xlsx / CSV por streaming).
+
+Cada función devuelve (encabezados, generador de filas) leyendo de la base de
+a EXPORTACION_LOTE filas con fetchmany; app.py pasa el generador a
+escritor_xlsx y responde con transferencia chunked. Así el tamaño de la
+exportación no depende de lo que quepa en memoria del worker ni del navegador.
+
+- usuarios          mismo filtro que /usuarios
+- control final     misma regla que Modules/control-final.js, sobre las filas ingeridas
+- reporte           filas vigentes de un archivo ingerido, filtrables por columna
+"""
+import io
+import json
+import math
+import os
+from decimal import ROUND_HALF_UP, Decimal
+
+from almacenamiento import obtener_almacen
+from database import conectar_archivo, conectar_facultad, iterar_usuarios_con_filtros
+from lector_xlsx import LectorXlsx
+
+# ======================= CONFIG ===========================
+EXPORTACION_LOTE = int(os.getenv("EXPORTACION_LOTE", "1000"))
+FORMATOS_EXPORTACION = ("xlsx", "csv")
+
+ENCABEZADOS_USUARIOS = ["Id", "Usuario", "Activo", "Rol", "Facultad Cod", "Facultad", "Carrera Cod", "Carrera"]
+ENCABEZADOS_CONTROL_FINAL = [
+    "Identificación", "Estudiante", "Correo", "NEE", "Nivel", "Carrera",
+    "[Vez] Materia (Docente)", "Parcial Final/[Mejor/Recup]", "Promedio"
+]
+
+
+def filas_de_cursor(cur, lote=EXPORTACION_LOTE):
+    while True:
+        filas = cur.fetchmany(lote)
+        if not filas:
+            return
+        yield from filas
+
+
+# ======================= USUARIOS ===========================
+def exportar_usuarios(facultad_cod=None, rol_id=None, q=None, activo=None):
+    def filas():
+        for row in iterar_usuarios_con_filtros(facultad_cod, rol_id, q, activo, lote=EXPORTACION_LOTE):
+            yield [row[0], row[1], "Sí" if row[2] else "No", row[3], row[4], row[5], row[6], row[7]]
+
+    return ENCABEZADOS_USUARIOS, filas()
+
+
+# ======================= REPORTES INGERIDOS ===========================
+def archivos_de_tipo(cur, facultad_cod, tipo):
+    """Archivos de la facultad cuya última ingesta es de ese tipo de reporte"""
+    cur.execute("""
+        SELECT a.Id FROM ArchivosExcel a
+        INNER JOIN IngestasReporte i ON i.ArchivoId = a.Id
+        WHERE a.FacultadCod = ? AND i.TipoReporte = ?
+          AND i.Version = (SELECT MAX(Version) FROM IngestasReporte WHERE ArchivoId = a.Id)
+    """, (facultad_cod, tipo))
+    return [row[0] for row in cur.fetchall()]
+
+
+def _ruta_json(columna):
+    """Ruta de JSON_VALUE para una columna del reporte (los encabezados tienen espacios y puntos)"""
+    return '$."' + columna.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def valor_numerico(valor):
+    """Igual que asNum del frontend: admite coma decimal; vacío o no numérico -> None"""
+    if not valor:
+        return None
+    try:
+        numero = float(str(valor).replace(",", ".", 1))
+    except ValueError:
+        return None
+    return numero if math.isfinite(numero) else None
+
+
+def fijo(n, decimales):
+    """Igual que Number.toFixed del frontend: los empates exactos (5.125) suben en vez de ir al par"""
+    return str(Decimal(n).quantize(Decimal(1).scaleb(-decimales), ROUND_HALF_UP))
+
+
+def formato_numero(n):
+    if n is None:
+        return "-"
+    return str(int(n)) if n.is_integer() else str(n)
+
+
+def _mapa_nee(cur, archivos_nomina):
+    """IDENTIFICACION -> 'DISCAPACIDAD PORCENTAJE%' de las nóminas"""
+    mapa = {}
+    if not archivos_nomina:
+        return mapa
+    marcas = ",".join("?" * len(archivos_nomina))
+    cur.execute(f"""
+        SELECT JSON_VALUE(Datos, '$.IDENTIFICACION'), JSON_VALUE(Datos, '$.DISCAPACIDAD'),
+               JSON_VALUE(Datos, '$."PORCENTAJE DISCAPACIDAD"')
+        FROM FilasReporte
+        WHERE ArchivoId IN ({marcas}) AND ISNULL(JSON_VALUE(Datos, '$.DISCAPACIDAD'), '') <> ''
+    """, archivos_nomina)
+    for identificacion, discapacidad, porcentaje in filas_de_cursor(cur):
+        mapa[identificacion] = f"{discapacidad} {porcentaje}%" if porcentaje else discapacidad
+    return mapa
+
+
+def fila_control_final(datos, mapa_nee):
+    """Fila de la lista de control final o None si el registro no entra (reglas de control-final.js)"""
+    identificacion = datos.get("IDENTIFICACION") or ""
+    if not identificacion:
+        return None
+
+    if datos.get("ESTADO") != "REPROBADO":
+        p1, p2 = valor_numerico(datos.get("PRIMER_PARCIAL")), valor_numerico(datos.get("SEGUNDO_PARCIAL"))
+        a1, a2 = valor_numerico(datos.get("ASISTENCIA_PRIMER_PARCIAL")), valor_numerico(datos.get("ASISTENCIA_SEGUNDO_PARCIAL"))
+        en_riesgo = any(n is not None and n < 4 for n in (p1, p2)) or any(n is not None and n < 40 for n in (a1, a2))
+        if not en_riesgo:
+            return None
+
+    no_vez = valor_numerico(datos.get("NO. VEZ"))
+    nee = mapa_nee.get(identificacion, "")
+    if no_vez is None or no_vez < (1 if nee else 2):
+        return None
+
+    extra = valor_numerico(datos.get("RECUPERACION"))
+    if extra is None:
+        extra = valor_numerico(datos.get("MEJORAMIENTO"))
+    materia, docente = datos.get("MATERIA") or "", datos.get("DOCENTE") or ""
+    promedio = valor_numerico(datos.get("PROMEDIO"))
+    correos = [c for c in (datos.get("CORREO_INSTITUCIONAL"), datos.get("CORREO_PERSONAL")) if c]
+    return [
+        identificacion,
+        f"{datos.get('APELLIDOS') or ''} {datos.get('NOMBRES') or ''}",
+        "; ".join(correos),
+        nee,
+        datos.get("NIVEL") or "",
+        datos.get("CARRERA") or "",
+        f"[{formato_numero(no_vez)}] {materia}" + (f" ({docente})" if docente else ""),
+        f"{formato_numero(valor_numerico(datos.get('PROMEDIO_PARCIALES')))} / {formato_numero(extra)}",
+        fijo(promedio, 2) if promedio is not None else "-",
+    ]
+
+
+def exportar_control_final(facultad_cod, periodo=None, carrera=None):
+    """
+    Lista de control final de una facultad a partir de los reportes ingeridos.
+    Sin periodo se usa el más reciente; periodo y carrera se filtran en SQL.
+
+    Returns:
+        tuple: (encabezados, generador de filas)
+    """
+    def filas():
+        conn = conectar_facultad(facultad_cod, lectura=True)
+        try:
+            cur = conn.cursor()
+            calificaciones = archivos_de_tipo(cur, facultad_cod, "calificaciones")
+            if not calificaciones:
+                return
+            mapa_nee = _mapa_nee(cur, archivos_de_tipo(cur, facultad_cod, "nomina"))
+
+            marcas = ",".join("?" * len(calificaciones))
+            periodo_actual = periodo
+            if not periodo_actual:
+                cur.execute(f"""
+                    SELECT MAX(JSON_VALUE(Datos, '$.PERIODO')) FROM FilasReporte WHERE ArchivoId IN ({marcas})
+                """, calificaciones)
+                periodo_actual = cur.fetchone()[0]
+                if not periodo_actual:
+                    return
+
+            condiciones = [f"ArchivoId IN ({marcas})", "JSON_VALUE(Datos, '$.PERIODO') = ?"]
+            params = [*calificaciones, periodo_actual]
+            if carrera:
+                condiciones.append("JSON_VALUE(Datos, '$.CARRERA') = ?")
+                params.append(carrera)
+            cur.execute(f"""
+                SELECT Datos FROM FilasReporte
+                WHERE {" AND ".join(condiciones)}
+                ORDER BY JSON_VALUE(Datos, '$.APELLIDOS'), JSON_VALUE(Datos, '$.NOMBRES')
+            """, params)
+            for (datos,) in filas_de_cursor(cur):
+                fila = fila_control_final(json.loads(datos), mapa_nee)
+                if fila is not None:
+                    yield fila
+        finally:
+            conn.close()
+
+    return ENCABEZADOS_CONTROL_FINAL, filas()
+
+
+def encabezados_reporte(archivo_id):
+    """
+    Encabezados de la versión vigente de un archivo, en el orden del libro
+    (FilasReporte guarda los datos como JSON con las claves ordenadas).
+
+    Returns:
+        tuple: (nombre del archivo, encabezados) o None si no existe
+    """
+    conn = conectar_archivo(archivo_id, lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT NombreArchivo, HashContenido, CASE WHEN HashContenido IS NULL THEN Datos END
+            FROM ArchivosExcel WHERE Id = ?
+        """, (archivo_id,))
+        row = cur.fetchone()
+    finally:
+        conn.close()
+    if not row or (row[1] is None and row[2] is None):
+        return None
+    # Filas anteriores al almacén de blobs que aún no se migraron: el libro sigue en Datos
+    origen = obtener_almacen().abrir(row[1].strip()) if row[1] else io.BytesIO(row[2])
+    with origen as f, LectorXlsx(f) as lector:
+        primera = next(lector.filas(), [])
+    return row[0], [str(h).strip().upper() for h in primera if h is not None and str(h).strip()]
+
+
+def exportar_reporte(archivo_id, encabezados, filtros=None):
+    """
+    Filas vigentes (ingeridas) de un archivo.
+
+    Args:
+        encabezados: columnas a exportar (ver encabezados_reporte)
+        filtros: {columna: valor} de igualdad; solo se admiten columnas de `encabezados`
+    """
+    filtros = {c: v for c, v in (filtros or {}).items() if c in encabezados}
+
+    def filas():
+        condiciones = ["ArchivoId = ?"]
+        params = [archivo_id]
+        for columna, valor in filtros.items():
+            # La ruta va como parámetro: los encabezados vienen del libro subido
+            condiciones.append("JSON_VALUE(Datos, ?) = ?")
+            params.extend([_ruta_json(columna), valor])
+        conn = conectar_archivo(archivo_id, lectura=True)
+        try:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT Datos FROM FilasReporte WHERE {" AND ".join(condiciones)} ORDER BY ClaveHash
+            """, params)
+            for (datos,) in filas_de_cursor(cur):
+                datos = json.loads(datos)
+                yield [datos.get(h) or None for h in encabezados]
+        finally:
+            conn.close()
+
+    return encabezados, filas()
@@ -0,0 +1,54 @@
+# Configuración de gunicorn (Dockerfile: gunicorn -c gunicorn.conf.py)
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# Métricas agregadas entre workers: se fija antes de que los workers importen prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/sisa_metricas")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+
+# MODO_ASGI=1: /auth/ug y /send-email asíncronos (asgi.py) sobre workers uvicorn
+if os.getenv("MODO_ASGI", "0") == "1":
+    wsgi_app = "asgi:app"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "app:app"
+    worker_class = "sync"
+
+
+# ======================= ARRANQUE ===========================
+# La BD se crea/migra una sola vez en el maestro; los workers arrancan sin consultar SQL Server
+def on_starting(server):
+    import shutil
+    from arranque import inicializar_despliegue
+
+    # Descarta métricas de una ejecución anterior
+    directorio = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+
+    # Cupos del limitador y vuelos en curso de una ejecución anterior
+    import vuelos
+    from limites import limitador
+    limitador.reiniciar()
+    vuelos.reiniciar()
+
+    inicializar_despliegue()
+
+
+def post_fork(server, worker):
+    import time
+    worker.inicio_arranque = time.perf_counter()
+
+
+def post_worker_init(worker):
+    import time
+    from arranque import fases
+    fases.registrar("worker.cargar_app", (time.perf_counter() - worker.inicio_arranque) * 1000)
+    fases.imprimir("Worker listo")
+
+
+def child_exit(server, worker):
+    from limites import limitador
+    from metricas import marcar_worker_terminado
+    marcar_worker_terminado(worker.pid)
+    limitador.liberar_proceso(worker.pid)
@@ -0,0 +1,133 @@
+import csv
+import io
+import re
+
+from database import obtener_roles, obtener_facultades, obtener_carreras_por_facultad
+from lector_xlsx import LectorXlsx
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Encabezados aceptados (sin distinguir mayúsculas) -> campo interno
+COLUMNAS = {
+    'usuario': 'usuario', 'correo': 'usuario', 'email': 'usuario',
+    'rolid': 'rolId', 'rol': 'rol',
+    'facultadcod': 'facultadCod', 'facultad': 'facultadCod',
+    'carreracod': 'carreraCod', 'carrera': 'carreraCod',
+    'activo': 'activo', 'estado': 'activo'
+}
+VALORES_INACTIVO = {'0', 'false', 'no', 'inactivo', 'n'}
+
+
+def _normalizar_encabezado(valor):
+    return COLUMNAS.get(str(valor or '').strip().lower().replace(' ', '').replace('_', ''))
+
+
+def _filas_csv(contenido):
+    texto = contenido.decode('utf-8-sig', errors='replace')
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    yield from csv.reader(io.StringIO(texto), dialecto)
+
+
+def _filas_xlsx(origen):
+    with LectorXlsx(origen) as lector:
+        for fila in lector.filas():
+            yield ['' if v is None else v for v in fila]
+
+
+def leer_filas_archivo(archivo):
+    """
+    Lee un CSV o xlsx de usuarios. La primera fila son los encabezados.
+
+    Returns:
+        list: dicts con los campos reconocidos y 'fila' (número de fila en el archivo)
+    """
+    nombre = (archivo.filename or '').lower()
+    # El xlsx se lee por streaming desde el archivo subido, sin cargarlo completo en memoria
+    filas = _filas_xlsx(archivo.stream) if nombre.endswith(('.xlsx', '.xlsm')) else _filas_csv(archivo.read())
+
+    encabezados = None
+    registros = []
+    for numero, fila in enumerate(filas, start=1):
+        if encabezados is None:
+            encabezados = [_normalizar_encabezado(h) for h in fila]
+            if 'usuario' not in encabezados:
+                raise ValueError("El archivo debe tener una columna 'usuario' (o 'correo')")
+            continue
+        if not any(str(v).strip() for v in fila):
+            continue
+        registro = {'fila': numero}
+        for campo, valor in zip(encabezados, fila):
+            if campo:
+                registro[campo] = str(valor).strip()
+        registros.append(registro)
+    return registros
+
+
+def validar_filas(registros, facultad_por_defecto=None):
+    """
+    Valida correo, rol, facultad y carrera contra los catálogos en caché.
+
+    Returns:
+        tuple: (validas, errores) — validas listas para importar_usuarios, errores con fila y motivo
+    """
+    roles_por_id = {int(r['id']): r['nombre'] for r in obtener_roles()}
+    roles_por_nombre = {r['nombre'].strip().lower(): int(r['id']) for r in obtener_roles()}
+    facultades = {f['codigo'].strip().upper() for f in obtener_facultades()}
+
+    validas = []
+    errores = []
+    vistos = set()
+
+    for r in registros:
+        usuario = r.get('usuario', '').strip()
+        fila = r['fila']
+
+        def error(motivo):
+            errores.append({'fila': fila, 'usuario': usuario, 'error': motivo})
+
+        if not EMAIL_PATTERN.match(usuario):
+            error('El usuario debe ser un email válido')
+            continue
+        if usuario.lower() in vistos:
+            error('Usuario duplicado en el archivo')
+            continue
+
+        rol_id = None
+        if r.get('rolId'):
+            try:
+                rol_id = int(float(r['rolId']))
+            except (ValueError, OverflowError):
+                # 'abc', 'nan' o 'inf' (celdas numéricas no finitas): error de la fila
+                rol_id = None
+        elif r.get('rol'):
+            rol_id = roles_por_nombre.get(r['rol'].strip().lower())
+        if rol_id not in roles_por_id:
+            error(f"Rol inválido: {r.get('rolId') or r.get('rol') or '(vacío)'}")
+            continue
+
+        facultad_cod = (r.get('facultadCod') or facultad_por_defecto or '').strip().upper()
+        if facultad_cod not in facultades:
+            error(f"Facultad inválida: {facultad_cod or '(vacía)'}")
+            continue
+
+        carrera_cod = (r.get('carreraCod') or '').strip().upper() or None
+        if carrera_cod:
+            carreras = {c['codigo'].strip().upper() for c in obtener_carreras_por_facultad(facultad_cod)}
+            if carrera_cod not in carreras:
+                error(f"La carrera {carrera_cod} no pertenece a la facultad {facultad_cod}")
+                continue
+
+        vistos.add(usuario.lower())
+        validas.append({
+            'fila': fila,
+            'usuario': usuario,
+            'rolId': rol_id,
+            'facultadCod': facultad_cod,
+            'carreraCod': carrera_cod,
+            'activo': (r.get('activo') or '1').strip().lower() not in VALORES_INACTIVO
+        })
+
+    return validas, errores
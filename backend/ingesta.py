@@ -0,0 +1,624 @@
+"""
+Ingesta incremental de los reportes Excel (calificaciones, nómina, docentes).
+
+Cada fila se identifica por su clave natural (IDENTIFICACION, MATERIA, PERIODO,
+GRUPO/PARALELO según el tipo de reporte). Al subir una versión nueva se compara
+contra lo ya ingerido y solo se aplica el delta:
+
+- FilasReporte       filas vigentes por archivo (clave -> hash + datos JSON)
+- CambiosReporte     conjunto de cambios (I/U/D) de cada versión ingerida
+- AgregadosReporte   conteos por columna/valor (ESTADO, NIVEL, CARRERA) ajustados con el delta
+- IngestasReporte    resumen de cada ingesta
+
+Ingesta manual (desde backend/); varios archivos se analizan en paralelo:
+    python ingesta.py <archivo_id> [<archivo_id> ...]
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from almacenamiento import obtener_almacen
+from database import conectar, conectar_archivo, particion_de_archivo
+from lector_xlsx import LectorXlsx
+from vuelos import marcar_cambio
+
+# ======================= CONFIG ===========================
+INGESTA_LOTE = int(os.getenv("INGESTA_LOTE", "1000"))
+# Ingerir en segundo plano cada versión nueva subida por /upload
+INGESTA_AUTOMATICA = os.getenv("INGESTA_AUTOMATICA", "1") == "1"
+# Procesos de cada worker para analizar libros en paralelo (0 = su parte de los núcleos del host)
+INGESTA_PROCESOS = int(os.getenv("INGESTA_PROCESOS", "0"))
+# Cada worker de gunicorn tiene su propio pool: entre todos no deben pasar de los núcleos
+_WORKERS = int(os.getenv("GUNICORN_WORKERS", "4"))
+
+# (tipo de reporte, columnas de la clave natural); una tupla admite columnas alternativas
+CLAVES_NATURALES = [
+    ("calificaciones", ["IDENTIFICACION", ("COD_MATERIA", "MATERIA"), "PERIODO", "GRUPO/PARALELO"]),
+    ("nomina", ["IDENTIFICACION", "PERIODO", "COD_CARRERA"]),
+    ("docentes", ["IDENTIFICACION", "PERIODO", "CARRERA"]),
+]
+# Columnas cuyos conteos por valor se mantienen en AgregadosReporte
+COLUMNAS_AGREGADAS = ["ESTADO", "NIVEL", "CARRERA"]
+
+
+class ReporteNoSoportado(Exception):
+    """El libro no tiene las columnas de ninguna clave natural conocida"""
+
+
+class VersionNoVigente(Exception):
+    """Se pidió ingerir una versión que ya no es la vigente del archivo"""
+
+
+# ======================= LECTURA Y CLAVES ===========================
+def _normalizar(valor):
+    if valor is None:
+        return ""
+    return str(valor).strip()
+
+
+def leer_libro(origen):
+    """
+    Lee la primera hoja de un xlsx por streaming (memoria acotada, ver lector_xlsx).
+
+    Returns:
+        tuple: (encabezados, iterador de filas como listas de str)
+    """
+    lector = LectorXlsx(origen)
+    filas = lector.filas()
+    encabezados = [_normalizar(h).upper() for h in next(filas, ())]
+
+    def iterar():
+        try:
+            for fila in filas:
+                yield [_normalizar(v) for v in fila]
+        finally:
+            lector.cerrar()
+
+    return encabezados, iterar()
+
+
+def resolver_clave(encabezados):
+    """
+    Returns:
+        tuple: (tipo de reporte, índices de las columnas de la clave)
+    """
+    posiciones = {h: i for i, h in enumerate(encabezados) if h}
+    for tipo, columnas in CLAVES_NATURALES:
+        indices = []
+        for columna in columnas:
+            opciones = columna if isinstance(columna, tuple) else (columna,)
+            indice = next((posiciones[c] for c in opciones if c in posiciones), None)
+            if indice is None:
+                break
+            indices.append(indice)
+        else:
+            return tipo, indices
+    raise ReporteNoSoportado("El libro no tiene las columnas de clave de ningún reporte conocido")
+
+
+def filas_por_clave(encabezados, filas, indices_clave):
+    """
+    Returns:
+        tuple: (dict clave_hash -> (clave, hash_fila, datos), filas omitidas sin clave)
+    """
+    resultado = {}
+    omitidas = 0
+    ancho = len(encabezados)
+    for fila in filas:
+        if not any(fila):
+            continue
+        fila = (fila + [""] * ancho)[:ancho]
+        partes = [fila[i] for i in indices_clave]
+        if not partes[0]:
+            omitidas += 1
+            continue
+        clave = " | ".join(partes)[:440]
+        # Claves repetidas en el mismo libro: se numeran en orden de aparición
+        base, n = clave, 2
+        while hashlib.sha1(clave.encode()).digest() in resultado:
+            clave, n = f"{base} #{n}", n + 1
+        datos = {h: v for h, v in zip(encabezados, fila) if h}
+        canonico = json.dumps(datos, ensure_ascii=False, sort_keys=True)
+        resultado[hashlib.sha1(clave.encode()).digest()] = (
+            clave, hashlib.sha1(canonico.encode()).hexdigest(), canonico
+        )
+    return resultado, omitidas
+
+
+# ======================= DIFF Y APLICACIÓN ===========================
+def _en_lotes(items, tamano):
+    for i in range(0, len(items), tamano):
+        yield items[i:i + tamano]
+
+
+def _datos_previos(cur, archivo_id, claves_hash):
+    """Clave y datos JSON vigentes solo de las filas que cambian o se eliminan"""
+    previos = {}
+    for lote in _en_lotes(claves_hash, 500):
+        marcadores = ", ".join("?" * len(lote))
+        cur.execute(f"""
+            SELECT ClaveHash, Clave, Datos FROM FilasReporte
+            WHERE ArchivoId = ? AND ClaveHash IN ({marcadores})
+        """, [archivo_id, *lote])
+        for clave_hash, clave, datos in cur.fetchall():
+            previos[bytes(clave_hash)] = (clave, datos)
+    return previos
+
+
+def _delta_agregados(delta, datos_json, signo):
+    datos = json.loads(datos_json)
+    for columna in COLUMNAS_AGREGADAS:
+        if columna in datos:
+            k = (columna, datos[columna][:400])
+            delta[k] = delta.get(k, 0) + signo
+
+
+def _version_vigente(cur, archivo_id):
+    cur.execute("SELECT VersionActual FROM ArchivosExcel WHERE Id = ?", (archivo_id,))
+    row = cur.fetchone()
+    if not row:
+        raise ValueError(f"Archivo {archivo_id} no encontrado")
+    return row[0]
+
+
+def _version_a_ingerir(cur, archivo_id, version):
+    """
+    Solo se ingiere la versión vigente: FilasReporte refleja siempre la última subida y
+    aplicar una anterior la revertiría (para volver atrás se sube esa versión de nuevo).
+
+    Returns:
+        tuple: (version, HashContenido) de la versión vigente
+    """
+    vigente = _version_vigente(cur, archivo_id)
+    if version is not None and version != vigente:
+        raise VersionNoVigente(f"La versión {version} del archivo {archivo_id} no es la vigente ({vigente})")
+    version = vigente
+
+    cur.execute("SELECT HashContenido FROM VersionesArchivoExcel WHERE ArchivoId = ? AND Version = ?",
+                (archivo_id, version))
+    row = cur.fetchone()
+    if not row:
+        raise ValueError(f"La versión {version} del archivo {archivo_id} no existe")
+    return version, row[0].strip()
+
+
+def analizar_blob(hash_hex):
+    """
+    Parte CPU de la ingesta: lee el libro del almacén y lo indexa por clave natural.
+    No toca la BD, así puede correr en un proceso del pool (ver PlanificadorIngesta).
+
+    Returns:
+        tuple: (tipo de reporte, filas por clave, omitidas, ms de análisis)
+    """
+    inicio = time.perf_counter()
+    with obtener_almacen().abrir(hash_hex) as f:
+        encabezados, filas = leer_libro(f)
+        tipo, indices = resolver_clave(encabezados)
+        nuevas, omitidas = filas_por_clave(encabezados, filas, indices)
+    return tipo, nuevas, omitidas, int((time.perf_counter() - inicio) * 1000)
+
+
+def ingerir_version(archivo_id, version=None, analisis=None):
+    """
+    Ingiere la versión vigente del archivo aplicando solo el delta contra el estado ya
+    ingerido. Todo el delta se aplica en una transacción.
+
+    Args:
+        version: versión esperada; VersionNoVigente si ya no es la vigente (p. ej. se subió otra
+                 mientras se analizaba)
+        analisis: resultado de analizar_blob ya calculado (p. ej. en el pool); si falta se analiza aquí
+
+    Returns:
+        dict: resumen de la ingesta (ver resumen_ingesta)
+    """
+    conn = conectar_archivo(archivo_id)
+    try:
+        cur = conn.cursor()
+        version, hash_hex = _version_a_ingerir(cur, archivo_id, version)
+        # El libro se lee y se indexa antes de tomar el lock
+        tipo, nuevas, omitidas, ms_analisis = analisis or analizar_blob(hash_hex)
+        inicio = time.perf_counter()
+
+        # Una ingesta a la vez por archivo; se libera con el commit/rollback
+        cur.execute("""
+            DECLARE @r INT;
+            EXEC @r = sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Transaction',
+                                    @LockTimeout = 300000;
+            SELECT @r;
+        """, (f"sisa_ingesta_{archivo_id}",))
+        resultado_lock = cur.fetchone()[0]
+        if resultado_lock < 0:
+            # -1 timeout, -2 cancelado, -3 deadlock: sin el lock el delta podría cruzarse con otro
+            raise RuntimeError(f"No se obtuvo el lock de ingesta del archivo {archivo_id} (código {resultado_lock})")
+        # Otra subida pudo cambiar la versión vigente mientras se analizaba el libro
+        if _version_vigente(cur, archivo_id) != version:
+            raise VersionNoVigente(f"La versión {version} del archivo {archivo_id} ya no es la vigente")
+        cur.execute("SELECT 1 FROM IngestasReporte WHERE ArchivoId = ? AND Version = ?", (archivo_id, version))
+        if cur.fetchone():
+            conn.rollback()
+            return resumen_ingesta(archivo_id, version)
+
+        cur.execute("SELECT ClaveHash, HashFila FROM FilasReporte WHERE ArchivoId = ?", (archivo_id,))
+        actuales = {bytes(row[0]): row[1] for row in cur.fetchall()}
+
+        insertadas = [k for k in nuevas if k not in actuales]
+        actualizadas = [k for k in nuevas if k in actuales and actuales[k] != nuevas[k][1]]
+        eliminadas = [k for k in actuales if k not in nuevas]
+        previos = _datos_previos(cur, archivo_id, actualizadas + eliminadas)
+
+        cur.fast_executemany = True
+        for lote in _en_lotes(eliminadas, INGESTA_LOTE):
+            cur.executemany("DELETE FROM FilasReporte WHERE ArchivoId = ? AND ClaveHash = ?",
+                            [(archivo_id, k) for k in lote])
+        for lote in _en_lotes(actualizadas, INGESTA_LOTE):
+            cur.executemany("""
+                UPDATE FilasReporte SET HashFila = ?, Datos = ?, Version = ?
+                WHERE ArchivoId = ? AND ClaveHash = ?
+            """, [(nuevas[k][1], nuevas[k][2], version, archivo_id, k) for k in lote])
+        for lote in _en_lotes(insertadas, INGESTA_LOTE):
+            cur.executemany("""
+                INSERT INTO FilasReporte (ArchivoId, ClaveHash, Clave, HashFila, Datos, Version)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(archivo_id, k, nuevas[k][0], nuevas[k][1], nuevas[k][2], version) for k in lote])
+
+        # Conjunto de cambios de la versión (lo que expone /files/<id>/cambios)
+        cambios = (
+            [(archivo_id, version, 'I', nuevas[k][0], None, nuevas[k][2]) for k in insertadas] +
+            [(archivo_id, version, 'U', nuevas[k][0], previos[k][1], nuevas[k][2]) for k in actualizadas] +
+            [(archivo_id, version, 'D', previos[k][0], previos[k][1], None) for k in eliminadas]
+        )
+        for lote in _en_lotes(cambios, INGESTA_LOTE):
+            cur.executemany("""
+                INSERT INTO CambiosReporte (ArchivoId, Version, Tipo, Clave, DatosAnteriores, DatosNuevos)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, lote)
+
+        # Agregados: se ajustan con el delta en vez de recalcular todo el archivo
+        delta = {}
+        for k in insertadas:
+            _delta_agregados(delta, nuevas[k][2], +1)
+        for k in actualizadas:
+            _delta_agregados(delta, previos[k][1], -1)
+            _delta_agregados(delta, nuevas[k][2], +1)
+        for k in eliminadas:
+            _delta_agregados(delta, previos[k][1], -1)
+        delta = [(archivo_id, columna, valor, n) for (columna, valor), n in delta.items() if n]
+        if delta:
+            cur.executemany("""
+                MERGE AgregadosReporte AS t
+                USING (SELECT ? AS ArchivoId, ? AS Columna, ? AS Valor, ? AS Delta) AS s
+                ON t.ArchivoId = s.ArchivoId AND t.Columna = s.Columna
+                   AND t.ValorHash = CAST(HASHBYTES('SHA1', s.Valor) AS BINARY(20))
+                WHEN MATCHED THEN UPDATE SET Filas = t.Filas + s.Delta
+                WHEN NOT MATCHED THEN INSERT (ArchivoId, Columna, Valor, Filas)
+                    VALUES (s.ArchivoId, s.Columna, s.Valor, s.Delta);
+            """, delta)
+            cur.execute("DELETE FROM AgregadosReporte WHERE ArchivoId = ? AND Filas <= 0", (archivo_id,))
+
+        ms = ms_analisis + int((time.perf_counter() - inicio) * 1000)
+        sin_cambios = len(nuevas) - len(insertadas) - len(actualizadas)
+        cur.execute("""
+            INSERT INTO IngestasReporte (ArchivoId, Version, TipoReporte, Insertadas, Actualizadas,
+                                         Eliminadas, SinCambios, Omitidas, DuracionMs)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (archivo_id, version, tipo, len(insertadas), len(actualizadas), len(eliminadas),
+              sin_cambios, omitidas, ms))
+        cur.execute("SELECT FacultadCod FROM ArchivosExcel WHERE Id = ?", (archivo_id,))
+        facultad_cod = cur.fetchone()[0]
+        conn.commit()
+        # Los módulos de la facultad cambian: no compartir vuelos de /api/modulos anteriores
+        marcar_cambio(facultad_cod)
+        print(f"✅ Ingesta archivo {archivo_id} v{version} ({tipo}): +{len(insertadas)} "
+              f"~{len(actualizadas)} -{len(eliminadas)} ={sin_cambios} en {ms} ms")
+        return resumen_ingesta(archivo_id, version)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# ======================= CONSULTAS ===========================
+def _fila_ingesta(row):
+    return {
+        'version': row[0],
+        'tipoReporte': row[1],
+        'insertadas': row[2],
+        'actualizadas': row[3],
+        'eliminadas': row[4],
+        'sinCambios': row[5],
+        'omitidas': row[6],
+        'duracionMs': row[7],
+        'fecha': row[8]
+    }
+
+
+_SELECT_INGESTA = """
+    SELECT Version, TipoReporte, Insertadas, Actualizadas, Eliminadas, SinCambios, Omitidas, DuracionMs, Fecha
+    FROM IngestasReporte
+"""
+
+
+def resumen_ingesta(archivo_id, version):
+    conn = conectar_archivo(archivo_id)
+    try:
+        cur = conn.cursor()
+        cur.execute(_SELECT_INGESTA + " WHERE ArchivoId = ? AND Version = ?", (archivo_id, version))
+        row = cur.fetchone()
+        return {'archivoId': archivo_id, **_fila_ingesta(row)} if row else None
+    finally:
+        conn.close()
+
+
+def listar_ingestas(archivo_id):
+    """Ingestas del archivo, de la más reciente a la más antigua"""
+    conn = conectar_archivo(archivo_id, lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute(_SELECT_INGESTA + " WHERE ArchivoId = ? ORDER BY Version DESC", (archivo_id,))
+        return [_fila_ingesta(row) for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def listar_cambios(archivo_id, version=None, tipo=None, cursor=0, limit=200):
+    """
+    Conjunto de cambios de una versión (por defecto la última ingerida), paginado por Id.
+
+    Returns:
+        dict: {version, cambios, siguienteCursor}
+    """
+    conn = conectar_archivo(archivo_id, lectura=True)
+    try:
+        cur = conn.cursor()
+        if version is None:
+            cur.execute("SELECT MAX(Version) FROM IngestasReporte WHERE ArchivoId = ?", (archivo_id,))
+            version = cur.fetchone()[0]
+            if version is None:
+                return {'version': None, 'cambios': [], 'siguienteCursor': None}
+
+        filtros = ["ArchivoId = ?", "Version = ?", "Id > ?"]
+        params = [archivo_id, version, cursor]
+        if tipo:
+            filtros.append("Tipo = ?")
+            params.append(tipo)
+        cur.execute(f"""
+            SELECT TOP (?) Id, Tipo, Clave, DatosAnteriores, DatosNuevos
+            FROM CambiosReporte
+            WHERE {" AND ".join(filtros)}
+            ORDER BY Id
+        """, [limit + 1, *params])
+        filas = cur.fetchall()
+    finally:
+        conn.close()
+
+    hay_mas = len(filas) > limit
+    filas = filas[:limit]
+    return {
+        'version': version,
+        'cambios': [{
+            'tipo': {'I': 'insertada', 'U': 'actualizada', 'D': 'eliminada'}[row[1]],
+            'clave': row[2],
+            'anterior': json.loads(row[3]) if row[3] else None,
+            'nuevo': json.loads(row[4]) if row[4] else None
+        } for row in filas],
+        'siguienteCursor': filas[-1][0] if hay_mas else None
+    }
+
+
+def obtener_agregados(archivo_id):
+    """Conteos vigentes por columna/valor: {columna: {valor: filas}}"""
+    conn = conectar_archivo(archivo_id, lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT Columna, Valor, Filas FROM AgregadosReporte
+            WHERE ArchivoId = ? ORDER BY Columna, Filas DESC
+        """, (archivo_id,))
+        agregados = {}
+        for columna, valor, filas in cur.fetchall():
+            agregados.setdefault(columna, {})[valor] = filas
+        return agregados
+    finally:
+        conn.close()
+
+
+# ======================= INGESTA EN PARALELO ===========================
+def _nucleos_disponibles():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _procesos_por_worker():
+    return max(1, _nucleos_disponibles() // max(1, _WORKERS))
+
+
+class PlanificadorIngesta:
+    """
+    Ingiere varios libros a la vez (p. ej. la sincronización de una facultad:
+    calificaciones, término anterior, docentes y nómina).
+
+    El análisis (lectura del XML e indexado por clave, CPU) corre en un pool de
+    procesos con la parte de los núcleos del host que toca a este worker (cada
+    worker de gunicorn tiene el suyo); los deltas se aplican en la
+    BD desde este proceso, en el orden recibido y en una transacción por archivo.
+    La hoja de un libro se parsea en secuencia, así que la unidad de paralelismo
+    es el libro.
+    """
+
+    def __init__(self, procesos=INGESTA_PROCESOS):
+        self.procesos = procesos or _procesos_por_worker()
+        self._pool = None
+        self._lock = threading.Lock()
+        self._progreso = {}
+
+    def _obtener_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn y no fork: el worker tiene hilos (salud, compactador) cuyo estado no debe copiarse
+                self._pool = ProcessPoolExecutor(max_workers=self.procesos,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _anotar(self, archivo_id, **campos):
+        with self._lock:
+            self._progreso.setdefault(archivo_id, {'archivoId': archivo_id}).update(campos)
+
+    def progreso(self):
+        """Estado y tiempos de la última ingesta de cada archivo en este worker"""
+        with self._lock:
+            return sorted((dict(p) for p in self._progreso.values()), key=lambda p: p['archivoId'])
+
+    @staticmethod
+    def _versiones_pendientes(archivo_ids):
+        """
+        Returns:
+            dict: archivo_id -> (version vigente, hash, ya_ingerida, facultad)
+        """
+        # Los archivos pueden vivir en particiones distintas (ver database.particion_de_archivo)
+        por_particion = {}
+        for archivo_id in archivo_ids:
+            por_particion.setdefault(particion_de_archivo(archivo_id), []).append(archivo_id)
+
+        pendientes = {}
+        for particion, ids in por_particion.items():
+            conn = conectar(particion)
+            try:
+                cur = conn.cursor()
+                marcadores = ", ".join("?" * len(ids))
+                cur.execute(f"""
+                    SELECT a.Id, a.VersionActual, v.HashContenido,
+                           CASE WHEN i.ArchivoId IS NULL THEN 0 ELSE 1 END, a.FacultadCod
+                    FROM ArchivosExcel a
+                    INNER JOIN VersionesArchivoExcel v ON v.ArchivoId = a.Id AND v.Version = a.VersionActual
+                    LEFT JOIN IngestasReporte i ON i.ArchivoId = a.Id AND i.Version = a.VersionActual
+                    WHERE a.Id IN ({marcadores})
+                """, ids)
+                pendientes.update({row[0]: (row[1], row[2].strip(), bool(row[3]), row[4]) for row in cur.fetchall()})
+            finally:
+                conn.close()
+        return pendientes
+
+    def ejecutar(self, archivo_ids):
+        """
+        Ingiere la versión vigente de cada archivo.
+
+        Returns:
+            list: por archivo {archivoId, facultadCod, estado, version, analisisMs, aplicacionMs, totalMs, resumen | error}
+        """
+        archivo_ids = list(dict.fromkeys(archivo_ids))
+        if not archivo_ids:
+            return []
+        inicio = time.perf_counter()
+        versiones = self._versiones_pendientes(archivo_ids)
+
+        futuros = {}
+        for archivo_id in archivo_ids:
+            if archivo_id not in versiones:
+                self._anotar(archivo_id, estado='error', version=None,
+                             error='Archivo no encontrado o sin contenido en el almacén')
+                continue
+            version, hash_hex, ya_ingerida, facultad_cod = versiones[archivo_id]
+            if ya_ingerida:
+                self._anotar(archivo_id, estado='sin_cambios', version=version, error=None, facultadCod=facultad_cod)
+                continue
+            self._anotar(archivo_id, estado='analizando', version=version, error=None, facultadCod=facultad_cod,
+                         analisisMs=None, aplicacionMs=None, totalMs=None)
+            futuros[archivo_id] = self._obtener_pool().submit(analizar_blob, hash_hex)
+
+        # Los análisis terminan en cualquier orden; los deltas se aplican en el orden pedido
+        for archivo_id, futuro in futuros.items():
+            version = versiones[archivo_id][0]
+            try:
+                analisis = futuro.result()
+                self._anotar(archivo_id, estado='aplicando', analisisMs=analisis[3])
+                t0 = time.perf_counter()
+                resumen = ingerir_version(archivo_id, version, analisis=analisis)
+                self._anotar(archivo_id, estado='listo', resumen=resumen,
+                             aplicacionMs=int((time.perf_counter() - t0) * 1000),
+                             totalMs=int((time.perf_counter() - inicio) * 1000))
+            except ReporteNoSoportado as e:
+                self._anotar(archivo_id, estado='no_soportado', error=str(e))
+            except VersionNoVigente as e:
+                # La versión nueva llega por su propia ingesta
+                self._anotar(archivo_id, estado='reemplazada', error=str(e))
+            except Exception as e:
+                print(f"❌ Error ingiriendo archivo {archivo_id}: {e}")
+                self._anotar(archivo_id, estado='error', error=str(e))
+
+        print(f"📊 Ingesta de {len(archivo_ids)} archivos ({len(futuros)} con cambios) en "
+              f"{int((time.perf_counter() - inicio) * 1000)} ms con {self.procesos} procesos")
+        with self._lock:
+            return [dict(self._progreso[a]) for a in archivo_ids]
+
+
+planificador = PlanificadorIngesta()
+
+
+def precalcular_tras_ingesta(resultados):
+    """Encola el precálculo de módulos de las facultades con archivos recién ingeridos"""
+    from precalculo import precalculador
+
+    precalculador.encolar(*(r['facultadCod'] for r in resultados if r.get('estado') == 'listo'))
+    return resultados
+
+
+# ======================= INGESTA EN SEGUNDO PLANO ===========================
+class IngestorReportes:
+    """
+    Hilo de fondo (uno por worker) que ingiere las versiones subidas sin bloquear /upload.
+    Varias subidas del mismo archivo en cola se reducen a la última versión; el
+    análisis corre en el pool de PlanificadorIngesta y al terminar se precalculan
+    los módulos de las facultades afectadas (ver precalculo).
+    """
+
+    def __init__(self):
+        self._cola = queue.Queue()
+        self._pendientes = set()
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def _bucle(self):
+        while True:
+            # Todo lo encolado mientras tanto se ingiere junto, en paralelo
+            archivo_ids = list(self._cola.get())
+            while not self._cola.empty():
+                archivo_ids.extend(self._cola.get_nowait())
+            with self._lock:
+                self._pendientes.difference_update(archivo_ids)
+            try:
+                precalcular_tras_ingesta(planificador.ejecutar(archivo_ids))
+            except Exception as e:
+                print(f"❌ Error ingiriendo archivos {archivo_ids}: {e}")
+
+    def encolar(self, *archivo_ids):
+        """Encola uno o varios archivos; los de una misma llamada se ingieren en la misma pasada"""
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="ingesta", daemon=True)
+                self._hilo.start()
+            nuevos = [a for a in dict.fromkeys(archivo_ids) if a not in self._pendientes]
+            self._pendientes.update(nuevos)
+        if nuevos:
+            self._cola.put(nuevos)
+
+
+ingestor = IngestorReportes()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and all(a.isdigit() for a in sys.argv[1:]):
+        # Fuera de gunicorn el pool puede usar todos los núcleos
+        resultados = PlanificadorIngesta(INGESTA_PROCESOS or _nucleos_disponibles()).ejecutar(
+            [int(a) for a in sys.argv[1:]])
+        print(json.dumps(resultados, default=str, ensure_ascii=False, indent=2))
+    else:
+        print(__doc__)
@@ -0,0 +1,230 @@
+"""
+Lector de xlsx por streaming con memoria acotada.
+
+Recorre el XML de la hoja con iterparse y descarta cada fila apenas se procesa,
+así la memoria depende del tamaño del lote y de la tabla de cadenas compartidas
+(que se carga una vez y ocupa mucho menos que el XML de la hoja). Devuelve
+valores tipados: str, int, float, bool, datetime o None.
+
+Uso:
+    with LectorXlsx(ruta_o_archivo) as lector:
+        encabezados = next(lector.filas())
+        for lote in lector.lotes(500):
+            ...
+"""
+import posixpath
+import re
+import zipfile
+from datetime import datetime, timedelta
+from xml.etree.ElementTree import fromstring, iterparse
+
+# ======================= CONFIG ===========================
+LOTE_FILAS = 1000
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG = "http://schemas.openxmlformats.org/package/2006/relationships"
+_M = "{%s}" % _NS_MAIN
+
+# Formatos numéricos predefinidos de Excel que son fechas/horas
+_FORMATOS_FECHA = set(range(14, 23)) | {45, 46, 47}
+# Literales entre comillas, colores/condiciones entre corchetes y escapes no cuentan como código de fecha
+_LITERALES_FORMATO = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+_COLUMNA = re.compile(r"[A-Z]+")
+
+
+class XlsxInvalido(ValueError):
+    """El archivo no es un libro xlsx legible"""
+
+
+def indice_columna(referencia):
+    """'A1' -> 0, 'AF9419' -> 31"""
+    letras = _COLUMNA.match(referencia).group()
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+
+def _es_formato_fecha(codigo):
+    codigo = _LITERALES_FORMATO.sub("", codigo or "").lower()
+    return any(c in codigo for c in "dmyhs") and "general" not in codigo
+
+
+def _texto(elem):
+    """Texto de un <si> o <is>: concatena los <t>, ignorando la fonética (<rPh>)"""
+    partes = []
+    for hijo in elem:
+        if hijo.tag == _M + "t":
+            partes.append(hijo.text or "")
+        elif hijo.tag == _M + "r":
+            t = hijo.find(_M + "t")
+            if t is not None:
+                partes.append(t.text or "")
+    return "".join(partes)
+
+
+class LectorXlsx:
+    """Lee una hoja de un xlsx fila por fila (o por lotes)"""
+
+    def __init__(self, origen, hoja=0):
+        """
+        Args:
+            origen: ruta o archivo binario con seek (BytesIO, archivo abierto, blob del almacén)
+            hoja: índice o nombre de la hoja
+        """
+        try:
+            self._zip = zipfile.ZipFile(origen)
+        except zipfile.BadZipFile as e:
+            raise XlsxInvalido(f"El archivo no es un xlsx válido: {e}") from e
+        self._ruta_hoja = self._resolver_hoja(hoja)
+        self._cadenas = None
+        self._estilos_fecha = None
+
+    # ----------------------- metadatos del paquete -----------------------
+    @staticmethod
+    def _parte(destino):
+        """Destino de una relación de xl/workbook.xml -> nombre dentro del zip"""
+        if destino.startswith("/"):
+            return destino.lstrip("/")
+        return posixpath.normpath(posixpath.join("xl", destino))
+
+    def _resolver_hoja(self, hoja):
+        try:
+            libro = self._zip.read("xl/workbook.xml")
+            relaciones = self._zip.read("xl/_rels/workbook.xml.rels")
+        except KeyError as e:
+            raise XlsxInvalido(f"El xlsx no tiene {e}") from e
+
+        destinos = {r.get("Id"): r.get("Target") for r in fromstring(relaciones).iter("{%s}Relationship" % _NS_PKG)}
+        hojas = [(h.get("name"), h.get("{%s}id" % _NS_REL)) for h in fromstring(libro).iter(_M + "sheet")]
+        if not hojas:
+            raise XlsxInvalido("El libro no tiene hojas")
+
+        if isinstance(hoja, int):
+            if hoja >= len(hojas):
+                raise XlsxInvalido(f"El libro solo tiene {len(hojas)} hojas")
+            rid = hojas[hoja][1]
+        else:
+            rid = next((r for nombre, r in hojas if nombre == hoja), None)
+            if rid is None:
+                raise XlsxInvalido(f"El libro no tiene la hoja '{hoja}'")
+        return self._parte(destinos[rid])
+
+    def _cargar_cadenas(self):
+        """Tabla de cadenas compartidas; cada <si> se libera apenas se lee"""
+        cadenas = []
+        try:
+            origen = self._zip.open("xl/sharedStrings.xml")
+        except KeyError:
+            return cadenas
+        with origen:
+            for _, elem in iterparse(origen):
+                if elem.tag == _M + "si":
+                    cadenas.append(_texto(elem))
+                    elem.clear()
+        return cadenas
+
+    def _cargar_estilos_fecha(self):
+        """Índices de cellXfs cuyo formato numérico es de fecha"""
+        try:
+            contenido = self._zip.read("xl/styles.xml")
+        except KeyError:
+            return set()
+
+        raiz = fromstring(contenido)
+        propios = {int(f.get("numFmtId")): f.get("formatCode") for f in raiz.iter(_M + "numFmt")}
+        fechas = set()
+        xfs = raiz.find(_M + "cellXfs")
+        for i, xf in enumerate(xfs if xfs is not None else []):
+            formato = int(xf.get("numFmtId", 0))
+            if formato in _FORMATOS_FECHA or (formato in propios and _es_formato_fecha(propios[formato])):
+                fechas.add(i)
+        return fechas
+
+    # ----------------------- celdas y filas -----------------------
+    def _valor(self, celda):
+        tipo = celda.get("t", "n")
+        if tipo == "inlineStr":
+            interno = celda.find(_M + "is")
+            return _texto(interno) if interno is not None else ""
+
+        v = celda.find(_M + "v")
+        if v is None or v.text is None:
+            return None
+        texto = v.text
+        if tipo == "s":
+            return self._cadenas[int(texto)]
+        if tipo in ("str", "e"):
+            return texto
+        if tipo == "b":
+            return texto == "1"
+        if tipo == "d":
+            return datetime.fromisoformat(texto)
+
+        numero = float(texto) if any(c in texto for c in ".eE") else int(texto)
+        if int(celda.get("s", 0)) in self._estilos_fecha:
+            return _EPOCA_EXCEL + timedelta(days=numero)
+        return numero
+
+    def filas(self):
+        """
+        Genera cada fila como lista de valores (None en celdas vacías). Las filas
+        ausentes en el XML se devuelven vacías para conservar la numeración.
+        """
+        if self._cadenas is None:
+            self._cadenas = self._cargar_cadenas()
+            self._estilos_fecha = self._cargar_estilos_fecha()
+
+        ancho = 0
+        siguiente = 1
+        datos_hoja = None
+        with self._zip.open(self._ruta_hoja) as origen:
+            for evento, elem in iterparse(origen, events=("start", "end")):
+                if evento == "start":
+                    if elem.tag == _M + "sheetData":
+                        datos_hoja = elem
+                    continue
+                if elem.tag == _M + "dimension":
+                    _, _, fin = (elem.get("ref") or "").partition(":")
+                    if fin:
+                        ancho = indice_columna(fin) + 1
+                elif elem.tag == _M + "row":
+                    numero = int(elem.get("r", siguiente))
+                    while siguiente < numero:
+                        yield [None] * ancho
+                        siguiente += 1
+
+                    fila = [None] * ancho
+                    for posicion, celda in enumerate(elem.iter(_M + "c")):
+                        referencia = celda.get("r")
+                        columna = indice_columna(referencia) if referencia else posicion
+                        if columna >= len(fila):
+                            fila.extend([None] * (columna + 1 - len(fila)))
+                        fila[columna] = self._valor(celda)
+                    siguiente = numero + 1
+                    # La fila ya se procesó: se suelta del árbol para acotar la memoria
+                    if datos_hoja is not None:
+                        datos_hoja.clear()
+                    yield fila
+
+    def lotes(self, tamano=LOTE_FILAS):
+        """Genera listas de hasta `tamano` filas"""
+        lote = []
+        for fila in self.filas():
+            lote.append(fila)
+            if len(lote) >= tamano:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+    def cerrar(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
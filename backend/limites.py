@@ -0,0 +1,302 @@
+"""
+Límites de concurrencia y de tasa por clase de ruta.
+
+Cada clase (blob, analitica, auth, sesion, correo) tiene cupos por usuario, por
+facultad y globales: "concurrencia" (requests en curso a la vez) y
+"por_minuto" con una "rafaga" inicial (GCRA). Las rutas sin sesión usan otra
+clave como "usuario": el login, la cuenta enviada (no la IP: un laboratorio
+entero sale por la misma NAT); la renovación, el token. LIMITES (JSON) reemplaza
+los valores de una clase, p. ej. {"blob": {"usuario": {"concurrencia": 1}}}.
+
+Los contadores viven en un SQLite local (LIMITES_DB) que comparten todos los
+workers del host; gunicorn lo vacía al arrancar y libera los cupos de un
+worker que termina. Al superar un límite se responde 429 con Retry-After.
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import wraps
+
+from metricas import ocupacion_limites, rechazos_limite
+
+# ======================= CONFIG ===========================
+LIMITES_ACTIVOS = os.getenv("LIMITES_ACTIVOS", "1") == "1"
+LIMITES_DB = os.getenv("LIMITES_DB", "/tmp/sisa_limites.db")
+# Un worker sync atiende un request a la vez: dejar al menos uno libre para el resto de rutas
+_WORKERS = int(os.getenv("GUNICORN_WORKERS", "4"))
+_LIBRES = max(1, _WORKERS - 1)
+MODO_ASGI = os.getenv("MODO_ASGI", "0") == "1"
+# Proxies delante de la app (nginx = 1) cuyo X-Forwarded-For se acepta (ProxyFix en app.py); 0 = ninguno
+PROXIES_CONFIABLES = int(os.getenv("PROXIES_CONFIABLES", "0"))
+
+CLASES = {
+    # /upload, /download, exportaciones: ocupan un worker mientras dura la transferencia
+    "blob": {
+        "usuario": {"concurrencia": 2, "por_minuto": 30, "rafaga": 10},
+        "facultad": {"concurrencia": 2, "por_minuto": 120, "rafaga": 20},
+        "global": {"concurrencia": _LIBRES},
+        "reintento": 5,
+    },
+    "analitica": {
+        "usuario": {"concurrencia": 2, "por_minuto": 60, "rafaga": 10},
+        "facultad": {"concurrencia": 3},
+        "global": {"concurrencia": _LIBRES},
+        "reintento": 2,
+    },
+    # Por cuenta enviada en /auth/ug
+    "auth": {
+        "usuario": {"concurrencia": 2, "por_minuto": 10, "rafaga": 5},
+        # En modo ASGI el login espera a UG sin ocupar un worker: sin tope global
+        "global": {} if MODO_ASGI else {"concurrencia": _LIBRES},
+        "reintento": 2,
+    },
+    # Por token en /auth/refresh
+    "sesion": {
+        "usuario": {"concurrencia": 2, "por_minuto": 10, "rafaga": 5},
+        "reintento": 2,
+    },
+    "correo": {
+        "usuario": {"concurrencia": 1, "por_minuto": 10, "rafaga": 3},
+        "global": {"concurrencia": 2, "por_minuto": 60, "rafaga": 10},
+        "reintento": 5,
+    },
+}
+for _clase, _valores in json.loads(os.getenv("LIMITES") or "{}").items():
+    for _ambito, _cupos in _valores.items():
+        if isinstance(_cupos, dict):
+            CLASES.setdefault(_clase, {}).setdefault(_ambito, {}).update(_cupos)
+        else:
+            CLASES.setdefault(_clase, {})[_ambito] = _cupos
+
+AMBITOS = ("usuario", "facultad", "global")
+# Un cupo más viejo que esto se da por perdido (el worker murió sin liberarlo)
+LIMITES_CUPO_MAXIMO = int(os.getenv("LIMITES_CUPO_MAXIMO", "3600"))
+# Cada cuánto un worker revisa si los dueños de los cupos siguen vivos
+LIMITES_REVISION = 30
+
+
+class LimiteExcedido(Exception):
+    """Se superó un cupo; `reintento` son los segundos sugeridos para Retry-After"""
+
+    def __init__(self, clase, motivo, reintento):
+        super().__init__(f"Límite de '{clase}' alcanzado ({motivo})")
+        self.clase = clase
+        self.motivo = motivo
+        self.reintento = max(1, math.ceil(reintento))
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# ======================= LIMITADOR ===========================
+class Limitador:
+    """Cupos compartidos entre procesos del mismo host (SQLite con BEGIN IMMEDIATE)"""
+
+    def __init__(self, ruta=LIMITES_DB, clases=CLASES):
+        self.ruta = ruta
+        self.clases = clases
+        self._local = threading.local()
+        self._ultima_revision = 0.0
+
+    def _conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS Cupos (
+                    Token TEXT PRIMARY KEY, Clase TEXT NOT NULL, Usuario TEXT, Facultad TEXT,
+                    Pid INTEGER NOT NULL, Desde REAL NOT NULL)
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS IX_Cupos_Clase ON Cupos (Clase)")
+            conn.execute("CREATE TABLE IF NOT EXISTS Tasas (Clave TEXT PRIMARY KEY, Tat REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def reiniciar(self):
+        """Borra el estado de una ejecución anterior (hook on_starting de gunicorn)"""
+        for sufijo in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.ruta + sufijo)
+            except FileNotFoundError:
+                pass
+
+    def liberar_proceso(self, pid):
+        """Cupos de un worker que terminó sin liberarlos (hook child_exit de gunicorn)"""
+        self._conexion().execute("DELETE FROM Cupos WHERE Pid = ?", (pid,))
+
+    def _purgar(self, cur, ahora):
+        cur.execute("DELETE FROM Cupos WHERE Desde < ?", (ahora - LIMITES_CUPO_MAXIMO,))
+        if ahora - self._ultima_revision < LIMITES_REVISION:
+            return
+        self._ultima_revision = ahora
+        pids = [row[0] for row in cur.execute("SELECT DISTINCT Pid FROM Cupos")]
+        for pid in pids:
+            if not _proceso_vivo(pid):
+                cur.execute("DELETE FROM Cupos WHERE Pid = ?", (pid,))
+
+    def _tasa(self, cur, clave, cupo, ahora):
+        """
+        GCRA: devuelve (nuevo TAT, None) si cabe o (None, segundos de espera) si no.
+        """
+        intervalo = 60.0 / cupo["por_minuto"]
+        tolerancia = intervalo * max(1, cupo.get("rafaga", 1))
+        row = cur.execute("SELECT Tat FROM Tasas WHERE Clave = ?", (clave,)).fetchone()
+        tat = max(row[0] if row else ahora, ahora) + intervalo
+        if tat - ahora > tolerancia:
+            return None, tat - ahora - tolerancia
+        return tat, None
+
+    def adquirir(self, clase, usuario=None, facultad=None):
+        """
+        Reserva un cupo de la clase o lanza LimiteExcedido.
+
+        Returns:
+            str: token para liberar()
+        """
+        config = self.clases[clase]
+        claves = {"usuario": usuario, "facultad": facultad, "global": "*"}
+        ahora = time.time()
+        conn = self._conexion()
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            self._purgar(cur, ahora)
+            en_curso = dict(zip(AMBITOS, cur.execute("""
+                SELECT SUM(Usuario = ?), SUM(Facultad = ?), COUNT(*) FROM Cupos WHERE Clase = ?
+            """, (usuario, facultad, clase)).fetchone()))
+
+            tasas = []
+            for ambito in AMBITOS:
+                cupo = config.get(ambito)
+                if not cupo or claves[ambito] is None:
+                    continue
+                if "concurrencia" in cupo and (en_curso[ambito] or 0) >= cupo["concurrencia"]:
+                    raise LimiteExcedido(clase, ambito, config.get("reintento", 1))
+                if cupo.get("por_minuto"):
+                    clave = f"{clase}:{ambito}:{claves[ambito]}"
+                    tat, espera = self._tasa(cur, clave, cupo, ahora)
+                    if tat is None:
+                        raise LimiteExcedido(clase, "tasa", espera)
+                    tasas.append((clave, tat))
+
+            # Solo se consume la tasa si todos los cupos alcanzan
+            cur.executemany("INSERT OR REPLACE INTO Tasas (Clave, Tat) VALUES (?, ?)", tasas)
+            token = uuid.uuid4().hex
+            cur.execute("INSERT INTO Cupos (Token, Clase, Usuario, Facultad, Pid, Desde) VALUES (?, ?, ?, ?, ?, ?)",
+                        (token, clase, usuario, facultad, os.getpid(), ahora))
+            cur.execute("COMMIT")
+        except LimiteExcedido as e:
+            cur.execute("ROLLBACK")
+            rechazos_limite.labels(clase, e.motivo).inc()
+            raise
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        ocupacion_limites.labels(clase).inc()
+        return token
+
+    def liberar(self, clase, token):
+        try:
+            self._conexion().execute("DELETE FROM Cupos WHERE Token = ?", (token,))
+        except sqlite3.Error as e:
+            # Se recupera al vencer LIMITES_CUPO_MAXIMO
+            print(f"⚠️ No se pudo liberar el cupo de '{clase}': {e}")
+        ocupacion_limites.labels(clase).dec()
+
+    def estado(self):
+        """Cupos en curso por clase (todos los workers del host)"""
+        filas = self._conexion().execute("SELECT Clase, COUNT(*) FROM Cupos GROUP BY Clase").fetchall()
+        return {clase: n for clase, n in filas}
+
+
+limitador = Limitador()
+
+
+# ======================= FLASK ===========================
+def ip_cliente(request):
+    """
+    IP del cliente. X-Forwarded-For no se lee aquí: cualquiera puede enviarlo. Detrás de nginx,
+    ProxyFix (PROXIES_CONFIABLES) ya dejó en remote_addr la IP que vio el proxy.
+    """
+    return request.remote_addr or "?"
+
+
+def clave_cuenta(usuario):
+    """Clave de /auth/ug: la cuenta enviada (sin distinguir mayúsculas)"""
+    return f"cuenta:{usuario.strip().lower()}"
+
+
+def cuenta_enviada(request):
+    usuario = request.form.get("usuario") or (request.get_json(silent=True) or {}).get("usuario")
+    return clave_cuenta(usuario) if isinstance(usuario, str) and usuario.strip() else ip_cliente(request)
+
+
+def token_enviado(request):
+    """Clave de /auth/refresh: el token (hasheado) de la sesión a renovar"""
+    auth = request.headers.get("Authorization", "")
+    if auth.lower().startswith("bearer ") and auth[7:].strip():
+        return "token:" + hashlib.sha256(auth[7:].strip().encode()).hexdigest()[:32]
+    return ip_cliente(request)
+
+
+def respuesta_limite(e):
+    """Cuerpo y cabeceras del 429"""
+    return ({
+        "error": "Demasiadas solicitudes, intente nuevamente en unos segundos",
+        "limite": e.motivo,
+        "reintentarEn": e.reintento
+    }, {"Retry-After": str(e.reintento)})
+
+
+def limitar(clase, clave=ip_cliente):
+    """
+    Decorador de rutas Flask (va después de @require_login/@require_role). El cupo se
+    libera al cerrar la respuesta, así una descarga o exportación en streaming lo ocupa
+    hasta terminar de enviarse. Sin usuario autenticado se usa clave(request).
+    """
+
+    def decorator(f):
+        from flask import jsonify, make_response, request
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not LIMITES_ACTIVOS:
+                return f(*args, **kwargs)
+            user = getattr(request, "current_user", None)
+            if user:
+                usuario, facultad = str(user["id"]), (user.get("facultadCod") or "").strip() or None
+            else:
+                usuario, facultad = clave(request), None
+
+            try:
+                token = limitador.adquirir(clase, usuario, facultad)
+            except LimiteExcedido as e:
+                print(f"🚦 {e}: usuario={usuario}, ruta={request.path}")
+                cuerpo, cabeceras = respuesta_limite(e)
+                return jsonify(cuerpo), 429, cabeceras
+
+            try:
+                response = make_response(f(*args, **kwargs))
+            except BaseException:
+                limitador.liberar(clase, token)
+                raise
+            response.call_on_close(lambda: limitador.liberar(clase, token))
+            return response
+
+        return decorated_function
+
+    return decorator
@@ -0,0 +1,175 @@
+"""
+Métricas Prometheus del backend (expuestas en GET /metrics).
+
+Con gunicorn cada worker escribe sus valores en PROMETHEUS_MULTIPROC_DIR
+(gunicorn.conf.py lo prepara al arrancar) y /metrics agrega los de todos los
+workers; sin esa variable se usa el registro normal del proceso.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess
+)
+
+MULTIPROCESO = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# ======================= HTTP ===========================
+solicitudes_http = Counter(
+    "sisa_http_solicitudes_total", "Solicitudes HTTP atendidas",
+    ["metodo", "ruta", "estado"]
+)
+duracion_http = Histogram(
+    "sisa_http_duracion_segundos", "Latencia de las solicitudes HTTP",
+    ["metodo", "ruta"], buckets=BUCKETS_HTTP
+)
+en_curso_http = Gauge(
+    "sisa_http_en_curso", "Solicitudes HTTP en curso",
+    ["ruta"], multiprocess_mode="livesum"
+)
+bytes_subidos = Counter(
+    "sisa_subidas_bytes_total", "Bytes recibidos en subidas de archivos (multipart)",
+    ["ruta"]
+)
+
+# ======================= BASE DE DATOS ===========================
+conexiones_bd = Counter("sisa_bd_conexiones_total", "Conexiones abiertas a SQL Server", ["resultado"])
+lecturas_bd = Counter("sisa_bd_lecturas_total", "Conexiones de solo lectura según destino", ["destino"])
+duracion_conexion_bd = Histogram(
+    "sisa_bd_conexion_segundos", "Tiempo en abrir una conexión a SQL Server",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+duracion_sql = Histogram(
+    "sisa_sql_duracion_segundos", "Duración de sentencias SQL",
+    ["operacion"], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+consultas_por_solicitud = Histogram(
+    "sisa_sql_consultas_por_solicitud", "Sentencias SQL ejecutadas por request",
+    ["ruta"], buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100)
+)
+
+# ======================= CACHÉ ===========================
+consultas_cache = Counter("sisa_cache_consultas_total", "Consultas a cachés en memoria", ["cache", "resultado"])
+
+# ======================= CORREO ===========================
+correos_en_curso = Gauge(
+    "sisa_correos_en_curso", "Envíos a Graph en curso (incluye esperas de reintento)",
+    multiprocess_mode="livesum"
+)
+correos_enviados = Counter("sisa_correos_total", "Envíos de correo", ["resultado"])
+reintentos_correo = Counter("sisa_correo_reintentos_total", "Reintentos ante 429/503/504 de Graph")
+duracion_correo = Histogram(
+    "sisa_correo_duracion_segundos", "Duración de un envío de correo (con reintentos)",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+# ======================= LÍMITES ===========================
+rechazos_limite = Counter(
+    "sisa_limite_rechazos_total", "Solicitudes rechazadas con 429 por el limitador",
+    ["clase", "motivo"]
+)
+ocupacion_limites = Gauge(
+    "sisa_limite_en_curso", "Cupos del limitador ocupados",
+    ["clase"], multiprocess_mode="livesum"
+)
+
+# ======================= VUELOS ===========================
+vuelos_coalescidos = Counter(
+    "sisa_vuelos_total", "Cálculos con coalescencia single-flight según quién los resolvió",
+    ["vuelo", "resultado"]
+)
+
+
+@contextmanager
+def medir_solicitud(metodo, ruta):
+    """
+    Cuenta y mide una solicitud HTTP.
+
+    El bloque recibe un dict donde debe dejar 'estado' con el código de respuesta.
+    """
+    resultado = {"estado": 500}
+    en_curso_http.labels(ruta).inc()
+    inicio = time.perf_counter()
+    try:
+        yield resultado
+    finally:
+        duracion_http.labels(metodo, ruta).observe(time.perf_counter() - inicio)
+        solicitudes_http.labels(metodo, ruta, str(resultado["estado"])).inc()
+        en_curso_http.labels(ruta).dec()
+
+
+@contextmanager
+def medir_envio_correo():
+    """Mide un envío; el bloque devuelve el número de reintentos en el dict recibido"""
+    resultado = {"reintentos": 0}
+    correos_en_curso.inc()
+    inicio = time.perf_counter()
+    try:
+        yield resultado
+        correos_enviados.labels("ok").inc()
+    except Exception:
+        correos_enviados.labels("error").inc()
+        raise
+    finally:
+        duracion_correo.observe(time.perf_counter() - inicio)
+        reintentos_correo.inc(resultado["reintentos"])
+        correos_en_curso.dec()
+
+
+def instrumentar_flask(app):
+    """Registra hooks de Flask que miden cada request por regla de ruta (no por URL)"""
+    from flask import request, g
+
+    def _ruta():
+        return request.url_rule.rule if request.url_rule else "sin_ruta"
+
+    @app.before_request
+    def _inicio_metricas():
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_ruta = _ruta()
+        en_curso_http.labels(g.metricas_ruta).inc()
+
+    @app.after_request
+    def _respuesta_metricas(response):
+        g.metricas_estado = response.status_code
+        return response
+
+    @app.teardown_request
+    def _fin_metricas(exc):
+        inicio = g.pop("metricas_inicio", None)
+        if inicio is None:
+            return
+        ruta = g.pop("metricas_ruta")
+        estado = g.pop("metricas_estado", 500)
+        duracion_http.labels(request.method, ruta).observe(time.perf_counter() - inicio)
+        solicitudes_http.labels(request.method, ruta, str(estado)).inc()
+        en_curso_http.labels(ruta).dec()
+        if request.mimetype == "multipart/form-data" and request.content_length:
+            bytes_subidos.labels(ruta).inc(request.content_length)
+
+
+def exportar():
+    """Devuelve (cuerpo, content_type) con las métricas agregadas de todos los workers"""
+    if MULTIPROCESO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
+
+
+def marcar_worker_terminado(pid):
+    """Descarta los gauges 'live' de un worker que terminó (hook child_exit de gunicorn)"""
+    if MULTIPROCESO:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,390 @@
+"""
+Migraciones versionadas del esquema de FACAFDB.
+
+Cada migración tiene un número de versión; las aplicadas se registran en la
+tabla VersionEsquema. aplicar_migraciones() ejecuta las pendientes en orden,
+cada una en su propia transacción, bajo un applock de SQL Server para que
+varios workers/contenedores no migren a la vez.
+
+Las particiones de datos por facultad (ver particiones.py) llevan su propia
+VersionEsquema y reciben las migraciones de MIGRACIONES_PARTICION: el esquema
+de sus tablas sale de las mismas sentencias que el de la principal.
+
+Uso manual (desde backend/):
+    python migraciones.py                         # aplica las pendientes
+    python migraciones.py --estado                # lista versiones aplicadas y pendientes
+    python migraciones.py --particion <nombre>    # lo mismo en una partición de datos
+"""
+import sys
+
+from database import PARTICION_PRINCIPAL, conectar
+
+
+def _si_no_existe_indice(nombre, tabla, sql):
+    # Sin la tabla no se hace nada: en las particiones no existen Usuarios ni Carrera
+    return f"""
+        IF OBJECT_ID('{tabla}', 'U') IS NOT NULL
+           AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{nombre}' AND object_id = OBJECT_ID('{tabla}'))
+            {sql}
+    """
+
+
+# (versión, descripción, [sentencias]). Nunca modificar una migración ya publicada: agregar una nueva.
+# Las sentencias son idempotentes para adoptar BD que ya tenían el cambio antes de existir VersionEsquema.
+MIGRACIONES = [
+    (1, "Usuarios.VersionSesion (revocación de tokens de sesión)", [
+        """
+        IF COL_LENGTH('Usuarios', 'VersionSesion') IS NULL
+            ALTER TABLE Usuarios ADD VersionSesion INT NOT NULL
+                CONSTRAINT DF_Usuarios_VersionSesion DEFAULT 0
+        """,
+    ]),
+    (2, "UsuariosTrigrama (búsqueda de usuarios)", [
+        """
+        IF OBJECT_ID('UsuariosTrigrama', 'U') IS NULL
+            CREATE TABLE UsuariosTrigrama (
+                Trigrama NCHAR(3) NOT NULL,
+                UsuarioId INT NOT NULL,
+                CONSTRAINT PK_UsuariosTrigrama PRIMARY KEY (Trigrama, UsuarioId),
+                CONSTRAINT FK_UsuariosTrigrama_Usuarios FOREIGN KEY (UsuarioId)
+                    REFERENCES Usuarios(Id) ON DELETE CASCADE
+            )
+        """,
+        # Indexa los usuarios existentes (misma regla que database._trigramas: minúsculas, ventanas de 3)
+        """
+        INSERT INTO UsuariosTrigrama (Trigrama, UsuarioId)
+        SELECT DISTINCT SUBSTRING(LOWER(u.Usuario), n.n, 3), u.Id
+        FROM Usuarios u
+        INNER JOIN (
+            SELECT TOP 150 ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS n FROM sys.all_objects
+        ) n ON n.n <= LEN(u.Usuario) - 2
+        WHERE NOT EXISTS (SELECT 1 FROM UsuariosTrigrama t WHERE t.UsuarioId = u.Id)
+        """,
+    ]),
+    (3, "Índices de ArchivosExcel, Usuarios y Carrera", [
+        # guardar_archivo_excel / eliminar por nombre: WHERE NombreArchivo = ? AND FacultadCod = ?
+        _si_no_existe_indice("IX_ArchivosExcel_Facultad_Nombre", "ArchivosExcel", """
+            CREATE INDEX IX_ArchivosExcel_Facultad_Nombre ON ArchivosExcel (FacultadCod, NombreArchivo)
+        """),
+        # listar_archivos_por_facultad: WHERE FacultadCod = ? ORDER BY FechaSubida DESC (cubre las columnas listadas)
+        _si_no_existe_indice("IX_ArchivosExcel_Facultad_Fecha", "ArchivosExcel", """
+            CREATE INDEX IX_ArchivosExcel_Facultad_Fecha ON ArchivosExcel (FacultadCod, FechaSubida DESC)
+                INCLUDE (NombreArchivo, TipoMime)
+        """),
+        # Listado de admin sin filtro: ORDER BY FechaSubida DESC
+        _si_no_existe_indice("IX_ArchivosExcel_Fecha", "ArchivosExcel", """
+            CREATE INDEX IX_ArchivosExcel_Fecha ON ArchivosExcel (FechaSubida DESC)
+                INCLUDE (NombreArchivo, FacultadCod, TipoMime)
+        """),
+        # /usuarios por facultad o rol con keyset sobre Id DESC; conteos de delete_facultad/delete_carrera
+        _si_no_existe_indice("IX_Usuarios_Facultad_Id", "Usuarios", """
+            CREATE INDEX IX_Usuarios_Facultad_Id ON Usuarios (FacultadCod, Id DESC)
+                INCLUDE (Estado, RolId, CarreraCod)
+        """),
+        _si_no_existe_indice("IX_Usuarios_Rol_Id", "Usuarios", """
+            CREATE INDEX IX_Usuarios_Rol_Id ON Usuarios (RolId, Id DESC)
+                INCLUDE (Estado, FacultadCod)
+        """),
+        _si_no_existe_indice("IX_Usuarios_CarreraCod", "Usuarios", """
+            CREATE INDEX IX_Usuarios_CarreraCod ON Usuarios (CarreraCod)
+        """),
+        _si_no_existe_indice("IX_Carrera_FacultadCod", "Carrera", """
+            CREATE INDEX IX_Carrera_FacultadCod ON Carrera (FacultadCod) INCLUDE (Nombre)
+        """),
+    ]),
+    (4, "ArchivosExcel: contenido en el almacén de blobs (HashContenido, Tamano)", [
+        """
+        IF COL_LENGTH('ArchivosExcel', 'HashContenido') IS NULL
+            ALTER TABLE ArchivosExcel ADD HashContenido CHAR(64) NULL, Tamano BIGINT NULL
+        """,
+        # Las filas migradas al almacén dejan Datos en NULL
+        "ALTER TABLE ArchivosExcel ALTER COLUMN Datos VARBINARY(MAX) NULL",
+        # Purga de blobs huérfanos y detección de contenidos compartidos
+        _si_no_existe_indice("IX_ArchivosExcel_Hash", "ArchivosExcel", """
+            CREATE INDEX IX_ArchivosExcel_Hash ON ArchivosExcel (HashContenido) WHERE HashContenido IS NOT NULL
+        """),
+    ]),
+    (5, "VersionesArchivoExcel (historial de versiones de cada libro)", [
+        """
+        IF COL_LENGTH('ArchivosExcel', 'VersionActual') IS NULL
+            ALTER TABLE ArchivosExcel ADD VersionActual INT NOT NULL
+                CONSTRAINT DF_ArchivosExcel_VersionActual DEFAULT 1
+        """,
+        """
+        IF OBJECT_ID('VersionesArchivoExcel', 'U') IS NULL
+            CREATE TABLE VersionesArchivoExcel (
+                Id INT PRIMARY KEY IDENTITY(1,1),
+                ArchivoId INT NOT NULL,
+                Version INT NOT NULL,
+                HashContenido CHAR(64) NOT NULL,
+                Tamano BIGINT NOT NULL,
+                TipoMime NVARCHAR(100) NOT NULL,
+                FechaSubida DATETIME NOT NULL DEFAULT GETDATE(),
+                SubidoPor NVARCHAR(150) NULL,
+                CONSTRAINT UQ_VersionesArchivoExcel UNIQUE (ArchivoId, Version),
+                CONSTRAINT FK_VersionesArchivoExcel_Archivo FOREIGN KEY (ArchivoId)
+                    REFERENCES ArchivosExcel(Id) ON DELETE CASCADE
+            )
+        """,
+        # Versión 1 = contenido actual de los archivos ya migrados al almacén
+        """
+        INSERT INTO VersionesArchivoExcel (ArchivoId, Version, HashContenido, Tamano, TipoMime, FechaSubida)
+        SELECT a.Id, a.VersionActual, a.HashContenido, a.Tamano, a.TipoMime, COALESCE(a.FechaSubida, GETDATE())
+        FROM ArchivosExcel a
+        WHERE a.HashContenido IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM VersionesArchivoExcel v WHERE v.ArchivoId = a.Id)
+        """,
+        _si_no_existe_indice("IX_VersionesArchivoExcel_Hash", "VersionesArchivoExcel", """
+            CREATE INDEX IX_VersionesArchivoExcel_Hash ON VersionesArchivoExcel (HashContenido)
+        """),
+    ]),
+    (6, "Ingesta incremental de reportes por clave natural", [
+        """
+        IF OBJECT_ID('FilasReporte', 'U') IS NULL
+            CREATE TABLE FilasReporte (
+                ArchivoId INT NOT NULL FOREIGN KEY REFERENCES ArchivosExcel(Id) ON DELETE CASCADE,
+                ClaveHash BINARY(20) NOT NULL,
+                Clave NVARCHAR(450) NOT NULL,
+                HashFila CHAR(40) NOT NULL,
+                Datos NVARCHAR(MAX) NOT NULL,
+                Version INT NOT NULL,
+                CONSTRAINT PK_FilasReporte PRIMARY KEY (ArchivoId, ClaveHash)
+            )
+        """,
+        """
+        IF OBJECT_ID('CambiosReporte', 'U') IS NULL
+            CREATE TABLE CambiosReporte (
+                Id BIGINT IDENTITY(1,1) PRIMARY KEY,
+                ArchivoId INT NOT NULL FOREIGN KEY REFERENCES ArchivosExcel(Id) ON DELETE CASCADE,
+                Version INT NOT NULL,
+                Tipo CHAR(1) NOT NULL,
+                Clave NVARCHAR(450) NOT NULL,
+                DatosAnteriores NVARCHAR(MAX) NULL,
+                DatosNuevos NVARCHAR(MAX) NULL
+            )
+        """,
+        _si_no_existe_indice("IX_CambiosReporte_Archivo_Version", "CambiosReporte", """
+            CREATE INDEX IX_CambiosReporte_Archivo_Version ON CambiosReporte (ArchivoId, Version, Id)
+        """),
+        """
+        IF OBJECT_ID('IngestasReporte', 'U') IS NULL
+            CREATE TABLE IngestasReporte (
+                ArchivoId INT NOT NULL FOREIGN KEY REFERENCES ArchivosExcel(Id) ON DELETE CASCADE,
+                Version INT NOT NULL,
+                TipoReporte NVARCHAR(50) NOT NULL,
+                Insertadas INT NOT NULL,
+                Actualizadas INT NOT NULL,
+                Eliminadas INT NOT NULL,
+                SinCambios INT NOT NULL,
+                Omitidas INT NOT NULL,
+                DuracionMs INT NOT NULL,
+                Fecha DATETIME NOT NULL DEFAULT GETDATE(),
+                CONSTRAINT PK_IngestasReporte PRIMARY KEY (ArchivoId, Version)
+            )
+        """,
+        """
+        IF OBJECT_ID('AgregadosReporte', 'U') IS NULL
+            CREATE TABLE AgregadosReporte (
+                ArchivoId INT NOT NULL FOREIGN KEY REFERENCES ArchivosExcel(Id) ON DELETE CASCADE,
+                Columna NVARCHAR(100) NOT NULL,
+                Valor NVARCHAR(400) NOT NULL,
+                Filas INT NOT NULL,
+                CONSTRAINT PK_AgregadosReporte PRIMARY KEY (ArchivoId, Columna, Valor)
+            )
+        """,
+    ]),
+    (7, "ResultadosModulo (vistas precalculadas de los módulos de análisis)", [
+        """
+        IF OBJECT_ID('ResultadosModulo', 'U') IS NULL
+            CREATE TABLE ResultadosModulo (
+                FacultadCod CHAR(3) NOT NULL,
+                Modulo NVARCHAR(40) NOT NULL,
+                Periodo NVARCHAR(100) NULL,
+                Huella CHAR(40) NOT NULL,
+                Resultado NVARCHAR(MAX) NOT NULL,
+                Filas INT NOT NULL,
+                DuracionMs INT NOT NULL,
+                Fecha DATETIME NOT NULL DEFAULT GETDATE(),
+                CONSTRAINT PK_ResultadosModulo PRIMARY KEY (FacultadCod, Modulo)
+            )
+        """,
+    ]),
+    (8, "ParticionFacultad (partición de datos de cada facultad)", [
+        # Sin fila = partición principal; Estado 'moviendo' bloquea subidas (ver particiones.mover_facultad)
+        """
+        IF OBJECT_ID('ParticionFacultad', 'U') IS NULL
+            CREATE TABLE ParticionFacultad (
+                FacultadCod CHAR(3) NOT NULL PRIMARY KEY,
+                Particion NVARCHAR(40) NOT NULL,
+                Estado NVARCHAR(20) NOT NULL DEFAULT 'activa',
+                FechaCambio DATETIME NOT NULL DEFAULT GETDATE()
+            )
+        """,
+    ]),
+    (9, "LatidoReplica (retraso de las réplicas de lectura)", [
+        # Una fila; la escribe el monitor de réplicas en la primaria y la lee en cada réplica
+        """
+        IF OBJECT_ID('LatidoReplica', 'U') IS NULL
+            CREATE TABLE LatidoReplica (
+                Id INT NOT NULL PRIMARY KEY,
+                InstanteMs BIGINT NOT NULL
+            )
+        """,
+    ]),
+    (10, "AgregadosReporte: clave por hash del valor (límite de 900 bytes de la clave)", [
+        # (ArchivoId, Columna, Valor) ocupa hasta 1004 bytes; ISNULL hace la columna NOT NULL para la PK
+        """
+        IF COL_LENGTH('AgregadosReporte', 'ValorHash') IS NULL
+            ALTER TABLE AgregadosReporte
+                ADD ValorHash AS ISNULL(CAST(HASHBYTES('SHA1', Valor) AS BINARY(20)), 0x) PERSISTED
+        """,
+        """
+        IF EXISTS (
+            SELECT 1 FROM sys.index_columns ic
+            INNER JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+            INNER JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+            WHERE i.name = 'PK_AgregadosReporte' AND i.object_id = OBJECT_ID('AgregadosReporte') AND c.name = 'Valor'
+        )
+            ALTER TABLE AgregadosReporte DROP CONSTRAINT PK_AgregadosReporte
+        """,
+        """
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'PK_AgregadosReporte'
+                       AND object_id = OBJECT_ID('AgregadosReporte'))
+            ALTER TABLE AgregadosReporte
+                ADD CONSTRAINT PK_AgregadosReporte PRIMARY KEY (ArchivoId, Columna, ValorHash)
+        """,
+    ]),
+    (11, "ResultadosModulo: una vista guardada por periodo", [
+        # '' = facultad sin calificaciones (Periodo pasa a ser parte de la clave)
+        "UPDATE ResultadosModulo SET Periodo = '' WHERE Periodo IS NULL",
+        """
+        IF COLUMNPROPERTY(OBJECT_ID('ResultadosModulo'), 'Periodo', 'AllowsNull') = 1
+            ALTER TABLE ResultadosModulo ALTER COLUMN Periodo NVARCHAR(100) NOT NULL
+        """,
+        """
+        IF NOT EXISTS (
+            SELECT 1 FROM sys.index_columns ic
+            INNER JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+            INNER JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+            WHERE i.name = 'PK_ResultadosModulo' AND i.object_id = OBJECT_ID('ResultadosModulo') AND c.name = 'Periodo'
+        )
+            ALTER TABLE ResultadosModulo DROP CONSTRAINT PK_ResultadosModulo
+        """,
+        """
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'PK_ResultadosModulo'
+                       AND object_id = OBJECT_ID('ResultadosModulo'))
+            ALTER TABLE ResultadosModulo
+                ADD CONSTRAINT PK_ResultadosModulo PRIMARY KEY (FacultadCod, Modulo, Periodo)
+        """,
+    ]),
+]
+
+# Migraciones de las tablas de datos por facultad, que se aplican también en cada partición
+# (ArchivosExcel y sus tablas hijas, ResultadosModulo, LatidoReplica). En la 3 solo cuentan
+# los índices de ArchivosExcel: Usuarios y Carrera no existen en una partición.
+MIGRACIONES_PARTICION = {3, 4, 5, 6, 7, 9, 10, 11}
+
+
+def _crear_tabla_versiones(cur):
+    cur.execute("""
+        IF OBJECT_ID('VersionEsquema', 'U') IS NULL
+            CREATE TABLE VersionEsquema (
+                Version INT PRIMARY KEY,
+                Descripcion NVARCHAR(255) NOT NULL,
+                FechaAplicada DATETIME NOT NULL DEFAULT GETDATE(),
+                DuracionMs INT NOT NULL
+            )
+    """)
+
+
+def versiones_aplicadas(cur):
+    _crear_tabla_versiones(cur)
+    cur.execute("SELECT Version FROM VersionEsquema")
+    return {int(row[0]) for row in cur.fetchall()}
+
+
+def _migraciones_de(particion):
+    if particion == PARTICION_PRINCIPAL:
+        return MIGRACIONES
+    return [m for m in MIGRACIONES if m[0] in MIGRACIONES_PARTICION]
+
+
+def aplicar_migraciones(particion=PARTICION_PRINCIPAL):
+    """
+    Aplica en orden las migraciones pendientes de la principal o de una partición de datos.
+
+    Returns:
+        bool: True si el esquema quedó en la última versión
+    """
+    import time
+
+    conn = conectar(particion)
+    try:
+        cur = conn.cursor()
+        # Serializa migraciones entre procesos; se libera al cerrar la sesión
+        cur.execute("""
+            DECLARE @r INT;
+            EXEC @r = sp_getapplock @Resource = 'sisa_migraciones', @LockMode = 'Exclusive',
+                                    @LockOwner = 'Session', @LockTimeout = 120000;
+            SELECT @r;
+        """)
+        if cur.fetchone()[0] < 0:
+            print("❌ No se obtuvo el lock de migraciones (otro proceso está migrando)")
+            return False
+
+        if particion != PARTICION_PRINCIPAL:
+            cur.execute("SELECT OBJECT_ID('ArchivosExcel', 'U')")
+            if cur.fetchone()[0] is None:
+                print(f"⚠️ Partición '{particion}' sin preparar (python particiones.py --preparar {particion})")
+                return True
+
+        aplicadas = versiones_aplicadas(cur)
+        conn.commit()
+
+        pendientes = [m for m in _migraciones_de(particion) if m[0] not in aplicadas]
+        if not pendientes:
+            print(f"ℹ️ Esquema de '{particion}' al día (versión {max(aplicadas, default=0)})")
+            return True
+
+        for version, descripcion, sentencias in sorted(pendientes):
+            print(f"🔧 Aplicando migración {version} en '{particion}': {descripcion}...")
+            inicio = time.perf_counter()
+            try:
+                for sql in sentencias:
+                    cur.execute(sql)
+                duracion_ms = int((time.perf_counter() - inicio) * 1000)
+                cur.execute("INSERT INTO VersionEsquema (Version, Descripcion, DuracionMs) VALUES (?, ?, ?)",
+                            (version, descripcion, duracion_ms))
+                conn.commit()
+                print(f"✅ Migración {version} aplicada ({duracion_ms} ms)")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error en migración {version}: {e}")
+                return False
+
+        return True
+    except Exception as e:
+        print(f"❌ Error aplicando migraciones: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def estado_migraciones(particion=PARTICION_PRINCIPAL):
+    conn = conectar(particion)
+    try:
+        cur = conn.cursor()
+        aplicadas = versiones_aplicadas(cur)
+        conn.commit()
+        return [(version, descripcion, version in aplicadas) for version, descripcion, _ in _migraciones_de(particion)]
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    nombre = sys.argv[sys.argv.index("--particion") + 1] if "--particion" in sys.argv else PARTICION_PRINCIPAL
+    if "--estado" in sys.argv:
+        for version, descripcion, aplicada in estado_migraciones(nombre):
+            print(f"{'✅' if aplicada else '⏳'} {version:>3}  {descripcion}")
+    else:
+        sys.exit(0 if aplicar_migraciones(nombre) else 1)
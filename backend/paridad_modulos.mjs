@@ -0,0 +1,56 @@
+// Corre las reglas de las páginas de frontend/Modules sobre filas de prueba, sin navegador,
+// para comparar con precalculo.py (lo usa test_precalculo.py).
+//
+// Entrada (stdin): { periodo, calificaciones: [...], nomina: [...] }
+// Salida (stdout): { 'control-parcial', 'control-final', 'tercera-matricula', 'top-promedios', reportes }
+import { readFileSync } from 'node:fs';
+
+const MODULOS = new URL('../frontend/Modules/', import.meta.url);
+const CALIFICACIONES = 'academicTrackingData_REPORTE_RECORD_CALIFICACIONES_POR_PARCIAL_TOTAL_xlsx';
+const NOMINA = 'academicTrackingData_REPORTE_NOMINA_ESTUDIANTES_MATRICULADOS_LEGALIZADOS_xlsx';
+
+const entrada = JSON.parse(readFileSync(0, 'utf8'));
+const datos = { [CALIFICACIONES]: entrada.calificaciones, [NOMINA]: entrada.nomina };
+
+// Lo mínimo del navegador que tocan las páginas al cargarse; sin servidor calculan en local
+const guardado = new Map();
+globalThis.window = globalThis;
+globalThis.localStorage = { getItem: (k) => guardado.get(k) ?? null, setItem: (k, v) => guardado.set(k, String(v)) };
+globalThis.document = { addEventListener() {}, getElementById: () => null };
+globalThis.__paridad = {
+  loadData: async (clave) => datos[clave] ?? null,
+  fetchModulo: async () => null,
+  filasDesdeServidor: async () => null,
+  descargarExportacion: async () => {},
+  enviarCorreos: async () => {},
+  enviarCorreosNEE: async () => {},
+};
+
+// Carga una página con sus imports reemplazados por los de __paridad y exporta las funciones pedidas
+async function cargar(pagina, funciones, extra = '') {
+  const fuente = readFileSync(new URL(pagina, MODULOS), 'utf8')
+    .replace(/^import\s*\{([^}]*)\}\s*from\s*['"][^'"]+['"];?/gm, (_, nombres) => `const {${nombres}} = globalThis.__paridad;`);
+  const modulo = `${fuente}\n${extra}\nexport { ${funciones.join(', ')} };\n`;
+  return import(`data:text/javascript;base64,${Buffer.from(modulo).toString('base64')}`);
+}
+
+const { periodo } = entrada;
+const salida = {};
+
+for (const pagina of ['control-parcial', 'control-final', 'tercera-matricula']) {
+  const { buildRows } = await cargar(`${pagina}.js`, ['buildRows']);
+  salida[pagina] = (await buildRows(periodo, 'Todas')).rows;
+}
+
+// top-promedios dibuja al calcular: se captura lo que recibe renderResultados y se recorta como ella
+const top = await cargar('top-promedios.js', ['renderForPeriodo'],
+  'renderResultados = (resultados) => { globalThis.__paridad.top = resultados; };');
+top.renderForPeriodo(entrada.calificaciones, periodo);
+salida['top-promedios'] = Object.fromEntries(Object.entries(globalThis.__paridad.top).map(([clave, estudiantes]) =>
+  [clave, estudiantes.sort((a, b) => parseFloat(b.promedio) - parseFloat(a.promedio)).slice(0, 5)]));
+
+const reportes = await cargar('reportes.js', ['buildMetrics', 'computeTop10DocentesReprobados']);
+const filas = entrada.calificaciones.filter(r => (r.PERIODO ?? '').toString().trim() === periodo);
+salida.reportes = { ...reportes.buildMetrics(filas), topDocentes: reportes.computeTop10DocentesReprobados(filas) };
+
+process.stdout.write(JSON.stringify(salida));
@@ -0,0 +1,355 @@
+"""
+Particiones de datos por facultad.
+
+Los catálogos (Rol, Facultad, Carrera), Usuarios, plantillas y configuración
+viven siempre en la base principal. Los datos de cada facultad (ArchivosExcel,
+sus versiones, filas ingeridas y vistas precalculadas) viven en la partición
+que indica ParticionFacultad (sin fila = principal). Las particiones se
+configuran en DB_PARTICIONES (ver database.py); cada una numera sus archivos
+desde su idBase, así un Id de archivo basta para saber dónde está.
+
+Mover una facultad copia sus filas a la partición destino (Ids nuevos), cambia
+la asignación y, pasado PARTICION_TTL para que ningún worker siga usando la
+asignación en caché, borra las filas del origen. Mientras dura, las subidas de
+esa facultad responden 409 y sus ingestas esperan.
+
+Uso manual (desde backend/):
+    python particiones.py --estado
+    python particiones.py --preparar <particion>
+    python particiones.py --mover <FacultadCod> <particion>
+"""
+import sys
+import threading
+import time
+
+from database import (
+    PARTICION_PRINCIPAL,
+    PARTICION_TTL,
+    PARTICIONES,
+    conectar,
+    invalidar_particiones,
+    particion_de_facultad,
+)
+from migraciones import aplicar_migraciones
+from vuelos import marcar_cambio
+
+# ======================= CONFIG ===========================
+MOVER_LOTE = 1000
+
+# Tablas hijas de ArchivosExcel que se copian al mover (ArchivoId va primero y se reasigna)
+TABLAS_ARCHIVO = [
+    ("VersionesArchivoExcel", ["ArchivoId", "Version", "HashContenido", "Tamano", "TipoMime", "FechaSubida",
+                               "SubidoPor"], "Version"),
+    ("FilasReporte", ["ArchivoId", "ClaveHash", "Clave", "HashFila", "Datos", "Version"], "ClaveHash"),
+    ("CambiosReporte", ["ArchivoId", "Version", "Tipo", "Clave", "DatosAnteriores", "DatosNuevos"], "Id"),
+    ("IngestasReporte", ["ArchivoId", "Version", "TipoReporte", "Insertadas", "Actualizadas", "Eliminadas",
+                         "SinCambios", "Omitidas", "DuracionMs", "Fecha"], "Version"),
+    ("AgregadosReporte", ["ArchivoId", "Columna", "Valor", "Filas"], "Columna"),
+]
+COLUMNAS_ARCHIVO = ["NombreArchivo", "TipoMime", "Datos", "FechaSubida", "FacultadCod", "HashContenido",
+                    "Tamano", "VersionActual"]
+
+
+class MovimientoEnCurso(Exception):
+    """Otro proceso ya está moviendo esa facultad"""
+
+
+def esquema_particion(id_base):
+    """
+    ArchivosExcel tal como la crea database.crear_base_datos, sin la FK a Facultad (el
+    catálogo está en la principal). El resto del esquema sale de las migraciones
+    (ver migraciones.MIGRACIONES_PARTICION).
+    """
+    return f"""
+        IF OBJECT_ID('ArchivosExcel', 'U') IS NULL
+            CREATE TABLE ArchivosExcel (
+                Id INT PRIMARY KEY IDENTITY({id_base + 1},1),
+                NombreArchivo NVARCHAR(255) NOT NULL,
+                TipoMime NVARCHAR(100) NOT NULL,
+                Datos VARBINARY(MAX) NOT NULL,
+                FechaSubida DATETIME DEFAULT GETDATE(),
+                FacultadCod CHAR(3) NOT NULL
+            )
+    """
+
+
+# ======================= ADMINISTRACIÓN ===========================
+def preparar_particion(nombre):
+    """
+    Crea (si falta) ArchivosExcel en una partición y le aplica las migraciones de datos;
+    los Ids de archivo empiezan en idBase + 1
+    """
+    if nombre == PARTICION_PRINCIPAL:
+        raise ValueError("La partición principal se prepara con las migraciones")
+    if nombre not in PARTICIONES:
+        raise ValueError(f"Partición desconocida: {nombre}")
+    conn = conectar(nombre)
+    try:
+        cur = conn.cursor()
+        cur.execute(esquema_particion(int(PARTICIONES[nombre].get("idBase", 0))))
+        conn.commit()
+    finally:
+        conn.close()
+    if not aplicar_migraciones(nombre):
+        raise RuntimeError(f"No se pudieron aplicar las migraciones en la partición '{nombre}'")
+    print(f"✅ Partición '{nombre}' preparada")
+
+
+def estado_particiones():
+    """
+    Returns:
+        list: por partición {particion, idBase, facultades, archivos, maxId, error?}
+    """
+    conn = conectar()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT FacultadCod, Particion, Estado, FechaCambio FROM ParticionFacultad ORDER BY FacultadCod")
+        asignaciones = {row[0].strip(): (row[1], row[2], row[3]) for row in cur.fetchall()}
+    finally:
+        conn.close()
+
+    estado = []
+    for nombre, config in PARTICIONES.items():
+        item = {'particion': nombre, 'idBase': config.get("idBase", 0)}
+        try:
+            conn = conectar(nombre)
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT FacultadCod, COUNT(*), MAX(Id) FROM ArchivosExcel GROUP BY FacultadCod")
+                filas = cur.fetchall()
+            finally:
+                conn.close()
+            item['archivos'] = sum(row[1] for row in filas)
+            item['maxId'] = max((row[2] for row in filas), default=None)
+            item['facultades'] = [{
+                'facultadCod': row[0].strip(),
+                'archivos': row[1],
+                # Filas de una facultad asignada a otra partición (p. ej. un movimiento interrumpido)
+                'asignada': (asignaciones.get(row[0].strip()) or (PARTICION_PRINCIPAL,))[0] == nombre,
+                'estado': (asignaciones.get(row[0].strip()) or (None, 'activa'))[1]
+            } for row in filas]
+        except Exception as e:
+            item['error'] = str(e)
+        estado.append(item)
+    return estado
+
+
+# ======================= MOVIMIENTO ===========================
+def _copiar_tabla(cur_origen, cur_destino, tabla, columnas, orden, facultad_cod, mapa_ids):
+    lista = ", ".join(f"t.{c}" for c in columnas)
+    cur_origen.execute(f"""
+        SELECT {lista} FROM {tabla} t
+        INNER JOIN ArchivosExcel a ON a.Id = t.ArchivoId
+        WHERE a.FacultadCod = ?
+        ORDER BY t.ArchivoId, t.{orden}
+    """, (facultad_cod,))
+    insertar = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})"
+    copiadas = 0
+    while True:
+        filas = cur_origen.fetchmany(MOVER_LOTE)
+        if not filas:
+            return copiadas
+        cur_destino.executemany(insertar, [(mapa_ids[row[0]], *row[1:]) for row in filas])
+        copiadas += len(filas)
+
+
+def mover_facultad(facultad_cod, destino, espera=PARTICION_TTL):
+    """
+    Mueve los datos de una facultad a otra partición.
+
+    Returns:
+        dict: {facultadCod, origen, destino, archivos, filas: {tabla: n}, ids: {viejo: nuevo}, totalMs}
+    """
+    facultad_cod = facultad_cod.strip().upper()
+    if destino not in PARTICIONES:
+        raise ValueError(f"Partición desconocida: {destino}")
+    inicio = time.perf_counter()
+
+    principal = conectar()
+    origen_conn = destino_conn = None
+    marcada = False
+    try:
+        cur_p = principal.cursor()
+        # Un movimiento por facultad en toda la flota; se libera al cerrar la sesión
+        cur_p.execute("""
+            DECLARE @r INT;
+            EXEC @r = sp_getapplock @Resource = ?, @LockMode = 'Exclusive',
+                                    @LockOwner = 'Session', @LockTimeout = 0;
+            SELECT @r;
+        """, (f"sisa_mover_{facultad_cod}",))
+        if cur_p.fetchone()[0] < 0:
+            raise MovimientoEnCurso(f"La facultad {facultad_cod} ya se está moviendo")
+
+        cur_p.execute("SELECT 1 FROM Facultad WHERE FacultadCod = ?", (facultad_cod,))
+        if not cur_p.fetchone():
+            raise ValueError(f"La facultad {facultad_cod} no existe")
+        cur_p.execute("SELECT Particion FROM ParticionFacultad WHERE FacultadCod = ?", (facultad_cod,))
+        row = cur_p.fetchone()
+        origen = row[0] if row else PARTICION_PRINCIPAL
+        if origen == destino:
+            raise ValueError(f"La facultad {facultad_cod} ya está en la partición '{destino}'")
+
+        # Desde aquí las subidas de la facultad responden 409 (se verifica sin caché)
+        cur_p.execute("""
+            MERGE ParticionFacultad AS t
+            USING (SELECT ? AS FacultadCod) AS s ON t.FacultadCod = s.FacultadCod
+            WHEN MATCHED THEN UPDATE SET Estado = 'moviendo', FechaCambio = GETDATE()
+            WHEN NOT MATCHED THEN INSERT (FacultadCod, Particion, Estado) VALUES (s.FacultadCod, ?, 'moviendo');
+        """, (facultad_cod, origen))
+        principal.commit()
+        marcada = True
+        print(f"🚚 Moviendo facultad {facultad_cod}: {origen} -> {destino}")
+
+        origen_conn, destino_conn = conectar(origen), conectar(destino)
+        cur_o, cur_d = origen_conn.cursor(), destino_conn.cursor()
+        # Bloquea altas y cambios de archivos de la facultad en el origen hasta el borrado final
+        cur_o.execute("""
+            SELECT Id FROM ArchivosExcel WITH (UPDLOCK, HOLDLOCK) WHERE FacultadCod = ? ORDER BY Id
+        """, (facultad_cod,))
+        ids = [row[0] for row in cur_o.fetchall()]
+        # Espera las ingestas en curso y bloquea las siguientes (mismo lock que ingesta.ingerir_version)
+        for archivo_id in ids:
+            cur_o.execute("""
+                DECLARE @r INT;
+                EXEC @r = sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Transaction',
+                                        @LockTimeout = 300000;
+                SELECT @r;
+            """, (f"sisa_ingesta_{archivo_id}",))
+            resultado_lock = cur_o.fetchone()[0]
+            if resultado_lock < 0:
+                raise RuntimeError(f"No se obtuvo el lock de ingesta del archivo {archivo_id} (código {resultado_lock})")
+
+        mapa_ids = {}
+        filas = {}
+        try:
+            # Restos de un movimiento anterior que no terminó: el destino no es la partición asignada,
+            # nadie los lee, y se borran para que repetir el movimiento no duplique archivos
+            cur_d.execute("DELETE FROM ArchivosExcel WHERE FacultadCod = ?", (facultad_cod,))
+            if cur_d.rowcount > 0:
+                print(f"🧹 {cur_d.rowcount} archivos de {facultad_cod} que quedaban en '{destino}' descartados")
+            cur_d.execute("DELETE FROM ResultadosModulo WHERE FacultadCod = ?", (facultad_cod,))
+
+            for archivo_id in ids:
+                cur_o.execute(f"SELECT {', '.join(COLUMNAS_ARCHIVO)} FROM ArchivosExcel WHERE Id = ?", (archivo_id,))
+                valores = cur_o.fetchone()
+                cur_d.execute(f"""
+                    INSERT INTO ArchivosExcel ({', '.join(COLUMNAS_ARCHIVO)})
+                    OUTPUT INSERTED.Id
+                    VALUES ({', '.join('?' * len(COLUMNAS_ARCHIVO))})
+                """, tuple(valores))
+                mapa_ids[archivo_id] = cur_d.fetchone()[0]
+
+            cur_d.fast_executemany = True
+            for tabla, columnas, orden in TABLAS_ARCHIVO:
+                filas[tabla] = _copiar_tabla(cur_o, cur_d, tabla, columnas, orden, facultad_cod, mapa_ids)
+            destino_conn.commit()
+        except Exception:
+            destino_conn.rollback()
+            raise
+
+        try:
+            cur_p.execute("""
+                UPDATE ParticionFacultad SET Particion = ?, FechaCambio = GETDATE() WHERE FacultadCod = ?
+            """, (destino, facultad_cod))
+            principal.commit()
+        except Exception:
+            # La asignación sigue en el origen: se descarta la copia
+            cur_d.execute("DELETE FROM ArchivosExcel WHERE FacultadCod = ?", (facultad_cod,))
+            destino_conn.commit()
+            raise
+        invalidar_particiones()
+        # Los archivos cambian de Id: los vuelos de /files y /download en curso ya no se comparten
+        marcar_cambio(facultad_cod)
+        print(f"🔀 {facultad_cod} asignada a '{destino}' ({len(ids)} archivos); esperando {espera} s a los workers")
+
+        # Los workers que aún tengan el origen en caché lo ven hasta que expire PARTICION_TTL
+        time.sleep(espera)
+        cur_o.execute("DELETE FROM ArchivosExcel WHERE FacultadCod = ?", (facultad_cod,))
+        cur_o.execute("DELETE FROM ResultadosModulo WHERE FacultadCod = ?", (facultad_cod,))
+        origen_conn.commit()
+
+        total_ms = int((time.perf_counter() - inicio) * 1000)
+        print(f"✅ Facultad {facultad_cod} movida a '{destino}' en {total_ms} ms")
+        return {
+            'facultadCod': facultad_cod,
+            'origen': origen,
+            'destino': destino,
+            'archivos': len(ids),
+            'filas': filas,
+            'ids': mapa_ids,
+            'totalMs': total_ms
+        }
+    except Exception:
+        if origen_conn is not None:
+            origen_conn.rollback()
+        raise
+    finally:
+        # Vuelve a admitir subidas (en la partición que haya quedado asignada)
+        if marcada:
+            try:
+                cur_p.execute("UPDATE ParticionFacultad SET Estado = 'activa' WHERE FacultadCod = ?", (facultad_cod,))
+                principal.commit()
+            except Exception as e:
+                print(f"❌ No se pudo reactivar la facultad {facultad_cod}: {e}")
+        for conn in (origen_conn, destino_conn, principal):
+            if conn is not None:
+                conn.close()
+
+
+class MovedorParticiones:
+    """Movimientos en segundo plano (duran al menos PARTICION_TTL); el progreso es por worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._movimientos = {}
+
+    def _ejecutar(self, facultad_cod, destino):
+        try:
+            resultado = mover_facultad(facultad_cod, destino)
+            estado = {'estado': 'listo', 'resultado': {k: v for k, v in resultado.items() if k != 'ids'}}
+        except Exception as e:
+            print(f"❌ Error moviendo la facultad {facultad_cod}: {e}")
+            estado = {'estado': 'error', 'error': str(e)}
+        with self._lock:
+            self._movimientos[facultad_cod].update(estado)
+
+    def iniciar(self, facultad_cod, destino):
+        if destino not in PARTICIONES:
+            raise ValueError(f"Partición desconocida: {destino}")
+        with self._lock:
+            if (self._movimientos.get(facultad_cod) or {}).get('estado') == 'moviendo':
+                raise MovimientoEnCurso(f"La facultad {facultad_cod} ya se está moviendo")
+            self._movimientos[facultad_cod] = {'facultadCod': facultad_cod, 'origen': particion_de_facultad(facultad_cod),
+                                               'destino': destino, 'estado': 'moviendo'}
+            threading.Thread(target=self._ejecutar, args=(facultad_cod, destino),
+                             name=f"mover-{facultad_cod}", daemon=True).start()
+            return dict(self._movimientos[facultad_cod])
+
+    def progreso(self):
+        with self._lock:
+            return [dict(m) for m in self._movimientos.values()]
+
+
+movedor = MovedorParticiones()
+
+
+if __name__ == '__main__':
+    if "--preparar" in sys.argv:
+        preparar_particion(sys.argv[sys.argv.index("--preparar") + 1])
+    elif "--mover" in sys.argv:
+        i = sys.argv.index("--mover")
+        resumen = mover_facultad(sys.argv[i + 1], sys.argv[i + 2])
+        print(f"   {resumen['archivos']} archivos, filas: {resumen['filas']}")
+        for viejo, nuevo in resumen['ids'].items():
+            print(f"   archivo {viejo} -> {nuevo}")
+    elif "--estado" in sys.argv:
+        for p in estado_particiones():
+            if 'error' in p:
+                print(f"❌ {p['particion']}: {p['error']}")
+                continue
+            print(f"📦 {p['particion']} (idBase {p['idBase']}): {p['archivos']} archivos, máx. Id {p['maxId']}")
+            for f in p['facultades']:
+                marca = "" if f['asignada'] else "  ⚠️ no asignada aquí"
+                print(f"   {f['facultadCod']}: {f['archivos']} archivos [{f['estado']}]{marca}")
+    else:
+        print(__doc__)
@@ -0,0 +1,262 @@
+"""
+Perfilado de consultas SQL.
+
+conectar() devuelve conexiones envueltas cuyos cursores miden cada sentencia:
+SQL normalizado, cantidad de parámetros, tiempo y filas devueltas/afectadas.
+Cada worker mantiene un resumen por sentencia, las N ejecuciones más lentas y
+el número de consultas por request (para detectar patrones N+1). Los admins lo
+consultan en GET /admin/consultas-sql.
+"""
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from metricas import duracion_sql, consultas_por_solicitud
+
+# ======================= CONFIG ===========================
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", "200"))
+SQL_TOP_LENTAS = int(os.getenv("SQL_TOP_LENTAS", "20"))
+SQL_MAX_SENTENCIAS = int(os.getenv("SQL_MAX_SENTENCIAS", "500"))
+# Consultas por request a partir de las cuales se avisa de un posible N+1
+SQL_ALERTA_POR_REQUEST = int(os.getenv("SQL_ALERTA_POR_REQUEST", "25"))
+
+_LITERAL_TEXTO = re.compile(r"N?'(?:[^']|'')*'")
+_LITERAL_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_sql(sql):
+    """Colapsa espacios y reemplaza literales por ? para agrupar sentencias equivalentes"""
+    sql = _LITERAL_TEXTO.sub("?", sql)
+    sql = _LITERAL_NUMERO.sub("?", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+def _operacion(sql_normalizado):
+    primera = sql_normalizado.split(" ", 1)[0].upper()
+    return primera if primera in ("SELECT", "INSERT", "UPDATE", "DELETE", "MERGE", "WITH", "EXEC") else "OTRA"
+
+
+# ======================= REGISTRO POR WORKER ===========================
+class RegistroConsultas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sentencias = {}
+        self._lentas = []  # heap (ms, orden, ejecucion)
+        self._orden = itertools.count()
+        self._rutas = {}
+
+    def registrar(self, ejecucion):
+        sql = ejecucion["sql"]
+        with self._lock:
+            stats = self._sentencias.get(sql)
+            if stats is None:
+                if len(self._sentencias) >= SQL_MAX_SENTENCIAS:
+                    # Descarta la sentencia con menos tiempo acumulado
+                    del self._sentencias[min(self._sentencias, key=lambda k: self._sentencias[k]["totalMs"])]
+                stats = self._sentencias[sql] = {"sql": sql, "ejecuciones": 0, "totalMs": 0.0,
+                                                 "maxMs": 0.0, "filas": 0}
+            stats["ejecuciones"] += 1
+            stats["totalMs"] += ejecucion["ms"]
+            stats["maxMs"] = max(stats["maxMs"], ejecucion["ms"])
+
+            entrada = (ejecucion["ms"], next(self._orden), ejecucion)
+            if len(self._lentas) < SQL_TOP_LENTAS:
+                heapq.heappush(self._lentas, entrada)
+            elif entrada[0] > self._lentas[0][0]:
+                heapq.heapreplace(self._lentas, entrada)
+
+    def sumar_filas(self, sql, filas):
+        with self._lock:
+            stats = self._sentencias.get(sql)
+            if stats:
+                stats["filas"] += filas
+
+    def registrar_request(self, ruta, consultas, ms):
+        with self._lock:
+            r = self._rutas.setdefault(ruta, {"ruta": ruta, "requests": 0, "consultas": 0,
+                                              "maxConsultas": 0, "totalMs": 0.0})
+            r["requests"] += 1
+            r["consultas"] += consultas
+            r["maxConsultas"] = max(r["maxConsultas"], consultas)
+            r["totalMs"] += ms
+
+    def reporte(self, limite=20):
+        with self._lock:
+            sentencias = [dict(s, promedioMs=round(s["totalMs"] / s["ejecuciones"], 2),
+                               totalMs=round(s["totalMs"], 2), maxMs=round(s["maxMs"], 2))
+                          for s in self._sentencias.values()]
+            lentas = [dict(e) for _, _, e in sorted(self._lentas, reverse=True)]
+            rutas = [dict(r, promedioConsultas=round(r["consultas"] / r["requests"], 2),
+                          totalMs=round(r["totalMs"], 2))
+                     for r in self._rutas.values()]
+        sentencias.sort(key=lambda s: s["totalMs"], reverse=True)
+        rutas.sort(key=lambda r: r["promedioConsultas"], reverse=True)
+        return {
+            "pid": os.getpid(),
+            "umbralLentaMs": SQL_LENTA_MS,
+            "porTiempoTotal": sentencias[:limite],
+            "masLentas": lentas[:limite],
+            "consultasPorRuta": rutas[:limite]
+        }
+
+    def reiniciar(self):
+        with self._lock:
+            self._sentencias.clear()
+            self._lentas.clear()
+            self._rutas.clear()
+
+
+registro = RegistroConsultas()
+
+# Contador de la request en curso: [consultas, ms]
+_contador_request = ContextVar("contador_sql", default=None)
+
+
+def _anotar(sql_original, parametros, inicio, filas_afectadas):
+    ms = (time.perf_counter() - inicio) * 1000
+    sql = normalizar_sql(sql_original)
+    ejecucion = {
+        "sql": sql,
+        "parametros": parametros,
+        "ms": round(ms, 2),
+        "filasAfectadas": filas_afectadas,
+        "momento": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    registro.registrar(ejecucion)
+    duracion_sql.labels(_operacion(sql)).observe(ms / 1000)
+
+    contador = _contador_request.get()
+    if contador is not None:
+        contador[0] += 1
+        contador[1] += ms
+    if ms >= SQL_LENTA_MS:
+        print(f"🐢 SQL lenta ({ms:.0f} ms, {parametros} params): {sql[:300]}")
+    return sql
+
+
+# ======================= ENVOLTORIOS pyodbc ===========================
+class CursorInstrumentado:
+    """Cursor pyodbc que mide execute/executemany y cuenta las filas leídas"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._sql = None
+
+    def execute(self, sql, *params):
+        parametros = len(params[0]) if len(params) == 1 and isinstance(params[0], (list, tuple)) else len(params)
+        inicio = time.perf_counter()
+        self._cursor.execute(sql, *params)
+        self._sql = _anotar(sql, parametros, inicio, self._cursor.rowcount)
+        return self
+
+    def executemany(self, sql, filas):
+        filas = list(filas)
+        inicio = time.perf_counter()
+        self._cursor.executemany(sql, filas)
+        self._sql = _anotar(sql, len(filas[0]) if filas else 0, inicio, len(filas))
+        return self
+
+    def _leidas(self, n):
+        if self._sql and n:
+            registro.sumar_filas(self._sql, n)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        self._leidas(1 if fila is not None else 0)
+        return fila
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._leidas(len(filas))
+        return filas
+
+    def fetchmany(self, size=None):
+        filas = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        self._leidas(len(filas))
+        return filas
+
+    def __iter__(self):
+        for fila in self._cursor:
+            self._leidas(1)
+            yield fila
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        if nombre in ("_cursor", "_sql"):
+            object.__setattr__(self, nombre, valor)
+        else:
+            # fast_executemany y demás atributos van al cursor real
+            setattr(self._cursor, nombre, valor)
+
+
+class ConexionInstrumentada:
+    """Conexión pyodbc cuyos cursores son CursorInstrumentado"""
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+
+    def cursor(self):
+        return CursorInstrumentado(self._conexion.cursor())
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def __enter__(self):
+        self._conexion.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conexion.__exit__(*exc)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __setattr__(self, nombre, valor):
+        if nombre == "_conexion":
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self._conexion, nombre, valor)
+
+
+# ======================= INTEGRACIÓN FLASK ===========================
+def instrumentar_flask(app):
+    """Cuenta las consultas de cada request y las reporta en X-Consultas-SQL / X-Tiempo-SQL-Ms"""
+    from flask import request, g
+
+    @app.before_request
+    def _inicio_contador_sql():
+        g.token_contador_sql = _contador_request.set([0, 0.0])
+
+    @app.after_request
+    def _fin_contador_sql(response):
+        contador = _contador_request.get()
+        if contador is None:
+            return response
+        consultas, ms = contador
+        ruta = request.url_rule.rule if request.url_rule else "sin_ruta"
+        registro.registrar_request(ruta, consultas, ms)
+        consultas_por_solicitud.labels(ruta).observe(consultas)
+        response.headers["X-Consultas-SQL"] = str(consultas)
+        response.headers["X-Tiempo-SQL-Ms"] = f"{ms:.1f}"
+        if consultas >= SQL_ALERTA_POR_REQUEST:
+            print(f"⚠️ {request.method} {ruta}: {consultas} consultas SQL en un request (¿N+1?)")
+        return response
+
+    @app.teardown_request
+    def _reset_contador_sql(exc):
+        token = g.pop("token_contador_sql", None)
+        if token is not None:
+            _contador_request.reset(token)
@@ -0,0 +1,567 @@
+"""
+Precálculo de los módulos de análisis (top-promedios, control-parcial,
+control-final, tercera-matricula, nee-control, reportes).
+
+Cada módulo se calcula a partir de las filas ingeridas (FilasReporte) de la
+facultad, con las mismas reglas que su página en frontend/Modules. Cuando una
+ingesta termina, el Precalculador calcula la vista por defecto (periodo más
+reciente, todas las carreras) de cada módulo y la guarda en ResultadosModulo
+junto con su duración. La vista guardada vale mientras no cambie la huella de
+la facultad (última versión ingerida de cada archivo), así que la primera
+visita después de una subida ya es un acierto de caché.
+
+ResultadosModulo guarda una vista por periodo (clave FacultadCod, Modulo, Periodo):
+los periodos anteriores se calculan en la primera visita y quedan guardados hasta
+la siguiente ingesta. Las vistas filtradas por carrera no se guardan.
+
+Las reglas replican las de las páginas de frontend/Modules, que las siguen usando
+cuando el servidor no tiene reportes ingeridos; test_precalculo.py comprueba con
+paridad_modulos.mjs que ambas den lo mismo.
+
+Precálculo manual (desde backend/):
+    python precalculo.py <facultad_cod> [<facultad_cod> ...]
+"""
+import hashlib
+import json
+import queue
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from database import conectar_facultad
+from exportacion import (
+    ENCABEZADOS_CONTROL_FINAL,
+    archivos_de_tipo,
+    filas_de_cursor,
+    fila_control_final,
+    fijo,
+    formato_numero,
+    valor_numerico
+)
+
+# ======================= CONFIG ===========================
+# Subir cuando cambie la lógica de algún módulo: invalida todo lo guardado
+VERSION_MODULOS = 3
+
+# Asignaturas esperadas por nivel (top-promedios.js)
+CARRERAS_TOP = {
+    'ENTRENAMIENTO DEPORTIVO': ('ED', {'1': 7, '2': 7, '3': 7, '4': 6, '5': 5, '6': 5, '7': 5, '8': 5}),
+    'PEDAGOGÍA DE LA ACTIVIDAD FÍSICA Y DEPORTE': ('PAF', {'1': 7, '2': 7, '3': 7, '4': 6, '5': 6, '6': 5, '7': 5, '8': 6, '9': 4}),
+}
+# Umbrales de control-parcial.js
+ASISTENCIA_BUENA, PARCIAL_BUENO, ASISTENCIA_MINIMA, PARCIAL_MINIMO = 70, 7, 40, 4
+
+_PERIODO_CICLO = re.compile(r"(\d{4})\s*-\s*(\d{4})\s+(CI{1,2})")
+_DOCENTE = re.compile(r"^\s*(\d{6,})\s*-\s*([A-Za-zÁÉÍÓÚÜÑáéíóúüñ\s.'-]+)\s*$")
+_MATERIAS_EXCLUIDAS = [re.compile(r"^INGLES\s+(I|II|III|IV)\b")]
+
+
+class ModuloDesconocido(ValueError):
+    """El módulo pedido no existe"""
+
+
+# ======================= DATOS DE LA FACULTAD ===========================
+def periodo_anterior(periodo):
+    """'2025 - 2026 CI' -> '2024 - 2025 CII'; 'x CII' -> 'x CI' (tercera-matricula.js)"""
+    m = _PERIODO_CICLO.search(periodo or "")
+    if not m:
+        return None
+    y1, y2, ciclo = m.groups()
+    return f"{y1} - {y2} CI" if ciclo == "CII" else f"{int(y1) - 1} - {int(y2) - 1} CII"
+
+
+def huella_facultad(cur, facultad_cod):
+    """Identifica el estado de los datos: cambia con cada ingesta de un archivo de la facultad"""
+    cur.execute("""
+        SELECT a.Id, MAX(i.Version) FROM ArchivosExcel a
+        INNER JOIN IngestasReporte i ON i.ArchivoId = a.Id
+        WHERE a.FacultadCod = ?
+        GROUP BY a.Id ORDER BY a.Id
+    """, (facultad_cod,))
+    partes = [f"{archivo}:{version}" for archivo, version in cur.fetchall()]
+    return hashlib.sha1(f"v{VERSION_MODULOS}|{','.join(partes)}".encode()).hexdigest()
+
+
+class DatosFacultad:
+    """Filas ingeridas que necesitan los módulos; se leen una vez por pasada de precálculo"""
+
+    def __init__(self, cur, facultad_cod, periodo=None, carrera=None):
+        self.calificaciones = archivos_de_tipo(cur, facultad_cod, "calificaciones")
+        self.periodos, self.carreras = [], []
+        self.actuales, self.anteriores = [], []
+        self.nee = {}
+        self.estudiantes_por_periodo = {}
+        if not self.calificaciones:
+            self.periodo = self.periodo_anterior = None
+            return
+
+        marcas = ",".join("?" * len(self.calificaciones))
+        cur.execute(f"""
+            SELECT JSON_VALUE(Datos, '$.PERIODO'), COUNT(DISTINCT JSON_VALUE(Datos, '$.IDENTIFICACION'))
+            FROM FilasReporte WHERE ArchivoId IN ({marcas})
+            GROUP BY JSON_VALUE(Datos, '$.PERIODO')
+        """, self.calificaciones)
+        self.estudiantes_por_periodo = {p: n for p, n in cur.fetchall() if p}
+        self.periodos = sorted(self.estudiantes_por_periodo, reverse=True)
+        self.periodo = periodo if periodo in self.estudiantes_por_periodo else next(iter(self.periodos), None)
+        self.periodo_anterior = periodo_anterior(self.periodo)
+
+        cur.execute(f"""
+            SELECT Datos FROM FilasReporte
+            WHERE ArchivoId IN ({marcas}) AND JSON_VALUE(Datos, '$.PERIODO') IN (?, ?)
+        """, [*self.calificaciones, self.periodo, self.periodo_anterior or self.periodo])
+        carreras = set()
+        for (datos,) in filas_de_cursor(cur):
+            fila = json.loads(datos)
+            if fila.get("PERIODO") == self.periodo and fila.get("CARRERA"):
+                carreras.add(fila["CARRERA"])
+            if carrera and fila.get("CARRERA") != carrera:
+                continue
+            (self.actuales if fila.get("PERIODO") == self.periodo else self.anteriores).append(fila)
+        self.actuales.sort(key=lambda f: (f.get("APELLIDOS") or "", f.get("NOMBRES") or ""))
+        # Carreras del periodo (sin el filtro) para el selector de las páginas
+        self.carreras = sorted(carreras)
+
+        nominas = archivos_de_tipo(cur, facultad_cod, "nomina")
+        if nominas:
+            cur.execute(f"""
+                SELECT JSON_VALUE(Datos, '$.IDENTIFICACION'), JSON_VALUE(Datos, '$.DISCAPACIDAD'),
+                       JSON_VALUE(Datos, '$."PORCENTAJE DISCAPACIDAD"'), JSON_VALUE(Datos, '$.NIVEL')
+                FROM FilasReporte
+                WHERE ArchivoId IN ({",".join("?" * len(nominas))})
+                  AND ISNULL(JSON_VALUE(Datos, '$.DISCAPACIDAD'), '') <> ''
+            """, nominas)
+            self.nee = {row[0]: (row[1], row[2] or "", row[3] or "") for row in filas_de_cursor(cur)}
+
+    def texto_nee(self, identificacion):
+        discapacidad, porcentaje, _ = self.nee.get(identificacion, ("", "", ""))
+        return f"{discapacidad} {porcentaje}%" if porcentaje else discapacidad
+
+
+def _estudiante(fila):
+    return f"{fila.get('APELLIDOS') or ''} {fila.get('NOMBRES') or ''}"
+
+
+def _correos(fila, separador="; "):
+    return separador.join(c for c in (fila.get("CORREO_INSTITUCIONAL"), fila.get("CORREO_PERSONAL")) if c)
+
+
+def _canon(texto):
+    texto = unicodedata.normalize("NFD", texto or "")
+    return " ".join("".join(c for c in texto if not unicodedata.combining(c)).split()).upper()
+
+
+# ======================= MÓDULOS ===========================
+def _control_final(datos):
+    mapa_nee = {i: datos.texto_nee(i) for i in datos.nee}
+    filas = (fila_control_final(f, mapa_nee) for f in datos.actuales)
+    return [dict(zip(ENCABEZADOS_CONTROL_FINAL, f)) for f in filas if f is not None]
+
+
+def _control_parcial(datos):
+    resultado = []
+    for fila in datos.actuales:
+        identificacion = fila.get("IDENTIFICACION")
+        no_vez = valor_numerico(fila.get("NO. VEZ"))
+        if not identificacion or no_vez is None:
+            continue
+        nee = datos.texto_nee(identificacion)
+        if no_vez < (1 if nee else 2):
+            continue
+        asistencia = valor_numerico(fila.get("ASISTENCIA_PRIMER_PARCIAL"))
+        parcial = valor_numerico(fila.get("PRIMER_PARCIAL"))
+        if asistencia is None and parcial is None:
+            continue
+
+        critico = (asistencia is not None and asistencia < ASISTENCIA_MINIMA) or (parcial is not None and parcial < PARCIAL_MINIMO)
+        alerta = (asistencia is not None and asistencia < ASISTENCIA_BUENA) or (parcial is not None and parcial < PARCIAL_BUENO)
+        if not critico and not alerta:
+            continue
+        resultado.append({
+            'Identificación': identificacion,
+            'Estudiante': _estudiante(fila),
+            'Correo': _correos(fila),
+            'NEE': nee,
+            'Nivel': fila.get("NIVEL") or "",
+            'Carrera': fila.get("CARRERA") or "",
+            'Materia': f"[{formato_numero(no_vez)}] {fila.get('MATERIA') or ''} "
+                       f"({fila.get('DOCENTE') or ''} : {fila.get('GRUPO/PARALELO') or ''})",
+            'Asistencia': f"{fijo(asistencia, 1)}%" if asistencia is not None else "-",
+            'Parcial': fijo(parcial, 2) if parcial is not None else "-",
+            'Estado': '💀' if critico else '⚠️',
+        })
+    return resultado
+
+
+def _tercera_matricula(datos):
+    actuales = {
+        (f.get("IDENTIFICACION"), f.get("MATERIA")) for f in datos.actuales
+        if valor_numerico(f.get("NO. VEZ")) == 3
+    }
+    resultado = {}
+    for fila in datos.anteriores:
+        clave = (fila.get("IDENTIFICACION"), fila.get("MATERIA"))
+        promedio = valor_numerico(fila.get("PROMEDIO"))
+        if not all(clave) or valor_numerico(fila.get("NO. VEZ")) != 2 or clave in actuales:
+            continue
+        # Como en el frontend, un promedio vacío cuenta como reprobado
+        if promedio is not None and promedio >= 7:
+            continue
+        partes = (fila.get("DOCENTE") or "").split(" - ")
+        docente = partes[1].strip() if len(partes) == 2 else (fila.get("DOCENTE") or "")
+        materia = clave[1]
+        resultado[clave] = {
+            'Identificacion': clave[0],
+            'Estudiante': _estudiante(fila).strip(),
+            'Correo': _correos(fila),
+            'Nivel': fila.get("NIVEL") or "",
+            'Materia': materia,
+            'Docente': docente,
+            'Carrera': fila.get("CARRERA") or "",
+            '[Vez] Materia (Docente)': f"[2] {materia} ({docente})",
+        }
+    return sorted(resultado.values(), key=lambda r: _canon(r['Estudiante']))
+
+
+def _nee_control(datos):
+    estudiantes = {}
+    for fila in datos.actuales:
+        identificacion = fila.get("IDENTIFICACION")
+        discapacidad, porcentaje, nivel_nomina = datos.nee.get(identificacion, ("", "", ""))
+        if not identificacion or not porcentaje:
+            continue
+        estudiante = estudiantes.setdefault(identificacion, {
+            'Identificación': identificacion,
+            'Estudiante': " ".join(_estudiante(fila).split()),
+            'Correo': _correos(fila),
+            'NEE': f"{discapacidad} ({porcentaje}%)",
+            'Nivel': fila.get("NIVEL") or nivel_nomina,
+            '[Vez] Materia (Docente)': [],
+        })
+        materia, docente = fila.get("MATERIA") or "", fila.get("DOCENTE") or ""
+        entrada = f"[{fila.get('NO. VEZ') or '?'}] {materia} ({docente}: {fila.get('GRUPO/PARALELO') or ''})"
+        if (materia or docente) and entrada not in estudiante['[Vez] Materia (Docente)']:
+            estudiante['[Vez] Materia (Docente)'].append(entrada)
+
+    lista = sorted((e for e in estudiantes.values() if e['[Vez] Materia (Docente)']), key=lambda e: _canon(e['Estudiante']))
+    riesgos = Counter()
+    for e in lista:
+        total = 0
+        for materia in e['[Vez] Materia (Docente)']:
+            vez = re.match(r"^\[(\d+)\]", materia)
+            vez = int(vez.group(1)) if vez else 1
+            total += 1 if vez == 1 else 4 if vez == 2 else 6
+        e['riesgo'] = total
+        riesgos[5 if total >= 12 else 4 if total >= 9 else 3 if total >= 6 else 2 if total >= 3 else 1] += 1
+    return {'estudiantes': lista, 'riesgos': {str(n): riesgos[n] for n in range(1, 6)}}
+
+
+def _top_promedios(datos):
+    por_estudiante = {}
+    for fila in datos.actuales:
+        por_estudiante.setdefault(fila.get("IDENTIFICACION") or "", []).append(fila)
+
+    grupos = {}
+    for identificacion, materias in por_estudiante.items():
+        fila = materias[0]
+        nivel = fila.get("NIVEL") or ""
+        alias, niveles = CARRERAS_TOP.get(fila.get("CARRERA"), (None, {}))
+        esperadas = niveles.get(nivel)
+        if not alias or valor_numerico(fila.get("NO. VEZ")) != 1 or not esperadas:
+            continue
+        if len(materias) != esperadas or any((m.get("NIVEL") or "") != nivel for m in materias):
+            continue
+        promedios = [p for p in (valor_numerico(m.get("PROMEDIO")) for m in materias) if p is not None]
+        if len(promedios) != esperadas:
+            continue
+
+        paralelos = [m.get("GRUPO/PARALELO") or "" for m in materias]
+        ma, ve = (sum(tipo in g for g in paralelos) / len(paralelos) * 100 for tipo in ("MA", "VE"))
+        grupos.setdefault((alias, int(nivel)), []).append({
+            'id': identificacion,
+            'nombre': _estudiante(fila),
+            'correo': _correos(fila),
+            'ma': f"{fijo(ma, 2)}%",
+            've': f"{fijo(ve, 2)}%",
+            'promedio': fijo(sum(promedios) / len(promedios), 2),
+        })
+
+    return {
+        f"{alias} - Nivel {nivel}": sorted(estudiantes, key=lambda e: -float(e['promedio']))[:5]
+        for (alias, nivel), estudiantes in sorted(grupos.items())
+    }
+
+
+def _reportes(datos):
+    filas = datos.actuales
+    vez, estados, bins, materias, docentes = Counter(), Counter(), [0] * 10, {}, {}
+    for fila in filas:
+        no_vez = fila.get("NO. VEZ") or ""
+        if no_vez:
+            vez[no_vez if no_vez in ("1", "2") else "3"] += 1
+        estado = (fila.get("ESTADO") or "").upper()
+        estados["APROBADO" if "APROB" in estado else "REPROBADO" if "REPROB" in estado else "CURSANDO"] += 1
+        promedio = valor_numerico(fila.get("PROMEDIO"))
+        if promedio is not None:
+            bins[max(0, min(9, int(promedio // 1)))] += 1
+        if fila.get("MATERIA"):
+            m = materias.setdefault(fila["MATERIA"], [0, 0])
+            m[0] += 1
+            m[1] += "REPROB" in estado
+
+        # Top docentes: solo estados finales, sin inglés ni movilidad y con docente "###### - Nombre"
+        estado_canon = _canon(fila.get("ESTADO"))
+        docente = _DOCENTE.match(fila.get("DOCENTE") or "")
+        if estado_canon not in ("APROBADA", "REPROBADA") or not docente or _canon(docente.group(2)) == "MOVILIDAD":
+            continue
+        if any(rx.match(_canon(fila.get("MATERIA"))) for rx in _MATERIAS_EXCLUIDAS):
+            continue
+        d = docentes.setdefault(docente.group(2).strip(), [0, 0])
+        d[0] += 1
+        d[1] += estado_canon == "REPROBADA"
+
+    top_materias = sorted(
+        ({'materia': m, 'reprobados': rep, 'total': tot, 'pct': rep / tot} for m, (tot, rep) in materias.items()),
+        key=lambda m: (-m['pct'], -m['reprobados'])
+    )[:10]
+    top_docentes = sorted(
+        ({'docente': d, 'rp': rep, 'tot': tot, 'pctReprob': rep / tot * 100} for d, (tot, rep) in docentes.items()),
+        key=lambda d: (-d['pctReprob'], -d['tot'])
+    )[:10]
+    return {
+        'registros': len(filas),
+        'estudiantes': len({f.get("IDENTIFICACION") for f in filas if f.get("IDENTIFICACION")}),
+        'vezCounts': {v: vez[v] for v in ("1", "2", "3")},
+        'estadoCounts': {e: estados[e] for e in ("APROBADO", "REPROBADO", "CURSANDO")},
+        'bins': [{'label': f"{i}–{i + 1}", 'count': n} for i, n in enumerate(bins)],
+        'materias': top_materias,
+        'topDocentes': top_docentes,
+        'estudiantesPorPeriodo': dict(sorted(datos.estudiantes_por_periodo.items())),
+    }
+
+
+MODULOS = {
+    'top-promedios': _top_promedios,
+    'control-parcial': _control_parcial,
+    'control-final': _control_final,
+    'tercera-matricula': _tercera_matricula,
+    'nee-control': _nee_control,
+    'reportes': _reportes,
+}
+
+
+def _contar_filas(resultado):
+    if isinstance(resultado, list):
+        return len(resultado)
+    if isinstance(resultado.get('estudiantes'), list):
+        return len(resultado['estudiantes'])
+    if 'registros' in resultado:
+        return resultado['registros']
+    return sum(len(grupo) for grupo in resultado.values())
+
+
+def _calcular(datos, modulo):
+    """
+    Returns:
+        tuple: (json del resultado, filas, ms)
+    """
+    inicio = time.perf_counter()
+    resultado = MODULOS[modulo](datos)
+    texto = json.dumps({
+        'modulo': modulo,
+        'periodo': datos.periodo,
+        'periodos': datos.periodos,
+        'carreras': datos.carreras,
+        'resultado': resultado
+    }, ensure_ascii=False)
+    return texto, _contar_filas(resultado), int((time.perf_counter() - inicio) * 1000)
+
+
+def _guardar(cur, facultad_cod, modulo, periodo, huella, texto, filas, ms):
+    cur.execute("""
+        MERGE ResultadosModulo AS t
+        USING (SELECT ? AS FacultadCod, ? AS Modulo, ? AS Periodo) AS s
+        ON t.FacultadCod = s.FacultadCod AND t.Modulo = s.Modulo AND t.Periodo = s.Periodo
+        WHEN MATCHED THEN UPDATE SET Huella = ?, Resultado = ?, Filas = ?, DuracionMs = ?, Fecha = GETDATE()
+        WHEN NOT MATCHED THEN INSERT (FacultadCod, Modulo, Periodo, Huella, Resultado, Filas, DuracionMs)
+            VALUES (s.FacultadCod, s.Modulo, s.Periodo, ?, ?, ?, ?);
+    """, (facultad_cod, modulo, periodo or "", huella, texto, filas, ms, huella, texto, filas, ms))
+
+
+def _vista_guardada(cur, facultad_cod, modulo, huella, periodo=None):
+    """
+    Resultado guardado y vigente de un periodo; sin periodo, el de la vista por defecto.
+    La vista por defecto es la del periodo más reciente con la huella actual: un periodo
+    anterior solo se guarda si ya está la vista por defecto (ver obtener_resultado) y el
+    orden de SQL coincide con el de DatosFacultad.periodos para 'AAAA - AAAA CI/CII'.
+    """
+    cur.execute(f"""
+        SELECT TOP (1) Resultado FROM ResultadosModulo
+        WHERE FacultadCod = ? AND Modulo = ? AND Huella = ? {"AND Periodo = ?" if periodo else ""}
+        ORDER BY Periodo DESC
+    """, (facultad_cod, modulo, huella, *([periodo] if periodo else [])))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+# ======================= CONSULTA ===========================
+def obtener_resultado(facultad_cod, modulo, periodo=None, carrera=None):
+    """
+    Resultado de un módulo. Las vistas sin carrera (periodo más reciente u otro periodo)
+    salen de ResultadosModulo si la huella coincide; si no, se calculan y se guardan.
+    Las vistas por carrera se calculan al vuelo.
+
+    Returns:
+        tuple: (json del resultado, desde_cache)
+    """
+    if modulo not in MODULOS:
+        raise ModuloDesconocido(f"Módulo desconocido: {modulo}")
+    conn = conectar_facultad(facultad_cod, lectura=True)
+    try:
+        cur = conn.cursor()
+        if not carrera:
+            guardado = _vista_guardada(cur, facultad_cod, modulo, huella_facultad(cur, facultad_cod), periodo)
+            if guardado is not None:
+                return guardado, True
+        else:
+            # Las vistas por carrera no se guardan: se calculan donde se leyó
+            return _calcular(DatosFacultad(cur, facultad_cod, periodo, carrera), modulo)[0], False
+    finally:
+        conn.close()
+
+    # Falta la vista del periodo: se calcula y se guarda en la primaria
+    conn = conectar_facultad(facultad_cod)
+    try:
+        cur = conn.cursor()
+        huella = huella_facultad(cur, facultad_cod)
+        datos = DatosFacultad(cur, facultad_cod, periodo)
+        texto, filas, ms = _calcular(datos, modulo)
+        por_defecto = datos.periodo == (datos.periodos[0] if datos.periodos else None)
+        # Otro periodo se guarda solo junto a la vista por defecto vigente (ver _vista_guardada)
+        if por_defecto or _vista_guardada(cur, facultad_cod, modulo, huella, datos.periodos[0]) is not None:
+            _guardar(cur, facultad_cod, modulo, datos.periodo, huella, texto, filas, ms)
+            conn.commit()
+        return texto, False
+    finally:
+        conn.close()
+
+
+def precalcular_facultad(facultad_cod):
+    """
+    Calcula y guarda la vista por defecto de todos los módulos de una facultad.
+
+    Returns:
+        dict: {facultadCod, periodo, huella, cargaMs, modulos: {modulo: {filas, ms}}, totalMs}
+    """
+    inicio = time.perf_counter()
+    conn = conectar_facultad(facultad_cod)
+    try:
+        cur = conn.cursor()
+        huella = huella_facultad(cur, facultad_cod)
+        datos = DatosFacultad(cur, facultad_cod)
+        carga_ms = int((time.perf_counter() - inicio) * 1000)
+        modulos = {}
+        # Las vistas de otros periodos con la huella anterior ya no sirven
+        cur.execute("DELETE FROM ResultadosModulo WHERE FacultadCod = ? AND Huella <> ?", (facultad_cod, huella))
+        for modulo in MODULOS:
+            texto, filas, ms = _calcular(datos, modulo)
+            _guardar(cur, facultad_cod, modulo, datos.periodo, huella, texto, filas, ms)
+            modulos[modulo] = {'filas': filas, 'ms': ms}
+        conn.commit()
+    finally:
+        conn.close()
+
+    total_ms = int((time.perf_counter() - inicio) * 1000)
+    print(f"🧮 Módulos de {facultad_cod} precalculados ({datos.periodo}) en {total_ms} ms")
+    return {
+        'facultadCod': facultad_cod,
+        'periodo': datos.periodo,
+        'huella': huella,
+        'cargaMs': carga_ms,
+        'modulos': modulos,
+        'totalMs': total_ms
+    }
+
+
+def listar_resultados(facultad_cod):
+    """Vistas guardadas de una facultad con su duración y si siguen vigentes"""
+    conn = conectar_facultad(facultad_cod, lectura=True)
+    try:
+        cur = conn.cursor()
+        huella = huella_facultad(cur, facultad_cod)
+        cur.execute("""
+            SELECT Modulo, Periodo, Huella, Filas, DuracionMs, Fecha FROM ResultadosModulo
+            WHERE FacultadCod = ? ORDER BY Modulo, Periodo DESC
+        """, (facultad_cod,))
+        return [{
+            'modulo': row[0],
+            'periodo': row[1] or None,
+            'vigente': row[2] == huella,
+            'filas': row[3],
+            'duracionMs': row[4],
+            'fecha': row[5]
+        } for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+# ======================= PRECÁLCULO EN SEGUNDO PLANO ===========================
+class Precalculador:
+    """
+    Hilo de fondo (uno por worker) que precalcula los módulos de las facultades
+    cuyos archivos acaba de ingerir este worker. Las facultades encoladas mientras
+    tanto se calculan una sola vez.
+    """
+
+    def __init__(self):
+        self._cola = queue.Queue()
+        self._pendientes = set()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._progreso = {}
+
+    def _anotar(self, facultad_cod, **campos):
+        with self._lock:
+            self._progreso.setdefault(facultad_cod, {'facultadCod': facultad_cod}).update(campos)
+
+    def progreso(self, facultad_cod=None):
+        """Estado y tiempos del último precálculo de cada facultad en este worker"""
+        with self._lock:
+            return [dict(p) for f, p in sorted(self._progreso.items()) if facultad_cod in (None, f)]
+
+    def _bucle(self):
+        while True:
+            facultad_cod = self._cola.get()
+            with self._lock:
+                self._pendientes.discard(facultad_cod)
+            self._anotar(facultad_cod, estado='calculando', error=None)
+            try:
+                self._anotar(facultad_cod, estado='listo', **precalcular_facultad(facultad_cod))
+            except Exception as e:
+                print(f"❌ Error precalculando módulos de {facultad_cod}: {e}")
+                self._anotar(facultad_cod, estado='error', error=str(e))
+
+    def encolar(self, *facultades):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="precalculo", daemon=True)
+                self._hilo.start()
+            nuevas = [f for f in dict.fromkeys(facultades) if f and f not in self._pendientes]
+            self._pendientes.update(nuevas)
+        for facultad_cod in nuevas:
+            self._anotar(facultad_cod, estado='en_cola', error=None)
+            self._cola.put(facultad_cod)
+
+
+precalculador = Precalculador()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        for facultad in sys.argv[1:]:
+            print(json.dumps(precalcular_facultad(facultad), ensure_ascii=False, indent=2))
+    else:
+        print(__doc__)
@@ -0,0 +1,225 @@
+"""
+Réplicas de lectura de SQL Server.
+
+DB_REPLICAS (base principal) y la clave "replicas" de cada partición en
+DB_PARTICIONES son listas de {"servidor", "puerto", "base", "usuario", "clave",
+"driver"}; lo que falte se toma de la base replicada. Las funciones de solo
+lectura piden conectar(..., lectura=True) y reciben una réplica al día o la
+primaria.
+
+Un hilo por worker escribe cada REPLICA_INTERVALO segundos un latido
+(LatidoReplica) en cada primaria con réplicas y lo lee en sus réplicas: el
+latido que ve una réplica es el instante hasta el que tiene aplicados los
+cambios (el log se aplica en orden). Una réplica que no responde o cuyo
+retraso supera REPLICA_MAX_RETRASO queda fuera hasta el siguiente chequeo.
+
+Lectura de lo escrito: cada escritura de un usuario deja una marca (cabecera
+X-Sisa-Escritura de la respuesta, que el frontend reenvía, y en memoria del
+worker); mientras ninguna réplica alcance esa marca, sus lecturas van a la
+primaria.
+"""
+import itertools
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+# ======================= CONFIG ===========================
+REPLICA_INTERVALO = float(os.getenv("REPLICA_INTERVALO", "5"))
+REPLICA_MAX_RETRASO = float(os.getenv("REPLICA_MAX_RETRASO", "30"))
+# Tiempo que el worker recuerda la última escritura de cada usuario
+REPLICA_MARCA_SEGUNDOS = int(os.getenv("REPLICA_MARCA_SEGUNDOS", "300"))
+CABECERA_ESCRITURA = "X-Sisa-Escritura"
+
+# Marca mínima (ms) que debe haber alcanzado una réplica para las lecturas del request en curso
+_leer_desde = ContextVar("sisa_leer_desde", default=0)
+
+
+def ahora_ms():
+    return int(time.time() * 1000)
+
+
+# ======================= LECTURA DE LO ESCRITO ===========================
+def fijar_lectura_desde(marca_ms=None):
+    """Al inicio de cada request: marca recibida del cliente (o ninguna)"""
+    try:
+        _leer_desde.set(max(0, int(marca_ms or 0)))
+    except (TypeError, ValueError):
+        _leer_desde.set(0)
+
+
+def exigir_lectura_desde(marca_ms):
+    """Sube (nunca baja) la marca que deben alcanzar las réplicas en este request"""
+    if marca_ms and marca_ms > _leer_desde.get():
+        _leer_desde.set(int(marca_ms))
+
+
+def lectura_desde():
+    return _leer_desde.get()
+
+
+class _MarcasEscritura:
+    """Última escritura de cada usuario en este worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._marcas = {}
+
+    def registrar(self, usuario_id):
+        marca = ahora_ms()
+        with self._lock:
+            self._marcas[usuario_id] = marca
+            if len(self._marcas) > 1000:
+                vencidas = marca - REPLICA_MARCA_SEGUNDOS * 1000
+                self._marcas = {u: m for u, m in self._marcas.items() if m >= vencidas}
+        exigir_lectura_desde(marca)
+        return marca
+
+    def de(self, usuario_id):
+        with self._lock:
+            marca = self._marcas.get(usuario_id, 0)
+        return marca if marca >= ahora_ms() - REPLICA_MARCA_SEGUNDOS * 1000 else 0
+
+
+marcas_escritura = _MarcasEscritura()
+
+
+# ======================= MONITOR ===========================
+class MonitorReplicas:
+    """
+    Latido y retraso de las réplicas; elige una réplica para cada conexión de lectura.
+    El hilo arranca con la primera lectura y solo si hay réplicas configuradas.
+    """
+
+    def __init__(self, intervalo=REPLICA_INTERVALO):
+        self.intervalo = intervalo
+        self._estado = {}
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._turno = itertools.count()
+
+    def _escribir_latido(self, particion):
+        from database import conectar
+
+        marca = ahora_ms()
+        conn = conectar(particion)
+        try:
+            cur = conn.cursor()
+            # Varios workers escriben el mismo latido: solo avanza
+            cur.execute("""
+                MERGE LatidoReplica AS t
+                USING (SELECT 1 AS Id) AS s ON t.Id = s.Id
+                WHEN MATCHED AND t.InstanteMs < ? THEN UPDATE SET InstanteMs = ?
+                WHEN NOT MATCHED THEN INSERT (Id, InstanteMs) VALUES (1, ?);
+            """, (marca, marca, marca))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _leer_latido(self, particion, indice):
+        from database import conectar_replica
+
+        conn = conectar_replica(particion, indice)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT InstanteMs FROM LatidoReplica WHERE Id = 1")
+            row = cur.fetchone()
+            return int(row[0]) if row else 0
+        finally:
+            conn.close()
+
+    def _actualizar(self, particion, indice, estado):
+        clave = (particion, indice)
+        with self._lock:
+            anterior = self._estado.get(clave, {}).get("ok")
+            self._estado[clave] = {"particion": particion, "replica": indice, "instante": time.monotonic(), **estado}
+        # Solo se registra el cambio de estado
+        if not estado["ok"] and anterior is not False:
+            motivo = estado.get("error") or f"retraso de {estado['retrasoSegundos']} s"
+            print(f"⚠️ Réplica {indice} de '{particion}' fuera de la rotación: {motivo}")
+        elif estado["ok"] and anterior is False:
+            print(f"✅ Réplica {indice} de '{particion}' de nuevo en la rotación")
+
+    def _chequear(self):
+        from database import PARTICIONES
+
+        for particion, config in PARTICIONES.items():
+            replicas = config.get("replicas") or []
+            if not replicas:
+                continue
+            try:
+                self._escribir_latido(particion)
+            except Exception as e:
+                print(f"❌ No se pudo escribir el latido de réplicas en '{particion}': {e}")
+            for indice in range(len(replicas)):
+                inicio = time.perf_counter()
+                try:
+                    alcanzado = self._leer_latido(particion, indice)
+                    retraso = max(0.0, (ahora_ms() - alcanzado) / 1000)
+                    estado = {"ok": retraso <= REPLICA_MAX_RETRASO, "alcanzadoMs": alcanzado,
+                              "retrasoSegundos": round(retraso, 1)}
+                except Exception as e:
+                    estado = {"ok": False, "alcanzadoMs": 0, "error": str(e)[:300]}
+                estado["ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+                self._actualizar(particion, indice, estado)
+
+    def _bucle(self):
+        while True:
+            try:
+                self._chequear()
+            except Exception as e:
+                print(f"❌ Error chequeando réplicas: {e}")
+            time.sleep(self.intervalo)
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="replicas", daemon=True)
+                self._hilo.start()
+
+    def elegir(self, particion, desde_ms=0):
+        """
+        Returns:
+            int: índice de una réplica que alcanzó la marca del request (y `desde_ms`), o None para la primaria
+        """
+        self.iniciar()
+        desde = max(lectura_desde(), desde_ms or 0)
+        vigencia = time.monotonic() - max(REPLICA_MAX_RETRASO, self.intervalo * 3)
+        with self._lock:
+            candidatas = [e["replica"] for e in self._estado.values()
+                          if e["particion"] == particion and e["ok"] and e["instante"] >= vigencia
+                          and e["alcanzadoMs"] >= desde]
+        if not candidatas:
+            return None
+        return candidatas[next(self._turno) % len(candidatas)]
+
+    def descartar(self, particion, indice, error):
+        """Una réplica que falló al conectar sale de la rotación hasta el próximo chequeo"""
+        self._actualizar(particion, indice, {"ok": False, "alcanzadoMs": 0, "error": str(error)[:300]})
+
+    def estado(self):
+        with self._lock:
+            return [{k: v for k, v in e.items() if k != "instante"}
+                    for _, e in sorted(self._estado.items())]
+
+
+monitor_replicas = MonitorReplicas()
+
+
+def instrumentar_flask(app):
+    """
+    Lee la marca de escritura que envía el cliente y, tras cada escritura exitosa de un
+    usuario autenticado, devuelve la nueva en X-Sisa-Escritura.
+    """
+    from flask import request
+
+    @app.before_request
+    def _marca_lectura():
+        fijar_lectura_desde(request.headers.get(CABECERA_ESCRITURA))
+
+    @app.after_request
+    def _marca_escritura(response):
+        user = getattr(request, "current_user", None)
+        if user and request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+            response.headers[CABECERA_ESCRITURA] = str(marcas_escritura.registrar(user["id"]))
+        return response
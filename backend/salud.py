@@ -0,0 +1,169 @@
+"""
+Chequeos de salud para las sondas del orquestador.
+
+Un hilo de fondo por worker verifica cada SALUD_INTERVALO segundos la BD
+(SELECT 1), el token de Graph, la alcanzabilidad de UG y, si hay, el retraso de
+las réplicas de lectura, y guarda el resultado.
+Las sondas (/api/health/ready, /api/health) solo leen ese resultado en memoria.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+
+from database import PARTICIONES, conectar
+from replicas import monitor_replicas
+
+# ======================= CONFIG ===========================
+SALUD_INTERVALO = float(os.getenv("SALUD_INTERVALO", "15"))
+SALUD_TIMEOUT = float(os.getenv("SALUD_TIMEOUT", "3"))
+# Sin un chequeo más reciente que esto, readiness responde 503
+SALUD_VIGENCIA = float(os.getenv("SALUD_VIGENCIA", str(SALUD_INTERVALO * 3)))
+
+
+def _ahora_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _verificar_bd():
+    conn = conectar()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchone()
+        # Conteo desde metadatos (sin recorrer la tabla)
+        cur.execute("""
+            SELECT SUM(rows) FROM sys.partitions
+            WHERE object_id = OBJECT_ID('Usuarios') AND index_id IN (0, 1)
+        """)
+        fila = cur.fetchone()
+        return {"usuarios": int(fila[0] or 0) if fila else 0}
+    finally:
+        conn.close()
+
+
+def _verificar_replicas():
+    """Último chequeo del monitor de réplicas; alguna fuera de la rotación marca DEGRADADO"""
+    monitor_replicas.iniciar()
+    replicas = monitor_replicas.estado()
+    fuera = [f"{r['particion']}/{r['replica']}" for r in replicas if not r["ok"]]
+    if fuera:
+        raise RuntimeError(f"Réplicas fuera de la rotación: {', '.join(fuera)}")
+    return {"replicas": replicas}
+
+
+def _verificar_graph():
+    from correo import CLIENT_ID, obtener_token_graph
+
+    if not CLIENT_ID:
+        return {"detalle": "no configurado"}
+    # MSAL devuelve el token en caché mientras esté vigente; solo renueva cuando vence
+    obtener_token_graph()
+    return {}
+
+
+def _verificar_ug(url):
+    partes = urlsplit(url)
+    # Cualquier respuesta HTTP cuenta como alcanzable; solo importan errores de red/timeout
+    resp = requests.head(f"{partes.scheme}://{partes.netloc}/", timeout=SALUD_TIMEOUT, allow_redirects=False)
+    return {"httpStatus": resp.status_code}
+
+
+class MonitorSalud:
+    """
+    Ejecuta los chequeos en segundo plano y sirve el último resultado.
+
+    `componentes` es una lista (nombre, función, crítico). Un componente crítico
+    caído hace que readiness falle; uno no crítico solo marca 'DEGRADADO'.
+    """
+
+    def __init__(self, componentes, intervalo=SALUD_INTERVALO):
+        self.componentes = componentes
+        self.intervalo = intervalo
+        self._resultado = None
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def _chequear(self):
+        estado = {}
+        for nombre, funcion, critico in self.componentes:
+            inicio = time.perf_counter()
+            try:
+                detalle = funcion() or {}
+                ok = True
+            except Exception as e:
+                detalle = {"error": str(e)[:300]}
+                ok = False
+            estado[nombre] = {
+                "status": "OK" if ok else "ERROR",
+                "critico": critico,
+                "ms": round((time.perf_counter() - inicio) * 1000, 1),
+                "verificadoEn": _ahora_iso(),
+                **detalle
+            }
+            # Solo se registra el cambio de estado, no cada chequeo fallido
+            anterior = (self._resultado or {}).get("componentes", {}).get(nombre, {}).get("status")
+            if not ok and anterior != "ERROR":
+                print(f"❌ Health check '{nombre}' falló: {detalle['error']}")
+            elif ok and anterior == "ERROR":
+                print(f"✅ Health check '{nombre}' recuperado")
+        return {"componentes": estado, "instante": time.monotonic(), "verificadoEn": _ahora_iso()}
+
+    def _bucle(self):
+        while True:
+            resultado = self._chequear()
+            with self._lock:
+                self._resultado = resultado
+            time.sleep(self.intervalo)
+
+    def iniciar(self):
+        """Arranca el hilo de fondo (idempotente; un hilo por worker)"""
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="salud", daemon=True)
+                self._hilo.start()
+
+    def estado(self):
+        """
+        Returns:
+            tuple: (cuerpo, listo) con el último resultado y si el worker puede recibir tráfico
+        """
+        self.iniciar()
+        with self._lock:
+            resultado = self._resultado
+
+        if resultado is None:
+            return {"status": "INICIANDO", "componentes": {}}, False
+
+        edad = time.monotonic() - resultado["instante"]
+        componentes = resultado["componentes"]
+        criticos_ok = all(c["status"] == "OK" for c in componentes.values() if c["critico"])
+        todos_ok = all(c["status"] == "OK" for c in componentes.values())
+        vigente = edad <= SALUD_VIGENCIA
+
+        if not vigente:
+            status = "DESACTUALIZADO"
+        elif not criticos_ok:
+            status = "ERROR"
+        else:
+            status = "OK" if todos_ok else "DEGRADADO"
+        return {
+            "status": status,
+            "verificadoEn": resultado["verificadoEn"],
+            "edadSegundos": round(edad, 1),
+            "componentes": componentes
+        }, vigente and criticos_ok
+
+
+def crear_monitor(ug_auth_url):
+    componentes = [
+        ("database", _verificar_bd, True),
+        ("graph", _verificar_graph, False),
+        ("ug", lambda: _verificar_ug(ug_auth_url), False),
+    ]
+    if any(config.get("replicas") for config in PARTICIONES.values()):
+        componentes.append(("replicas", _verificar_replicas, False))
+    return MonitorSalud(componentes)
@@ -0,0 +1,144 @@
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+from database import obtener_versiones_sesion
+
+# ======================= CARGA .ENV (carpeta "archivos") =======================
+BASE_DIR = Path(__file__).resolve().parent
+ENV_PATH = BASE_DIR / "archivos" / ".env"
+load_dotenv(dotenv_path=ENV_PATH, override=True)
+
+# ======================= CONFIG ===========================
+SESION_MINUTOS = int(os.getenv("SESION_MINUTOS", "15"))
+SESION_GRACIA_MINUTOS = int(os.getenv("SESION_GRACIA_MINUTOS", "30"))
+SESION_REVOCACION_SEGUNDOS = int(os.getenv("SESION_REVOCACION_SEGUNDOS", "30"))
+SECRETO_PATH = BASE_DIR / "archivos" / ".sesion_secreto"
+
+
+def _cargar_secreto():
+    """
+    SESION_SECRETO del .env; si no está definido se genera uno en archivos/.sesion_secreto
+    para que todos los workers de la máquina firmen con la misma clave.
+    """
+    secreto = os.getenv("SESION_SECRETO")
+    if secreto:
+        return secreto
+
+    SECRETO_PATH.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(SECRETO_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_urlsafe(48))
+        print(f"🔑 Secreto de sesión generado en {SECRETO_PATH}")
+    except FileExistsError:
+        pass
+
+    # Otro worker pudo crearlo un instante antes: esperar a que tenga contenido
+    for _ in range(50):
+        secreto = SECRETO_PATH.read_text().strip()
+        if secreto:
+            return secreto
+        time.sleep(0.05)
+    raise RuntimeError(f"No se pudo leer el secreto de sesión en {SECRETO_PATH}")
+
+
+_serializer = URLSafeTimedSerializer(_cargar_secreto(), salt="sisa-sesion")
+
+
+# ======================= VERSIONES DE REVOCACIÓN ===========================
+class _VersionesSesion:
+    """
+    Caché por worker de Usuarios.VersionSesion.
+
+    Se recarga como máximo cada SESION_REVOCACION_SEGUNDOS (una consulta por worker,
+    no por request); los cambios hechos en este worker se aplican de inmediato.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versiones = {}
+        self._cargado_en = 0.0
+
+    def _recargar_si_vencido(self):
+        if time.monotonic() - self._cargado_en < SESION_REVOCACION_SEGUNDOS:
+            return
+        with self._lock:
+            if time.monotonic() - self._cargado_en < SESION_REVOCACION_SEGUNDOS:
+                return
+            try:
+                self._versiones = obtener_versiones_sesion()
+            except Exception as e:
+                print(f"⚠️ No se pudieron recargar versiones de sesión: {e}")
+            self._cargado_en = time.monotonic()
+
+    def actual(self, user_id):
+        self._recargar_si_vencido()
+        return self._versiones.get(user_id, 0)
+
+    def registrar(self, user_id, version):
+        with self._lock:
+            self._versiones[user_id] = max(version, self._versiones.get(user_id, 0))
+
+
+versiones_sesion = _VersionesSesion()
+
+
+# ======================= TOKENS ===========================
+def emitir_token(user):
+    """
+    Firma un token de sesión con la identidad del usuario.
+
+    Returns:
+        tuple: (token, expiraEn en milisegundos epoch)
+    """
+    payload = {
+        "id": user["id"],
+        "usuario": user["usuario"],
+        "estado": user["estado"],
+        "rolId": user["rolId"],
+        "rolNombre": user["rolNombre"],
+        "facultadCod": user["facultadCod"],
+        "facultadNombre": user.get("facultadNombre"),
+        "carreraCod": user.get("carreraCod"),
+        "carreraNombre": user.get("carreraNombre"),
+        "ver": user.get("versionSesion", 0)
+    }
+    token = _serializer.dumps(payload)
+    expira_en = int((time.time() + SESION_MINUTOS * 60) * 1000)
+    return token, expira_en
+
+
+def verificar_token(token, gracia=False, comprobar_version=True):
+    """
+    Verifica firma, vigencia y versión de revocación sin consultar la BD.
+
+    Args:
+        token: token emitido por emitir_token
+        gracia: acepta tokens vencidos hace menos de SESION_GRACIA_MINUTOS (solo para /auth/refresh)
+        comprobar_version: rechaza tokens emitidos antes del último cambio del usuario
+
+    Returns:
+        dict: usuario embebido en el token, o None si no es válido
+    """
+    max_age = SESION_MINUTOS * 60
+    if gracia:
+        max_age += SESION_GRACIA_MINUTOS * 60
+
+    try:
+        payload = _serializer.loads(token, max_age=max_age)
+    except SignatureExpired:
+        return None
+    except BadSignature:
+        print("❌ verificar_token: firma inválida")
+        return None
+
+    version = payload.pop("ver", 0)
+    if comprobar_version and version < versiones_sesion.actual(payload["id"]):
+        return None
+    return payload
@@ -0,0 +1,129 @@
+"""
+Subida en lote de reportes: varios archivos en un multipart o un .zip.
+
+Cada archivo se copia por bloques al almacén de blobs a medida que se lee
+(nada se carga completo en memoria); luego guardar_archivos_excel registra
+todas las filas en una sola transacción. Si la validación o la transacción
+fallan, los blobs ya copiados quedan huérfanos y los elimina la purga.
+"""
+import mimetypes
+import os
+import posixpath
+import shutil
+import tempfile
+import zipfile
+
+from almacenamiento import obtener_almacen
+from lector_xlsx import LectorXlsx, XlsxInvalido
+
+# ======================= CONFIG ===========================
+LOTE_MAX_ARCHIVOS = int(os.getenv("LOTE_MAX_ARCHIVOS", "20"))
+# Tamaño total descomprimido admitido por lote (protege contra zips que se expanden sin control)
+LOTE_MAX_BYTES = int(os.getenv("LOTE_MAX_BYTES", str(200 * 1024 * 1024)))
+TIPOS_ZIP = {"application/zip", "application/x-zip-compressed"}
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Por encima de esto el cuerpo de un zip enviado directo se vuelca a disco
+BUFFER_CUERPO = 8 * 1024 * 1024
+
+
+class LoteInvalido(ValueError):
+    """El lote no se puede aceptar (vacío, demasiado grande, nombres repetidos, libro ilegible)"""
+
+
+def _tipo_mime(nombre):
+    if nombre.lower().endswith((".xlsx", ".xlsm")):
+        return MIME_XLSX
+    return mimetypes.guess_type(nombre)[0] or "application/octet-stream"
+
+
+def _miembros_zip(origen):
+    """Itera (nombre, tipo, stream) de cada archivo de un zip; omite carpetas y metadatos de macOS"""
+    try:
+        zf = zipfile.ZipFile(origen)
+    except zipfile.BadZipFile as e:
+        raise LoteInvalido(f"El zip no es válido: {e}") from e
+    with zf:
+        for info in zf.infolist():
+            nombre = posixpath.basename(info.filename)
+            if info.is_dir() or not nombre or nombre.startswith(".") or info.filename.startswith("__MACOSX/"):
+                continue
+            with zf.open(info) as stream:
+                yield nombre, _tipo_mime(nombre), stream
+
+
+def _entradas(archivos, cuerpo_zip):
+    """Itera (nombre, tipo, stream) de los archivos del multipart (expandiendo .zip) o del zip enviado directo"""
+    if cuerpo_zip is not None:
+        yield from _miembros_zip(cuerpo_zip)
+        return
+    for archivo in archivos:
+        nombre = (archivo.filename or "").strip()
+        if not nombre:
+            continue
+        if nombre.lower().endswith(".zip") or archivo.mimetype in TIPOS_ZIP:
+            yield from _miembros_zip(archivo.stream)
+        else:
+            yield nombre, archivo.mimetype or _tipo_mime(nombre), archivo.stream
+
+
+class _LectorLimitado:
+    """Envuelve un stream y corta cuando el lote supera LOTE_MAX_BYTES"""
+
+    def __init__(self, stream, restante):
+        self.stream = stream
+        self.restante = restante
+        self.leidos = 0
+
+    def read(self, n=-1):
+        bloque = self.stream.read(n)
+        self.leidos += len(bloque)
+        if self.leidos > self.restante:
+            raise LoteInvalido(f"El lote supera el máximo de {LOTE_MAX_BYTES // (1024 * 1024)} MB")
+        return bloque
+
+
+def almacenar_lote(archivos, cuerpo=None, tipo_cuerpo=None):
+    """
+    Copia al almacén los archivos de una subida en lote.
+
+    Args:
+        archivos: FileStorage del multipart (campos 'files'/'file'); un .zip se expande
+        cuerpo: stream del cuerpo cuando la petición es directamente un zip
+        tipo_cuerpo: mimetype de la petición
+
+    Returns:
+        list: (nombre, tipo_mime, hash_hex, tamano) por archivo
+    """
+    almacen = obtener_almacen()
+    cuerpo_zip = None
+    if cuerpo is not None and tipo_cuerpo in TIPOS_ZIP:
+        # zipfile necesita seek: el cuerpo se copia por bloques a un temporal
+        cuerpo_zip = tempfile.SpooledTemporaryFile(max_size=BUFFER_CUERPO)
+        shutil.copyfileobj(cuerpo, cuerpo_zip, 1024 * 1024)
+        cuerpo_zip.seek(0)
+
+    try:
+        guardados = []
+        total = 0
+        for nombre, tipo, stream in _entradas(archivos, cuerpo_zip):
+            if len(guardados) >= LOTE_MAX_ARCHIVOS:
+                raise LoteInvalido(f"El lote admite como máximo {LOTE_MAX_ARCHIVOS} archivos")
+            if any(g[0] == nombre for g in guardados):
+                raise LoteInvalido(f"El archivo '{nombre}' está repetido en el lote")
+
+            hash_hex, tamano = almacen.guardar(_LectorLimitado(stream, LOTE_MAX_BYTES - total))
+            total += tamano
+            if nombre.lower().endswith((".xlsx", ".xlsm")):
+                try:
+                    with almacen.abrir(hash_hex) as f:
+                        LectorXlsx(f).cerrar()
+                except XlsxInvalido as e:
+                    raise LoteInvalido(f"{nombre}: {e}") from e
+            guardados.append((nombre, tipo, hash_hex, tamano))
+    finally:
+        if cuerpo_zip is not None:
+            cuerpo_zip.close()
+
+    if not guardados:
+        raise LoteInvalido("El lote no contiene archivos")
+    return guardados
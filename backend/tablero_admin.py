@@ -0,0 +1,224 @@
+"""
+Tablero del administrador: resumen de todas las facultades.
+
+Una consulta por base (la principal para usuarios y una por partición para
+archivos e ingestas) obtiene la huella de cada facultad; solo las facultades
+cuya huella cambió se vuelven a agregar, cada una en un hilo del pool
+(TABLERO_HILOS) con su propia conexión. Los parciales
+se guardan por facultad y se combinan en el total, así la vista de toda la
+universidad cuesta lo que la facultad más lenta y no la suma de todas.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import CacheTTL
+from database import PARTICIONES, conectar, conectar_facultad, particion_de_facultad
+from precalculo import huella_facultad, precalcular_facultad
+
+# ======================= CONFIG ===========================
+TABLERO_HILOS = int(os.getenv("TABLERO_HILOS", "8"))
+# Tope de vida de un parcial aunque su huella no cambie
+TABLERO_TTL = int(os.getenv("TABLERO_TTL", "600"))
+# Módulos cuyo número de filas se informa como estudiantes/materias en riesgo
+MODULOS_RIESGO = ("control-parcial", "control-final", "tercera-matricula", "nee-control")
+
+cache_tablero = CacheTTL("tablero_admin", TABLERO_TTL)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TABLERO_HILOS, thread_name_prefix="tablero")
+        return _pool
+
+
+def _huellas():
+    """
+    Returns:
+        dict: FacultadCod -> (Nombre, huella de archivos/usuarios/ingestas)
+    """
+    conn = conectar(lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT f.FacultadCod, f.Nombre,
+                   (SELECT COUNT(*) FROM Usuarios u WHERE u.FacultadCod = f.FacultadCod),
+                   (SELECT CHECKSUM_AGG(CHECKSUM(u.Id, u.Estado, u.RolId, u.CarreraCod)) FROM Usuarios u
+                    WHERE u.FacultadCod = f.FacultadCod)
+            FROM Facultad f
+            ORDER BY f.FacultadCod
+        """)
+        facultades = {row[0].strip(): (row[1], tuple(row[2:])) for row in cur.fetchall()}
+    finally:
+        conn.close()
+
+    # Archivos e ingestas viven en la partición de cada facultad: una consulta agrupada por partición
+    datos = {}
+    for particion in PARTICIONES:
+        conn = conectar(particion, lectura=True)
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT a.FacultadCod, COUNT(*), CHECKSUM_AGG(CHECKSUM(a.Id, a.VersionActual)),
+                       CHECKSUM_AGG(i.Huella)
+                FROM ArchivosExcel a
+                OUTER APPLY (SELECT CHECKSUM_AGG(CHECKSUM(i.ArchivoId, i.Version)) AS Huella
+                             FROM IngestasReporte i WHERE i.ArchivoId = a.Id) i
+                GROUP BY a.FacultadCod
+            """)
+            for row in cur.fetchall():
+                if particion == particion_de_facultad(row[0].strip()):
+                    datos[row[0].strip()] = tuple(row[1:])
+        finally:
+            conn.close()
+
+    return {cod: (nombre, usuarios + datos.get(cod, (0, None, None)))
+            for cod, (nombre, usuarios) in facultades.items()}
+
+
+def _riesgo(cur, facultad_cod):
+    """Filas de los módulos de riesgo; si lo guardado no está vigente se precalcula la facultad"""
+    huella = huella_facultad(cur, facultad_cod)
+    # Hay una fila por periodo: la del más reciente (la última en este orden) es la vista por defecto
+    cur.execute("""
+        SELECT Modulo, Filas FROM ResultadosModulo WHERE FacultadCod = ? AND Huella = ? ORDER BY Periodo
+    """, (facultad_cod, huella))
+    guardados = {row[0]: row[1] for row in cur.fetchall()}
+    if all(m in guardados for m in MODULOS_RIESGO):
+        return {m: guardados[m] for m in MODULOS_RIESGO}
+
+    cur.execute("""
+        SELECT COUNT(*) FROM IngestasReporte i INNER JOIN ArchivosExcel a ON a.Id = i.ArchivoId
+        WHERE a.FacultadCod = ? AND i.TipoReporte = 'calificaciones'
+    """, (facultad_cod,))
+    if not cur.fetchone()[0]:
+        return {m: 0 for m in MODULOS_RIESGO}
+    modulos = precalcular_facultad(facultad_cod)['modulos']
+    return {m: modulos[m]['filas'] for m in MODULOS_RIESGO}
+
+
+def agregar_facultad(facultad_cod, nombre=None):
+    """
+    Parcial de una facultad: archivos, usuarios por rol, ingesta y riesgo.
+
+    Returns:
+        dict
+    """
+    inicio = time.perf_counter()
+    # Usuarios en la base principal; archivos, ingestas y módulos en la partición de la facultad
+    conn = conectar(lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT ISNULL(r.Nombre, ''), COUNT(*), SUM(CASE WHEN u.Estado = 1 THEN 1 ELSE 0 END)
+            FROM Usuarios u LEFT JOIN Rol r ON r.RolId = u.RolId
+            WHERE u.FacultadCod = ?
+            GROUP BY r.Nombre
+        """, (facultad_cod,))
+        roles = cur.fetchall()
+        por_rol = {row[0]: row[1] for row in roles}
+        usuarios, activos = sum(row[1] for row in roles), sum(row[2] for row in roles)
+    finally:
+        conn.close()
+
+    conn = conectar_facultad(facultad_cod, lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*), ISNULL(SUM(CAST(Tamano AS BIGINT)), 0), MAX(FechaSubida)
+            FROM ArchivosExcel WHERE FacultadCod = ?
+        """, (facultad_cod,))
+        archivos, bytes_archivos, ultima_subida = cur.fetchone()
+
+        cur.execute("""
+            SELECT COUNT(DISTINCT a.Id), (SELECT COUNT(*) FROM FilasReporte fr
+                                          INNER JOIN ArchivosExcel x ON x.Id = fr.ArchivoId
+                                          WHERE x.FacultadCod = ?)
+            FROM ArchivosExcel a INNER JOIN IngestasReporte i ON i.ArchivoId = a.Id
+            WHERE a.FacultadCod = ?
+        """, (facultad_cod, facultad_cod))
+        ingeridos, filas = cur.fetchone()
+
+        riesgo = _riesgo(cur, facultad_cod)
+    finally:
+        conn.close()
+
+    return {
+        'facultadCod': facultad_cod,
+        'nombre': nombre,
+        'archivos': archivos,
+        'bytes': bytes_archivos,
+        'ultimaSubida': ultima_subida,
+        'usuarios': usuarios,
+        'usuariosActivos': activos,
+        'usuariosPorRol': por_rol,
+        'archivosIngeridos': ingeridos,
+        'filasIngeridas': filas,
+        'riesgo': riesgo,
+        'ms': int((time.perf_counter() - inicio) * 1000)
+    }
+
+
+def _combinar(parciales):
+    totales = {
+        'facultades': len(parciales),
+        'archivos': 0, 'bytes': 0, 'ultimaSubida': None,
+        'usuarios': 0, 'usuariosActivos': 0, 'usuariosPorRol': {},
+        'archivosIngeridos': 0, 'filasIngeridas': 0,
+        'riesgo': {m: 0 for m in MODULOS_RIESGO}
+    }
+    for p in parciales:
+        for campo in ('archivos', 'bytes', 'usuarios', 'usuariosActivos', 'archivosIngeridos', 'filasIngeridas'):
+            totales[campo] += p[campo]
+        if p['ultimaSubida'] and (totales['ultimaSubida'] is None or p['ultimaSubida'] > totales['ultimaSubida']):
+            totales['ultimaSubida'] = p['ultimaSubida']
+        for rol, n in p['usuariosPorRol'].items():
+            totales['usuariosPorRol'][rol] = totales['usuariosPorRol'].get(rol, 0) + n
+        for modulo, n in p['riesgo'].items():
+            totales['riesgo'][modulo] += n
+    return totales
+
+
+def resumen_universidad(forzar=False):
+    """
+    Resumen de todas las facultades; reagrega en paralelo solo las que cambiaron.
+
+    Returns:
+        dict: {totales, facultades: [parcial...], recalculadas: [cod...], errores: {cod: msg}, ms}
+    """
+    inicio = time.perf_counter()
+    huellas = _huellas()
+
+    parciales = {}
+    pendientes = {}
+    for facultad_cod, (nombre, huella) in huellas.items():
+        guardado = None if forzar else cache_tablero.obtener((facultad_cod,))
+        if guardado and guardado[0] == huella:
+            parciales[facultad_cod] = guardado[1]
+        else:
+            pendientes[facultad_cod] = _obtener_pool().submit(agregar_facultad, facultad_cod, nombre)
+
+    errores = {}
+    for facultad_cod, futuro in pendientes.items():
+        try:
+            parcial = futuro.result()
+        except Exception as e:
+            print(f"❌ Error agregando facultad {facultad_cod}: {e}")
+            errores[facultad_cod] = str(e)
+            continue
+        cache_tablero.guardar((facultad_cod,), (huellas[facultad_cod][1], parcial))
+        parciales[facultad_cod] = parcial
+
+    lista = [parciales[f] for f in huellas if f in parciales]
+    return {
+        'totales': _combinar(lista),
+        'facultades': lista,
+        'recalculadas': sorted(pendientes),
+        'errores': errores,
+        'ms': int((time.perf_counter() - inicio) * 1000)
+    }
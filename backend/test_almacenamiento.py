@@ -0,0 +1,88 @@
+"""Pruebas del almacén de blobs direccionado por contenido"""
+import hashlib
+import io
+import os
+
+import pytest
+
+import almacenamiento
+from almacenamiento import AlmacenBlobs, AlmacenLocal
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenLocal(tmp_path / "blobs")
+
+
+def test_guardar_bytes_y_stream(almacen, monkeypatch):
+    # Bloques chicos para que el stream se lea en varias vueltas
+    monkeypatch.setattr(almacenamiento, "BLOQUE_LECTURA", 7)
+    contenido = b"PK\x03\x04" + os.urandom(100)
+
+    hash_hex, tamano = almacen.guardar(contenido)
+    assert (hash_hex, tamano) == (hashlib.sha256(contenido).hexdigest(), len(contenido))
+    assert almacen.guardar(io.BytesIO(contenido)) == (hash_hex, tamano)
+
+    assert almacen.existe(hash_hex)
+    assert almacen.ruta_local(hash_hex) == almacen.raiz / hash_hex[:2] / hash_hex[2:4] / hash_hex
+    with almacen.abrir(hash_hex) as f:
+        assert f.read() == contenido
+    # Sin temporales sueltos
+    assert list(almacen.temporales.iterdir()) == []
+
+
+def test_contenido_repetido_comparte_blob(almacen):
+    a, _ = almacen.guardar(b"mismo contenido")
+    b, _ = almacen.guardar(b"mismo contenido")
+    c, _ = almacen.guardar(b"otro contenido")
+
+    assert a == b != c
+    assert sorted(h for h, _ in almacen.listar()) == sorted({a, c})
+
+
+def test_eliminar_sin_error_si_no_existe(almacen):
+    hash_hex, _ = almacen.guardar(b"x")
+    almacen.eliminar(hash_hex)
+    almacen.eliminar(hash_hex)
+    assert not almacen.existe(hash_hex)
+
+
+def test_listar_ignora_archivos_ajenos(almacen):
+    hash_hex, _ = almacen.guardar(b"x")
+    (almacen.raiz / "ab" / "cd").mkdir(parents=True)
+    (almacen.raiz / "ab" / "cd" / "notas.txt").write_text("no es un blob")
+
+    (listado,) = list(almacen.listar())
+    assert listado[0] == hash_hex
+    assert 0 <= listado[1] < 60
+
+
+def test_stream_fallido_no_deja_temporales(almacen):
+    class Roto(io.RawIOBase):
+        def read(self, n=-1):
+            raise OSError("conexión cortada")
+
+    with pytest.raises(OSError):
+        almacen.guardar(Roto())
+    assert list(almacen.temporales.iterdir()) == []
+
+
+def test_interfaz_abstracta():
+    with pytest.raises(TypeError):
+        AlmacenBlobs()
+
+    class SinListar(AlmacenBlobs):
+        def guardar(self, origen): ...
+        def abrir(self, hash_hex): ...
+        def existe(self, hash_hex): ...
+        def eliminar(self, hash_hex): ...
+
+    with pytest.raises(TypeError):
+        SinListar()
+
+
+def test_backend_desconocido(monkeypatch):
+    monkeypatch.setattr(almacenamiento, "_almacen", None)
+    monkeypatch.setattr(almacenamiento, "ALMACEN_BLOBS", "s3")
+    with pytest.raises(ValueError):
+        almacenamiento.obtener_almacen()
@@ -0,0 +1,188 @@
+"""Pruebas de la búsqueda por trigramas y la paginación keyset de /usuarios"""
+import pytest
+
+import database
+from database import _condicion_busqueda, _filtros_usuarios, _trigramas, listar_usuarios_con_filtros
+
+ROLES = [{"id": 1, "nombre": "admin"}, {"id": 2, "nombre": "decano"}, {"id": 4, "nombre": "usuario"}]
+FACULTADES = [{"codigo": "FACAF", "nombre": "Educación Física"}, {"codigo": "FCM", "nombre": "Ciencias Médicas"}]
+
+
+@pytest.fixture(autouse=True)
+def catalogos(monkeypatch):
+    monkeypatch.setattr(database, "obtener_roles", lambda: ROLES)
+    monkeypatch.setattr(database, "obtener_facultades", lambda: FACULTADES)
+
+
+class _CursorFalso:
+    def __init__(self, filas):
+        self.filas = filas
+        self.consultas = []
+
+    def execute(self, sql, params=()):
+        self.consultas.append((sql, list(params)))
+
+    def fetchall(self):
+        return self.filas
+
+    def close(self):
+        pass
+
+
+class _ConexionFalsa:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def bd(monkeypatch):
+    """Cursor que devuelve las filas que ponga la prueba y guarda las consultas"""
+    cursor = _CursorFalso([])
+    monkeypatch.setattr(database, "conectar", lambda **kwargs: _ConexionFalsa(cursor))
+    return cursor
+
+
+def _fila(user_id):
+    return (user_id, f"user{user_id}", 1, "FACAF", None, 4, "usuario", "Educación Física", None)
+
+
+def test_trigramas():
+    assert _trigramas("JPerez") == {"jpe", "per", "ere", "rez"}
+    assert _trigramas("ab") == set()
+    assert _trigramas(None) == set()
+
+
+def test_busqueda_con_trigramas():
+    sql, params = _condicion_busqueda("  PERE ")
+    # Todos los trigramas deben estar (HAVING COUNT) y el LIKE descarta falsos positivos
+    assert "UsuariosTrigrama" in sql and "HAVING COUNT(*) = ?" in sql
+    assert params == ["ere", "per", 2, "%pere%"]
+
+
+def test_busqueda_corta_usa_like():
+    sql, params = _condicion_busqueda("jp")
+    assert "UsuariosTrigrama" not in sql
+    assert "u.Usuario LIKE ?" in sql
+    assert params == ["%jp%"]
+
+
+def test_busqueda_por_rol_y_facultad():
+    sql, params = _condicion_busqueda("físic")
+    assert "u.FacultadCod IN (?)" in sql and "u.RolId" not in sql
+    assert params[-1] == "FACAF"
+
+    sql, params = _condicion_busqueda("a")
+    # 'a' aparece en admin, decano y usuario, y en las dos facultades
+    assert "u.RolId IN (?, ?, ?)" in sql and "u.FacultadCod IN (?, ?)" in sql
+    assert params == ["%a%", 1, 2, 4, "FACAF", "FCM"]
+
+
+def test_filtros_usuarios():
+    assert _filtros_usuarios() == ("1=1", [])
+
+    where, params = _filtros_usuarios("FACAF", 2, "  ", False)
+    assert where == "u.FacultadCod = ? AND u.RolId = ? AND u.Estado = ?"
+    assert params == ["FACAF", 2, 0]
+
+
+def test_keyset_pide_una_fila_extra(bd):
+    bd.filas = [_fila(49), _fila(48), _fila(47)]
+    resultado = listar_usuarios_con_filtros(limit=2, cursor=50, incluir_total=False)
+
+    sql, params = bd.consultas[-1]
+    assert "TOP (3)" in sql and "u.Id < ?" in sql and "OFFSET" not in sql
+    assert params == [50]
+    assert [u["id"] for u in resultado["data"]] == [49, 48]
+    assert resultado["has_more"] is True
+    assert resultado["next_cursor"] == 48
+    assert resultado["total"] is None
+
+
+def test_keyset_ultima_pagina(bd):
+    bd.filas = [_fila(2), _fila(1)]
+    resultado = listar_usuarios_con_filtros(limit=2, cursor=3, incluir_total=False)
+    assert resultado["has_more"] is False
+    assert resultado["next_cursor"] is None
+
+
+def test_sin_cursor_pagina_por_offset(bd):
+    bd.filas = [_fila(30)]
+    resultado = listar_usuarios_con_filtros(facultad_cod="FACAF", page=2, limit=10, incluir_total=False)
+
+    sql, params = bd.consultas[-1]
+    assert "OFFSET 20 ROWS FETCH NEXT 11 ROWS ONLY" in sql and "TOP" not in sql
+    assert params == ["FACAF"]
+    assert resultado["data"][0]["carreraNombre"] == "Sin carrera"
+
+
+# ======================= SUBIDAS IDÉNTICAS ===========================
+class _CursorGuion(_CursorFalso):
+    """fetchone devuelve, en orden, las respuestas preparadas por la prueba"""
+
+    def __init__(self, respuestas):
+        super().__init__([])
+        self.respuestas = list(respuestas)
+
+    def fetchone(self):
+        return self.respuestas.pop(0)
+
+    def sentencias(self):
+        return [" ".join(sql.split()[:3]) for sql, _ in self.consultas]
+
+
+HASH = "ab" * 32
+MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _registrar(cur, hash_hex=HASH, tipo=MIME):
+    return database._registrar_archivo_excel(cur, "notas.xlsx", tipo, hash_hex, 10, "FACAF", 7)
+
+
+def test_subida_identica_no_escribe():
+    # HashContenido es CHAR(64): puede venir con espacios
+    cur = _CursorGuion([(5, HASH + " ", MIME, None, 3)])
+    resultado = _registrar(cur)
+
+    assert resultado == {"id": 5, "version": 3, "hash": HASH, "tamano": 10, "sinCambios": True}
+    assert len(cur.consultas) == 1
+
+
+def test_subida_identica_solo_actualiza_el_tipo():
+    cur = _CursorGuion([(5, HASH, "application/octet-stream", None, 3)])
+    assert _registrar(cur)["sinCambios"] is True
+    assert cur.consultas[-1] == ("UPDATE ArchivosExcel SET TipoMime = ? WHERE Id = ?", [MIME, 5])
+
+
+def test_fila_sin_migrar_identica_pasa_al_almacen():
+    # Sin HashContenido: el hash sale de HASHBYTES sobre Datos
+    cur = _CursorGuion([(5, None, MIME, HASH, 2)])
+    resultado = _registrar(cur)
+
+    assert resultado["sinCambios"] is True and resultado["version"] == 2
+    assert cur.sentencias()[1:] == ["UPDATE ArchivosExcel SET", "INSERT INTO VersionesArchivoExcel"]
+    assert "Datos = NULL" in cur.consultas[1][0]
+    # La versión conserva la FechaSubida de la fila
+    assert cur.consultas[2][1][:7] == [5, 2, HASH, 10, MIME, 1, 7]
+
+
+def test_contenido_distinto_agrega_version():
+    cur = _CursorGuion([(5, "cd" * 32, MIME, None, 2), (3,)])
+    resultado = _registrar(cur)
+
+    assert resultado == {"id": 5, "version": 3, "hash": HASH, "tamano": 10, "sinCambios": False}
+    assert "VersionActual = VersionActual + 1" in cur.consultas[1][0]
+    assert cur.consultas[2][1][:2] == [5, 3]
+
+
+def test_archivo_nuevo():
+    cur = _CursorGuion([None, (42,)])
+    resultado = _registrar(cur)
+
+    assert resultado == {"id": 42, "version": 1, "hash": HASH, "tamano": 10, "sinCambios": False}
+    assert cur.sentencias()[1:] == ["INSERT INTO ArchivosExcel", "INSERT INTO VersionesArchivoExcel"]
@@ -0,0 +1,83 @@
+"""Pruebas de los generadores de exportación"""
+import csv
+import io
+import os
+import zipfile
+from datetime import date, datetime
+from xml.etree.ElementTree import fromstring
+
+import escritor_xlsx
+from escritor_xlsx import generar_csv, generar_xlsx
+from lector_xlsx import LectorXlsx
+
+_M = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def _xlsx(encabezados, filas, **kwargs):
+    return b"".join(generar_xlsx(encabezados, filas, **kwargs))
+
+
+def test_xlsx_es_un_paquete_valido():
+    contenido = _xlsx(["A"], [[1]], hoja="Control final")
+    with zipfile.ZipFile(io.BytesIO(contenido)) as zf:
+        assert zf.testzip() is None
+        assert {"[Content_Types].xml", "_rels/.rels", "xl/workbook.xml", "xl/_rels/workbook.xml.rels",
+                "xl/styles.xml", "xl/worksheets/sheet1.xml"} <= set(zf.namelist())
+        hojas = fromstring(zf.read("xl/workbook.xml")).iter(_M + "sheet")
+        assert [h.get("name") for h in hojas] == ["Control final"]
+
+
+def test_xlsx_tipos_de_celda():
+    filas = [["texto", 3, 2.5, True, None, "", date(2025, 1, 1), datetime(2025, 1, 1, 12)]]
+    with LectorXlsx(io.BytesIO(_xlsx(list("ABCDEFGH"), filas))) as lector:
+        _, fila = list(lector.filas())
+    assert fila == ["texto", 3, 2.5, True, None, None, datetime(2025, 1, 1), datetime(2025, 1, 1, 12)]
+
+
+def test_xlsx_escapa_y_limpia_texto():
+    filas = [["<b>&\"x\"</b>", "con\x01control", "  espacios  "]]
+    with LectorXlsx(io.BytesIO(_xlsx(["A", "B", "C"], filas))) as lector:
+        _, fila = list(lector.filas())
+    assert fila == ["<b>&\"x\"</b>", "concontrol", "  espacios  "]
+
+
+def test_xlsx_entrega_por_bloques(monkeypatch):
+    monkeypatch.setattr(escritor_xlsx, "FILAS_POR_BLOQUE", 10)
+    # Texto aleatorio para que deflate no retenga todo el contenido
+    filas = [[n, os.urandom(2000).hex()] for n in range(95)]
+    bloques = list(generar_xlsx(["N", "TEXTO"], iter(filas)))
+    assert len(bloques) > 2
+    with LectorXlsx(io.BytesIO(b"".join(bloques))) as lector:
+        leidas = list(lector.filas())
+    assert len(leidas) == 96
+    assert leidas[-1] == filas[-1]
+
+
+def _csv(encabezados, filas, separador=","):
+    texto = b"".join(generar_csv(encabezados, filas, separador)).decode("utf-8")
+    assert texto.startswith("﻿")
+    return list(csv.reader(io.StringIO(texto[1:]), delimiter=separador))
+
+
+def test_csv_filas_y_separador():
+    assert _csv(["A", "B"], [["x;y", None], [1, 2.5]], separador=";") == [["A", "B"], ["x;y", ""], ["1", "2.5"]]
+
+
+def test_csv_neutraliza_formulas():
+    filas = [["=HYPERLINK(\"http://x\")", "@SUM(A1)", "\tx", "\rx", "-2+3", "+A1", "-inf", "a=b"]]
+    assert _csv(["=A", "B"], filas) == [
+        ["'=A", "B"],
+        ["'=HYPERLINK(\"http://x\")", "'@SUM(A1)", "'\tx", "'\rx", "'-2+3", "'+A1", "'-inf", "a=b"],
+    ]
+
+
+def test_csv_conserva_numeros_con_signo():
+    # Notas y saldos negativos llegan como texto desde los reportes: no son fórmulas
+    assert _csv(["A"], [["-3.5", "+1", "-1", -1, "-2,5"]])[1] == ["-3.5", "+1", "-1", "-1", "-2,5"]
+
+
+def test_csv_entrega_por_bloques(monkeypatch):
+    monkeypatch.setattr(escritor_xlsx, "FILAS_POR_BLOQUE", 10)
+    bloques = list(generar_csv(["N"], ([n] for n in range(25))))
+    assert len(bloques) == 3
+    assert len(_csv(["N"], ([n] for n in range(25)))) == 26
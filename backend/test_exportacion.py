@@ -0,0 +1,59 @@
+"""Pruebas de los encabezados de reporte para /api/export/reporte (BD simulada)"""
+
+import pytest
+
+import exportacion
+from almacenamiento import AlmacenLocal
+from escritor_xlsx import generar_xlsx
+from exportacion import encabezados_reporte
+
+LIBRO = b"".join(generar_xlsx([" identificacion ", "Materia", None, "NO. VEZ"], [["0912", "CALCULO", "", 1]]))
+
+
+class _Conexion:
+    def __init__(self, fila):
+        self.fila = fila
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchone(self):
+        return self.fila
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fila(monkeypatch, tmp_path):
+    """Fila de ArchivosExcel (NombreArchivo, HashContenido, Datos) que devuelve la BD"""
+    almacen = AlmacenLocal(tmp_path / "blobs")
+    monkeypatch.setattr(exportacion, "obtener_almacen", lambda: almacen)
+    actual = []
+    monkeypatch.setattr(exportacion, "conectar_archivo", lambda archivo_id, lectura=False: _Conexion(actual[0]))
+    return almacen, actual
+
+
+def test_encabezados_desde_el_almacen(fila):
+    almacen, actual = fila
+    hash_hex, _ = almacen.guardar(LIBRO)
+    # HashContenido es CHAR(64)
+    actual.append(("notas.xlsx", hash_hex + " ", None))
+
+    assert encabezados_reporte(1) == ("notas.xlsx", ["IDENTIFICACION", "MATERIA", "NO. VEZ"])
+
+
+def test_encabezados_de_fila_sin_migrar(fila):
+    _, actual = fila
+    actual.append(("notas.xlsx", None, LIBRO))
+    assert encabezados_reporte(1) == ("notas.xlsx", ["IDENTIFICACION", "MATERIA", "NO. VEZ"])
+
+
+@pytest.mark.parametrize("row", [None, ("vacio.xlsx", None, None)])
+def test_sin_contenido(fila, row):
+    _, actual = fila
+    actual.append(row)
+    assert encabezados_reporte(1) is None
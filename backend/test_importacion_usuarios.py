@@ -0,0 +1,81 @@
+"""Pruebas de la lectura y validación de archivos de importación de usuarios"""
+import io
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import importacion_usuarios
+from escritor_xlsx import generar_xlsx
+from importacion_usuarios import leer_filas_archivo, validar_filas
+
+ROLES = [{"id": 1, "nombre": "admin"}, {"id": 4, "nombre": "usuario"}]
+FACULTADES = [{"codigo": "FACAF", "nombre": "Educación Física"}, {"codigo": "FCM", "nombre": "Ciencias Médicas"}]
+CARRERAS = {"FACAF": [{"codigo": "ED", "nombre": "Entrenamiento Deportivo"}], "FCM": []}
+
+
+@pytest.fixture(autouse=True)
+def catalogos(monkeypatch):
+    monkeypatch.setattr(importacion_usuarios, "obtener_roles", lambda: ROLES)
+    monkeypatch.setattr(importacion_usuarios, "obtener_facultades", lambda: FACULTADES)
+    monkeypatch.setattr(importacion_usuarios, "obtener_carreras_por_facultad", lambda cod: CARRERAS[cod])
+
+
+def _archivo(contenido, nombre):
+    return FileStorage(stream=io.BytesIO(contenido), filename=nombre)
+
+
+def test_csv_con_punto_y_coma_y_encabezados_alternativos():
+    contenido = "\ufeffCorreo;Rol;Facultad;Estado\na@ug.edu.ec;admin;facaf;inactivo\n;;;\nb@ug.edu.ec;usuario;FCM;\n"
+    registros = leer_filas_archivo(_archivo(contenido.encode("utf-8"), "usuarios.csv"))
+
+    # La fila vacía se salta pero la numeración sigue siendo la del archivo
+    assert registros == [
+        {"fila": 2, "usuario": "a@ug.edu.ec", "rol": "admin", "facultadCod": "facaf", "activo": "inactivo"},
+        {"fila": 4, "usuario": "b@ug.edu.ec", "rol": "usuario", "facultadCod": "FCM", "activo": ""},
+    ]
+
+
+def test_xlsx_con_rol_numerico():
+    contenido = b"".join(generar_xlsx(["Usuario", "RolId", "FacultadCod"], [["c@ug.edu.ec", 4, "FACAF"]]))
+    registros = leer_filas_archivo(_archivo(contenido, "usuarios.XLSX"))
+    validas, errores = validar_filas(registros)
+
+    assert errores == []
+    assert validas[0]["rolId"] == 4
+
+
+def test_sin_columna_usuario():
+    with pytest.raises(ValueError):
+        leer_filas_archivo(_archivo(b"nombre,rol\nx,admin\n", "usuarios.csv"))
+
+
+def test_validar_filas():
+    registros = [
+        {"fila": 2, "usuario": "a@ug.edu.ec", "rol": "Admin", "facultadCod": "facaf", "carreraCod": "ed", "activo": "no"},
+        {"fila": 3, "usuario": "A@ug.edu.ec", "rolId": "1"},
+        {"fila": 4, "usuario": "sin-arroba", "rolId": "1"},
+        {"fila": 5, "usuario": "d@ug.edu.ec", "rolId": "9", "facultadCod": "FACAF"},
+        {"fila": 6, "usuario": "e@ug.edu.ec", "rolId": "4", "facultadCod": "XX"},
+        {"fila": 7, "usuario": "f@ug.edu.ec", "rolId": "4", "facultadCod": "FCM", "carreraCod": "ED"},
+        {"fila": 8, "usuario": "g@ug.edu.ec", "rolId": "4.0"},
+    ]
+    validas, errores = validar_filas(registros, facultad_por_defecto="FCM")
+
+    assert validas == [
+        {"fila": 2, "usuario": "a@ug.edu.ec", "rolId": 1, "facultadCod": "FACAF", "carreraCod": "ED", "activo": False},
+        {"fila": 8, "usuario": "g@ug.edu.ec", "rolId": 4, "facultadCod": "FCM", "carreraCod": None, "activo": True},
+    ]
+    assert [(e["fila"], e["error"]) for e in errores] == [
+        (3, "Usuario duplicado en el archivo"),
+        (4, "El usuario debe ser un email válido"),
+        (5, "Rol inválido: 9"),
+        (6, "Facultad inválida: XX"),
+        (7, "La carrera ED no pertenece a la facultad FCM"),
+    ]
+
+
+@pytest.mark.parametrize("rol", ["abc", "nan", "inf", "-inf", "1e400"])
+def test_rol_no_numerico_es_error_de_la_fila(rol):
+    validas, errores = validar_filas([{"fila": 2, "usuario": "a@ug.edu.ec", "rolId": rol, "facultadCod": "FACAF"}])
+    assert validas == []
+    assert errores == [{"fila": 2, "usuario": "a@ug.edu.ec", "error": f"Rol inválido: {rol}"}]
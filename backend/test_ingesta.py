@@ -0,0 +1,123 @@
+"""Pruebas de las claves naturales de ingesta y de la versión a ingerir (sin base de datos)"""
+import hashlib
+import io
+import json
+
+import pytest
+
+from escritor_xlsx import generar_xlsx
+from ingesta import ReporteNoSoportado, VersionNoVigente, _version_a_ingerir, filas_por_clave, leer_libro, resolver_clave
+
+ENCABEZADOS = ["IDENTIFICACION", "MATERIA", "PERIODO", "GRUPO/PARALELO", "PROMEDIO", ""]
+
+
+def _por_clave(filas, encabezados=ENCABEZADOS):
+    _, indices = resolver_clave(encabezados)
+    resultado, omitidas = filas_por_clave(encabezados, filas, indices)
+    return {clave: (hash_fila, json.loads(datos)) for clave, hash_fila, datos in resultado.values()}, omitidas
+
+
+def test_resolver_clave_por_tipo():
+    assert resolver_clave(ENCABEZADOS) == ("calificaciones", [0, 1, 2, 3])
+    assert resolver_clave(["PERIODO", "COD_CARRERA", "IDENTIFICACION"]) == ("nomina", [2, 0, 1])
+    assert resolver_clave(["IDENTIFICACION", "PERIODO", "CARRERA", "DOCENTE"]) == ("docentes", [0, 1, 2])
+
+
+def test_resolver_clave_prefiere_cod_materia():
+    encabezados = ["IDENTIFICACION", "MATERIA", "COD_MATERIA", "PERIODO", "GRUPO/PARALELO"]
+    assert resolver_clave(encabezados) == ("calificaciones", [0, 2, 3, 4])
+
+
+def test_resolver_clave_sin_columnas():
+    with pytest.raises(ReporteNoSoportado):
+        resolver_clave(["NOMBRE", "CORREO"])
+
+
+def test_filas_por_clave_omite_vacias_y_sin_identificacion():
+    filas = [
+        ["0912", "CALCULO", "2025 - 2026 CI", "MA1", "8.5", "x"],
+        ["", "", "", "", "", ""],
+        ["", "FISICA", "2025 - 2026 CI", "MA1", "7", ""],
+    ]
+    por_clave, omitidas = _por_clave(filas)
+    assert list(por_clave) == ["0912 | CALCULO | 2025 - 2026 CI | MA1"]
+    assert omitidas == 1
+    # Las columnas sin encabezado no se guardan
+    assert por_clave["0912 | CALCULO | 2025 - 2026 CI | MA1"][1] == {
+        "IDENTIFICACION": "0912", "MATERIA": "CALCULO", "PERIODO": "2025 - 2026 CI",
+        "GRUPO/PARALELO": "MA1", "PROMEDIO": "8.5"
+    }
+
+
+def test_filas_por_clave_numera_repetidas_y_completa_cortas():
+    filas = [
+        ["0912", "CALCULO", "2025 - 2026 CI", "MA1", "8.5"],
+        ["0912", "CALCULO", "2025 - 2026 CI", "MA1", "9"],
+        ["0912", "CALCULO", "2025 - 2026 CI"],
+    ]
+    por_clave, _ = _por_clave(filas)
+    assert list(por_clave) == [
+        "0912 | CALCULO | 2025 - 2026 CI | MA1",
+        "0912 | CALCULO | 2025 - 2026 CI | MA1 #2",
+        "0912 | CALCULO | 2025 - 2026 CI | ",
+    ]
+    assert por_clave["0912 | CALCULO | 2025 - 2026 CI | MA1 #2"][1]["PROMEDIO"] == "9"
+
+
+def test_hash_de_fila_no_depende_del_orden_de_columnas():
+    fila = ["0912", "CALCULO", "2025 - 2026 CI", "MA1", "8.5"]
+    encabezados = ENCABEZADOS[:5]
+    orden = [4, 2, 0, 3, 1]
+    a, _ = _por_clave([fila], encabezados)
+    b, _ = _por_clave([[fila[i] for i in orden]], [encabezados[i] for i in orden])
+    assert list(a.values()) == list(b.values())
+
+
+def test_clave_hash_es_sha1_de_la_clave():
+    filas = [["0912", "CALCULO", "2025 - 2026 CI", "MA1", "8.5"]]
+    _, indices = resolver_clave(ENCABEZADOS)
+    resultado, _ = filas_por_clave(ENCABEZADOS, filas, indices)
+    (clave_hash, (clave, _, _)), = resultado.items()
+    assert clave_hash == hashlib.sha1(clave.encode()).digest()
+
+
+def test_leer_libro_normaliza_encabezados_y_valores():
+    libro = io.BytesIO(b"".join(generar_xlsx(
+        [" identificacion ", "Materia", "PERIODO", "GRUPO/PARALELO", "NOTA"],
+        [[912, " CALCULO ", "2025 - 2026 CI", "MA1", 8.5], [None, None, None, None, None]]
+    )))
+    encabezados, filas = leer_libro(libro)
+    assert encabezados == ["IDENTIFICACION", "MATERIA", "PERIODO", "GRUPO/PARALELO", "NOTA"]
+    assert list(filas) == [["912", "CALCULO", "2025 - 2026 CI", "MA1", "8.5"], ["", "", "", "", ""]]
+
+
+class _Cursor:
+    """fetchone devuelve, en orden, las respuestas preparadas"""
+
+    def __init__(self, *respuestas):
+        self.respuestas = list(respuestas)
+
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchone(self):
+        return self.respuestas.pop(0)
+
+
+def test_version_a_ingerir_es_la_vigente():
+    hash_hex = "ab" * 32
+    assert _version_a_ingerir(_Cursor((3,), (hash_hex + " ",)), 10, None) == (3, hash_hex)
+    assert _version_a_ingerir(_Cursor((3,), (hash_hex,)), 10, 3) == (3, hash_hex)
+
+
+def test_version_anterior_no_se_ingiere():
+    # Aplicar la versión 2 sobre FilasReporte revertiría la 3 ya subida
+    with pytest.raises(VersionNoVigente):
+        _version_a_ingerir(_Cursor((3,)), 10, 2)
+
+
+def test_archivo_o_version_inexistente():
+    with pytest.raises(ValueError):
+        _version_a_ingerir(_Cursor(None), 10, None)
+    with pytest.raises(ValueError):
+        _version_a_ingerir(_Cursor((3,), None), 10, None)
@@ -0,0 +1,100 @@
+"""Pruebas de lector_xlsx (desde backend/: python -m pytest)"""
+import io
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from escritor_xlsx import generar_xlsx
+from lector_xlsx import LectorXlsx, XlsxInvalido, indice_columna
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_LIBRO = f"""<workbook {_NS} xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Notas" sheetId="1" r:id="rId1"/></sheets></workbook>"""
+_RELS = """<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>"""
+_ESTILOS = f"""<styleSheet {_NS}>
+<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/></numFmts>
+<cellXfs count="3"><xf numFmtId="0"/><xf numFmtId="164"/><xf numFmtId="2"/></cellXfs></styleSheet>"""
+_CADENAS = f"""<sst {_NS}><si><t>IDENTIFICACION</t></si><si><t>NOMBRE</t></si>
+<si><r><t>PÉREZ </t></r><r><t>ANA</t></r><rPh><t>ペレス</t></rPh></si></sst>"""
+
+
+def _libro(filas_xml, dimension="A1:D4"):
+    """xlsx mínimo con cadenas compartidas, estilos de fecha y la hoja dada"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("xl/workbook.xml", _LIBRO)
+        zf.writestr("xl/_rels/workbook.xml.rels", _RELS)
+        zf.writestr("xl/styles.xml", _ESTILOS)
+        zf.writestr("xl/sharedStrings.xml", _CADENAS)
+        zf.writestr("xl/worksheets/sheet1.xml",
+                    f'<worksheet {_NS}><dimension ref="{dimension}"/><sheetData>{filas_xml}</sheetData></worksheet>')
+    buffer.seek(0)
+    return buffer
+
+
+def test_indice_columna():
+    assert indice_columna("A1") == 0
+    assert indice_columna("Z3") == 25
+    assert indice_columna("AF9419") == 31
+
+
+def test_valores_tipados_y_cadenas_compartidas():
+    libro = _libro(
+        '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c></row>'
+        '<row r="2"><c r="A2"><v>912</v></c><c r="B2" t="s"><v>2</v></c>'
+        '<c r="C2" s="1"><v>45658</v></c><c r="D2" t="b"><v>1</v></c></row>'
+        '<row r="3"><c r="A3" s="2"><v>7.5</v></c><c r="B3" t="inlineStr"><is><t>en línea</t></is></c>'
+        '<c r="C3" t="str"><v>=fórmula</v></c></row>'
+    )
+    with LectorXlsx(libro) as lector:
+        filas = list(lector.filas())
+    assert filas[0] == ["IDENTIFICACION", "NOMBRE", None, None]
+    # La fonética (<rPh>) no forma parte del texto
+    assert filas[1] == [912, "PÉREZ ANA", datetime(2025, 1, 1), True]
+    # numFmtId 2 (0.00) no es fecha
+    assert filas[2] == [7.5, "en línea", "=fórmula", None]
+
+
+def test_filas_ausentes_y_celdas_dispersas():
+    libro = _libro('<row r="1"><c r="A1"><v>1</v></c></row><row r="4"><c r="D4"><v>4</v></c></row>')
+    with LectorXlsx(libro) as lector:
+        filas = list(lector.filas())
+    assert filas == [[1, None, None, None], [None] * 4, [None] * 4, [None, None, None, 4]]
+
+
+def test_fila_mas_ancha_que_la_dimension():
+    libro = _libro('<row r="1"><c r="A1"><v>1</v></c><c r="C1"><v>3</v></c></row>', dimension="A1:A1")
+    with LectorXlsx(libro) as lector:
+        assert next(lector.filas()) == [1, None, 3]
+
+
+def test_lotes():
+    filas = "".join(f'<row r="{n}"><c r="A{n}"><v>{n}</v></c></row>' for n in range(1, 6))
+    with LectorXlsx(_libro(filas, dimension="A1:A5")) as lector:
+        assert [len(lote) for lote in lector.lotes(2)] == [2, 2, 1]
+
+
+def test_hoja_por_nombre_e_inexistente():
+    with LectorXlsx(_libro('<row r="1"><c r="A1"><v>1</v></c></row>'), hoja="Notas") as lector:
+        assert next(lector.filas())[0] == 1
+    with pytest.raises(XlsxInvalido):
+        LectorXlsx(_libro(""), hoja="Otra")
+    with pytest.raises(XlsxInvalido):
+        LectorXlsx(_libro(""), hoja=3)
+
+
+def test_archivo_que_no_es_xlsx():
+    with pytest.raises(XlsxInvalido):
+        LectorXlsx(io.BytesIO(b"IDENTIFICACION,NOMBRE\n1,ANA\n"))
+
+
+def test_lee_lo_que_genera_escritor_xlsx():
+    filas = [["0912", "ÑANDÚ & <co>", 8.25, None, datetime(2025, 3, 4, 10, 30)]]
+    libro = io.BytesIO(b"".join(generar_xlsx(["ID", "NOMBRE", "NOTA", "VACIO", "FECHA"], filas)))
+    with LectorXlsx(libro) as lector:
+        encabezados, fila = list(lector.filas())
+    assert encabezados == ["ID", "NOMBRE", "NOTA", "VACIO", "FECHA"]
+    assert fila[:4] == ["0912", "ÑANDÚ & <co>", 8.25, None]
+    assert abs((fila[4] - datetime(2025, 3, 4, 10, 30)).total_seconds()) < 1
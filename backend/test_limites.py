@@ -0,0 +1,163 @@
+"""Pruebas del limitador (SQLite temporal, reloj fijo)"""
+import pytest
+
+import limites
+from limites import LimiteExcedido, Limitador, clave_cuenta
+
+CLASES = {
+    "blob": {
+        "usuario": {"concurrencia": 2, "por_minuto": 6, "rafaga": 3},
+        "facultad": {"concurrencia": 3, "por_minuto": 60, "rafaga": 1},
+        "global": {"concurrencia": 10},
+        "reintento": 5,
+    },
+}
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    ahora = [1_000_000.0]
+    monkeypatch.setattr(limites.time, "time", lambda: ahora[0])
+    return ahora
+
+
+@pytest.fixture
+def limitador(tmp_path):
+    return Limitador(ruta=str(tmp_path / "limites.db"), clases=CLASES)
+
+
+def _consumir(limitador, clase, usuario, facultad=None):
+    """Adquiere y libera al instante: solo cuenta la tasa"""
+    limitador.liberar(clase, limitador.adquirir(clase, usuario, facultad))
+
+
+def test_rafaga_y_reintento(limitador, reloj):
+    # 6 por minuto: un request cada 10 s, con ráfaga de 3
+    for _ in range(3):
+        _consumir(limitador, "blob", "u1")
+    with pytest.raises(LimiteExcedido) as e:
+        _consumir(limitador, "blob", "u1")
+    assert e.value.motivo == "tasa"
+    assert e.value.reintento == 10
+
+    reloj[0] += 9.5
+    with pytest.raises(LimiteExcedido):
+        _consumir(limitador, "blob", "u1")
+    reloj[0] += 0.5
+    _consumir(limitador, "blob", "u1")
+    # Otro usuario tiene su propia ráfaga
+    _consumir(limitador, "blob", "u2")
+
+
+def test_reintento_minimo_un_segundo(limitador, reloj):
+    for _ in range(3):
+        _consumir(limitador, "blob", "u1")
+    reloj[0] += 9.9
+    with pytest.raises(LimiteExcedido) as e:
+        _consumir(limitador, "blob", "u1")
+    assert e.value.reintento == 1
+
+
+def test_concurrencia_por_usuario_y_facultad(limitador, reloj):
+    a = limitador.adquirir("blob", "u1", "FAC")
+    reloj[0] += 1
+    limitador.adquirir("blob", "u1", "FAC")
+    with pytest.raises(LimiteExcedido) as e:
+        limitador.adquirir("blob", "u1", "FAC")
+    assert (e.value.motivo, e.value.reintento) == ("usuario", 5)
+
+    reloj[0] += 1
+    limitador.adquirir("blob", "u2", "FAC")
+    reloj[0] += 1
+    with pytest.raises(LimiteExcedido) as e:
+        limitador.adquirir("blob", "u3", "FAC")
+    assert e.value.motivo == "facultad"
+
+    limitador.liberar("blob", a)
+    reloj[0] += 1
+    limitador.adquirir("blob", "u3", "FAC")
+    assert limitador.estado() == {"blob": 3}
+
+
+def test_rechazo_no_consume_tasa(limitador, reloj):
+    # La facultad admite 1 por segundo: el segundo request se rechaza por ella
+    _consumir(limitador, "blob", "u1", "FAC")
+    with pytest.raises(LimiteExcedido) as e:
+        _consumir(limitador, "blob", "u1", "FAC")
+    assert e.value.motivo == "tasa"
+    # ...sin gastar la ráfaga del usuario: quedan 2 de 3
+    reloj[0] += 1
+    _consumir(limitador, "blob", "u1", "FAC")
+    reloj[0] += 1
+    _consumir(limitador, "blob", "u1", "FAC")
+    reloj[0] += 1
+    with pytest.raises(LimiteExcedido):
+        _consumir(limitador, "blob", "u1", "FAC")
+
+
+def test_liberar_proceso(limitador):
+    limitador.adquirir("blob", "u1")
+    limitador.liberar_proceso(limites.os.getpid())
+    assert limitador.estado() == {}
+
+
+def test_clave_cuenta():
+    assert clave_cuenta("  Ana.Perez@UG.edu.ec ") == "cuenta:ana.perez@ug.edu.ec"
+
+
+def test_decorador_responde_429(limitador, monkeypatch):
+    flask = pytest.importorskip("flask")
+    monkeypatch.setattr(limites, "limitador", limitador)
+    monkeypatch.setattr(limites, "LIMITES_ACTIVOS", True)
+    app = flask.Flask(__name__)
+
+    @app.route("/descarga")
+    @limites.limitar("blob")
+    def descarga():
+        return "ok"
+
+    cliente = app.test_client()
+    for _ in range(3):
+        # El cupo se libera al cerrar la respuesta
+        with cliente.get("/descarga") as respuesta:
+            assert respuesta.status_code == 200
+    assert limitador.estado() == {}
+    respuesta = cliente.get("/descarga")
+    assert respuesta.status_code == 429
+    assert int(respuesta.headers["Retry-After"]) >= 1
+    assert respuesta.get_json()["limite"] == "tasa"
+
+
+def _ip_de(app, **entorno):
+    with app.test_client() as cliente:
+        return cliente.get("/ip", headers={"X-Forwarded-For": "6.6.6.6, 10.0.0.9"}, environ_base=entorno).get_data(as_text=True)
+
+
+def test_ip_cliente_no_acepta_x_forwarded_for_del_cliente():
+    flask = pytest.importorskip("flask")
+    app = flask.Flask(__name__)
+    app.add_url_rule("/ip", "ip", lambda: limites.ip_cliente(flask.request))
+
+    # Sin proxies confiables la cabecera es del cliente y se ignora
+    assert _ip_de(app, REMOTE_ADDR="10.0.0.1") == "10.0.0.1"
+
+
+def test_cuenta_enviada_o_ip():
+    flask = pytest.importorskip("flask")
+    app = flask.Flask(__name__)
+    with app.test_request_context("/auth/ug", method="POST", json={"usuario": " Ana@UG.edu.ec"}):
+        assert limites.cuenta_enviada(flask.request) == "cuenta:ana@ug.edu.ec"
+    with app.test_request_context("/auth/ug", method="POST", json={"usuario": 5},
+                                  environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        assert limites.cuenta_enviada(flask.request) == "10.0.0.1"
+
+
+def test_ip_cliente_detras_de_un_proxy_confiable():
+    flask = pytest.importorskip("flask")
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    app = flask.Flask(__name__)
+    app.add_url_rule("/ip", "ip", lambda: limites.ip_cliente(flask.request))
+    # Como app.py con PROXIES_CONFIABLES=1: solo cuenta lo que agregó nginx (la última IP)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    assert _ip_de(app, REMOTE_ADDR="127.0.0.1") == "10.0.0.9"
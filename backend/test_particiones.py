@@ -0,0 +1,116 @@
+"""Pruebas del ruteo de facultades y archivos a particiones y de las migraciones por partición"""
+import pytest
+
+import database
+import particiones
+from database import FacultadEnMovimiento, particion_de_archivo, particion_de_facultad, verificar_escritura_facultad
+from migraciones import MIGRACIONES, MIGRACIONES_PARTICION, _migraciones_de
+
+PARTICIONES = {
+    "principal": {"idBase": 0},
+    "norte": {"idBase": 1_000_000},
+    "sur": {"idBase": 2_000_000},
+}
+
+
+@pytest.fixture
+def particionado(monkeypatch):
+    """Tres particiones; la prueba pone en `asignadas` FacultadCod -> (partición, estado)"""
+    asignadas = {}
+    consultas = []
+
+    def consultar_particion(facultad_cod):
+        consultas.append(facultad_cod)
+        return asignadas.get(facultad_cod, ("principal", "activa"))
+
+    monkeypatch.setattr(database, "PARTICIONES", PARTICIONES)
+    monkeypatch.setattr(database, "_consultar_particion", consultar_particion)
+    database.invalidar_particiones()
+    yield asignadas, consultas
+    database.invalidar_particiones()
+
+
+@pytest.mark.parametrize("archivo_id, particion", [
+    (1, "principal"),
+    (1_000_000, "principal"),
+    (1_000_001, "norte"),
+    (1_999_999, "norte"),
+    (2_000_001, "sur"),
+])
+def test_particion_de_archivo_por_id_base(particionado, archivo_id, particion):
+    assert particion_de_archivo(archivo_id) == particion
+
+
+def test_sin_particiones_todo_va_a_la_principal(monkeypatch):
+    monkeypatch.setattr(database, "PARTICIONES", {"principal": {"idBase": 0}})
+    assert particion_de_archivo(5_000_000) == "principal"
+    assert particion_de_facultad("FCM") == "principal"
+
+
+def test_particion_de_facultad_en_cache(particionado):
+    asignadas, consultas = particionado
+    asignadas["FCM"] = ("norte", "activa")
+
+    assert particion_de_facultad("FCM") == "norte"
+    assert particion_de_facultad("FCM") == "norte"
+    assert particion_de_facultad("FACAF") == "principal"
+    assert particion_de_facultad(None) == "principal"
+    assert consultas == ["FCM", "FACAF"]
+
+    # Después de un movimiento cada worker vuelve a consultar al invalidar
+    asignadas["FCM"] = ("sur", "activa")
+    database.invalidar_particiones()
+    assert particion_de_facultad("FCM") == "sur"
+
+
+def test_escritura_bloqueada_durante_un_movimiento(particionado):
+    asignadas, consultas = particionado
+    asignadas["FCM"] = ("norte", "moviendo")
+    with pytest.raises(FacultadEnMovimiento):
+        verificar_escritura_facultad("FCM")
+    # Sin caché: cada verificación consulta
+    with pytest.raises(FacultadEnMovimiento):
+        verificar_escritura_facultad("FCM")
+    assert consultas == ["FCM", "FCM"]
+
+    asignadas["FCM"] = ("norte", "activa")
+    verificar_escritura_facultad("FCM")
+
+
+# ======================= ESQUEMA ===========================
+def test_esquema_particion_numera_desde_id_base():
+    sql = particiones.esquema_particion(1_000_000)
+    assert "IDENTITY(1000001,1)" in sql
+    # El catálogo de facultades está en la principal
+    assert "REFERENCES" not in sql
+
+
+def test_preparar_particion_valida_el_nombre(monkeypatch):
+    monkeypatch.setattr(particiones, "PARTICIONES", PARTICIONES)
+    with pytest.raises(ValueError, match="principal"):
+        particiones.preparar_particion("principal")
+    with pytest.raises(ValueError, match="desconocida"):
+        particiones.preparar_particion("oeste")
+
+
+def test_migraciones_de_cada_particion():
+    versiones = [m[0] for m in MIGRACIONES]
+    assert versiones == sorted(set(versiones))
+    assert MIGRACIONES_PARTICION <= set(versiones)
+
+    assert _migraciones_de("principal") == MIGRACIONES
+    de_particion = [m[0] for m in _migraciones_de("norte")]
+    assert de_particion == sorted(MIGRACIONES_PARTICION)
+    # ResultadosModulo vive en cada partición: su clave por periodo también
+    assert 11 in de_particion
+
+
+def test_migraciones_no_tocan_tablas_de_la_principal_en_particiones():
+    # Usuarios, Rol, Facultad y Carrera solo existen en la principal
+    for version, _, sentencias in _migraciones_de("norte"):
+        if version == 3:
+            continue
+        for sql in sentencias:
+            for tabla in ("Usuarios", "Rol ", "Carrera", "Facultad "):
+                assert tabla not in sql, (version, tabla)
+
@@ -0,0 +1,348 @@
+"""
+Pruebas de los módulos precalculados. Las de paridad corren las mismas filas por las
+páginas de frontend/Modules (paridad_modulos.mjs, con node) y por precalculo.py.
+"""
+import json
+import random
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import exportacion
+import precalculo
+from precalculo import DatosFacultad, huella_facultad, periodo_anterior
+
+ACTUAL, ANTERIOR = "2025 - 2026 CI", "2024 - 2025 CII"
+CARRERAS = ["ENTRENAMIENTO DEPORTIVO", "PEDAGOGÍA DE LA ACTIVIDAD FÍSICA Y DEPORTE", "ENFERMERIA"]
+MATERIAS = ["ANATOMIA", "BIOMECANICA", "CALCULO", "FISIOLOGIA", "INGLES II", "NATACION", "PEDAGOGIA",
+            "PSICOLOGIA", "ATLETISMO", "NUTRICION"]
+DOCENTES = ["0912345 - PEREZ JUAN", "0923456 - MORA ANA", "0934567 - ÁLVAREZ JOSÉ", "0000000 - MOVILIDAD",
+            "SIN ASIGNAR", "0945678 - RIOS LUIS", ""]
+APELLIDOS = ["ACOSTA", "BRAVO", "CEDENO", "DUARTE", "ESPINOZA", "FLORES", "GUERRERO", "HIDALGO",
+             "IBARRA", "JARAMILLO", "LOPEZ", "MENDOZA"]
+NOMBRES = ["ANA", "LUIS", "MARIA", "JOSE", "CARLA", "PEDRO"]
+# Decimales con empate al redondear (x.x5, x.xx5) además de vacíos, coma decimal y texto
+NOTAS = ["", "3.5", "4", "5.125", "6,5", "6.875", "7", "8.25", "9.5", "10", "0", "S/N"]
+ASISTENCIAS = ["", "35.25", "39.95", "40", "62.25", "69.75", "70", "85.5", "100"]
+ESTADOS = ["APROBADO", "REPROBADO", "APROBADA", "REPROBADA", "EN CURSO", ""]
+
+
+# ======================= DATOS DE PRUEBA ===========================
+def _fixture(semilla=45):
+    """Calificaciones de dos periodos y la nómina, con casos de cada regla"""
+    azar = random.Random(semilla)
+    calificaciones, nomina = [], []
+
+    for i in range(48):
+        estudiante = {
+            "IDENTIFICACION": f"09{i:08d}",
+            "APELLIDOS": f"{APELLIDOS[i % 12]} {APELLIDOS[(i // 12) * 3]}",
+            "NOMBRES": NOMBRES[i % 6],
+            "CORREO_INSTITUCIONAL": f"e{i}@ug.edu.ec",
+            "CORREO_PERSONAL": f"e{i}@mail.com" if i % 3 else "",
+            "CARRERA": CARRERAS[i % 3],
+        }
+        nivel = str(1 + i % 8)
+
+        if i % 4 == 0:
+            # Candidato a top-promedios: todas las materias del nivel, primera vez
+            esperadas = precalculo.CARRERAS_TOP.get(estudiante["CARRERA"], (None, {"": 0}))[1].get(nivel, 5)
+            cantidad = esperadas - (1 if i % 16 == 0 else 0)
+        else:
+            cantidad = azar.randint(1, 5)
+
+        for materia in azar.sample(MATERIAS, min(cantidad, len(MATERIAS))):
+            calificaciones.append({
+                **estudiante,
+                "PERIODO": ACTUAL,
+                "NIVEL": nivel if i % 4 == 0 or azar.random() < 0.8 else str(1 + (i + 1) % 8),
+                "MATERIA": materia,
+                "DOCENTE": azar.choice(DOCENTES),
+                "GRUPO/PARALELO": azar.choice(["MA1", "VE2", "NO1", "MA3"]),
+                "NO. VEZ": "1" if i % 4 == 0 else azar.choice(["1", "1", "2", "3", "", "4"]),
+                "ASISTENCIA_PRIMER_PARCIAL": azar.choice(ASISTENCIAS),
+                "PRIMER_PARCIAL": azar.choice(NOTAS),
+                "ASISTENCIA_SEGUNDO_PARCIAL": azar.choice(ASISTENCIAS),
+                "SEGUNDO_PARCIAL": azar.choice(NOTAS),
+                "PROMEDIO_PARCIALES": azar.choice(NOTAS),
+                "RECUPERACION": azar.choice(["", "", "7.5"]),
+                "MEJORAMIENTO": azar.choice(["", "8"]),
+                "PROMEDIO": azar.choice(NOTAS[1:-1]) if i % 4 == 0 else azar.choice(NOTAS),
+                "ESTADO": azar.choice(ESTADOS),
+            })
+
+        # Segunda matrícula reprobada en el periodo anterior; algunos ya tomaron la tercera
+        if i % 3 == 1:
+            materia = MATERIAS[i % len(MATERIAS)]
+            calificaciones.append({
+                **estudiante, "PERIODO": ANTERIOR, "NIVEL": nivel, "MATERIA": materia,
+                "DOCENTE": azar.choice(DOCENTES), "NO. VEZ": "2",
+                "PROMEDIO": azar.choice(["", "4.5", "6.99", "7", "8"]), "ESTADO": "REPROBADO",
+            })
+            if i % 2:
+                calificaciones.append({
+                    **estudiante, "PERIODO": ACTUAL, "NIVEL": nivel, "MATERIA": materia,
+                    "DOCENTE": azar.choice(DOCENTES), "NO. VEZ": "3", "PROMEDIO": "", "ESTADO": "EN CURSO",
+                })
+
+        if i % 5 == 0:
+            nomina.append({
+                "IDENTIFICACION": estudiante["IDENTIFICACION"],
+                "DISCAPACIDAD": azar.choice(["FISICA", "VISUAL", "AUDITIVA"]),
+                "PORCENTAJE DISCAPACIDAD": "" if i % 10 == 0 else str(azar.choice([30, 45, 60])),
+                "NIVEL": nivel,
+            })
+        elif i % 7 == 0:
+            nomina.append({"IDENTIFICACION": estudiante["IDENTIFICACION"], "DISCAPACIDAD": "",
+                           "PORCENTAJE DISCAPACIDAD": "", "NIVEL": nivel})
+
+    return calificaciones, nomina
+
+
+class _BD:
+    """
+    Cursor sobre las filas de prueba que responde las consultas de DatosFacultad
+    (archivo 1 = calificaciones, archivo 2 = nómina).
+    """
+
+    def __init__(self, calificaciones, nomina):
+        self.calificaciones = calificaciones
+        self.nomina = nomina
+        self.resultado = []
+
+    def execute(self, sql, params=()):
+        if "TipoReporte" in sql:
+            self.resultado = [(1,)] if params[1] == "calificaciones" else [(2,)]
+        elif "GROUP BY" in sql:
+            por_periodo = {}
+            for fila in self.calificaciones:
+                por_periodo.setdefault(fila["PERIODO"], set()).add(fila["IDENTIFICACION"])
+            self.resultado = [(p, len(ids)) for p, ids in por_periodo.items()]
+        elif "DISCAPACIDAD" in sql:
+            self.resultado = [(f["IDENTIFICACION"], f["DISCAPACIDAD"], f["PORCENTAJE DISCAPACIDAD"] or None, f["NIVEL"])
+                              for f in self.nomina if f["DISCAPACIDAD"]]
+        else:
+            periodos = set(params[-2:])
+            self.resultado = [(json.dumps(f),) for f in self.calificaciones if f["PERIODO"] in periodos]
+
+    def fetchall(self):
+        resultado, self.resultado = self.resultado, []
+        return resultado
+
+    def fetchmany(self, n):
+        lote, self.resultado = self.resultado[:n], self.resultado[n:]
+        return lote
+
+
+@pytest.fixture(scope="module")
+def fixture():
+    return _fixture()
+
+
+@pytest.fixture(scope="module")
+def datos(fixture):
+    return DatosFacultad(_BD(*fixture), "FACAF")
+
+
+@pytest.fixture(scope="module")
+def frontend(fixture):
+    """Resultado de las páginas del frontend para las mismas filas"""
+    if shutil.which("node") is None:
+        pytest.skip("node no está instalado")
+    # sheet_to_json no pone las celdas vacías; la ingesta las guarda como ""
+    calificaciones, nomina = ([{k: v for k, v in f.items() if v != ""} for f in filas] for filas in fixture)
+    salida = subprocess.run(
+        ["node", str(Path(__file__).with_name("paridad_modulos.mjs"))],
+        input=json.dumps({"periodo": ACTUAL, "calificaciones": calificaciones, "nomina": nomina}),
+        capture_output=True, text=True, timeout=60, check=True
+    )
+    return json.loads(salida.stdout)
+
+
+def _sin_orden(filas):
+    # control-parcial y control-final ordenan por estudiante después de buildRows
+    return sorted(json.dumps(f, sort_keys=True, ensure_ascii=False) for f in filas)
+
+
+# ======================= PARIDAD CON EL FRONTEND ===========================
+def test_datos_del_periodo_mas_reciente(datos, fixture):
+    assert datos.periodo == ACTUAL and datos.periodo_anterior == ANTERIOR
+    assert datos.periodos == [ACTUAL, ANTERIOR]
+    assert datos.carreras == sorted(CARRERAS)
+    assert len(datos.actuales) == sum(f["PERIODO"] == ACTUAL for f in fixture[0])
+
+
+def test_paridad_control_parcial(datos, frontend):
+    resultado = precalculo._control_parcial(datos)
+    assert resultado, "la fixture debe tener alertas"
+    assert _sin_orden(resultado) == _sin_orden(frontend["control-parcial"])
+
+
+def test_paridad_control_final(datos, frontend):
+    esperado = [{k: v for k, v in fila.items() if k not in ("_key", "Estado")} for fila in frontend["control-final"]]
+    resultado = precalculo._control_final(datos)
+    assert resultado
+    assert _sin_orden(resultado) == _sin_orden(esperado)
+
+
+def test_paridad_tercera_matricula(datos, frontend):
+    esperado = [{k: v for k, v in fila.items() if k != "_key"} for fila in frontend["tercera-matricula"]]
+    resultado = precalculo._tercera_matricula(datos)
+    assert resultado
+    assert resultado == esperado
+
+
+def test_paridad_top_promedios(datos, frontend):
+    # Mismo formato que renderDesdeServidor en top-promedios.js
+    resultado = {
+        grupo: [{
+            "id": e["id"],
+            "nombre": e["nombre"],
+            "correo": "<br>".join(e["correo"].split("; ")),
+            "grupo": f"<strong>MA:</strong> {e['ma']}<br><strong>VE:</strong> {e['ve']}",
+            "promedio": e["promedio"],
+        } for e in estudiantes]
+        for grupo, estudiantes in precalculo._top_promedios(datos).items()
+    }
+    assert resultado
+    assert resultado == frontend["top-promedios"]
+
+
+def test_paridad_reportes(datos, frontend):
+    resultado = precalculo._reportes(datos)
+    del resultado["estudiantesPorPeriodo"]
+    assert resultado == frontend["reportes"]
+
+
+# ======================= REGLAS PROPIAS ===========================
+def test_periodo_anterior():
+    assert periodo_anterior("2025 - 2026 CI") == "2024 - 2025 CII"
+    assert periodo_anterior("2025-2026 CII") == "2025 - 2026 CI"
+    assert periodo_anterior("2025") is None
+    assert periodo_anterior(None) is None
+
+
+def test_redondeo_como_to_fixed():
+    assert exportacion.fijo(5.125, 2) == "5.13"
+    assert exportacion.fijo(35.25, 1) == "35.3"
+    # 1.005 es 1.00499... en binario: toFixed también da 1.00
+    assert exportacion.fijo(1.005, 2) == "1.00"
+    assert exportacion.fijo(-2.5, 0) == "-3"
+    assert exportacion.valor_numerico("Infinity") is None
+
+
+def test_nee_control():
+    datos = DatosFacultad(_BD([
+        {"PERIODO": ACTUAL, "IDENTIFICACION": "01", "APELLIDOS": "BRAVO  ", "NOMBRES": "ANA", "CARRERA": "X",
+         "MATERIA": "CALCULO", "DOCENTE": "PEREZ", "GRUPO/PARALELO": "MA1", "NO. VEZ": "2", "NIVEL": "3"},
+        {"PERIODO": ACTUAL, "IDENTIFICACION": "01", "APELLIDOS": "BRAVO  ", "NOMBRES": "ANA", "CARRERA": "X",
+         "MATERIA": "FISICA", "DOCENTE": "MORA", "GRUPO/PARALELO": "MA1", "NO. VEZ": "3", "NIVEL": "3"},
+        {"PERIODO": ACTUAL, "IDENTIFICACION": "02", "APELLIDOS": "ACOSTA", "NOMBRES": "LUIS", "CARRERA": "X",
+         "MATERIA": "CALCULO", "DOCENTE": "PEREZ", "GRUPO/PARALELO": "VE1", "NO. VEZ": "1"},
+        # Sin porcentaje en la nómina: no entra
+        {"PERIODO": ACTUAL, "IDENTIFICACION": "03", "APELLIDOS": "CEDENO", "NOMBRES": "EVA", "CARRERA": "X",
+         "MATERIA": "CALCULO", "DOCENTE": "PEREZ", "NO. VEZ": "1"},
+    ], [
+        {"IDENTIFICACION": "01", "DISCAPACIDAD": "FISICA", "PORCENTAJE DISCAPACIDAD": "40", "NIVEL": "2"},
+        {"IDENTIFICACION": "02", "DISCAPACIDAD": "VISUAL", "PORCENTAJE DISCAPACIDAD": "35", "NIVEL": "1"},
+        {"IDENTIFICACION": "03", "DISCAPACIDAD": "AUDITIVA", "PORCENTAJE DISCAPACIDAD": "", "NIVEL": "1"},
+    ]), "FACAF")
+
+    resultado = precalculo._nee_control(datos)
+    assert [(e["Identificación"], e["Estudiante"], e["Nivel"], e["riesgo"]) for e in resultado["estudiantes"]] == [
+        ("02", "ACOSTA LUIS", "1", 1),
+        ("01", "BRAVO ANA", "3", 10),
+    ]
+    assert resultado["estudiantes"][1]["NEE"] == "FISICA (40%)"
+    assert resultado["estudiantes"][1]["[Vez] Materia (Docente)"] == ["[2] CALCULO (PEREZ: MA1)", "[3] FISICA (MORA: MA1)"]
+    assert resultado["riesgos"] == {"1": 1, "2": 0, "3": 0, "4": 1, "5": 0}
+
+
+def test_huella_cambia_con_cada_ingesta(monkeypatch):
+    class _Cursor:
+        def __init__(self, filas):
+            self.filas = filas
+
+        def execute(self, sql, params=()):
+            pass
+
+        def fetchall(self):
+            return self.filas
+
+    huella = huella_facultad(_Cursor([(1, 3), (2, 1)]), "FACAF")
+    assert huella == huella_facultad(_Cursor([(1, 3), (2, 1)]), "FACAF")
+    assert huella != huella_facultad(_Cursor([(1, 4), (2, 1)]), "FACAF")
+    assert huella != huella_facultad(_Cursor([(1, 3)]), "FACAF")
+    # Cambiar la lógica de los módulos invalida lo guardado
+    monkeypatch.setattr(precalculo, "VERSION_MODULOS", precalculo.VERSION_MODULOS + 1)
+    assert huella != huella_facultad(_Cursor([(1, 3), (2, 1)]), "FACAF")
+
+
+# ======================= VISTAS GUARDADAS POR PERIODO ===========================
+class _ResultadosModulo:
+    """ResultadosModulo en memoria: {(facultad, modulo, periodo): (huella, resultado)}"""
+
+    def __init__(self):
+        self.filas = {}
+        self.resultado = None
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        if sql.lstrip().startswith("MERGE"):
+            facultad, modulo, periodo, huella, texto = params[:5]
+            self.filas[(facultad, modulo, periodo)] = (huella, texto)
+            return
+        facultad, modulo, huella, *periodo = params
+        vigentes = sorted((p, texto) for (f, m, p), (h, texto) in self.filas.items()
+                          if (f, m, h) == (facultad, modulo, huella) and (not periodo or p == periodo[0]))
+        self.resultado = (vigentes[-1][1],) if vigentes else None
+
+    def fetchone(self):
+        return self.resultado
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def guardadas(monkeypatch, fixture):
+    tabla = _ResultadosModulo()
+    bd = _BD(*fixture)
+    monkeypatch.setattr(precalculo, "conectar_facultad", lambda facultad_cod, lectura=False: tabla)
+    monkeypatch.setattr(precalculo, "huella_facultad", lambda cur, facultad_cod: "h1")
+    monkeypatch.setattr(precalculo, "DatosFacultad",
+                        lambda cur, facultad_cod, periodo=None, carrera=None: DatosFacultad(bd, facultad_cod, periodo, carrera))
+    return tabla
+
+
+def test_otro_periodo_se_guarda_junto_a_la_vista_por_defecto(guardadas):
+    # Sin la vista por defecto, un periodo anterior se calcula pero no se guarda
+    texto, desde_cache = precalculo.obtener_resultado("FACAF", "reportes", periodo=ANTERIOR)
+    assert not desde_cache and json.loads(texto)["periodo"] == ANTERIOR
+    assert guardadas.filas == {}
+
+    precalculo.obtener_resultado("FACAF", "reportes")
+    assert list(guardadas.filas) == [("FACAF", "reportes", ACTUAL)]
+
+    precalculo.obtener_resultado("FACAF", "reportes", periodo=ANTERIOR)
+    assert set(guardadas.filas) == {("FACAF", "reportes", ACTUAL), ("FACAF", "reportes", ANTERIOR)}
+
+    # Cada periodo sale de su fila y la vista por defecto sigue siendo la del más reciente
+    texto, desde_cache = precalculo.obtener_resultado("FACAF", "reportes", periodo=ANTERIOR)
+    assert desde_cache and json.loads(texto)["periodo"] == ANTERIOR
+    texto, desde_cache = precalculo.obtener_resultado("FACAF", "reportes")
+    assert desde_cache and json.loads(texto)["periodo"] == ACTUAL
+
+
+def test_vista_por_carrera_no_se_guarda(guardadas):
+    texto, desde_cache = precalculo.obtener_resultado("FACAF", "control-parcial", carrera="ENFERMERIA")
+    assert not desde_cache
+    assert {r["Carrera"] for r in json.loads(texto)["resultado"]} <= {"ENFERMERIA"}
+    assert guardadas.filas == {}
@@ -0,0 +1,113 @@
+"""Pruebas de la elección de réplicas de lectura y de la lectura de lo escrito"""
+import time
+
+import pytest
+
+import database
+import replicas
+from replicas import MonitorReplicas, ahora_ms, exigir_lectura_desde, fijar_lectura_desde, lectura_desde
+
+
+@pytest.fixture
+def monitor():
+    """Monitor sin hilo: la prueba pone el estado de cada réplica"""
+    fijar_lectura_desde(0)
+    monitor = MonitorReplicas(intervalo=1)
+    monitor._hilo = object()
+    yield monitor
+    fijar_lectura_desde(0)
+
+
+def _al_dia(monitor, particion, indice, alcanzado=None):
+    monitor._actualizar(particion, indice, {"ok": True, "alcanzadoMs": alcanzado or ahora_ms(), "retrasoSegundos": 0})
+
+
+def test_rotacion_entre_replicas_al_dia(monitor):
+    _al_dia(monitor, "principal", 0)
+    _al_dia(monitor, "principal", 1)
+    _al_dia(monitor, "norte", 0)
+
+    elegidas = [monitor.elegir("principal") for _ in range(4)]
+    assert sorted(elegidas) == [0, 0, 1, 1]
+    assert monitor.elegir("sur") is None
+
+
+def test_replica_atrasada_o_caida_queda_fuera(monitor, capsys):
+    _al_dia(monitor, "principal", 0)
+    monitor._actualizar("principal", 1, {"ok": False, "alcanzadoMs": 0, "retrasoSegundos": 45.0})
+    assert {monitor.elegir("principal") for _ in range(3)} == {0}
+
+    monitor.descartar("principal", 0, "timeout")
+    assert monitor.elegir("principal") is None
+    # El cambio de estado se informa una vez
+    monitor.descartar("principal", 0, "timeout")
+    salida = capsys.readouterr().out
+    assert salida.count("Réplica 0 de 'principal' fuera de la rotación: timeout") == 1
+    assert "retraso de 45.0 s" in salida
+
+    _al_dia(monitor, "principal", 0)
+    assert "de nuevo en la rotación" in capsys.readouterr().out
+
+
+def test_estado_sin_chequeo_reciente_no_cuenta(monitor, monkeypatch):
+    _al_dia(monitor, "principal", 0)
+    ahora = time.monotonic()
+    monkeypatch.setattr(replicas.time, "monotonic", lambda: ahora + replicas.REPLICA_MAX_RETRASO + 5)
+    assert monitor.elegir("principal") is None
+
+
+def test_lectura_de_lo_escrito(monitor):
+    marca = ahora_ms()
+    _al_dia(monitor, "principal", 0, alcanzado=marca - 2000)
+    _al_dia(monitor, "principal", 1, alcanzado=marca + 1000)
+
+    # La marca puede venir del cliente, del propio request o de quien conecta
+    fijar_lectura_desde(str(marca))
+    assert {monitor.elegir("principal") for _ in range(3)} == {1}
+    fijar_lectura_desde(0)
+    assert monitor.elegir("principal", desde_ms=marca) == 1
+    assert monitor.elegir("principal", desde_ms=marca + 5000) is None
+
+
+def test_marca_de_lectura():
+    fijar_lectura_desde("no-es-numero")
+    assert lectura_desde() == 0
+    fijar_lectura_desde("-5")
+    assert lectura_desde() == 0
+
+    fijar_lectura_desde(100)
+    exigir_lectura_desde(50)
+    assert lectura_desde() == 100
+    exigir_lectura_desde(200)
+    assert lectura_desde() == 200
+    fijar_lectura_desde(0)
+
+
+def test_marcas_de_escritura_vencen(monkeypatch):
+    marcas = replicas._MarcasEscritura()
+    marca = marcas.registrar(7)
+    assert lectura_desde() == marca
+    assert marcas.de(7) == marca and marcas.de(8) == 0
+
+    monkeypatch.setattr(replicas, "ahora_ms", lambda: marca + replicas.REPLICA_MARCA_SEGUNDOS * 1000 + 1)
+    assert marcas.de(7) == 0
+    fijar_lectura_desde(0)
+
+
+def test_chequeo_mide_el_retraso(monitor, monkeypatch):
+    monkeypatch.setattr(database, "PARTICIONES", {
+        "principal": {"replicas": [{}, {}]},
+        "norte": {"replicas": []},
+    })
+    ahora = ahora_ms()
+    latidos = {0: ahora - 1000, 1: ahora - int((replicas.REPLICA_MAX_RETRASO + 10) * 1000)}
+    escritos = []
+    monkeypatch.setattr(monitor, "_escribir_latido", escritos.append)
+    monkeypatch.setattr(monitor, "_leer_latido", lambda particion, indice: latidos[indice])
+
+    monitor._chequear()
+    assert escritos == ["principal"]
+    estado = {e["replica"]: e for e in monitor.estado()}
+    assert estado[0]["ok"] and estado[0]["alcanzadoMs"] == latidos[0]
+    assert not estado[1]["ok"]
+    assert monitor.elegir("principal") == 0
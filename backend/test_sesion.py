@@ -0,0 +1,124 @@
+"""Pruebas de los tokens de sesión y su revocación por versión"""
+import os
+import time
+
+os.environ.setdefault("SESION_SECRETO", "secreto-de-pruebas")
+
+import pytest
+from itsdangerous.timed import TimestampSigner
+
+import sesion
+from sesion import emitir_token, verificar_token
+
+USUARIO = {
+    "id": 7,
+    "usuario": "jperez",
+    "estado": True,
+    "rolId": 2,
+    "rolNombre": "Docente",
+    "facultadCod": "FACAF",
+    "facultadNombre": "Educación Física",
+    "versionSesion": 3,
+}
+
+
+@pytest.fixture(autouse=True)
+def versiones(monkeypatch):
+    """Caché nueva por prueba; la 'BD' es un dict que la prueba puede cambiar"""
+    en_bd = {}
+    cargas = []
+
+    def obtener():
+        cargas.append(1)
+        return dict(en_bd)
+
+    monkeypatch.setattr(sesion, "obtener_versiones_sesion", obtener)
+    monkeypatch.setattr(sesion, "versiones_sesion", sesion._VersionesSesion())
+    return en_bd, cargas
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Segundos que se adelanta el reloj de itsdangerous al verificar"""
+    adelanto = [0]
+    monkeypatch.setattr(TimestampSigner, "get_timestamp", lambda self: int(time.time()) + adelanto[0])
+    return adelanto
+
+
+def test_token_ida_y_vuelta():
+    token, expira_en = emitir_token(USUARIO)
+    payload = verificar_token(token)
+
+    assert payload["id"] == 7 and payload["facultadCod"] == "FACAF"
+    assert payload["carreraCod"] is None
+    # La versión solo viaja en el token, no se devuelve como dato del usuario
+    assert "ver" not in payload
+    assert expira_en > 0
+
+
+def test_token_alterado_no_vale():
+    token, _ = emitir_token(USUARIO)
+    assert verificar_token(token[:-2] + ("AA" if not token.endswith("AA") else "BB")) is None
+    assert verificar_token("no-es-un-token") is None
+
+
+def test_vencimiento_y_gracia(reloj):
+    token, _ = emitir_token(USUARIO)
+
+    reloj[0] = sesion.SESION_MINUTOS * 60 + 5
+    assert verificar_token(token) is None
+    assert verificar_token(token, gracia=True)["id"] == 7
+
+    reloj[0] = (sesion.SESION_MINUTOS + sesion.SESION_GRACIA_MINUTOS) * 60 + 5
+    assert verificar_token(token, gracia=True) is None
+
+
+def test_revocacion_por_version(versiones):
+    en_bd, _ = versiones
+    en_bd[7] = 3
+    token, _ = emitir_token(USUARIO)
+    assert verificar_token(token)["id"] == 7
+
+    # Un cambio del usuario en este worker invalida los tokens anteriores al instante
+    sesion.versiones_sesion.registrar(7, 4)
+    assert verificar_token(token) is None
+    assert verificar_token(token, comprobar_version=False)["id"] == 7
+
+    nuevo, _ = emitir_token({**USUARIO, "versionSesion": 4})
+    assert verificar_token(nuevo)["id"] == 7
+
+
+def test_registrar_no_retrocede_la_version():
+    versiones = sesion.versiones_sesion
+    assert versiones.actual(7) == 0
+    versiones.registrar(7, 5)
+    versiones.registrar(7, 2)
+    assert versiones.actual(7) == 5
+
+
+def test_recarga_como_maximo_cada_intervalo(versiones, monkeypatch):
+    en_bd, cargas = versiones
+    ahora = [1000.0]
+    monkeypatch.setattr(sesion.time, "monotonic", lambda: ahora[0])
+
+    en_bd[7] = 1
+    assert sesion.versiones_sesion.actual(7) == 1
+    # Otro worker sube la versión: se ve recién al vencer el intervalo
+    en_bd[7] = 2
+    ahora[0] += sesion.SESION_REVOCACION_SEGUNDOS - 1
+    assert sesion.versiones_sesion.actual(7) == 1
+    ahora[0] += 1
+    assert sesion.versiones_sesion.actual(7) == 2
+    assert len(cargas) == 2
+
+
+def test_error_al_recargar_conserva_las_versiones(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(sesion.time, "monotonic", lambda: ahora[0])
+    sesion.versiones_sesion.registrar(7, 4)
+
+    def falla():
+        raise RuntimeError("BD caída")
+
+    monkeypatch.setattr(sesion, "obtener_versiones_sesion", falla)
+    assert sesion.versiones_sesion.actual(7) == 4
@@ -0,0 +1,88 @@
+"""Pruebas de la subida en lote (multipart y zip) contra un almacén en disco temporal"""
+import io
+import zipfile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import subida_lote
+from almacenamiento import AlmacenLocal
+from escritor_xlsx import generar_xlsx
+from subida_lote import MIME_XLSX, LoteInvalido, almacenar_lote
+
+LIBRO = b"".join(generar_xlsx(["IDENTIFICACION"], [["0912"]]))
+
+
+@pytest.fixture(autouse=True)
+def almacen(tmp_path, monkeypatch):
+    almacen = AlmacenLocal(tmp_path / "blobs")
+    monkeypatch.setattr(subida_lote, "obtener_almacen", lambda: almacen)
+    return almacen
+
+
+def _archivo(nombre, contenido, tipo=None):
+    return FileStorage(stream=io.BytesIO(contenido), filename=nombre, content_type=tipo)
+
+
+def _zip(miembros):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in miembros.items():
+            zf.writestr(nombre, contenido)
+    return buffer.getvalue()
+
+
+def test_multipart_con_zip(almacen):
+    contenido_zip = _zip({
+        "reportes/notas.xlsx": LIBRO,
+        "reportes/": b"",
+        "__MACOSX/reportes/._notas.xlsx": b"basura",
+        ".DS_Store": b"basura",
+        "leeme.txt": b"hola",
+    })
+    guardados = almacenar_lote([
+        _archivo("nomina.xlsx", LIBRO, MIME_XLSX),
+        _archivo("lote.zip", contenido_zip, "application/octet-stream"),
+        _archivo("", b"campo vacio"),
+    ])
+
+    assert [(nombre, tipo) for nombre, tipo, _, _ in guardados] == [
+        ("nomina.xlsx", MIME_XLSX), ("notas.xlsx", MIME_XLSX), ("leeme.txt", "text/plain")
+    ]
+    # Mismo contenido, mismo blob
+    assert guardados[0][2] == guardados[1][2]
+    with almacen.abrir(guardados[2][2]) as f:
+        assert f.read() == b"hola"
+
+
+def test_zip_enviado_como_cuerpo():
+    cuerpo = io.BytesIO(_zip({"notas.xlsx": LIBRO}))
+    (guardado,) = almacenar_lote([], cuerpo=cuerpo, tipo_cuerpo="application/zip")
+    assert guardado[0] == "notas.xlsx" and guardado[3] == len(LIBRO)
+
+
+@pytest.mark.parametrize("archivos, mensaje", [
+    ([], "no contiene archivos"),
+    ([_archivo("a.xlsx", LIBRO), _archivo("a.xlsx", LIBRO)], "repetido"),
+    ([_archivo("roto.xlsx", b"no es un libro")], "roto.xlsx"),
+    ([_archivo("lote.zip", b"no es un zip")], "zip no es válido"),
+])
+def test_lotes_invalidos(archivos, mensaje):
+    with pytest.raises(LoteInvalido, match=mensaje):
+        almacenar_lote(archivos)
+
+
+def test_maximo_de_archivos(monkeypatch):
+    monkeypatch.setattr(subida_lote, "LOTE_MAX_ARCHIVOS", 2)
+    with pytest.raises(LoteInvalido, match="como máximo 2"):
+        almacenar_lote([_archivo(f"{i}.txt", b"x") for i in range(3)])
+
+
+def test_maximo_de_bytes_descomprimidos(monkeypatch):
+    # Un zip chico que se expande por encima del límite se corta mientras se lee
+    monkeypatch.setattr(subida_lote, "LOTE_MAX_BYTES", 1000)
+    bomba = _zip({"a.txt": b"0" * 600, "b.txt": b"0" * 600})
+    assert len(bomba) < 1000
+
+    with pytest.raises(LoteInvalido, match="supera el máximo"):
+        almacenar_lote([_archivo("bomba.zip", bomba)])
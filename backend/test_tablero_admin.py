@@ -0,0 +1,136 @@
+"""Pruebas del resumen del administrador: combinación de parciales y reagregación por huella"""
+from datetime import datetime
+
+import pytest
+
+import tablero_admin
+from tablero_admin import MODULOS_RIESGO, _combinar, _riesgo, resumen_universidad
+
+
+def _parcial(cod, **campos):
+    parcial = {
+        'facultadCod': cod, 'nombre': cod, 'archivos': 1, 'bytes': 100, 'ultimaSubida': None,
+        'usuarios': 2, 'usuariosActivos': 1, 'usuariosPorRol': {'Docente': 2},
+        'archivosIngeridos': 1, 'filasIngeridas': 10, 'riesgo': {m: 1 for m in MODULOS_RIESGO}, 'ms': 5
+    }
+    parcial.update(campos)
+    return parcial
+
+
+def test_combinar():
+    totales = _combinar([
+        _parcial("FACAF", ultimaSubida=datetime(2025, 1, 2)),
+        _parcial("FCM", archivos=3, usuariosPorRol={'Docente': 1, 'Administrador': 1},
+                 ultimaSubida=datetime(2025, 3, 1), riesgo={m: 4 for m in MODULOS_RIESGO}),
+        _parcial("FING", archivos=0, bytes=0, usuariosPorRol={}),
+    ])
+    assert totales['facultades'] == 3
+    assert totales['archivos'] == 4 and totales['bytes'] == 200
+    assert totales['ultimaSubida'] == datetime(2025, 3, 1)
+    assert totales['usuariosPorRol'] == {'Docente': 3, 'Administrador': 1}
+    assert totales['riesgo'] == {m: 6 for m in MODULOS_RIESGO}
+
+
+def test_combinar_sin_facultades():
+    totales = _combinar([])
+    assert totales['facultades'] == 0 and totales['ultimaSubida'] is None
+    assert totales['riesgo'] == {m: 0 for m in MODULOS_RIESGO}
+
+
+# ======================= REAGREGACIÓN ===========================
+@pytest.fixture
+def universidad(monkeypatch):
+    """Huellas que pone la prueba y registro de las facultades que se agregaron"""
+    tablero_admin.cache_tablero.invalidar()
+    huellas = {"FACAF": ("Educación Física", (1,)), "FCM": ("Medicina", (1,))}
+    agregadas = []
+
+    def agregar_facultad(facultad_cod, nombre=None):
+        agregadas.append(facultad_cod)
+        if facultad_cod == "FALLA":
+            raise RuntimeError("sin conexión")
+        return _parcial(facultad_cod, nombre=nombre)
+
+    monkeypatch.setattr(tablero_admin, "_huellas", lambda: dict(huellas))
+    monkeypatch.setattr(tablero_admin, "agregar_facultad", agregar_facultad)
+    yield huellas, agregadas
+    tablero_admin.cache_tablero.invalidar()
+
+
+def test_solo_se_reagregan_las_que_cambiaron(universidad):
+    huellas, agregadas = universidad
+
+    resumen = resumen_universidad()
+    assert resumen['recalculadas'] == ["FACAF", "FCM"]
+    assert [p['nombre'] for p in resumen['facultades']] == ["Educación Física", "Medicina"]
+
+    agregadas.clear()
+    huellas["FCM"] = ("Medicina", (2,))
+    resumen = resumen_universidad()
+    assert agregadas == ["FCM"] and resumen['recalculadas'] == ["FCM"]
+    assert resumen['totales']['facultades'] == 2
+
+    agregadas.clear()
+    assert resumen_universidad(forzar=True)['recalculadas'] == ["FACAF", "FCM"]
+    assert sorted(agregadas) == ["FACAF", "FCM"]
+
+
+def test_error_de_una_facultad_no_corta_el_resumen(universidad):
+    huellas, agregadas = universidad
+    huellas["FALLA"] = ("Otra", (1,))
+
+    resumen = resumen_universidad()
+    assert resumen['errores'] == {"FALLA": "sin conexión"}
+    assert [p['facultadCod'] for p in resumen['facultades']] == ["FACAF", "FCM"]
+
+    # Lo que falló no se guarda: se vuelve a intentar en el siguiente resumen
+    agregadas.clear()
+    resumen_universidad()
+    assert agregadas == ["FALLA"]
+
+
+# ======================= RIESGO ===========================
+class _Cursor:
+    def __init__(self, guardados, ingestas=1):
+        self.guardados = guardados
+        self.ingestas = ingestas
+        self.filas = []
+
+    def execute(self, sql, params=()):
+        self.filas = self.guardados if "ResultadosModulo" in sql else [(self.ingestas,)]
+
+    def fetchall(self):
+        return self.filas
+
+    def fetchone(self):
+        return self.filas[0]
+
+
+@pytest.fixture
+def precalculadas(monkeypatch):
+    llamadas = []
+
+    def precalcular_facultad(facultad_cod):
+        llamadas.append(facultad_cod)
+        return {'modulos': {m: {'filas': 7} for m in MODULOS_RIESGO}}
+
+    monkeypatch.setattr(tablero_admin, "huella_facultad", lambda cur, facultad_cod: "h1")
+    monkeypatch.setattr(tablero_admin, "precalcular_facultad", precalcular_facultad)
+    return llamadas
+
+
+def test_riesgo_desde_la_vista_por_defecto(precalculadas):
+    # Una fila por periodo en orden ascendente: gana la del más reciente
+    guardados = [(m, 1) for m in MODULOS_RIESGO] + [(m, 3) for m in MODULOS_RIESGO]
+    assert _riesgo(_Cursor(guardados), "FACAF") == {m: 3 for m in MODULOS_RIESGO}
+    assert precalculadas == []
+
+
+def test_riesgo_incompleto_se_precalcula(precalculadas):
+    assert _riesgo(_Cursor([("control-parcial", 2)]), "FACAF") == {m: 7 for m in MODULOS_RIESGO}
+    assert precalculadas == ["FACAF"]
+
+
+def test_riesgo_sin_calificaciones_ingeridas(precalculadas):
+    assert _riesgo(_Cursor([], ingestas=0), "FACAF") == {m: 0 for m in MODULOS_RIESGO}
+    assert precalculadas == []
@@ -0,0 +1,149 @@
+"""Pruebas del historial de versiones y su compactación (BD simulada)"""
+from datetime import datetime
+
+import pytest
+
+import versiones
+from versiones import CompactadorVersiones, compactar_versiones, listar_versiones, obtener_version
+
+HASH = "ab" * 32
+
+
+class _Cursor:
+    """
+    fetchone/fetchall devuelven lo preparado por la prueba; cada DELETE toma el
+    siguiente rowcount de la lista.
+    """
+
+    def __init__(self, fetchone=(), fetchall=(), rowcounts=()):
+        self.respuestas = list(fetchone)
+        self.filas = list(fetchall)
+        self.rowcounts = list(rowcounts)
+        self.rowcount = -1
+        self.consultas = []
+
+    def execute(self, sql, params=()):
+        self.consultas.append((" ".join(sql.split()), tuple(params)))
+        if "DELETE" in sql:
+            self.rowcount = self.rowcounts.pop(0)
+
+    def fetchone(self):
+        return self.respuestas.pop(0) if self.respuestas else None
+
+    def fetchall(self):
+        return self.filas
+
+
+class _Conexion:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+        self.cerrada = False
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        self.cerrada = True
+
+
+@pytest.fixture
+def archivo(monkeypatch):
+    """Conexión de la partición del archivo; la prueba pone el cursor"""
+    conexiones = []
+
+    def conectar_archivo(archivo_id, lectura=False):
+        assert lectura
+        return conexiones[-1]
+
+    monkeypatch.setattr(versiones, "conectar_archivo", conectar_archivo)
+    return lambda cursor: conexiones.append(_Conexion(cursor)) or conexiones[-1]
+
+
+@pytest.fixture
+def particiones(monkeypatch):
+    """{particion: cursor}; sin cursor preparado la partición no tiene nada que compactar"""
+    cursores = {}
+    conexiones = {}
+
+    def conectar(particion):
+        cursor = cursores.setdefault(particion, _Cursor(fetchone=[(0,)], rowcounts=[0, 0]))
+        conexiones[particion] = _Conexion(cursor)
+        return conexiones[particion]
+
+    monkeypatch.setattr(versiones, "PARTICIONES", {"principal": {}, "historico": {}})
+    monkeypatch.setattr(versiones, "conectar", conectar)
+    return cursores, conexiones
+
+
+def test_listar_versiones(archivo):
+    fecha = datetime(2025, 3, 1)
+    conexion = archivo(_Cursor(fetchall=[
+        (3, HASH + "  ", 120, "application/x", fecha, "ana@ug.edu.ec", 3),
+        (2, "cd" * 32, 100, "application/x", fecha, None, 3),
+    ]))
+
+    lista = listar_versiones(10)
+    assert [(v["version"], v["vigente"]) for v in lista] == [(3, True), (2, False)]
+    # HashContenido es CHAR(64)
+    assert lista[0]["hash"] == HASH
+    assert lista[0]["subidoPor"] == "ana@ug.edu.ec"
+    assert conexion._cursor.consultas[0][1] == (10,)
+    assert conexion.cerrada
+
+
+def test_obtener_version(archivo):
+    archivo(_Cursor(fetchone=[("notas.xlsx", "application/x", HASH + " ")]))
+    assert obtener_version(10, 2) == ("notas.xlsx", "application/x", HASH)
+
+    archivo(_Cursor())
+    assert obtener_version(10, 99) is None
+
+
+def test_compactar_en_lotes(particiones, monkeypatch):
+    cursores, conexiones = particiones
+    monkeypatch.setattr(versiones, "VERSIONES_LOTE_BORRADO", 3)
+    # Versiones: un lote lleno (3), luego 1; cambios de ingesta: 2
+    cursores["principal"] = _Cursor(fetchone=[(0,)], rowcounts=[3, 1, 2])
+
+    assert compactar_versiones(retener=5, max_dias=30) == 4
+
+    cursor = cursores["principal"]
+    borrados = [params for sql, params in cursor.consultas if sql.startswith("WITH candidatas")]
+    assert borrados == [(3, 5, 30), (3, 5, 30)]
+    # La versión vigente nunca entra en las candidatas
+    assert "WHERE Version <> VersionActual" in cursor.consultas[1][0]
+    assert any(sql.startswith("DELETE TOP (?) c FROM CambiosReporte") for sql, _ in cursor.consultas)
+    # Un commit por lote: las transacciones de borrado son cortas
+    assert conexiones["principal"].commits == 3
+    assert all(c.cerrada for c in conexiones.values())
+
+
+def test_compactar_suma_particiones(particiones):
+    cursores, _ = particiones
+    cursores["principal"] = _Cursor(fetchone=[(0,)], rowcounts=[2, 0])
+    cursores["historico"] = _Cursor(fetchone=[(1,)], rowcounts=[5, 0])
+    assert compactar_versiones() == 7
+
+
+def test_otro_proceso_compactando(particiones):
+    cursores, conexiones = particiones
+    cursores["principal"] = _Cursor(fetchone=[(-1,)])
+    cursores["historico"] = _Cursor(fetchone=[(-1,)])
+
+    assert compactar_versiones() == -1
+    assert all(c.commits == 0 and c.cerrada for c in conexiones.values())
+
+    # Si solo una partición está tomada se cuenta lo que hicieron las demás
+    cursores["principal"] = _Cursor(fetchone=[(-1,)])
+    cursores["historico"] = _Cursor(fetchone=[(0,)], rowcounts=[4, 0])
+    assert compactar_versiones() == 4
+
+
+def test_compactador_desactivado():
+    compactador = CompactadorVersiones(intervalo=0)
+    compactador.iniciar()
+    assert compactador._hilo is None
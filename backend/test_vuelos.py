@@ -0,0 +1,150 @@
+"""Pruebas de la coalescencia de requests (single-flight)"""
+import os
+import stat
+import threading
+
+import pytest
+
+import vuelos
+from vuelos import VueloUnico
+
+
+@pytest.fixture
+def vuelo_unico(tmp_path, monkeypatch):
+    monkeypatch.setattr(vuelos, "VUELOS_DIR", str(tmp_path))
+    monkeypatch.setattr(vuelos, "VUELOS_ACTIVOS", True)
+    return VueloUnico(directorio=str(tmp_path), espera=5)
+
+
+def _en_paralelo(n, funcion):
+    resultados = [None] * n
+    errores = [None] * n
+
+    def correr(i):
+        try:
+            resultados[i] = funcion()
+        except Exception as e:
+            errores[i] = e
+
+    hilos = [threading.Thread(target=correr, args=(i,)) for i in range(n)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados, errores
+
+
+def test_misma_clave_calcula_una_vez(vuelo_unico):
+    llamadas = []
+    liberar = threading.Event()
+
+    def calcular():
+        llamadas.append(1)
+        liberar.wait(5)
+        return {"archivos": 3}
+
+    temporizador = threading.Timer(0.2, liberar.set)
+    temporizador.start()
+    resultados, errores = _en_paralelo(5, lambda: vuelo_unico.ejecutar("files", ("FAC", 1), calcular))
+    temporizador.join()
+
+    assert errores == [None] * 5
+    assert len(llamadas) == 1
+    assert all(valor == {"archivos": 3} for valor, _ in resultados)
+    assert sorted(compartido for _, compartido in resultados) == [False] + [True] * 4
+
+
+def test_claves_distintas_no_comparten(vuelo_unico):
+    assert vuelo_unico.ejecutar("files", ("FAC", 1), lambda: 1) == (1, False)
+    assert vuelo_unico.ejecutar("files", ("FAC", 2), lambda: 2) == (2, False)
+
+
+def test_al_terminar_se_vuelve_a_calcular(vuelo_unico):
+    assert vuelo_unico.ejecutar("files", ("FAC",), lambda: 1) == (1, False)
+    assert vuelo_unico.ejecutar("files", ("FAC",), lambda: 2) == (2, False)
+
+
+def test_error_del_lider_llega_a_todos(vuelo_unico):
+    liberar = threading.Event()
+
+    def calcular():
+        liberar.wait(5)
+        raise ValueError("sin conexión")
+
+    temporizador = threading.Timer(0.2, liberar.set)
+    temporizador.start()
+    _, errores = _en_paralelo(3, lambda: vuelo_unico.ejecutar("files", ("FAC",), calcular))
+    temporizador.join()
+    assert all(isinstance(e, ValueError) for e in errores)
+
+
+def test_lectura_propia_no_coalesce(vuelo_unico, monkeypatch):
+    monkeypatch.setattr(vuelos, "lectura_desde", lambda: 1.0)
+    assert vuelo_unico.ejecutar("files", ("FAC",), lambda: 1) == (1, False)
+
+
+def test_version_contenido_cambia_con_marcar_cambio(tmp_path, monkeypatch):
+    monkeypatch.setattr(vuelos, "VUELOS_DIR", str(tmp_path))
+    inicial_fac, inicial_todas = vuelos.version_contenido("FAC"), vuelos.version_contenido()
+
+    vuelos.marcar_cambio("FAC")
+    assert vuelos.version_contenido("FAC") != inicial_fac
+    assert vuelos.version_contenido("OTRA") == (0, 0)
+    assert vuelos.version_contenido() != inicial_todas
+
+    antes_otra = vuelos.version_contenido("OTRA")
+    vuelos.marcar_cambio()
+    assert vuelos.version_contenido("OTRA") != antes_otra
+
+
+# ======================= DIRECTORIO ===========================
+posix = pytest.mark.skipif(not hasattr(os, "getuid"), reason="permisos POSIX")
+
+
+@posix
+def test_directorio_solo_para_el_servicio(tmp_path):
+    directorio = tmp_path / "vuelos"
+    vuelos._preparar_directorio(str(directorio))
+    assert stat.S_IMODE(directorio.stat().st_mode) == 0o700
+
+    # Uno propio pero abierto a otros se vuelve a cerrar
+    directorio.chmod(0o777)
+    vuelos._preparar_directorio(str(directorio))
+    assert stat.S_IMODE(directorio.stat().st_mode) == 0o700
+
+
+@posix
+def test_directorio_de_otro_usuario(tmp_path, monkeypatch):
+    directorio = tmp_path / "vuelos"
+    directorio.mkdir()
+    monkeypatch.setattr(vuelos.os, "getuid", lambda: directorio.stat().st_uid + 1)
+    with pytest.raises(PermissionError, match="otro usuario"):
+        vuelos._preparar_directorio(str(directorio))
+
+
+@posix
+@pytest.mark.parametrize("tipo", ["enlace", "archivo"])
+def test_directorio_que_no_es_directorio(tmp_path, tipo):
+    ruta = tmp_path / "vuelos"
+    if tipo == "enlace":
+        (tmp_path / "real").mkdir()
+        ruta.symlink_to(tmp_path / "real")
+        with pytest.raises(PermissionError, match="no es un directorio"):
+            vuelos._preparar_directorio(str(ruta))
+    else:
+        ruta.write_text("x")
+        # makedirs ya falla con un archivo en la ruta
+        with pytest.raises(OSError):
+            vuelos._preparar_directorio(str(ruta))
+
+
+def test_reiniciar_sin_directorio_utilizable(tmp_path, monkeypatch, capsys):
+    ruta = tmp_path / "vuelos"
+    monkeypatch.setattr(vuelos, "VUELOS_DIR", str(ruta))
+
+    def preparar_directorio():
+        raise PermissionError("ajeno")
+
+    monkeypatch.setattr(vuelos, "_preparar_directorio", preparar_directorio)
+    vuelos.reiniciar()
+    assert "no utilizable: ajeno" in capsys.readouterr().out
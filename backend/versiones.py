@@ -0,0 +1,181 @@
+"""
+Historial de versiones de los libros Excel.
+
+guardar_archivo_excel() agrega una fila en VersionesArchivoExcel por cada cambio
+de contenido; aquí se listan/descargan versiones previas y se compactan las que
+superan la retención (VERSIONES_RETENER por archivo o VERSIONES_MAX_DIAS de
+antigüedad). La versión vigente nunca se elimina.
+
+Compactación manual (desde backend/):
+    python versiones.py --compactar
+"""
+import os
+import random
+import threading
+import time
+
+from database import PARTICIONES, conectar, conectar_archivo
+
+# ======================= CONFIG ===========================
+VERSIONES_RETENER = int(os.getenv("VERSIONES_RETENER", "10"))
+VERSIONES_MAX_DIAS = int(os.getenv("VERSIONES_MAX_DIAS", "180"))
+VERSIONES_COMPACTAR_SEGUNDOS = int(os.getenv("VERSIONES_COMPACTAR_SEGUNDOS", "21600"))
+VERSIONES_LOTE_BORRADO = 1000
+
+
+def listar_versiones(archivo_id):
+    """Versiones de un archivo, de la más reciente a la más antigua"""
+    conn = conectar_archivo(archivo_id, lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT v.Version, v.HashContenido, v.Tamano, v.TipoMime, v.FechaSubida, v.SubidoPor, a.VersionActual
+            FROM VersionesArchivoExcel v
+            INNER JOIN ArchivosExcel a ON a.Id = v.ArchivoId
+            WHERE v.ArchivoId = ?
+            ORDER BY v.Version DESC
+        """, (archivo_id,))
+        return [{
+            'version': row[0],
+            'hash': row[1].strip(),
+            'tamano': row[2],
+            'tipoMime': row[3],
+            'fechaSubida': row[4],
+            'subidoPor': row[5],
+            'vigente': row[0] == row[6]
+        } for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def obtener_version(archivo_id, version):
+    """
+    Returns:
+        tuple: (NombreArchivo, TipoMime, HashContenido) o None
+    """
+    conn = conectar_archivo(archivo_id, lectura=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT a.NombreArchivo, v.TipoMime, v.HashContenido
+            FROM VersionesArchivoExcel v
+            INNER JOIN ArchivosExcel a ON a.Id = v.ArchivoId
+            WHERE v.ArchivoId = ? AND v.Version = ?
+        """, (archivo_id, version))
+        row = cur.fetchone()
+        return (row[0], row[1], row[2].strip()) if row else None
+    finally:
+        conn.close()
+
+
+def compactar_versiones(retener=VERSIONES_RETENER, max_dias=VERSIONES_MAX_DIAS):
+    """
+    Borra versiones no vigentes fuera de la retención, en lotes, en cada partición.
+    Los blobs que queden sin referencias los elimina purgar_blobs_huerfanos.
+
+    Returns:
+        int: versiones eliminadas (-1 si otro proceso está compactando)
+    """
+    resultados = [_compactar_particion(particion, retener, max_dias) for particion in PARTICIONES]
+    if all(r < 0 for r in resultados):
+        return -1
+    return sum(r for r in resultados if r > 0)
+
+
+def _compactar_particion(particion, retener, max_dias):
+    conn = conectar(particion)
+    try:
+        cur = conn.cursor()
+        # Un solo compactador a la vez en toda la flota; si está tomado se omite esta ronda
+        cur.execute("""
+            DECLARE @r INT;
+            EXEC @r = sp_getapplock @Resource = 'sisa_compactar_versiones', @LockMode = 'Exclusive',
+                                    @LockOwner = 'Session', @LockTimeout = 0;
+            SELECT @r;
+        """)
+        if cur.fetchone()[0] < 0:
+            return -1
+
+        eliminadas = 0
+        while True:
+            cur.execute("""
+                WITH candidatas AS (
+                    SELECT v.Id, v.Version, v.FechaSubida, a.VersionActual,
+                           ROW_NUMBER() OVER (PARTITION BY v.ArchivoId ORDER BY v.Version DESC) AS Orden
+                    FROM VersionesArchivoExcel v
+                    INNER JOIN ArchivosExcel a ON a.Id = v.ArchivoId
+                )
+                DELETE FROM VersionesArchivoExcel
+                WHERE Id IN (
+                    SELECT TOP (?) Id FROM candidatas
+                    WHERE Version <> VersionActual
+                      AND (Orden > ? OR FechaSubida < DATEADD(DAY, -?, GETDATE()))
+                )
+            """, (VERSIONES_LOTE_BORRADO, retener, max_dias))
+            borradas = cur.rowcount
+            conn.commit()
+            eliminadas += max(borradas, 0)
+            if borradas < VERSIONES_LOTE_BORRADO:
+                break
+
+        # Los conjuntos de cambios de la ingesta siguen la misma retención que las versiones
+        while True:
+            cur.execute("""
+                DELETE TOP (?) c FROM CambiosReporte c
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM VersionesArchivoExcel v
+                    WHERE v.ArchivoId = c.ArchivoId AND v.Version = c.Version
+                )
+            """, (VERSIONES_LOTE_BORRADO,))
+            borradas = cur.rowcount
+            conn.commit()
+            if borradas < VERSIONES_LOTE_BORRADO:
+                break
+
+        if eliminadas:
+            print(f"🧹 {eliminadas} versiones de archivos compactadas ({particion})")
+        return eliminadas
+    finally:
+        conn.close()
+
+
+class CompactadorVersiones:
+    """Hilo de fondo (uno por worker) que compacta versiones y purga blobs huérfanos"""
+
+    def __init__(self, intervalo=VERSIONES_COMPACTAR_SEGUNDOS):
+        self.intervalo = intervalo
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def _bucle(self):
+        # Desfase aleatorio para que los workers no coincidan
+        time.sleep(random.uniform(60, 60 + self.intervalo / 4))
+        while True:
+            try:
+                if compactar_versiones() >= 0:
+                    from almacenamiento import purgar_blobs_huerfanos
+                    purgar_blobs_huerfanos()
+            except Exception as e:
+                print(f"❌ Error compactando versiones: {e}")
+            time.sleep(self.intervalo)
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is None and self.intervalo > 0:
+                self._hilo = threading.Thread(target=self._bucle, name="compactador", daemon=True)
+                self._hilo.start()
+
+
+compactador = CompactadorVersiones()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if "--compactar" in sys.argv:
+        from almacenamiento import purgar_blobs_huerfanos
+
+        compactar_versiones()
+        purgar_blobs_huerfanos()
+    else:
+        print("Uso: python versiones.py --compactar")
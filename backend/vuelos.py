@@ -0,0 +1,269 @@
+"""
+Coalescencia de requests idénticos en vuelo (single-flight).
+
+A primera hora todos los coordinadores de una facultad abren la app y la
+sincronización pide a la vez el mismo /files y los mismos /download. Con
+vuelos.ejecutar(nombre, clave, calcular) solo el primero consulta SQL Server;
+los que llegan mientras tanto esperan y reciben su resultado. No es una
+caché: al terminar el vuelo el siguiente request vuelve a calcular.
+
+Dentro de un worker se espera en memoria. Entre workers del mismo host, con un
+lock de archivo (fcntl) en VUELOS_DIR: el líder deja el resultado serializado
+antes de soltar el lock y quien esperaba lo usa si se escribió después de su
+llegada. gunicorn vacía el directorio al arrancar.
+
+La clave lleva la versión de contenido de la facultad (version_contenido), que
+cambia con cada escritura de archivos o ingesta (marcar_cambio): un request
+que llega después de una escritura no se suma a un vuelo anterior a ella.
+"""
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+
+from metricas import vuelos_coalescidos
+from replicas import lectura_desde
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se coalesce dentro del worker
+    fcntl = None
+
+# ======================= CONFIG ===========================
+VUELOS_ACTIVOS = os.getenv("VUELOS_ACTIVOS", "1") == "1"
+# Propio del usuario del servicio (ver _preparar_directorio)
+VUELOS_DIR = os.getenv("VUELOS_DIR") or os.path.join(
+    tempfile.gettempdir(), f"sisa_vuelos_{os.getuid()}" if hasattr(os, "getuid") else "sisa_vuelos")
+# Máximo que se espera el vuelo de otro request antes de calcular por cuenta propia
+VUELO_ESPERA = float(os.getenv("VUELO_ESPERA", "30"))
+# Los resultados que dejan los líderes se borran pasado este tiempo
+VUELO_RESULTADO_TTL = 60
+# Archivos de lock (uno por clave); borrar uno en uso solo puede duplicar un cálculo
+VUELO_LOCK_TTL = 3600
+
+
+def _preparar_directorio(directorio=None):
+    """
+    Crea el directorio solo para el usuario del servicio y comprueba que lo siga siendo: los
+    resultados se leen con pickle, así que un directorio creado antes por otro usuario del host
+    (o escribible por otros) le permitiría ejecutar código en la app. PermissionError si no es propio.
+    """
+    directorio = directorio or VUELOS_DIR
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    info = os.lstat(directorio)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{directorio} no es un directorio")
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"{directorio} pertenece a otro usuario (uid {info.st_uid})")
+        if stat.S_IMODE(info.st_mode) != 0o700:
+            os.chmod(directorio, 0o700)
+
+
+def reiniciar():
+    """Descarta versiones y resultados de una ejecución anterior (hook on_starting de gunicorn)"""
+    import shutil
+    shutil.rmtree(VUELOS_DIR, ignore_errors=True)
+    try:
+        _preparar_directorio()
+    except OSError as e:
+        # Los vuelos quedan solo dentro de cada worker (ver VueloUnico._entre_procesos)
+        print(f"⚠️ Directorio de vuelos no utilizable: {e}")
+
+
+# ======================= VERSIONES DE CONTENIDO ===========================
+def _ruta_version(ambito):
+    return os.path.join(VUELOS_DIR, hashlib.sha1(f"version:{ambito}".encode()).hexdigest() + ".ver")
+
+
+def _leer_version(ambito):
+    try:
+        with open(_ruta_version(ambito), "rb") as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _escribir_version(ambito):
+    fd, temporal = tempfile.mkstemp(dir=VUELOS_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(str(time.time_ns()).encode())
+    os.replace(temporal, _ruta_version(ambito))
+
+
+def version_contenido(facultad_cod=None):
+    """
+    Versión de los archivos de una facultad en este host (sin facultad: de todas).
+    Se lee en cada request, así ve las escrituras de cualquier worker.
+    """
+    if facultad_cod is None:
+        return _leer_version("*")
+    return _leer_version("todas"), _leer_version(f"facultad:{facultad_cod.strip()}")
+
+
+def marcar_cambio(*facultades):
+    """Tras escribir archivos o ingerir: sin facultades, el cambio afecta a todas"""
+    try:
+        _preparar_directorio()
+        for facultad_cod in facultades:
+            if facultad_cod:
+                _escribir_version(f"facultad:{facultad_cod.strip()}")
+        if not any(facultades):
+            _escribir_version("todas")
+        _escribir_version("*")
+    except OSError as e:
+        # Sin versión nueva un request podría sumarse a un vuelo anterior a la escritura
+        print(f"⚠️ No se pudo marcar el cambio de contenido ({facultades}): {e}")
+
+
+# ======================= VUELOS ===========================
+class _Vuelo:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor = None
+        self.error = None
+
+
+class VueloUnico:
+    """Un cálculo en vuelo por clave; los demás requests con la misma clave comparten su resultado"""
+
+    def __init__(self, directorio=VUELOS_DIR, espera=VUELO_ESPERA):
+        self.directorio = directorio
+        self.espera = espera
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self._ultima_purga = 0.0
+
+    def ejecutar(self, nombre, clave, calcular):
+        """
+        Args:
+            nombre: tipo de vuelo (métricas); clave: tupla con ruta, facultad, parámetros y versión
+
+        Returns:
+            tuple: (valor, compartido)
+        """
+        # Quien exige leer sus propias escrituras no puede tomar el resultado de otro
+        if not VUELOS_ACTIVOS or lectura_desde():
+            return calcular(), False
+
+        huella = hashlib.sha256(repr((nombre, clave)).encode()).hexdigest()
+        with self._lock:
+            vuelo = self._en_curso.get(huella)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._en_curso[huella] = _Vuelo()
+
+        if not lider:
+            if not vuelo.listo.wait(self.espera):
+                vuelos_coalescidos.labels(nombre, "espera_vencida").inc()
+                return calcular(), False
+            if vuelo.error is not None:
+                raise vuelo.error
+            vuelos_coalescidos.labels(nombre, "worker").inc()
+            return vuelo.valor, True
+
+        try:
+            vuelo.valor, compartido = self._entre_procesos(nombre, huella, calcular)
+            return vuelo.valor, compartido
+        except Exception as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[huella]
+            vuelo.listo.set()
+
+    def _entre_procesos(self, nombre, huella, calcular):
+        if fcntl is None:
+            vuelos_coalescidos.labels(nombre, "lider").inc()
+            return calcular(), False
+
+        try:
+            _preparar_directorio(self.directorio)
+        except OSError as e:
+            print(f"⚠️ Vuelo sin coalescencia entre workers: {e}")
+            vuelos_coalescidos.labels(nombre, "lider").inc()
+            return calcular(), False
+        base = os.path.join(self.directorio, huella)
+        llegada = time.time_ns()
+        with open(base + ".lock", "ab") as candado:
+            try:
+                fcntl.flock(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Otro worker calcula lo mismo: se espera a que suelte el lock
+                if not self._esperar_lock(candado):
+                    vuelos_coalescidos.labels(nombre, "espera_vencida").inc()
+                    return calcular(), False
+                compartido = self._leer_resultado(base, llegada)
+                if compartido is not None:
+                    fcntl.flock(candado, fcntl.LOCK_UN)
+                    vuelos_coalescidos.labels(nombre, "proceso").inc()
+                    return compartido[0], True
+
+            # Líder (o el anterior falló): se calcula con el lock tomado
+            try:
+                vuelos_coalescidos.labels(nombre, "lider").inc()
+                valor = calcular()
+                self._escribir_resultado(base, valor)
+                return valor, False
+            finally:
+                fcntl.flock(candado, fcntl.LOCK_UN)
+
+    def _esperar_lock(self, candado):
+        limite = time.monotonic() + self.espera
+        pausa = 0.005
+        while time.monotonic() < limite:
+            time.sleep(pausa)
+            pausa = min(pausa * 2, 0.05)
+            try:
+                fcntl.flock(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                continue
+        return False
+
+    def _leer_resultado(self, base, llegada):
+        """(valor,) si el líder lo escribió después de `llegada`, o None"""
+        try:
+            with open(base + ".res", "rb") as f:
+                instante, valor = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return (valor,) if instante >= llegada else None
+
+    def _escribir_resultado(self, base, valor):
+        try:
+            fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((time.time_ns(), valor), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, base + ".res")
+        except Exception as e:
+            # Quien espera en otro worker calculará por su cuenta
+            print(f"⚠️ No se pudo compartir el resultado del vuelo: {e}")
+        self._purgar()
+
+    def _purgar(self):
+        """Borra resultados y locks viejos (como mucho una vez cada VUELO_RESULTADO_TTL por worker)"""
+        ahora = time.time()
+        if ahora - self._ultima_purga < VUELO_RESULTADO_TTL:
+            return
+        self._ultima_purga = ahora
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith((".res", ".tmp")):
+                vida = VUELO_RESULTADO_TTL
+            elif nombre.endswith(".lock"):
+                vida = VUELO_LOCK_TTL
+            else:
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                if ahora - os.stat(ruta).st_mtime > vida:
+                    os.unlink(ruta)
+            except FileNotFoundError:
+                pass
+
+
+vuelos = VueloUnico()
@@ -1,4 +1,5 @@
 import { saveData, loadData } from '../indexeddb-storage.js';
+import { getSessionAuthHeader, rememberWriteMarker } from '../auth-session.js';
 
 const API_BASE = 'http://26.127.175.34:5000';
 const ROLES_PERMITIDOS = ['admin', 'rector'];
@@ -28,7 +29,7 @@ async function getAuthHeaders() {
   if (!userEmail) throw new Error('No hay email de usuario almacenado');
   return { 
     'Content-Type': 'application/json', 
-    'X-User-Email': userEmail 
+    ...(await getSessionAuthHeader(API_BASE))
   };
 }
 
@@ -240,7 +241,7 @@ window.removeFile = async function (btn, filename) {
   try {
     const headers = await getAuthHeaders();
     const url = `${API_BASE}/delete/by-name/${encodeURIComponent(filename)}`;
-    const response = await fetch(url, { method: "DELETE", headers });
+    const response = await rememberWriteMarker(await fetch(url, { method: "DELETE", headers }));
 
     if (!response.ok) {
       const result = await response.json().catch(() => ({}));
@@ -281,19 +282,22 @@ async function processExcelFile() {
       formData.append("file", files[i]);
       if (userData.facultadCod) formData.append("facultadCod", userData.facultadCod);
 
-      const response = await fetch(`${API_BASE}/upload`, {
+      const response = await rememberWriteMarker(await fetch(`${API_BASE}/upload`, {
         method: 'POST',
-        headers: { 'X-User-Email': userEmail },
+        headers: await getSessionAuthHeader(API_BASE),
         body: formData
-      });
+      }));
 
       if (!response.ok) {
         const errorResult = await response.json().catch(() => ({}));
         throw new Error(errorResult.error || `Error ${response.status}`);
       }
 
+      const result = await response.json().catch(() => ({}));
       if (uploadStatus) {
-        uploadStatus.textContent = 'Archivo subido correctamente.';
+        uploadStatus.textContent = result.sinCambios
+          ? 'El archivo no cambió (ya estaba actualizado).'
+          : 'Archivo subido correctamente.';
         uploadStatus.style.color = 'green';
       }
     }
@@ -502,22 +506,22 @@ async function saveTemplates() {
       tipo: currentType 
     };
     
-    const templateResponse = await fetch(`${API_BASE}/plantillas`, {
+    const templateResponse = await rememberWriteMarker(await fetch(`${API_BASE}/plantillas`, {
       method: 'POST',
       headers,
       body: JSON.stringify(apiTemplates)
-    });
+    }));
 
     if (!templateResponse.ok) {
       const errorText = await templateResponse.text();
       throw new Error('Error guardando plantillas: ' + errorText);
     }
 
-    const correoResponse = await fetch(`${API_BASE}/correo-autoridad`, {
+    const correoResponse = await rememberWriteMarker(await fetch(`${API_BASE}/correo-autoridad`, {
       method: 'POST',
       headers,
       body: JSON.stringify({ correoAutoridad })
-    });
+    }));
 
     if (!correoResponse.ok) {
       const errorText = await correoResponse.text();
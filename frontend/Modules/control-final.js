@@ -1,5 +1,6 @@
 import { loadData } from '../indexeddb-storage.js';
 import { enviarCorreos } from './emailModule.js';
+import { descargarExportacion, filasDesdeServidor } from './modulos-api.js';
 
 const norm = (s) => (s ?? '').toString().trim();
 const asNum = (v) => { const n = Number(String(v).replace(',', '.')); return Number.isFinite(n) ? n : null; };
@@ -92,6 +93,10 @@ function computeNoEmailDocentesMessages(selected, docentesExcel) {
 
 // Build rows con filtros
 async function buildRows(periodoSeleccionado = null, carreraSeleccionada = null) {
+  const servidor = await filasDesdeServidor('control-final', periodoSeleccionado, carreraSeleccionada, ['selectedPeriodSRP', 'selectedCareerSRP'],
+    (r, periodo) => ({ ...r, _key: `${r.Identificación}||${r["[Vez] Materia (Docente)"]}||${periodo}`, Estado: '💀' }));
+  if (servidor) return servidor;
+
   const datosNotas = await loadData('academicTrackingData_REPORTE_RECORD_CALIFICACIONES_POR_PARCIAL_TOTAL_xlsx');
   const datosNomina = await loadData('academicTrackingData_REPORTE_NOMINA_ESTUDIANTES_MATRICULADOS_LEGALIZADOS_xlsx');
   const datosCalificaciones = await loadData('academicTrackingData_REPORTE_RECORD_CALIFICACIONES_POR_PARCIAL_TOTAL_xlsx') || [];
@@ -199,6 +204,7 @@ document.addEventListener('DOMContentLoaded', async () => {
   const elements = {
     filterInput: document.getElementById('filterAcademicInput'),
     sendBtn: document.getElementById('sendAcademicEmails'),
+    exportBtn: document.getElementById('exportExcelBtn'),
     backBtn: document.getElementById('goToMenuButton'),
     periodSelect: document.getElementById('period-select'),
     careerSelect: document.getElementById('carrer-select')
@@ -316,5 +322,16 @@ document.addEventListener('DOMContentLoaded', async () => {
     }
   });
 
+  // El xlsx se genera en el servidor con el mismo periodo y carrera seleccionados
+  elements.exportBtn?.addEventListener('click', async () => {
+    const carrera = elements.careerSelect?.value || 'Todas';
+    const params = { periodo: elements.periodSelect?.value || '', ...(carrera !== 'Todas' && { carrera }) };
+    try {
+      await descargarExportacion('/api/export/control-final.xlsx', params, 'control_final.xlsx');
+    } catch (err) {
+      await showModal({ icon: 'error', title: 'Error al exportar', html: escapeHtml(err?.message || String(err)) });
+    }
+  });
+
   elements.backBtn?.addEventListener('click', () => window.location.href = '../index.html');
 });
\ No newline at end of file
@@ -1,5 +1,6 @@
 import { loadData } from '../indexeddb-storage.js';
 import { enviarCorreos } from './emailModule.js';
+import { filasDesdeServidor } from './modulos-api.js';
 
 const norm = (s) => (s ?? '').toString().trim();
 const asNum = (v) => { const n = Number(String(v).replace(',', '.')); return Number.isFinite(n) ? n : null; };
@@ -94,6 +95,9 @@ function computeNoEmailDocentesMessages(selected, docentesExcel) {
 
 // Build rows con filtros
 async function buildRows(periodoSeleccionado = null, carreraSeleccionada = null) {
+  const servidor = await filasDesdeServidor('control-parcial', periodoSeleccionado, carreraSeleccionada, ['selectedPeriodSR', 'selectedCareerSR']);
+  if (servidor) return servidor;
+
   const datosNotas = await loadData('academicTrackingData_REPORTE_RECORD_CALIFICACIONES_POR_PARCIAL_TOTAL_xlsx');
   const datosNomina = await loadData('academicTrackingData_REPORTE_NOMINA_ESTUDIANTES_MATRICULADOS_LEGALIZADOS_xlsx');
   const datosCalificaciones = await loadData('academicTrackingData_REPORTE_RECORD_CALIFICACIONES_POR_PARCIAL_TOTAL_xlsx') || [];
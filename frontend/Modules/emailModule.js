@@ -1,5 +1,6 @@
 // emailModule.js
 import { loadData } from '../indexeddb-storage.js';
+import { getSessionAuthHeader } from '../auth-session.js';
 
 const API_BASE = 'http://178.128.10.70:5000';
 let AUTORIDAD = "alvaro.espinozabu@ug.edu.ec"; 
@@ -82,7 +83,7 @@ async function enviarCorreo(para, contenido) {
   try {
     const response = await fetch(`${API_BASE}/send-email`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: { "Content-Type": "application/json", ...(await getSessionAuthHeader(API_BASE)) },
       body: JSON.stringify({
         to: para, // string o array
         subject: "FACAF Notificación Académica",
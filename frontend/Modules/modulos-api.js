@@ -0,0 +1,72 @@
+// modulos-api.js
+import { getSessionAuthHeader } from '../auth-session.js';
+
+const API_BASE = 'http://26.127.175.34:5000';
+
+/**
+ * Vista de un módulo calculada en el servidor desde los reportes ingeridos
+ * (GET /api/modulos/<modulo>). Devuelve { modulo, periodo, periodos, carreras, resultado }
+ * o null si el servidor no responde o la facultad aún no tiene reportes ingeridos:
+ * en ese caso cada página calcula con los datos de IndexedDB como antes.
+ */
+export async function fetchModulo(modulo, { periodo = '', carrera = '' } = {}) {
+  const params = new URLSearchParams();
+  if (periodo) params.set('periodo', periodo);
+  if (carrera && carrera !== 'Todas') params.set('carrera', carrera);
+
+  try {
+    const resp = await fetch(`${API_BASE}/api/modulos/${encodeURIComponent(modulo)}?${params}`, {
+      headers: { ...(await getSessionAuthHeader(API_BASE)) }
+    });
+    if (!resp.ok) return null;
+    const data = await resp.json();
+    return data?.periodo ? data : null;
+  } catch (err) {
+    console.warn(`⚠️ No se pudo obtener ${modulo} del servidor:`, err);
+    return null;
+  }
+}
+
+// Lista de carreras con 'Todas' primero, como en los selectores de las páginas
+export const carrerasConTodas = (carreras = []) =>
+  ['Todas', ...[...carreras].sort((a, b) => a.localeCompare(b, 'es', { sensitivity: 'base' }))];
+
+/**
+ * Descarga un export generado en el servidor (/api/export/..., /usuarios/export...) con la
+ * sesión actual; el navegador solo guarda el archivo recibido.
+ */
+export async function descargarExportacion(ruta, params, nombre) {
+  const resp = await fetch(`${API_BASE}${ruta}?${new URLSearchParams(params)}`, {
+    headers: { ...(await getSessionAuthHeader(API_BASE)) }
+  });
+  if (!resp.ok) throw new Error((await resp.json().catch(() => null))?.error || `Error ${resp.status}`);
+
+  const url = URL.createObjectURL(await resp.blob());
+  const enlace = Object.assign(document.createElement('a'), { href: url, download: nombre });
+  document.body.appendChild(enlace);
+  enlace.click();
+  enlace.remove();
+  setTimeout(() => URL.revokeObjectURL(url), 1000);
+}
+
+/**
+ * buildRows de las páginas con tabla (control-parcial, control-final, tercera-matricula)
+ * desde el servidor: { rows, periodos, carreras } o null para calcular en el navegador.
+ * Guarda periodo y carrera en las mismas claves de localStorage que usa cada página.
+ */
+export async function filasDesdeServidor(modulo, periodoSeleccionado, carreraSeleccionada, [periodKey, careerKey], mapear = (r) => r) {
+  const periodo = periodoSeleccionado || localStorage.getItem(periodKey) || '';
+  let carrera = carreraSeleccionada || localStorage.getItem(careerKey) || 'Todas';
+
+  let data = await fetchModulo(modulo, { periodo, carrera });
+  // La carrera guardada puede no existir en el periodo: se vuelve a 'Todas'
+  if (data && carrera !== 'Todas' && !data.carreras.includes(carrera)) {
+    carrera = 'Todas';
+    data = await fetchModulo(modulo, { periodo: data.periodo });
+  }
+  if (!data) return null;
+
+  localStorage.setItem(periodKey, data.periodo);
+  localStorage.setItem(careerKey, carrera);
+  return { rows: data.resultado.map(r => mapear(r, data.periodo)), periodos: data.periodos, carreras: carrerasConTodas(data.carreras) };
+}
@@ -1,6 +1,7 @@
 // nee-control.js
 import { enviarCorreosNEE } from './emailModule.js';
 import { loadData } from '../indexeddb-storage.js';
+import { fetchModulo } from './modulos-api.js';
 
 document.addEventListener('DOMContentLoaded', async () => {
   const [tableBody, filterInput, totalSpan, sendEmailsBtn, goToMenuButton, periodSelect, careerSelect] = 
@@ -35,6 +36,10 @@ document.addEventListener('DOMContentLoaded', async () => {
     currentCarrera = localStorage.getItem('selectedCareerNEE') || '';
     if (currentCarrera && !allCarreras.includes(currentCarrera)) currentCarrera = '';
 
+    renderFilters();
+  }
+
+  function renderFilters() {
     if (periodSelect) periodSelect.innerHTML = allPeriodos.map(p => `<option value="${escapeHtml(p)}" ${p === currentPeriodo ? 'selected' : ''}>${escapeHtml(p)}</option>`).join('');
     if (careerSelect) {
       const carrerasConTodas = ['', ...allCarreras];
@@ -153,7 +158,29 @@ document.addEventListener('DOMContentLoaded', async () => {
     renderTable(allStudentsData);
   }
 
-  const reloadFiltersAndData = async () => { await populateFilters(); await loadAndMergeData(); };
+  /* Vista del servidor (/api/modulos/nee-control); false si hay que calcular con IndexedDB */
+  async function loadFromServer() {
+    const periodo = localStorage.getItem('selectedPeriodNEE') || '';
+    let carrera = localStorage.getItem('selectedCareerNEE') || '';
+    let data = await fetchModulo('nee-control', { periodo, carrera });
+    if (data && carrera && !data.carreras.includes(carrera)) {
+      carrera = '';
+      data = await fetchModulo('nee-control', { periodo: data.periodo });
+    }
+    if (!data) return false;
+
+    [allPeriodos, allCarreras, currentPeriodo, currentCarrera] = [data.periodos, data.carreras, data.periodo, carrera];
+    renderFilters();
+    allStudentsData = data.resultado.estudiantes;
+    renderTable(allStudentsData);
+    return true;
+  }
+
+  const reloadFiltersAndData = async () => {
+    if (await loadFromServer()) return;
+    await populateFilters();
+    await loadAndMergeData();
+  };
 
   /* Inicialización */
   await reloadFiltersAndData();
@@ -168,7 +195,7 @@ document.addEventListener('DOMContentLoaded', async () => {
   careerSelect?.addEventListener('change', async () => {
     currentCarrera = careerSelect.value;
     localStorage.setItem('selectedCareerNEE', currentCarrera);
-    await loadAndMergeData();
+    await reloadFiltersAndData();
   });
 
   filterInput?.addEventListener('input', () => {
@@ -1,5 +1,7 @@
 // panel-admin.js - Versión ultra compacta
 import { loadData, saveData } from '../indexeddb-storage.js';
+import { getSessionAuthHeader, rememberWriteMarker } from '../auth-session.js';
+import { descargarExportacion } from './modulos-api.js';
 
 const API_BASE = 'http://26.127.175.34:5000', DEBUG = false;
 const $ = id => document.getElementById(id);
@@ -10,9 +12,9 @@ const createUserBtn = $('createUserBtn'), updateUserBtn = $('updateUserBtn'), cl
 const refreshBtn = $('refreshUsersBtn'), searchText = $('searchText'), filterRol = $('filterRol');
 const filterActivo = $('filterActivo'), applyFiltersBtn = $('applyFiltersBtn'), resetFiltersBtn = $('resetFiltersBtn');
 const loadMoreBtn = $('loadMoreBtn'), [statTotal, statAdmins, statActivos] = ['stat-total', 'stat-admins', 'stat-activos'].map($);
-const [manageFacultiesBtn, manageCareersBtn] = ['manageFacultiesBtn', 'manageCareersBtn'].map($);
+const [manageFacultiesBtn, manageCareersBtn, exportUsersBtn] = ['manageFacultiesBtn', 'manageCareersBtn', 'exportUsersBtn'].map($);
 
-let USERS_CACHE = [], selectedId = null, page = 0;
+let USERS_CACHE = [], selectedId = null, page = 0, nextCursor = null;
 const PAGE_SIZE = 20, CACHE_KEY = 'admin_users_cache_v2';
 window.catalogEditingId = null;
 
@@ -78,7 +80,8 @@ const verificarSesion = async () => {
 const makeAuthenticatedRequest = async (url, options = {}) => {
   const userData = await loadData('userData');
   if (!userData?.usuario) throw new Error('No hay sesión válida');
-  return fetch(url, { ...options, headers: { 'X-User-Email': userData.usuario, 'Content-Type': 'application/json', ...(options.headers || {}) } });
+  const authHeader = await getSessionAuthHeader(API_BASE);
+  return rememberWriteMarker(await fetch(url, { ...options, headers: { ...authHeader, 'Content-Type': 'application/json', ...(options.headers || {}) } }));
 };
 
 const apiHealth = async () => {
@@ -174,11 +177,13 @@ const renderTable = (list, { append = false } = {}) => {
 };
 
 // API usuarios compacto
-const apiListUsers = async ({ q = '', rol = '', page = 0, limit = PAGE_SIZE } = {}) => {
+const apiListUsers = async ({ q = '', rol = '', page = 0, limit = PAGE_SIZE, cursor = null } = {}) => {
   const params = new URLSearchParams();
   if (q) params.set('q', q);
   if (rol) params.set('rolId', rol);
-  params.set('page', String(page));
+  // Paginación por cursor (keyset); 'page' solo para la primera carga
+  if (cursor) params.set('cursor', String(cursor));
+  else params.set('page', String(page));
   params.set('limit', String(limit));
 
   const resp = await makeAuthenticatedRequest(`${API_BASE}/usuarios?${params}`);
@@ -190,7 +195,7 @@ const apiListUsers = async ({ q = '', rol = '', page = 0, limit = PAGE_SIZE } =
   else if (body.data?.length) [rows, total] = [body.data, body.total || body.data.length];
   else if (body.rows?.length) [rows, total] = [body.rows, body.total || body.rows.length];
 
-  return { rows: rows.map(mapUser).filter(Boolean), total };
+  return { rows: rows.map(mapUser).filter(Boolean), total, nextCursor: body.next_cursor ?? null };
 };
 
 const apiCreateUser = async ({ usuario, rol = 'operador', activo = true, facultadCod, carreraCod }) => {
@@ -257,7 +262,8 @@ const refreshUsers = async ({ reset = true } = {}) => {
   
   try {
     await verificarSesion();
-    let { rows, total } = await apiListUsers({ q, rol: rol || '', page, limit: PAGE_SIZE });
+    let { rows, total, nextCursor: cursorSiguiente } = await apiListUsers({ q, rol: rol || '', page, limit: PAGE_SIZE, cursor: reset ? null : nextCursor });
+    nextCursor = cursorSiguiente;
     if (activo !== '') rows = rows.filter(user => user.activo === (activo === '1')), total = rows.length;
 
     if (rows.length === 0 && page === 0) {
@@ -386,6 +392,14 @@ resetFiltersBtn?.addEventListener('click', () => {
   searchText.value = ''; filterRol.value = ''; filterActivo.value = ''; refreshUsers({ reset: true });
 });
 loadMoreBtn?.addEventListener('click', () => { page += 1; refreshUsers({ reset: false }); });
+// Exporta todos los usuarios de los filtros actuales (sin paginar); el xlsx se genera en el servidor
+exportUsersBtn?.addEventListener('click', async () => {
+  const { q, rol, activo } = currentFilters();
+  showOverlay('Exportando usuarios...');
+  try { await descargarExportacion('/usuarios/export.xlsx', { ...(q && { q }), ...(rol && { rolId: rol }), ...(activo && { activo }) }, 'usuarios.xlsx'); }
+  catch (error) { await modalError(`Error al exportar: ${error.message}`); }
+  finally { hideOverlay(); }
+});
 
 // Gestión catálogos ultra compacta
 manageFacultiesBtn?.addEventListener('click', () => showCatalogManager('facultades'));
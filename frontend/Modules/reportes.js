@@ -1,4 +1,5 @@
 import { loadData } from '../indexeddb-storage.js';
+import { fetchModulo } from './modulos-api.js';
 
 /* ===== Helpers ===== */
 const norm = (v) => (v ?? '').toString().trim();
@@ -102,8 +103,7 @@ async function populatePeriodSelect() {
     ({ data } = await loadWithFallback(KEYS_PARCIAL));
   }
   if (!data.length) {
-    select.innerHTML = '';
-    return null;
+    return populateFromServer(localStorage.getItem('selectedPeriod') || '');
   }
 
   // Guardar todos los datos para filtrar después
@@ -143,13 +143,29 @@ async function populatePeriodSelect() {
   return selected;
 }
 
+/* ===== Selectores desde el servidor (sin reportes en IndexedDB) ===== */
+async function populateFromServer(period) {
+  const select = document.getElementById('period-select');
+  const vista = await fetchModulo('reportes', { periodo: period });
+  if (!vista) {
+    select.innerHTML = '';
+    return null;
+  }
+
+  select.innerHTML = vista.periodos.map(p => `<option value="${p}">${p}</option>`).join('');
+  select.value = vista.periodo;
+  localStorage.setItem('selectedPeriod', vista.periodo);
+  populateCareerSelect(vista.periodo, vista.carreras);
+  return vista.periodo;
+}
+
 /* ===== Poblar selector de carreras ===== */
-function populateCareerSelect(period) {
+function populateCareerSelect(period, serverCareers = null) {
   const select = document.getElementById('career-select');
   if (!select) return;
 
   const periodData = allData.filter(r => norm(r.PERIODO) === norm(period));
-  const careers = Array.from(new Set(periodData.map(r => norm(r.CARRERA)).filter(Boolean))).sort();
+  const careers = serverCareers ?? Array.from(new Set(periodData.map(r => norm(r.CARRERA)).filter(Boolean))).sort();
 
   select.innerHTML = '<option value="">Todas las carreras</option>' +
     careers.map(c => `<option value="${c}">${c}</option>`).join('');
@@ -522,7 +538,9 @@ async function renderCharts(m) {
     }
   });
 
-  const sp = await getStudentsByPeriod();
+  const sp = m.estudiantesPorPeriodo
+    ? { labels: Object.keys(m.estudiantesPorPeriodo), counts: Object.values(m.estudiantesPorPeriodo) }
+    : await getStudentsByPeriod();
   chartEstPorPeriodo = new Chart(document.getElementById('chartEstPorPeriodo'), {
     type: 'bar',
     data: {
@@ -701,6 +719,19 @@ function renderTables(m, topDocentes) {
 
 /* ===== Carga principal ===== */
 async function loadReport() {
+  // Sin filtro de materia la vista sale del servidor; con materia se filtra en el navegador
+  if (!currentMateria) {
+    const period = document.getElementById('period-select').value;
+    const vista = await fetchModulo('reportes', { periodo: period, carrera: currentCareer });
+    if (vista && vista.periodo === period) {
+      const m = vista.resultado;
+      renderKPIs(m);
+      renderCharts(m);
+      renderTables(m, m.topDocentes);
+      return;
+    }
+  }
+
   const rows = applyFilters();
 
   if (!Array.isArray(rows) || !rows.length) {
@@ -732,9 +763,10 @@ document.addEventListener('DOMContentLoaded', async () => {
   });
   
   // Evento para cambio de período
-  document.getElementById('period-select').addEventListener('change', (e) => {
+  document.getElementById('period-select').addEventListener('change', async (e) => {
     localStorage.setItem('selectedPeriod', e.target.value);
-    populateCareerSelect(e.target.value);
+    if (allData.length) populateCareerSelect(e.target.value);
+    else await populateFromServer(e.target.value);
     loadReport();
   });
   
@@ -1,6 +1,7 @@
 // tercera-matricula.js
 import { loadData } from '../indexeddb-storage.js';
 import { enviarCorreos } from './emailModule.js';
+import { filasDesdeServidor } from './modulos-api.js';
 
 /* Utils básicos */
 const norm = (s) => (s ?? '').toString().trim();
@@ -100,6 +101,10 @@ function computeNoEmailDocentesMessages(selected, docentesExcel) {
 
 /* Construcción de filas */
 async function buildRows(periodoSeleccionado = null, carreraSeleccionada = null) {
+  const servidor = await filasDesdeServidor('tercera-matricula', periodoSeleccionado, carreraSeleccionada, ['selectedPeriodTM', 'selectedCareerTM'],
+    (r, periodo) => ({ ...r, _key: buildKey(r.Identificacion, r.Materia, getPeriodoAnterior(periodo)) }));
+  if (servidor) return servidor;
+
   const [semestre, calificaciones] = await Promise.all([loadData(KEY_POR_SEMESTRE), loadData(KEY_PARCIAL_TOTAL)]);
   if (!Array.isArray(calificaciones)) return { rows: [], periodos: [], carreras: [] };
 
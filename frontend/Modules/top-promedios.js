@@ -1,5 +1,6 @@
 // top-promedios.js
 import { loadData } from '../indexeddb-storage.js';
+import { fetchModulo } from './modulos-api.js';
 
 const KEY = 'academicTrackingData_REPORTE_RECORD_CALIFICACIONES_POR_PARCIAL_TOTAL_xlsx';
 const carreras = {
@@ -27,10 +28,24 @@ function sortPeriodosDesc(periodos) {
 }
 
 async function initTopPromedios() {
-  const data = await loadData(KEY);
   const container = document.getElementById('top-promedios-container');
   const periodSelect = document.getElementById('periodSelect');
 
+  // Vista calculada en el servidor; sin ella se calcula con los datos de IndexedDB
+  const servidor = await fetchModulo('top-promedios');
+  if (servidor) {
+    periodSelect.innerHTML = servidor.periodos.map(p => `<option value="${p}">${p}</option>`).join('');
+    periodSelect.value = servidor.periodo;
+    renderDesdeServidor(servidor);
+    periodSelect.addEventListener('change', async () => {
+      const vista = await fetchModulo('top-promedios', { periodo: periodSelect.value });
+      if (vista) renderDesdeServidor(vista);
+      else container.innerHTML = `<p>No se pudo cargar el periodo seleccionado.</p>`;
+    });
+    return;
+  }
+
+  const data = await loadData(KEY);
   if (!Array.isArray(data) || data.length === 0) {
     container.innerHTML = `<p>No hay datos disponibles.</p>`;
     return;
@@ -82,6 +97,17 @@ function renderForPeriodo(allData, periodoSeleccionado) {
   renderResultados(resultados, periodoSeleccionado);
 }
 
+function renderDesdeServidor({ periodo, resultado }) {
+  const resultados = Object.fromEntries(Object.entries(resultado).map(([key, estudiantes]) => [key, estudiantes.map(e => ({
+    id: e.id,
+    nombre: e.nombre,
+    correo: e.correo.split('; ').join('<br>'),
+    grupo: `<strong>MA:</strong> ${e.ma}<br><strong>VE:</strong> ${e.ve}`,
+    promedio: e.promedio
+  }))]));
+  renderResultados(resultados, periodo);
+}
+
 function renderResultados(resultados, periodoLabel) {
   const container = document.getElementById('top-promedios-container');
   container.innerHTML = `
@@ -23,6 +23,8 @@ export async function ensureSessionGuard() {
     await removeData('isLoggedIn');
     await removeData('sessionExpiresAt');
     await removeData('userData');
+    await removeData('sessionToken');
+    await removeData('sessionTokenExpiresAt');
     location.href = resolveLoginPath();
     return false;
   }
@@ -46,3 +48,46 @@ export async function scheduleAutoLogout() {
     location.href = resolveLoginPath();
   }, remaining);
 }
+
+// Marca de la última escritura (X-Sisa-Escritura). Se reenvía en cada request para que el
+// backend no lea de una réplica que todavía no tiene lo que el usuario acaba de guardar.
+const WRITE_MARKER_MS = 5 * 60 * 1000;
+
+export async function rememberWriteMarker(response) {
+  const marker = response?.headers?.get('X-Sisa-Escritura');
+  if (marker) {
+    await saveData('writeMarker', marker);
+    await saveData('writeMarkerSavedAt', Date.now());
+  }
+  return response;
+}
+
+// Cabecera Authorization con el token de sesión firmado; lo renueva en /auth/refresh si está por vencer.
+export async function getSessionAuthHeader(apiBase) {
+  let token = await loadData('sessionToken');
+  if (!token) return {};
+
+  const tokenExpiresAt = Number(await loadData('sessionTokenExpiresAt') || 0);
+  if (tokenExpiresAt - Date.now() < 2 * 60 * 1000) {
+    try {
+      const resp = await fetch(`${apiBase}/auth/refresh`, {
+        method: 'POST',
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      if (resp.ok) {
+        const result = await resp.json();
+        token = result.token;
+        await saveData('sessionToken', result.token);
+        await saveData('sessionTokenExpiresAt', result.expiraEn);
+      }
+    } catch (err) {
+      console.warn('⚠️ No se pudo renovar el token de sesión:', err);
+    }
+  }
+  const headers = { Authorization: `Bearer ${token}` };
+  const marker = await loadData('writeMarker');
+  if (marker && Date.now() - Number(await loadData('writeMarkerSavedAt') || 0) < WRITE_MARKER_MS) {
+    headers['X-Sisa-Escritura'] = marker;
+  }
+  return headers;
+}
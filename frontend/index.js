@@ -1,6 +1,6 @@
 // index.js - Versión con popup personalizado
 import { loadData, saveData, removeData } from './indexeddb-storage.js';
-import { ensureSessionGuard, scheduleAutoLogout } from './auth-session.js';
+import { ensureSessionGuard, scheduleAutoLogout, getSessionAuthHeader, rememberWriteMarker } from './auth-session.js';
 
 const API_BASE = 'http://26.127.175.34:5000';
 
@@ -23,18 +23,13 @@ document.addEventListener('DOMContentLoaded', async () => {
     return;
   }
 
-  // Headers simples para autenticación
-  const authHeaders = {
-    'X-User-Email': currentUser.usuario,
-    'Content-Type': 'application/json'
-  };
-
-  // Función helper para requests autenticados
+  // Función helper para requests autenticados (token de sesión firmado)
   const apiRequest = async (url, options = {}) => {
-    return fetch(url, {
+    const authHeader = await getSessionAuthHeader(API_BASE);
+    return rememberWriteMarker(await fetch(url, {
       ...options,
-      headers: { ...authHeaders, ...(options.headers || {}) }
-    });
+      headers: { 'Content-Type': 'application/json', ...authHeader, ...(options.headers || {}) }
+    }));
   };
 
   // ---------- Tema ----------
@@ -472,6 +467,8 @@ async function syncFiles() {
         await removeData('sessionExpiresAt');
         await removeData('userData');
         await removeData('userPermissions');
+        await removeData('sessionToken');
+        await removeData('sessionTokenExpiresAt');
         location.href = 'login.html';
       };
     }
@@ -79,6 +79,8 @@ document.addEventListener('DOMContentLoaded', () => {
             await saveData('isLoggedIn', true);
             await saveData('userData', userData);
             await saveData('sessionExpiresAt', expirationTime);
+            await saveData('sessionToken', result.token);
+            await saveData('sessionTokenExpiresAt', result.expiraEn);
 
             window.location.href = 'index.html';
           }